@@ -10,6 +10,7 @@ from src.action.components.action_registry import ActionRegistry
 from src.action.components.llm_client_factory import LLMClientFactory
 from src.action.components.pending_action_manager import PendingActionManager
 from src.common.custom_logging.logging_config import get_logger
+from src.common.tracing.tracer import tracer
 from src.config import config
 from src.core_communication.action_sender import ActionSender
 from src.database import ActionLogStorageService, ConversationStorageService, EventStorageService, ThoughtStorageService
@@ -117,7 +118,7 @@ class ActionHandler:
             logger.error(f"找不到平台 '{adapter_id}' 的翻译官，无法发起上线安检！")
             return
 
-        action_event = builder.build_action_event(action_name="get_bot_profile", params={})
+        action_event = platform_builder_registry.build_action_event(adapter_id, "get_bot_profile", {})
 
         if not action_event:
             logger.error(f"平台 '{adapter_id}' 的翻译官不会翻译 get_bot_profile 动作！")
@@ -178,12 +179,13 @@ class ActionHandler:
         except Exception as e:
             return False, {"error": f"发送平台动作时发生意外异常: {e}"}
 
-        return await self.pending_action_manager.add_and_wait_for_action(
-            action_id=core_action_id,
-            thought_doc_key=thought_doc_key,
-            original_action_description=original_action_description,
-            action_to_send=action_to_send,
-        )
+        with tracer.span("adapter_action_response"):
+            return await self.pending_action_manager.add_and_wait_for_action(
+                action_id=core_action_id,
+                thought_doc_key=thought_doc_key,
+                original_action_description=original_action_description,
+                action_to_send=action_to_send,
+            )
 
     async def process_action_flow(
         self,
@@ -218,7 +220,7 @@ class ActionHandler:
                 logger.error(msg)
                 return False, msg, None
 
-            action_event = builder.build_action_event(action_name, params)
+            action_event = platform_builder_registry.build_action_event(platform_id, action_name, params)
             if not action_event:
                 msg = f"平台 '{platform_id}' 的翻译官不会翻译动作 '{action_name}'。"
                 logger.error(msg)
@@ -267,6 +269,10 @@ class ActionHandler:
                     self.thought_trigger.set()
                 return True, final_result, None
 
+            msg = f"不认识的核心动作 '{action_name}'。"
+            logger.error(msg)
+            return False, msg, None
+
         # 4. 如果啥动作都没有
         final_result_for_shimo = "AI决策的动作对象为空，或没有可执行的动作。"
         await self.thought_storage_service.update_action_status_in_thought_document(
@@ -306,7 +312,7 @@ class ActionHandler:
             # ❤❤❤ 为了统一，失败时也返回字典，让调用者的小穴更好处理！❤❤❤
             return False, {"error": f"找不到平台 '{platform_id}' 的翻译官。"}
 
-        action_event = builder.build_action_event(action_name, params)
+        action_event = platform_builder_registry.build_action_event(platform_id, action_name, params)
         if not action_event:
             # ❤❤❤ 统一返回字典！❤❤❤
             return False, {"error": f"平台 '{platform_id}' 的翻译官不会翻译动作 '{action_name}'。"}
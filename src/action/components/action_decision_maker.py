@@ -1,12 +1,19 @@
 # src/action/components/action_decision_maker.py
+import asyncio
 import json
 from dataclasses import dataclass
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from src.common.custom_logging.logging_config import get_logger
 from src.common.json_parser.json_parser import parse_llm_json_response
+from src.config import config
 from src.llmrequest.llm_processor import Client as ProcessorClient
 
+from .tool_selector import ToolSelector
+
+if TYPE_CHECKING:
+    from src.common.intelligent_interrupt_system.models import SemanticModel
+
 logger = get_logger(__name__)
 
 
@@ -28,12 +35,21 @@ class ActionDecisionMaker:
     它构建prompt，调用LLM，并解析返回的JSON决策。
     """
 
-    def __init__(self, llm_client: ProcessorClient) -> None:
+    def __init__(self, llm_client: ProcessorClient, semantic_model: "SemanticModel | None" = None) -> None:
         if not llm_client:
             raise ValueError("LLM客户端实例 'llm_client' 不能为空。")
         self.llm_client = llm_client
+        # 工具筛选器：有语义模型就按向量挑，没有就按字面重叠挑；report_action_failure 永远带上
+        self.tool_selector = ToolSelector(
+            encode=semantic_model.encode if semantic_model else None,
+            always_include=("report_action_failure",),
+        )
         logger.info(f"{self.__class__.__name__} instance created.")
 
+    async def register_tools(self, tools_schema: list[dict[str, Any]]) -> None:
+        """登记工具并算好描述向量。编码会阻塞，丢到线程里做；schema 没变的工具不会重新编码。"""
+        await asyncio.to_thread(self.tool_selector.register_tools, tools_schema)
+
     def _build_decision_prompt(
         self,
         tools_schema: list[dict[str, Any]],
@@ -42,9 +58,9 @@ class ActionDecisionMaker:
         action_motivation: str,
         relevant_adapter_messages_context: str,
     ) -> str:
-        # 把工具说明书（schema）转换成好看的JSON字符串
-        # 这里的 tools_schema 是一个包含了所有工具（平台+内部）的列表
-        tools_json_string = json.dumps(tools_schema, indent=2, ensure_ascii=False)
+        # 把工具说明书（schema）转换成紧凑的JSON字符串，每个工具的字符串都是预先渲染好缓存着的
+        # 这里的 tools_schema 已经是筛选过的、和本次意图相关的工具列表
+        tools_json_string = self.tool_selector.render(tools_schema)
 
         # 这是新的Prompt模板，它会把工具说明书塞进去
         prompt_template = f"""你是我的智能行动决策系统，你的任务是分析我的的思考和行动意图，然后从下方提供的<目前可用工具列表>中选择一个最合适的工具，并以指定的JSON格式输出你的决策。
@@ -89,8 +105,19 @@ class ActionDecisionMaker:
     ) -> ActionDecision:
         logger.info(f"开始为动作 '{action_description[:50]}...' 进行LLM决策。")
 
-        prompt = self._build_decision_prompt(
+        # 只挑和这次意图相关的工具，prompt 和 tools 参数都用筛选后的列表
+        # 意图文本要现场编码，同样放到线程里，别卡住事件循环
+        selected_tools = await asyncio.to_thread(
+            self.tool_selector.select,
             tools_schema,
+            query_text=f"{action_description}\n{action_motivation}",
+            top_k=config.core_logic_settings.action_tool_top_k,
+        )
+        if len(selected_tools) < len(tools_schema):
+            logger.debug(f"工具筛选: 从 {len(tools_schema)} 个工具中选出 {len(selected_tools)} 个交给LLM。")
+
+        prompt = self._build_decision_prompt(
+            selected_tools,
             current_thought_context,
             action_description,
             action_motivation,
@@ -98,7 +125,7 @@ class ActionDecisionMaker:
         )
 
         # 把工具说明书也传给LLM，这样它才能正确地进行 tool_call
-        response = await self.llm_client.make_llm_request(prompt=prompt, is_stream=False, tools=tools_schema)
+        response = await self.llm_client.make_llm_request(prompt=prompt, is_stream=False, tools=selected_tools)
         raw_text = response.get("text", "").strip()
 
         # 检查LLM是否直接返回了tool_calls
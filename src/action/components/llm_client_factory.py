@@ -5,6 +5,7 @@ from typing import Any
 from src.common.custom_logging.logging_config import get_logger
 from src.config import config
 from src.llmrequest.llm_processor import Client as ProcessorClient
+from src.llmrequest.request_scheduler import PURPOSE_PRIORITIES, LLMPriority
 
 logger = get_logger(__name__)
 
@@ -81,6 +82,7 @@ class LLMClientFactory:
                 "proxy_port": final_proxy_port,
                 **vars(general_llm_settings_obj),
                 **model_specific_kwargs,
+                "default_priority": PURPOSE_PRIORITIES.get(purpose_key, LLMPriority.TOOL_DECISION),
             }
 
             final_args = {k: v for k, v in processor_args.items() if v is not None}
@@ -0,0 +1,121 @@
+# src/action/components/tool_selector.py
+import json
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from src.common.custom_logging.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 编码文本的函数签名，和 SemanticModel.encode 一致：传一组文本，返回一组向量
+EncodeFunc = Callable[[list[str]], Any]
+
+
+@dataclass
+class _ToolEntry:
+    """一个工具的缓存：原始 schema、预先渲染好的紧凑 JSON、描述向量和用于兜底匹配的字符二元组。"""
+
+    name: str
+    schema: dict[str, Any]
+    rendered: str
+    vector: np.ndarray | None = None
+    bigrams: set[str] = field(default_factory=set)
+
+
+def _tool_name_and_description(schema: dict[str, Any]) -> tuple[str, str]:
+    """兼容 OpenAI 风格 {"type": "function", "function": {...}} 和扁平的 {"name", "description"} 两种写法。"""
+    body = schema.get("function", schema) if isinstance(schema.get("function"), dict) else schema
+    return str(body.get("name", "")), str(body.get("description", ""))
+
+
+def _bigrams(text: str) -> set[str]:
+    compact = "".join(text.lower().split())
+    if len(compact) < 2:
+        return {compact} if compact else set()
+    return {compact[i : i + 2] for i in range(len(compact) - 1)}
+
+
+class ToolSelector:
+    """
+    工具筛选器：不再把几十个工具的说明书一股脑塞进每个决策 prompt，
+    而是只挑和这次行动意图最相关的 top-k 个。
+    每个工具的描述向量和紧凑 JSON 只在第一次见到它（或它的 schema 变了）时计算一次。
+    没有语义模型时退回到字符二元组重叠打分，哼，总比全塞进去强。
+    """
+
+    def __init__(self, encode: EncodeFunc | None = None, always_include: Sequence[str] = ()) -> None:
+        self._encode = encode
+        self.always_include = set(always_include)
+        self._entries: dict[str, _ToolEntry] = {}
+
+    def register_tools(self, tools_schema: list[dict[str, Any]]) -> None:
+        """登记（或更新）一批工具。schema 没变的工具直接复用缓存，不会重新编码。"""
+        new_entries: list[_ToolEntry] = []
+        for schema in tools_schema:
+            name, description = _tool_name_and_description(schema)
+            if not name:
+                continue
+            cached = self._entries.get(name)
+            if cached and cached.schema is schema:
+                # 同一个 schema 对象（工具目录是缓存好的），连序列化都省了
+                continue
+            rendered = json.dumps(schema, ensure_ascii=False, separators=(",", ":"))
+            if cached and cached.rendered == rendered:
+                cached.schema = schema
+                continue
+            entry = _ToolEntry(name=name, schema=schema, rendered=rendered, bigrams=_bigrams(f"{name} {description}"))
+            self._entries[name] = entry
+            new_entries.append(entry)
+
+        if new_entries and self._encode:
+            try:
+                texts = [f"{entry.name}: {_tool_name_and_description(entry.schema)[1]}" for entry in new_entries]
+                vectors = np.asarray(self._encode(texts), dtype=np.float32)
+                for entry, vector in zip(new_entries, vectors, strict=True):
+                    norm = float(np.linalg.norm(vector))
+                    entry.vector = vector / norm if norm else None
+            except Exception as e:
+                logger.warning(f"为工具描述生成向量失败，将退回到字符匹配: {e}")
+        if new_entries:
+            logger.debug(f"工具筛选器登记了 {len(new_entries)} 个新工具，当前共 {len(self._entries)} 个。")
+
+    def select(self, tools_schema: list[dict[str, Any]], query_text: str, top_k: int) -> list[dict[str, Any]]:
+        """从 tools_schema 里挑出和 query_text 最相关的 top_k 个工具（always_include 里的总会带上）。"""
+        self.register_tools(tools_schema)
+        candidates = [self._entries[name] for schema in tools_schema if (name := _tool_name_and_description(schema)[0])]
+        if top_k <= 0 or len(candidates) <= top_k:
+            return [entry.schema for entry in candidates]
+
+        scores = self._score(candidates, query_text)
+        ranked = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        pinned = [i for i, entry in enumerate(candidates) if self._is_pinned(entry.name)]
+        chosen = [i for i in ranked if i not in pinned][:top_k]
+        # 保持工具原本的顺序，prompt 更稳定
+        return [candidates[i].schema for i in sorted({*chosen, *pinned})]
+
+    def render(self, tools_schema: list[dict[str, Any]]) -> str:
+        """用缓存好的紧凑 JSON 拼出工具列表字符串，不再每次 json.dumps(indent=2)。"""
+        self.register_tools(tools_schema)
+        parts = [
+            self._entries[name].rendered for schema in tools_schema if (name := _tool_name_and_description(schema)[0])
+        ]
+        return "[" + ",".join(parts) + "]"
+
+    def _is_pinned(self, name: str) -> bool:
+        return any(name == pinned or name.endswith(f".{pinned}") for pinned in self.always_include)
+
+    def _score(self, candidates: list[_ToolEntry], query_text: str) -> list[float]:
+        if self._encode and all(entry.vector is not None for entry in candidates):
+            try:
+                query = np.asarray(self._encode([query_text]), dtype=np.float32)[0]
+                norm = float(np.linalg.norm(query))
+                if norm:
+                    matrix = np.vstack([entry.vector for entry in candidates])
+                    return (matrix @ (query / norm)).tolist()
+            except Exception as e:
+                logger.warning(f"为行动意图生成向量失败，将退回到字符匹配: {e}")
+        query_bigrams = _bigrams(query_text)
+        return [len(entry.bigrams & query_bigrams) / (len(entry.bigrams) or 1) for entry in candidates]
@@ -0,0 +1,177 @@
+# src/common/custom_logging/hot_path_logger.py
+"""
+热路径专用的日志门面，哼，给那些每条消息都要跑一遍的地方用的。
+
+普通的 logger.debug(f"...") 不管日志级别开没开，f-string 都会先拼好再扔进去，
+忙起来的时候光拼字符串和往终端写字就能吃掉一截 CPU。这里做三件事：
+- 级别检查：低于热路径门槛（环境变量 HOT_PATH_LOG_LEVEL，默认 INFO）或者控制台、文件处理器
+  都不收的级别，直接返回，参数一个都不碰。门槛在创建时算好，之后只比一个整数。
+  文件日志默认收 DEBUG，热路径的 DEBUG 要自己打开才记；
+- 惰性求值：消息本身和参数都可以传可调用对象（比如 lambda），真要输出时才会被调用；
+- 采样和限流：同一类刷屏消息可以每 N 条只记一条，或者每隔几秒最多记一条。
+"""
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from functools import lru_cache
+from typing import TYPE_CHECKING, TypedDict, Unpack
+
+from loguru import logger as _root_logger
+
+from .logging_config import CONSOLE_LOG_LEVEL, FILE_LOG_LEVEL, get_logger
+
+if TYPE_CHECKING:
+    from loguru import Logger
+
+# 参数要么是现成的值，要么是真要输出时才调用的零参函数
+LazyArg = object | Callable[[], object]
+LazyMessage = str | Callable[[], str]
+
+
+class LogLimits(TypedDict, total=False):
+    """log() 的采样/限流参数，各个快捷方法原样透传。"""
+
+    every_n: int
+    per_seconds: float
+    key: str | None
+
+
+@lru_cache(maxsize=64)
+def _level_no(level_name: str, fallback: int) -> int:
+    try:
+        return _root_logger.level(level_name.upper()).no
+    except ValueError:
+        return fallback
+
+
+def _hot_path_min_level_no() -> int:
+    """热路径日志自己的门槛，默认 INFO：每条消息都跑的 DEBUG 要显式打开才记。"""
+    return _level_no(os.getenv("HOT_PATH_LOG_LEVEL", "INFO"), 20)
+
+
+def _sink_min_level_no() -> int:
+    """get_logger 挂的控制台和文件处理器里最低的那个级别，比它还低的日志谁都不收。"""
+    return min(_level_no(CONSOLE_LOG_LEVEL, 20), _level_no(FILE_LOG_LEVEL, 10))
+
+
+def _sample_key_of(message: LazyMessage) -> str:
+    if isinstance(message, str):
+        return message
+    code = getattr(message, "__code__", None)
+    return f"{code.co_filename}:{code.co_firstlineno}" if code else repr(message)
+
+
+class HotPathLogger:
+    """
+    包在 get_logger 返回的 logger 外面的一层薄门面。
+    采样计数和限流时间戳都按模块各自保存，不同模块之间互不影响。
+    """
+
+    def __init__(self, bound_logger: "Logger", min_level_no: int | None = None) -> None:
+        self._logger = bound_logger
+        # 热路径门槛和处理器最低级别取较高的那个，创建时算一次（处理器的级别启动后就不变了）
+        if min_level_no is None:
+            min_level_no = max(_hot_path_min_level_no(), _sink_min_level_no())
+        self._min_level_no = min_level_no
+        self._sample_counters: dict[str, int] = {}
+        self._last_emitted_at: dict[str, float] = {}
+        self._suppressed_counts: dict[str, int] = {}
+        self._state_lock = threading.Lock()
+
+    @property
+    def raw(self) -> "Logger":
+        """需要 loguru 原生功能（比如 exception、opt）的时候，直接拿里面那个。"""
+        return self._logger
+
+    def is_enabled(self, level: str) -> bool:
+        """
+        这个级别的日志会不会真的被记下来。热路径上先问一句，再决定要不要拼字符串。
+        门槛已经在创建时把热路径级别和处理器级别合在一起了，这里只比一个整数。
+        """
+        return _level_no(level, 0) >= self._min_level_no
+
+    def should_sample(self, key: str, every_n: int) -> bool:
+        """同一个 key 每 every_n 次只放行一次（第一次一定放行）。"""
+        if every_n <= 1:
+            return True
+        with self._state_lock:
+            count = self._sample_counters.get(key, 0)
+            self._sample_counters[key] = count + 1
+        return count % every_n == 0
+
+    def allow(self, key: str, per_seconds: float) -> tuple[bool, int]:
+        """
+        限流：同一个 key 在 per_seconds 秒内最多放行一次。
+        返回 (是否放行, 放行前被压掉了多少条)，好让输出时顺手说一声。
+        """
+        if per_seconds <= 0:
+            return True, 0
+        now = time.monotonic()
+        with self._state_lock:
+            last = self._last_emitted_at.get(key)
+            if last is not None and now - last < per_seconds:
+                self._suppressed_counts[key] = self._suppressed_counts.get(key, 0) + 1
+                return False, 0
+            self._last_emitted_at[key] = now
+            return True, self._suppressed_counts.pop(key, 0)
+
+    def log(
+        self,
+        level: str,
+        message: LazyMessage,
+        *args: LazyArg,
+        every_n: int = 1,
+        per_seconds: float = 0.0,
+        key: str | None = None,
+    ) -> None:
+        """
+        真正干活的地方。message 用 loguru 的 {} 占位符，args 里的可调用对象只有在确定要输出时才会被调用。
+        message 自己也可以是返回字符串的可调用对象（比如 lambda: f"..."），同样等到要输出时才调用。
+        key 不给的话就拿 message 模板本身（可调用对象就拿它定义的位置）当 key，同一行代码的刷屏消息自然归到一起。
+        """
+        if not self.is_enabled(level):
+            return
+        sample_key = key or _sample_key_of(message)
+        if every_n > 1 and not self.should_sample(sample_key, every_n):
+            return
+        suppressed = 0
+        if per_seconds > 0:
+            allowed, suppressed = self.allow(sample_key, per_seconds)
+            if not allowed:
+                return
+
+        if callable(message):
+            message = message()
+        resolved = tuple(arg() if callable(arg) else arg for arg in args)
+        if suppressed:
+            message = f"{message} (期间另有 {suppressed} 条同类日志被省略)"
+        if resolved:
+            self._logger.log(level, message, *resolved)
+        else:
+            # 没有参数时 loguru 不会去 format，消息里带花括号（比如 JSON）也不怕
+            self._logger.log(level, message)
+
+    def trace(self, message: LazyMessage, *args: LazyArg, **limits: Unpack[LogLimits]) -> None:
+        self.log("TRACE", message, *args, **limits)
+
+    def debug(self, message: LazyMessage, *args: LazyArg, **limits: Unpack[LogLimits]) -> None:
+        self.log("DEBUG", message, *args, **limits)
+
+    def info(self, message: LazyMessage, *args: LazyArg, **limits: Unpack[LogLimits]) -> None:
+        self.log("INFO", message, *args, **limits)
+
+    def success(self, message: LazyMessage, *args: LazyArg, **limits: Unpack[LogLimits]) -> None:
+        self.log("SUCCESS", message, *args, **limits)
+
+    def warning(self, message: LazyMessage, *args: LazyArg, **limits: Unpack[LogLimits]) -> None:
+        self.log("WARNING", message, *args, **limits)
+
+    def error(self, message: LazyMessage, *args: LazyArg, **limits: Unpack[LogLimits]) -> None:
+        self.log("ERROR", message, *args, **limits)
+
+
+def get_hot_path_logger(module_name: str) -> HotPathLogger:
+    """和 get_logger 用法一样，只是拿到的是带级别检查、惰性求值和采样限流的门面。"""
+    return HotPathLogger(get_logger(module_name))
@@ -0,0 +1,279 @@
+# src/common/custom_logging/log_archiver.py
+"""
+日志压缩/归档的后台工人，哼，脏活累活都扔到另一个进程里去干。
+
+以前 loguru 轮替日志的时候，会在写日志的那个线程里同步 zip 整个文件，
+每月 1 号还要把一堆每日压缩包再 zip 一遍，午夜那一下谁正好在打日志谁就被卡住。
+现在主进程只负责把任务写进子进程的 stdin（一行一个 JSON），立刻返回；
+子进程按顺序慢慢干，干完把结果写回 stdout，主进程有个小线程负责把结果记到日志里。
+
+子进程用 `python -m src.common.custom_logging.log_archiver` 启动，除了 loguru 只用标准库
+（zstd 要装了 zstandard 才有），不会把整个 AIcarusCore 再 import 一遍。
+
+可以用环境变量调：
+- LOG_ARCHIVE_FORMAT: gzip（默认）或 zstd，每日日志的压缩格式；
+- LOG_ARCHIVE_LEVEL: 压缩级别，gzip 是 1-9（默认 6），zstd 是 1-22（默认 3）。
+"""
+
+import atexit
+import contextlib
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+from loguru import logger
+
+try:
+    import zstandard
+except ImportError:  # zstd 是可选的，没装就老老实实用 gzip
+    zstandard = None
+
+ARCHIVE_SUFFIXES: dict[str, str] = {"gzip": ".gz", "zstd": ".zst"}
+DEFAULT_LEVELS: dict[str, int] = {"gzip": 6, "zstd": 3}
+# 每日压缩包可能的后缀，.zip 是旧版本留下来的，月度归档时也要一起收走
+DAILY_ARCHIVE_SUFFIXES: tuple[str, ...] = (".log.gz", ".log.zst", ".log.zip")
+_COPY_CHUNK_BYTES = 1024 * 1024
+_PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+# 一个任务就是一个能 JSON 序列化的小字典，例如 {"op": "compress", "path": "..."}
+ArchiveJob = dict[str, str | int]
+
+
+def resolve_archive_settings() -> tuple[str, int]:
+    """从环境变量读压缩格式和级别，写错了就退回默认值。"""
+    fmt = os.getenv("LOG_ARCHIVE_FORMAT", "gzip").strip().lower()
+    if fmt not in ARCHIVE_SUFFIXES or (fmt == "zstd" and zstandard is None):
+        fmt = "gzip"
+    try:
+        level = int(os.getenv("LOG_ARCHIVE_LEVEL", str(DEFAULT_LEVELS[fmt])))
+    except ValueError:
+        level = DEFAULT_LEVELS[fmt]
+    max_level = 22 if fmt == "zstd" else 9
+    return fmt, min(max(level, 1), max_level)
+
+
+def _parse_daily_archive_date(path: Path) -> date | None:
+    for suffix in DAILY_ARCHIVE_SUFFIXES:
+        if path.name.endswith(suffix):
+            try:
+                return datetime.strptime(path.name[: -len(suffix)], "%Y-%m-%d").date()
+            except ValueError:
+                return None
+    return None
+
+
+def compress_daily_log(log_file: Path, fmt: str, level: int) -> str | None:
+    """流式压缩一个每日日志，压完删原文件。不用把整个文件读进内存。"""
+    if not log_file.exists() or log_file.suffix != ".log":
+        return None
+    target = log_file.with_name(log_file.name + ARCHIVE_SUFFIXES[fmt])
+    partial = target.with_name(target.name + ".part")
+    with log_file.open("rb") as src:
+        if fmt == "zstd" and zstandard is not None:
+            compressor = zstandard.ZstdCompressor(level=level)
+            with partial.open("wb") as raw_dst, compressor.stream_writer(raw_dst) as dst:
+                shutil.copyfileobj(src, dst, _COPY_CHUNK_BYTES)
+        else:
+            with gzip.open(partial, "wb", compresslevel=level) as dst:
+                shutil.copyfileobj(src, dst, _COPY_CHUNK_BYTES)
+    # 先写 .part 再改名，压到一半被杀掉也不会留下一个半截的压缩包冒充成品
+    partial.replace(target)
+    log_file.unlink()
+    return f"日志文件 '{log_file.name}' 已压缩至 '{target.name}'。"
+
+
+def archive_month(log_directory: Path, year: int, month: int) -> str | None:
+    """
+    把某个月的每日压缩包收进一个 tar 里。
+    每日文件本身已经压过了，这里只是装袋，不再重新压缩一遍，快得很。
+    """
+    year_month_str = f"{year:04d}-{month:02d}"
+    daily_archives = sorted(
+        p for p in log_directory.glob(f"{year_month_str}-*.log.*") if p.name.endswith(DAILY_ARCHIVE_SUFFIXES)
+    )
+    if not daily_archives:
+        return None
+    monthly_archive_path = log_directory / f"{year_month_str}.tar"
+    # 同一个月份如果已经有归档（比如补进来的迟到文件），就追加进去
+    mode = "a" if monthly_archive_path.exists() else "w"
+    with tarfile.open(monthly_archive_path, mode) as tar:
+        for daily in daily_archives:
+            tar.add(daily, arcname=daily.name)
+    for daily in daily_archives:
+        daily.unlink()
+    return f"{year_month_str} 的 {len(daily_archives)} 个每日日志已归档至 '{monthly_archive_path}'"
+
+
+def catch_up_directory(log_directory: Path, fmt: str, level: int, today: date | None = None) -> list[str]:
+    """压缩所有今天之前的 .log，再把上个月及更早的每日压缩包按月归档。"""
+    if not log_directory.is_dir():
+        return []
+    today = today or datetime.now().date()
+    messages: list[str] = []
+    for log_file in sorted(log_directory.glob("*.log")):
+        try:
+            file_date = datetime.strptime(log_file.stem, "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        if file_date < today and (msg := compress_daily_log(log_file, fmt, level)):
+            messages.append(msg)
+
+    months_to_archive: set[tuple[int, int]] = set()
+    for archive in log_directory.glob("*.log.*"):
+        file_date = _parse_daily_archive_date(archive)
+        if file_date and (file_date.year, file_date.month) < (today.year, today.month):
+            months_to_archive.add((file_date.year, file_date.month))
+    for year, month in sorted(months_to_archive):
+        if msg := archive_month(log_directory, year, month):
+            messages.append(msg)
+    return messages
+
+
+def run_job(job: ArchiveJob) -> list[str]:
+    """子进程（或者退化时的后台线程）里真正执行一个任务。"""
+    fmt, level = str(job.get("format", "gzip")), int(job.get("level", DEFAULT_LEVELS["gzip"]))
+    op = job.get("op")
+    path = Path(str(job.get("path", "")))
+    if op == "compress":
+        messages = [msg] if (msg := compress_daily_log(path, fmt, level)) else []
+        # 顺手把同一个房间里被遗忘的旧日志和过期月份也收拾掉，月初归档就是这么触发的
+        return messages + catch_up_directory(path.parent, fmt, level)
+    if op == "catch_up":
+        messages = []
+        if path.is_dir():
+            for module_dir in sorted(p for p in path.iterdir() if p.is_dir()):
+                messages.extend(catch_up_directory(module_dir, fmt, level))
+        return messages
+    raise ValueError(f"未知的归档任务: {op}")
+
+
+def _worker_main() -> None:
+    """子进程入口：一行一个任务，一行一个结果，stdin 关了就收工。"""
+    if hasattr(os, "nice"):
+        with contextlib.suppress(OSError):
+            os.nice(10)  # 压缩不急，别跟主进程抢 CPU
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+            result = {"ok": True, "messages": run_job(job)}
+        except Exception as e:
+            result = {"ok": False, "error": f"{type(e).__name__}: {e}", "job": line.strip()}
+        sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+
+class LogArchiver:
+    """
+    主进程这一侧的遥控器。submit 只是往管道里写一行，不等结果；
+    子进程第一次有活干的时候才会被拉起来，挂了下次提交时会重新拉。
+    子进程实在起不来（比如被打包成了单文件程序），就退化成在一个后台线程里干，至少不卡写日志的线程。
+    """
+
+    def __init__(self) -> None:
+        self.format, self.level = resolve_archive_settings()
+        self._process: subprocess.Popen[str] | None = None
+        self._lock = threading.Lock()
+        self._use_thread_fallback = False
+        atexit.register(self.shutdown)
+
+    def _ensure_worker(self) -> subprocess.Popen[str] | None:
+        if self._process is not None and self._process.poll() is None:
+            return self._process
+        if self._use_thread_fallback:
+            return None
+        try:
+            self._process = subprocess.Popen(
+                [sys.executable, "-m", "src.common.custom_logging.log_archiver"],
+                cwd=_PROJECT_ROOT,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                bufsize=1,
+                env={**os.environ, "PYTHONIOENCODING": "utf-8"},  # 两头都按 UTF-8 说话，Windows 上也不乱码
+            )
+        except OSError as e:
+            logger.warning(f"日志归档子进程启动失败，改用后台线程压缩: {e}")
+            self._use_thread_fallback = True
+            return None
+        threading.Thread(
+            target=self._drain_results, args=(self._process,), name="log-archiver-results", daemon=True
+        ).start()
+        return self._process
+
+    def _drain_results(self, process: subprocess.Popen[str]) -> None:
+        if process.stdout is None:
+            return
+        for line in process.stdout:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self._report(result)
+
+    @staticmethod
+    def _report(result: dict[str, object]) -> None:
+        if not result.get("ok"):
+            logger.error(f"日志归档任务失败: {result.get('error')} (任务: {result.get('job')})")
+            return
+        messages = result.get("messages")
+        for msg in messages if isinstance(messages, list) else []:
+            # 每日压缩太日常了，只留个 trace；月度归档才值得说一声
+            if "已压缩至" in msg:
+                logger.trace(msg)
+            else:
+                logger.info(msg)
+
+    def _run_in_thread(self, job: ArchiveJob) -> None:
+        def _target() -> None:
+            try:
+                self._report({"ok": True, "messages": run_job(job)})
+            except Exception as e:
+                self._report({"ok": False, "error": f"{type(e).__name__}: {e}", "job": json.dumps(job)})
+
+        threading.Thread(target=_target, name="log-archiver-fallback", daemon=True).start()
+
+    def submit(self, op: str, path: Path | str) -> None:
+        job: ArchiveJob = {"op": op, "path": str(Path(path).resolve()), "format": self.format, "level": self.level}
+        with self._lock:
+            process = self._ensure_worker()
+            if process is not None and process.stdin is not None:
+                try:
+                    process.stdin.write(json.dumps(job, ensure_ascii=False) + "\n")
+                    process.stdin.flush()
+                    return
+                except (BrokenPipeError, OSError, ValueError):
+                    self._process = None
+        self._run_in_thread(job)
+
+    def compress_rotated_file(self, file_path: str) -> None:
+        """给 loguru 当 compression 钩子用：轮替出来的旧文件丢给工人，自己马上返回。"""
+        self.submit("compress", file_path)
+
+    def schedule_catch_up(self, root_log_dir: Path) -> None:
+        """启动时的补课：把所有模块目录里遗留的旧日志交给工人，不拖慢启动。"""
+        self.submit("catch_up", root_log_dir)
+
+    def shutdown(self) -> None:
+        """关掉 stdin 就行，工人会把手头排着的活干完再自己退出，不用在这儿等它。"""
+        with self._lock:
+            process, self._process = self._process, None
+        if process is not None and process.stdin is not None:
+            with contextlib.suppress(OSError, ValueError):
+                process.stdin.close()
+
+
+log_archiver = LogArchiver()
+
+
+if __name__ == "__main__":
+    _worker_main()
@@ -2,16 +2,20 @@
 import os
 import sys
 import threading  # <--- 把它请进来！
-import zipfile
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 from pathlib import Path
 
 from loguru import logger
 from loguru._logger import Logger
 
+from .log_archiver import log_archiver
+
 # --- 核心配置 (不变) ---
 LOG_DIR = Path(os.getcwd()) / "logs"
 LOG_DIR.mkdir(parents=True, exist_ok=True)
+# 控制台和文件处理器的级别，启动时读一次；热路径日志也靠这两个算出“最低会被记下来的级别”
+CONSOLE_LOG_LEVEL = os.getenv("CONSOLE_LOG_LEVEL", "INFO").upper()
+FILE_LOG_LEVEL = os.getenv("FILE_LOG_LEVEL", "DEBUG").upper()
 
 _LAST_HOUSEKEEPING_DATE: date | None = None
 
@@ -40,6 +44,8 @@ MODULE_CONFIG_MAP = {
     "common.custom_logging.logger_manager": ("日志管理", "white"),
     "common.focus_chat_history_builder.chat_prompt_builder": ("聊天提示构建", "green"),
     "common.intelligent_interrupt_system.iis_main": ("智能中断", "green"),
+    "common.intelligent_interrupt_system.intelligent_interrupter": ("智能中断", "green"),
+    "common.intelligent_interrupt_system.models": ("智能中断", "green"),
     "common.summarization_observation.summarization_service": ("观察摘要", "light-black"),
     "common.utils": ("通用工具", "white"),
     "common.summarization_observation": ("观察摘要", "light-black"),
@@ -100,118 +106,16 @@ _handlers_created = set()
 _lock = threading.Lock()  # <--- 这就是我们的贞操锁！
 
 
-def _perform_daily_compression(log_file: Path) -> None:
-    """哼，就是把昨天的日志文件打包成zip。小事一桩。"""
-    if not log_file.exists() or log_file.suffix != ".log":
-        return
-    zip_path = log_file.with_suffix(".log.zip")
-    try:
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-            zf.write(log_file, arcname=log_file.name)
-        log_file.unlink()  # 压缩完就把原来的删了，不占地方
-        logger.trace(f"日志文件 '{log_file.name}' 已压缩至 '{zip_path.name}'。")
-    except Exception as e:
-        logger.error(f"压缩日志 '{log_file.name}' 时失败了: {e}")
-
-
-def _perform_monthly_archival(log_directory: Path, year: int, month: int) -> None:
-    """把指定月份的每日压缩包都吃掉，打包成一个月度大礼包。"""
-    year_month_str = f"{year:04d}-{month:02d}"
-    monthly_archive_name = f"{year_month_str}.zip"
-    monthly_archive_path = log_directory / monthly_archive_name
-
-    daily_zips_to_archive = list(log_directory.glob(f"{year_month_str}-*.log.zip"))
-
-    if not daily_zips_to_archive:
-        return
-
-    logger.info(f"月初大扫除！正在将 {len(daily_zips_to_archive)} 个每日日志归档至 '{monthly_archive_name}'...")
-    try:
-        with zipfile.ZipFile(monthly_archive_path, "w", zipfile.ZIP_DEFLATED) as monthly_zf:
-            for daily_zip in daily_zips_to_archive:
-                monthly_zf.write(daily_zip, arcname=daily_zip.name)
-
-        for daily_zip in daily_zips_to_archive:
-            daily_zip.unlink()
-
-        logger.success(f"{year_month_str} 的日志已成功归档至: '{monthly_archive_path}'")
-    except Exception as e:
-        logger.error(f"月度归档 {year_month_str} 失败: {e}")
-
-
-def catch_up_and_archive_logs(log_directory: Path) -> None:
-    """
-    我全新的主动巡逻函数，现在加上了时间的贞操锁，哼！
-    """
-    if not log_directory.exists():
-        return
-
-    today = datetime.now().date()
-    months_to_archive = set()
-
-    # --- 第一步：追溯并压缩所有被遗忘的每日日志（这个逻辑没错，就是要压缩所有过去的.log文件） ---
-    for log_file in log_directory.glob("*.log"):
-        try:
-            file_date = datetime.strptime(log_file.stem, "%Y-%m-%d").date()
-            if file_date < today:
-                logger.info(f"哼，发现了被你遗忘的日志 '{log_file.name}'，现在就来惩罚它！")
-                _perform_daily_compression(log_file)
-        except ValueError:
-            continue
-
-    # --- 第二步：找出所有需要被月度吞噬的“过去”的月份 ---
-    # 我会检查所有的每日压缩包，但只会对上个月和更早的动情！
-    for zip_file in log_directory.glob("*.log.zip"):
-        try:
-            file_date_str = zip_file.stem.replace(".log", "")
-            file_date = datetime.strptime(file_date_str, "%Y-%m-%d").date()
-
-            # --- 这就是我知错就改的地方，看清楚了，笨蛋！ ---
-            # 我在这里加了一道淫乱的贞操锁！
-            # 只有当年份比今年小，或者年份相同但月份比本月小的时候，我才会把它列为吞噬目标！
-            if file_date.year < today.year or (file_date.year == today.year and file_date.month < today.month):
-                months_to_archive.add((file_date.year, file_date.month))
-
-        except ValueError:
-            continue
-
-    # --- 第三步：执行月度吞噬 ---
-    # 开始只针对“旧情人”的淫乱派对！
-    for year, month in sorted(months_to_archive):
-        _perform_monthly_archival(log_directory, year, month)
-
-
 def perform_global_log_housekeeping(root_log_dir: Path) -> None:
     """
-    我全新的淫乱女管家！
-    我会巡视整个 logs 豪宅，闯进每一个房间（模块日志目录），
-    然后用我饥渴的 `catch_up_and_archive_logs` 函数，把里面的小骚货们全都调教一遍！
+    我全新的淫乱女管家！现在我只负责发号施令~
+    巡视整个 logs 豪宅、压缩被遗忘的旧日志、按月归档，全都交给后台的归档工人去干，
+    我自己立刻回来，绝不拖慢启动，哼！
     """
     if not root_log_dir.is_dir():
         return
-
-    logger.info("女管家开始巡视所有日志房间，准备进行大扫除...")
-    for module_dir in root_log_dir.iterdir():
-        if module_dir.is_dir():
-            logger.trace(f"正在检查房间 '{module_dir.name}'...")
-            catch_up_and_archive_logs(module_dir)
-    logger.info("所有房间都已检查完毕，哼，现在干净多了~")
-
-
-def compress_log_on_rotation(file_path_to_compress_str: str, _: str) -> None:
-    """
-    在 loguru 轮替日志文件时被调用的函数。
-    """
-    file_to_compress = Path(file_path_to_compress_str)
-    if not file_to_compress.exists():
-        return
-    _perform_daily_compression(file_to_compress)
-
-    # 午夜高潮后的月度检查依然保留，这可是双重保险哦~
-    today = datetime.now()
-    if today.day == 1:
-        last_month_date = today - timedelta(days=1)
-        _perform_monthly_archival(file_to_compress.parent, last_month_date.year, last_month_date.month)
+    logger.info("女管家已经把所有日志房间的大扫除交给后台工人了，哼，它干完会自己汇报的~")
+    log_archiver.schedule_catch_up(root_log_dir)
 
 
 def get_logger(module_name: str) -> Logger:
@@ -269,7 +173,7 @@ def get_logger(module_name: str) -> Logger:
 
             logger.add(
                 sys.stderr,
-                level=os.getenv("CONSOLE_LOG_LEVEL", "INFO").upper(),
+                level=CONSOLE_LOG_LEVEL,
                 format=console_format,
                 filter=lambda record: record["extra"].get("padded_alias") == padded_alias,
                 colorize=True,
@@ -297,11 +201,12 @@ def get_logger(module_name: str) -> Logger:
 
             logger.add(
                 sink=log_file_path,
-                level=os.getenv("FILE_LOG_LEVEL", "DEBUG").upper(),
+                level=FILE_LOG_LEVEL,
                 format=file_format_str,
-                rotation=compress_log_on_rotation,  # <-- 看这里！把你的宝贝函数放到 rotation 这里来！
+                rotation="00:00",  # 每天午夜换一个新文件，文件名里的日期跟着变
                 retention="90 days",
-                compression=None,  # <-- 这个就不要了，或者设成 None，免得它俩打架！
+                # 轮替下来的旧文件只是丢给后台归档进程，写日志的线程立刻返回，午夜不再卡一下
+                compression=log_archiver.compress_rotated_file,
                 encoding="utf-8",
                 enqueue=True,
                 filter=lambda record: record["extra"].get("padded_alias") == padded_alias,
@@ -430,6 +430,7 @@ async def format_chat_history_for_llm(
         user_map=user_map,
         uid_str_to_platform_id_map=uid_str_to_platform_id_map,
         processed_event_ids=processed_event_ids,
+        history_event_ids=[event.event_id for event in raw_events],
         image_references=image_references,
         conversation_name=conversation_name_str,
         last_valid_text_message=last_valid_text_message,
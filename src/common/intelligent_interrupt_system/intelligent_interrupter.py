@@ -4,8 +4,15 @@
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 
+from src.common.custom_logging.hot_path_logger import get_hot_path_logger
+
 from .models import SemanticMarkovModel
 
+# 每条消息都要走一遍的评分过程，用热路径门面，没开 DEBUG 时连字符串都不拼
+logger = get_hot_path_logger(__name__)
+# 打开 DEBUG 之后，评分细节也只每这么多条消息记一次，不然群里一热闹就刷屏
+EVALUATION_LOG_EVERY_N = 10
+
 
 class IntelligentInterrupter:
     """
@@ -43,13 +50,15 @@ class IntelligentInterrupter:
 
         self.objective_semantic_threshold = objective_semantic_threshold
 
-        print("究极进化版-小色猫判断器（无状态版）已完美初始化！我已准备好，随时等待主人的双重插入！")
+        logger.info("究极进化版-小色猫判断器（无状态版）已完美初始化！我已准备好，随时等待主人的双重插入！")
 
     def _calculate_objective_importance(self, message_text: str) -> float:
         # ... (这个方法没问题，保持不变) ...
         for keyword in self.objective_keywords:
             if keyword in message_text:
-                print(f"**[阶段一]** 检测到霸道关键词 '{keyword}'！客观重要性极高！")
+                logger.debug(
+                    "**[阶段一]** 检测到霸道关键词 '{}'！客观重要性极高！", keyword, every_n=EVALUATION_LOG_EVERY_N
+                )
                 return 1.0
         return 0.0
 
@@ -58,7 +67,12 @@ class IntelligentInterrupter:
         unexpectedness_score = self.semantic_markov_model.calculate_contextual_unexpectedness(
             current_text=message_text, previous_text=context_message_text
         )
-        print(f"**[阶段二-A]** 上下文衔接意外度得分为: {unexpectedness_score:.2f} (对比上文: '{context_message_text}')")
+        logger.debug(
+            "**[阶段二-A]** 上下文衔接意外度得分为: {:.2f} (对比上文: '{}')",
+            unexpectedness_score,
+            context_message_text,
+            every_n=EVALUATION_LOG_EVERY_N,
+        )
 
         if self.core_concepts_encoded.size == 0:
             importance_score = 0.0
@@ -70,16 +84,16 @@ class IntelligentInterrupter:
             )
             importance_score = np.max(similarities) * 100
 
-        print(f"**[阶段二-B]** 内容核心重要性得分为: {importance_score:.2f}")
+        logger.debug("**[阶段二-B]** 内容核心重要性得分为: {:.2f}", importance_score, every_n=EVALUATION_LOG_EVERY_N)
 
         preliminary_score = self.alpha * unexpectedness_score + self.beta * importance_score
-        print(f"**[阶段二-C]** 融合后的基础快感分数为: {preliminary_score:.2f}")
+        logger.debug("**[阶段二-C]** 融合后的基础快感分数为: {:.2f}", preliminary_score, every_n=EVALUATION_LOG_EVERY_N)
         return preliminary_score
 
     def _get_speaker_weight(self, speaker_id: str) -> float:
         # ... (这个方法没问题，保持不变) ...
         weight = self.speaker_weights.get(speaker_id, self.speaker_weights.get("default", 1.0))
-        print(f"**[阶段三]** 发言者 '{speaker_id}' 的主观权重为: {weight}")
+        logger.debug("**[阶段三]** 发言者 '{}' 的主观权重为: {}", speaker_id, weight, every_n=EVALUATION_LOG_EVERY_N)
         return weight
 
     # --- ❤❤❤ 究极淫乱高潮点：无状态的双重插入！❤❤❤ ---
@@ -92,12 +106,14 @@ class IntelligentInterrupter:
         if not message_text:
             return False
 
-        print(f"\n===== 开始评估新消息: '{new_message.get('text')}' (来自: {new_message.get('speaker_id')}) =====")
         speaker_id = new_message.get("speaker_id")
+        logger.debug(
+            "===== 开始评估新消息: '{}' (来自: {}) =====", message_text, speaker_id, every_n=EVALUATION_LOG_EVERY_N
+        )
 
         objective_score = self._calculate_objective_importance(message_text)
         if objective_score >= 1.0:
-            print("===== 结论: [强制中断]！客观重要性压倒一切！啊~ 这次插入好评！ =====")
+            logger.info("===== 结论: [强制中断]！客观重要性压倒一切！啊~ 这次插入好评！ =====")
             # 我不再更新任何东西，只告诉你结果！
             return True
 
@@ -106,13 +122,24 @@ class IntelligentInterrupter:
         speaker_weight = self._get_speaker_weight(speaker_id)
         final_score = preliminary_score * speaker_weight
 
-        print(f"**[最终裁决]** 最终得分(基础分 * 权重): {preliminary_score:.2f} * {speaker_weight} = {final_score:.2f}")
+        logger.debug(
+            "**[最终裁决]** 最终得分(基础分 * 权重): {:.2f} * {} = {:.2f}",
+            preliminary_score,
+            speaker_weight,
+            final_score,
+            every_n=EVALUATION_LOG_EVERY_N,
+        )
 
         if final_score > self.final_threshold:
-            print(
-                f"===== 结论: [建议中断]！最终得分 {final_score:.2f} 超越阈值 {self.final_threshold}！哥哥，这次的快感足够了！ ====="
+            logger.info(
+                "===== 结论: [建议中断]！最终得分 {:.2f} 超越阈值 {}！哥哥，这次的快感足够了！ =====",
+                final_score,
+                self.final_threshold,
             )
             return True
 
-        print("===== 结论: [无需中断]！哼，这次的刺激不够呢~ 主人你自己决定要不要记住它吧~ =====")
+        logger.debug(
+            "===== 结论: [无需中断]！哼，这次的刺激不够呢~ 主人你自己决定要不要记住它吧~ =====",
+            every_n=EVALUATION_LOG_EVERY_N,
+        )
         return False
@@ -11,9 +11,13 @@ from sentence_transformers import SentenceTransformer
 from sklearn.cluster import KMeans
 from sklearn.metrics.pairwise import cosine_similarity
 
+from src.common.custom_logging.hot_path_logger import get_hot_path_logger
+
 # 闭上你那张O形嘴，scikit-learn的未来警告声太吵了！
 warnings.filterwarnings("ignore", category=FutureWarning, module="sklearn")
 
+logger = get_hot_path_logger(__name__)
+
 
 class MarkovChainModel:
     """
@@ -23,10 +27,10 @@ class MarkovChainModel:
 
     def __init__(self) -> None:
         self.chain = {}
-        print("经典款-词频马尔可夫链已准备就绪，等待主人的调教~")
+        logger.info("经典款-词频马尔可夫链已准备就绪，等待主人的调教~")
 
     def train(self, text_list: list[str]) -> None:
-        print("正在学习历史对话，感受哥哥的每一次输入...")
+        logger.info("正在学习历史对话，感受哥哥的每一次输入...")
         for text in text_list:
             words = jieba.lcut(text)
             if len(words) < 2:
@@ -39,7 +43,7 @@ class MarkovChainModel:
                 if next_word not in self.chain[current_word]:
                     self.chain[current_word][next_word] = 0
                 self.chain[current_word][next_word] += 1
-        print("学习完毕！我已经熟悉哥哥的模式了~")
+        logger.info("学习完毕！我已经熟悉哥哥的模式了~")
 
     def calculate_unexpectedness(self, text: str) -> float:
         words = jieba.lcut(text)
@@ -71,7 +75,7 @@ class SemanticModel:
 
     def __init__(self, model_name: str = "paraphrase-multilingual-MiniLM-L12-v2") -> None:
         self.model = SentenceTransformer(model_name)
-        print(f"语义探针 '{model_name}' 已启动，准备探索深层含义！")
+        logger.info("语义探针 '{}' 已启动，准备探索深层含义！", model_name)
 
     def encode(self, texts: list[str] | str) -> np.ndarray:
         return self.model.encode(texts)
@@ -92,7 +96,7 @@ class SemanticMarkovModel:
         self.num_clusters = num_clusters  # 主人，你想要我被分成多少个敏感带（语义簇）呢？
         self.kmeans: KMeans | None = None  # 这是我们用来划分身体的聚类工具
         self.transition_matrix: np.ndarray | None = None  # 这是记录灵魂跳转模式的淫乱矩阵
-        print(f"究极混合体-语义马尔可夫链已准备就绪，将使用 {num_clusters} 个语义簇。")
+        logger.info("究极混合体-语义马尔可夫链已准备就绪，将使用 {} 个语义簇。", num_clusters)
 
     def train(self, conversations: list[list[str]]) -> None:
         """用你一场场纯粹的对话，来彻底重塑我的身体和灵魂吧！（现在我的身体更灵活了哦~❤️）"""
@@ -103,31 +107,33 @@ class SemanticMarkovModel:
         # 如果你喂我的句子总数，比你想要的G点数量还少...
         if len(all_texts) < self.num_clusters:
             # 我就不再哭着报错，而是娇嗔地告诉你，然后用现有的所有句子作为G点！
-            print(f"💦 警告！对话记录太少了({len(all_texts)}句)，不够形成主人你想要的 {self.num_clusters} 个敏感带。")
-            print(f"💦 我会智能地把敏感带数量调整为 {len(all_texts)} 个，用我仅有的快感来满足你哦~")
+            logger.warning(
+                "💦 对话记录太少了({}句)，不够形成主人你想要的 {} 个敏感带。", len(all_texts), self.num_clusters
+            )
+            logger.warning("💦 我会智能地把敏感带数量调整为 {} 个，用我仅有的快感来满足你哦~", len(all_texts))
             # 动态调整！我身体的敏感带数量，不能超过我感受到的刺激总数！
             num_actual_clusters = len(all_texts)
             # 如果连一句话都没有，那就没法玩了，直接投降！
             if num_actual_clusters == 0:
-                print("💥 错误！主人你什么都没给我，我……我没法训练啦！")
+                logger.error("💥 主人你什么都没给我，我……我没法训练啦！")
                 return
         else:
             # 如果你的爱抚足够多，我就按你喜欢的方式来~
             num_actual_clusters = self.num_clusters
 
-        print("第一步：正在将所有对话转化为我的“灵魂向量”...")
+        logger.info("第一步：正在将所有对话转化为我的“灵魂向量”...")
         embeddings = self.semantic_model.encode(all_texts)
-        print(f"已成功转化 {len(embeddings)} 条灵魂。")
+        logger.info("已成功转化 {} 条灵魂。", len(embeddings))
 
-        print(f"第二步：正在用 K-Means 算法探索我身体上的 {num_actual_clusters} 个“语义G点”...")
+        logger.info("第二步：正在用 K-Means 算法探索我身体上的 {} 个“语义G点”...", num_actual_clusters)
         # 使用我们动态计算出的、绝对不会出错的数量来初始化！
         self.kmeans = KMeans(
             n_clusters=num_actual_clusters, random_state=42, n_init="auto"
         )  # n_init='auto' 是新版sklearn的推荐哦
         self.kmeans.fit(embeddings)
-        print("探索完成！我已经形成了全新的语义分区！")
+        logger.info("探索完成！我已经形成了全新的语义分区！")
 
-        print("第三步：正在学习你在每一场“爱爱”中的“灵魂跳转”模式...")
+        logger.info("第三步：正在学习你在每一场“爱爱”中的“灵魂跳转”模式...")
         num_states = num_actual_clusters  # 跳转矩阵的大小也要跟着变！
         self.transition_matrix = np.ones((num_states, num_states))
 
@@ -148,7 +154,7 @@ class SemanticMarkovModel:
         # 虽然我们前面有判断，但多一层保护更安全，就像戴了双层套套一样~
         safe_row_sums = np.where(row_sums == 0, 1, row_sums)
         self.transition_matrix = self.transition_matrix / safe_row_sums
-        print("灵魂跳转学习完毕！我已经完全掌握了你每一场爱爱的模式了，主人~ ❤")
+        logger.info("灵魂跳转学习完毕！我已经完全掌握了你每一场爱爱的模式了，主人~ ❤")
 
     def _get_state(self, text: str) -> int:
         """感受一句话属于哪个“语义G点”"""
@@ -0,0 +1,116 @@
+# src/common/json_parser/incremental_reply_parser.py
+import json
+from typing import Any
+
+from src.common.custom_logging.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class IncrementalReplyParser:
+    """
+    流式JSON的增量解析器，专门对付专注聊天那种顶层是个对象、里面有个字符串数组的回复。
+    LLM 一边吐字，我一边数括号：数组里的某一条字符串一闭合，就立刻把它交出去，
+    不用等整个JSON写完。顺便把已经写完的顶层标量字段（reply_willing、at_someone 之类）记下来。
+
+    它不负责校验整个JSON，流结束后还是要用 parse_llm_json_response 解析完整文本，哼。
+    """
+
+    def __init__(self, array_field: str = "reply_text") -> None:
+        self.array_field = array_field
+        # 已经完整写出来的顶层标量字段
+        self.fields: dict[str, Any] = {}
+        # 已经交出去的数组元素个数
+        self.emitted_count: int = 0
+        self._started: bool = False
+        self._finished: bool = False
+        self._stack: list[str] = []
+        self._in_string: bool = False
+        self._escape: bool = False
+        self._string_chars: list[str] = []
+        self._scalar_chars: list[str] = []
+        self._expect_key: bool = False
+        self._current_key: str | None = None
+
+    @property
+    def finished(self) -> bool:
+        """顶层对象是否已经闭合。"""
+        return self._finished
+
+    def feed(self, text: str) -> list[str]:
+        """喂一段新文本，返回这段文本里新闭合的数组元素（按顺序）。"""
+        completed: list[str] = []
+        for char in text:
+            if self._finished:
+                break
+            if not self._started:
+                # 跳过 ```json 这类代码块标记和前面的废话，直到第一个 '{'
+                if char == "{":
+                    self._started = True
+                    self._stack.append("{")
+                    self._expect_key = True
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._on_string_closed("".join(self._string_chars), completed)
+                    continue
+                self._string_chars.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_chars = []
+            elif char in "{[":
+                self._stack.append(char)
+            elif char in "}]":
+                self._flush_scalar()
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self._finished = True
+            elif char == ",":
+                self._flush_scalar()
+                if len(self._stack) == 1:
+                    self._expect_key = True
+            elif char == ":":
+                if len(self._stack) == 1:
+                    self._expect_key = False
+            elif len(self._stack) == 1 and not self._expect_key and not char.isspace():
+                # 顶层的数字 / true / false / null
+                self._scalar_chars.append(char)
+        return completed
+
+    def _on_string_closed(self, raw: str, completed: list[str]) -> None:
+        try:
+            value = json.loads(f'"{raw}"', strict=False)
+        except json.JSONDecodeError:
+            logger.debug(f"增量解析时无法解码字符串，按原样使用: {raw[:50]}")
+            value = raw
+
+        depth = len(self._stack)
+        if depth == 1:
+            if self._expect_key:
+                self._current_key = value
+            elif self._current_key is not None:
+                self.fields[self._current_key] = value
+        elif depth == 2 and self._stack[-1] == "[" and self._current_key == self.array_field:
+            self.emitted_count += 1
+            completed.append(value)
+
+    def _flush_scalar(self) -> None:
+        if not self._scalar_chars:
+            return
+        token = "".join(self._scalar_chars).strip()
+        self._scalar_chars = []
+        if self._current_key is None or len(self._stack) != 1:
+            return
+        try:
+            self.fields[self._current_key] = json.loads(token)
+        except json.JSONDecodeError:
+            logger.debug(f"增量解析时遇到无法识别的顶层值 '{token}'，忽略。")
@@ -0,0 +1,66 @@
+# src/common/semantic_memory/embedding_codec.py
+# 句向量在事件文档里的紧凑存法。哼，384 个 float64 渲染成 JSON 数组要好几 KB，
+# 量化成 int8（每个向量带一个缩放系数）再 base64 一下，只剩 500 来个字符。
+#
+# 存进库里的样子：{"format": "int8", "dim": 384, "scale": 0.0078, "data": "<base64>"}
+# float16 格式不需要 scale。老文档里的纯浮点数组照样能解，不用迁移。
+
+import base64
+from typing import Any
+
+import numpy as np
+
+EMBEDDING_FORMAT_INT8 = "int8"
+EMBEDDING_FORMAT_FLOAT16 = "float16"
+SUPPORTED_EMBEDDING_FORMATS = (EMBEDDING_FORMAT_INT8, EMBEDDING_FORMAT_FLOAT16)
+
+_INT8_MAX = 127.0
+
+
+def encode_embedding(vector: list[float] | np.ndarray, fmt: str = EMBEDDING_FORMAT_INT8) -> dict[str, Any]:
+    """把句向量压成可以直接放进文档的小字典。不认识的格式按 int8 处理。"""
+    vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+    if fmt == EMBEDDING_FORMAT_FLOAT16:
+        return {
+            "format": EMBEDDING_FORMAT_FLOAT16,
+            "dim": int(vec.size),
+            "data": base64.b64encode(vec.astype("<f2").tobytes()).decode("ascii"),
+        }
+    # 对称量化：最大绝对值映射到 127，全零向量的 scale 记 0，解出来还是全零
+    max_abs = float(np.max(np.abs(vec))) if vec.size else 0.0
+    scale = max_abs / _INT8_MAX if max_abs > 0 else 0.0
+    quantized = np.round(vec / scale) if scale > 0 else np.zeros_like(vec)
+    return {
+        "format": EMBEDDING_FORMAT_INT8,
+        "dim": int(vec.size),
+        "scale": scale,
+        "data": base64.b64encode(np.clip(quantized, -_INT8_MAX, _INT8_MAX).astype(np.int8).tobytes()).decode("ascii"),
+    }
+
+
+def decode_embedding(stored: dict[str, Any] | list[float] | None) -> np.ndarray | None:
+    """
+    把库里读出来的句向量还原成 float32 数组；老的纯数组也认。
+    数据坏了（长度对不上、base64 解不开）就返回 None，调用方当它没有向量。
+    """
+    if stored is None:
+        return None
+    if isinstance(stored, list):
+        return np.asarray(stored, dtype=np.float32) if stored else None
+    if not isinstance(stored, dict) or not stored.get("data"):
+        return None
+    try:
+        raw = base64.b64decode(stored["data"])
+        fmt = stored.get("format")
+        if fmt == EMBEDDING_FORMAT_FLOAT16:
+            vec = np.frombuffer(raw, dtype="<f2").astype(np.float32)
+        elif fmt == EMBEDDING_FORMAT_INT8:
+            vec = np.frombuffer(raw, dtype=np.int8).astype(np.float32) * np.float32(stored.get("scale") or 0.0)
+        else:
+            return None
+    except (ValueError, TypeError):
+        return None
+    dim = stored.get("dim")
+    if not vec.size or (dim is not None and vec.size != int(dim)):
+        return None
+    return vec
@@ -0,0 +1,238 @@
+# src/common/semantic_memory/semantic_memory_service.py
+import asyncio
+import contextlib
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from src.common.custom_logging.logging_config import get_logger
+from src.config import config
+
+from .embedding_codec import decode_embedding
+from .vector_index import SemanticVectorIndex, VectorHit
+
+if TYPE_CHECKING:
+    from src.common.intelligent_interrupt_system.models import SemanticModel
+    from src.database.services.event_storage_service import EventStorageService
+    from src.database.services.summary_storage_service import SummaryStorageService
+
+logger = get_logger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]  # 从 src/common/semantic_memory/ 向上到项目根目录
+BACKFILL_BATCH_SIZE = 1000
+KIND_EVENT = "event"
+KIND_SUMMARY = "summary"
+
+
+class SemanticMemoryService:
+    """
+    语义记忆服务：把入库消息和会话总结的句向量放进向量索引，按语义捞出相关的历史消息和总结。
+    哼，以后想起很久以前说过的话，不用再把几百条最近消息全塞进 prompt 了。
+    """
+
+    def __init__(
+        self,
+        event_storage: "EventStorageService",
+        semantic_model: "SemanticModel | None",
+        summary_storage: "SummaryStorageService | None" = None,
+    ) -> None:
+        self.event_storage = event_storage
+        self.semantic_model = semantic_model
+        self.summary_storage = summary_storage
+        settings = config.semantic_memory
+        index_dir = Path(settings.index_directory)
+        if not index_dir.is_absolute():
+            index_dir = PROJECT_ROOT / index_dir
+        self.index = SemanticVectorIndex(
+            index_dir=index_dir,
+            dimension=settings.embedding_dimension,
+            segment_size=settings.segment_size,
+        )
+        self._backfill_task: asyncio.Task | None = None
+        self._segment_writer_task: asyncio.Task | None = None
+
+    async def initialize(self) -> None:
+        """
+        加载磁盘上的索引段，并（按配置）在后台把数据库里还没进索引的历史消息补进来。
+        补录可能要翻很多页，不能卡着启动流程，补完之前检索只是少几条结果而已。
+        """
+        await asyncio.to_thread(self.index.load)
+        if config.semantic_memory.backfill_on_startup:
+            self._backfill_task = asyncio.create_task(self._run_backfill())
+
+    async def _run_backfill(self) -> None:
+        try:
+            await self.backfill_from_storage()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"语义记忆索引补录历史消息失败: {e}", exc_info=True)
+
+    async def backfill_from_storage(self) -> int:
+        """从上次索引到的位置开始，分页把带向量的消息事件补进索引。返回新增条数。"""
+        added = 0
+        cursor_ts, cursor_key = self.index.max_timestamp, self.index.max_timestamp_item_id
+        while True:
+            batch = await self.event_storage.get_embedded_message_events_after(
+                cursor_ts, cursor_key, limit=BACKFILL_BATCH_SIZE
+            )
+            for doc in batch:
+                vector = decode_embedding(doc.get("embedding"))
+                if vector is not None and self.index.add(
+                    item_id=doc["_key"],
+                    conversation_id=doc.get("conversation_id") or "",
+                    vector=vector,
+                    timestamp=int(doc.get("timestamp") or 0),
+                ):
+                    added += 1
+            self._schedule_segment_write()
+            if len(batch) < BACKFILL_BATCH_SIZE:
+                break
+            cursor_ts, cursor_key = int(batch[-1].get("timestamp") or 0), batch[-1]["_key"]
+        if added:
+            logger.info(f"语义记忆索引已补入 {added} 条历史消息，当前共 {len(self.index)} 条。")
+        return added
+
+    def index_event_document(self, event_doc: dict[str, Any]) -> bool:
+        """入库时调用：事件文档带了句向量就顺手解码放进索引。"""
+        item_id = event_doc.get("_key") or event_doc.get("event_id")
+        embedding = decode_embedding(event_doc.get("embedding")) if item_id else None
+        if embedding is None:
+            return False
+        conversation_id = event_doc.get("conversation_id_extracted") or (
+            (event_doc.get("conversation_info") or {}).get("conversation_id") or ""
+        )
+        added = self.index.add(
+            item_id=str(item_id),
+            conversation_id=conversation_id,
+            vector=embedding,
+            timestamp=int(event_doc.get("timestamp") or 0),
+        )
+        self._schedule_segment_write()
+        return added
+
+    async def index_summary(self, summary_id: str, conversation_id: str, summary_text: str, timestamp: int) -> bool:
+        """会话总结存好后调用：把总结文本编码成句向量放进索引，以后按意思也能想起那段对话的大意。"""
+        if not self.semantic_model or not summary_id or not summary_text or not summary_text.strip():
+            return False
+        try:
+            vector = (await asyncio.to_thread(self.semantic_model.encode, [summary_text]))[0]
+        except Exception as e:
+            logger.error(f"为总结 '{summary_id}' 生成句向量失败: {e}", exc_info=True)
+            return False
+        added = self.index.add(
+            item_id=summary_id,
+            conversation_id=conversation_id,
+            vector=vector,
+            kind=KIND_SUMMARY,
+            timestamp=timestamp,
+        )
+        self._schedule_segment_write()
+        return added
+
+    def _schedule_segment_write(self) -> None:
+        """索引里有封存好还没落盘的段，就丢到线程里去写，同一时间只跑一个写任务。"""
+        if not self.index.has_unwritten_segments:
+            return
+        if self._segment_writer_task is not None and not self._segment_writer_task.done():
+            return
+        self._segment_writer_task = asyncio.create_task(self._write_pending_segments())
+
+    async def _write_pending_segments(self) -> None:
+        try:
+            # 线程里只写盘，换块回到事件循环里做；写的时候又封存了新段就接着写
+            while self.index.has_unwritten_segments:
+                written = await asyncio.to_thread(self.index.write_pending_segments)
+                self.index.install_written_segments(written)
+        except Exception as e:
+            logger.error(f"向量索引段落盘失败: {e}", exc_info=True)
+
+    async def search_similar(
+        self,
+        query_text: str,
+        conversation_id: str | None = None,
+        top_k: int | None = None,
+        exclude_ids: set[str] | None = None,
+        kinds: set[str] | None = None,
+    ) -> list[VectorHit]:
+        """按语义检索索引，只返回命中的条目信息，不查数据库。conversation_id 为空时全局检索。"""
+        if not self.semantic_model or not query_text or not query_text.strip():
+            return []
+        query_vector = (await asyncio.to_thread(self.semantic_model.encode, [query_text]))[0]
+        return self.index.search(
+            query_vector,
+            k=top_k or config.semantic_memory.default_top_k,
+            conversation_id=conversation_id,
+            kinds=kinds,
+            exclude_ids=exclude_ids,
+            min_score=config.semantic_memory.min_similarity,
+        )
+
+    async def retrieve_relevant_messages(
+        self,
+        query_text: str,
+        conversation_id: str | None = None,
+        top_k: int | None = None,
+        exclude_ids: set[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        取和 query_text 语义最相关的历史消息文档（按相似度从高到低），
+        每条文档额外带一个 semantic_score 字段。
+        """
+        hits = await self.search_similar(query_text, conversation_id, top_k, exclude_ids, kinds={KIND_EVENT})
+        return await self._resolve_event_hits(hits)
+
+    async def retrieve_related_memory(
+        self,
+        query_text: str,
+        conversation_id: str | None = None,
+        top_k: int | None = None,
+        exclude_ids: set[str] | None = None,
+    ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        """
+        一次检索同时捞相关的历史消息和会话总结，返回 (消息文档列表, 总结文档列表)，
+        都按相似度从高到低，带 semantic_score 字段。给 prompt 拼“相关回忆”用。
+        """
+        hits = await self.search_similar(query_text, conversation_id, top_k, exclude_ids)
+        event_hits = [hit for hit in hits if hit.kind == KIND_EVENT]
+        summary_hits = [hit for hit in hits if hit.kind == KIND_SUMMARY]
+        messages = await self._resolve_event_hits(event_hits)
+        summaries = await self._resolve_summary_hits(summary_hits)
+        return messages, summaries
+
+    async def _resolve_event_hits(self, hits: list[VectorHit]) -> list[dict[str, Any]]:
+        if not hits:
+            return []
+        docs = await self.event_storage.get_events_by_ids([hit.item_id for hit in hits])
+        docs_by_key = {doc.get("_key"): doc for doc in docs}
+        # 热集合里没有的，多半是太老被搬进冷归档了，按命中里带的会话和时间戳去归档里捞回来
+        missing = [(hit.conversation_id, hit.timestamp, hit.item_id) for hit in hits if hit.item_id not in docs_by_key]
+        if missing:
+            docs_by_key.update(await self.event_storage.lookup_archived_events(missing))
+        return [
+            {**docs_by_key[hit.item_id], "semantic_score": round(hit.score, 4)}
+            for hit in hits
+            if hit.item_id in docs_by_key
+        ]
+
+    async def _resolve_summary_hits(self, hits: list[VectorHit]) -> list[dict[str, Any]]:
+        if not hits or not self.summary_storage:
+            return []
+        docs = await self.summary_storage.get_summaries_by_ids([hit.item_id for hit in hits])
+        docs_by_key = {doc.get("_key"): doc for doc in docs}
+        return [
+            {**docs_by_key[hit.item_id], "semantic_score": round(hit.score, 4)}
+            for hit in hits
+            if hit.item_id in docs_by_key
+        ]
+
+    async def shutdown(self) -> None:
+        """停掉后台补录，把封存段和还没写满的活动段都落盘。"""
+        if self._backfill_task is not None and not self._backfill_task.done():
+            self._backfill_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._backfill_task
+        if self._segment_writer_task is not None:
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._segment_writer_task
+        self.index.install_written_segments(await asyncio.to_thread(self.index.flush))
+        logger.info("语义记忆索引已落盘。")
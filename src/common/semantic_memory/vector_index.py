@@ -0,0 +1,348 @@
+# src/common/semantic_memory/vector_index.py
+# 进程内的向量索引：内存里一个活动缓冲区，写满了就封存成磁盘上的段（vectors.npy + meta.json），
+# 之后用内存映射读回来，查询时逐段做矩阵乘法取 top-k。哼，几十万条消息以内根本不需要什么外部向量库。
+
+import heapq
+import json
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from src.common.custom_logging.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+SEGMENT_DIR_PREFIX = "segment_"
+VECTORS_FILENAME = "vectors.npy"
+META_FILENAME = "meta.json"
+
+
+@dataclass
+class VectorHit:
+    """一次检索命中的条目。"""
+
+    item_id: str
+    conversation_id: str
+    kind: str
+    timestamp: int
+    score: float
+
+
+class _VectorBlock:
+    """一块可检索的向量（一个磁盘段或者活动缓冲区的快照），向量都已归一化。"""
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        item_ids: list[str],
+        conversation_ids: list[str],
+        kinds: list[str],
+        timestamps: list[int],
+    ) -> None:
+        self.vectors = vectors
+        self.item_ids = item_ids
+        self.conversation_ids = np.array(conversation_ids, dtype=str)
+        self.kinds = np.array(kinds, dtype=str)
+        self.timestamps = timestamps
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def top_k(
+        self,
+        query: np.ndarray,
+        k: int,
+        conversation_id: str | None,
+        kinds: set[str] | None,
+        exclude_ids: set[str],
+    ) -> list[VectorHit]:
+        if len(self) == 0:
+            return []
+        scores = np.asarray(self.vectors @ query, dtype=np.float32)
+        mask = np.ones(len(self), dtype=bool)
+        if conversation_id is not None:
+            mask &= self.conversation_ids == conversation_id
+        if kinds:
+            mask &= np.isin(self.kinds, list(kinds))
+        candidate_rows = np.flatnonzero(mask)
+        if candidate_rows.size == 0:
+            return []
+        candidate_scores = scores[candidate_rows]
+        # 多取几个，给被排除的条目留余量
+        take = min(candidate_rows.size, k + len(exclude_ids))
+        if take < candidate_rows.size:
+            best = np.argpartition(-candidate_scores, take - 1)[:take]
+        else:
+            best = np.arange(candidate_rows.size)
+        hits = []
+        for pos in best:
+            row = int(candidate_rows[pos])
+            item_id = self.item_ids[row]
+            if item_id in exclude_ids:
+                continue
+            hits.append(
+                VectorHit(
+                    item_id=item_id,
+                    conversation_id=str(self.conversation_ids[row]),
+                    kind=str(self.kinds[row]),
+                    timestamp=int(self.timestamps[row]),
+                    score=float(candidate_scores[pos]),
+                )
+            )
+        return hits
+
+
+class SemanticVectorIndex:
+    """
+    按会话可过滤的向量索引，支持增量写入和磁盘持久化。
+    - add() 把新向量放进活动缓冲区，满 segment_size 条就封存成一个段，先留在内存里照常参与检索；
+    - 封存段的落盘交给 write_pending_segments()（会读写磁盘，请丢进 asyncio.to_thread 里跑），
+      它只写盘、读回 np.load(mmap_mode="r") 的版本，不碰索引本身；回到事件循环后再用
+      install_written_segments() 把内存里的块换成映射版，不占常驻内存；
+    - 最后一个没写满的段启动时会被读回活动缓冲区，下次封存直接覆盖它，免得攒一堆碎段。
+    检索是精确的暴力点积（向量已归一化，即余弦相似度），对单机聊天记录的规模足够快了。
+    """
+
+    def __init__(self, index_dir: Path, dimension: int = 384, segment_size: int = 4096) -> None:
+        self.index_dir = Path(index_dir)
+        self.dimension = dimension
+        self.segment_size = max(1, segment_size)
+        self._segments: list[_VectorBlock] = []
+        self._next_segment_seq = 0
+        self._known_ids: set[str] = set()
+        # 只跟踪消息事件（kind="event"）的最大时间戳，补录历史消息时从这里接着翻
+        self.max_timestamp: int = 0
+        self.max_timestamp_item_id: str = ""
+
+        # 活动缓冲区
+        self._active_seq: int | None = None
+        self._active_vectors: list[np.ndarray] = []
+        self._active_ids: list[str] = []
+        self._active_conversations: list[str] = []
+        self._active_kinds: list[str] = []
+        self._active_timestamps: list[int] = []
+        self._active_block: _VectorBlock | None = None
+        self._dirty = False
+
+        # 已封存但还没写到磁盘的段：(段号, 它在 _segments 里的那块)
+        self._unwritten: list[tuple[int, _VectorBlock]] = []
+        self._write_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self._segments) + len(self._active_ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._known_ids
+
+    # --- 写入 ---
+
+    def add(
+        self,
+        item_id: str,
+        conversation_id: str,
+        vector: list[float] | np.ndarray,
+        kind: str = "event",
+        timestamp: int = 0,
+    ) -> bool:
+        """加入一条向量。已存在或维度不对时返回 False。"""
+        if item_id in self._known_ids:
+            return False
+        vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vec.shape[0] != self.dimension:
+            logger.warning(f"向量 '{item_id}' 的维度是 {vec.shape[0]}，索引要求 {self.dimension}，跳过。")
+            return False
+        norm = float(np.linalg.norm(vec))
+        if norm == 0.0:
+            return False
+
+        self._known_ids.add(item_id)
+        self._active_vectors.append(vec / norm)
+        self._active_ids.append(item_id)
+        self._active_conversations.append(conversation_id)
+        self._active_kinds.append(kind)
+        self._active_timestamps.append(int(timestamp))
+        self._active_block = None
+        self._dirty = True
+        if kind == "event" and (int(timestamp), item_id) > (self.max_timestamp, self.max_timestamp_item_id):
+            self.max_timestamp, self.max_timestamp_item_id = int(timestamp), item_id
+
+        if len(self._active_ids) >= self.segment_size:
+            self._seal_active()
+        return True
+
+    @property
+    def has_unwritten_segments(self) -> bool:
+        """是否有封存了但还没落盘的段。"""
+        return bool(self._unwritten)
+
+    def write_pending_segments(self) -> list[tuple[_VectorBlock, _VectorBlock]]:
+        """
+        把封存了还没落盘的段写到磁盘，返回 (内存里的旧块, 内存映射读回的新块) 列表。
+        这里是阻塞的磁盘 IO，别在事件循环里直接调，用 asyncio.to_thread；
+        它不改 _segments 和待写队列，换块请回到事件循环里调 install_written_segments()。
+        """
+        written: list[tuple[_VectorBlock, _VectorBlock]] = []
+        with self._write_lock:
+            for seq, block in list(self._unwritten):
+                seg_dir = self._write_segment(seq, block)
+                vectors = np.load(seg_dir / VECTORS_FILENAME, mmap_mode="r")
+                mapped = _VectorBlock(
+                    vectors, block.item_ids, block.conversation_ids.tolist(), block.kinds.tolist(), block.timestamps
+                )
+                written.append((block, mapped))
+                logger.debug(f"向量索引段 {seq} 已落盘（{len(mapped)} 条）。")
+        return written
+
+    def install_written_segments(self, written: list[tuple[_VectorBlock, _VectorBlock]]) -> None:
+        """把 write_pending_segments() 写好的段换成内存映射版，并移出待写队列。和 add() 在同一个线程里调。"""
+        if not written:
+            return
+        replacements = {id(block): mapped for block, mapped in written}
+        # 整个列表换新的，正在遍历旧列表的检索不受影响
+        self._segments = [replacements.get(id(block), block) for block in self._segments]
+        self._unwritten = [(seq, block) for seq, block in self._unwritten if id(block) not in replacements]
+
+    def flush(self) -> list[tuple[_VectorBlock, _VectorBlock]]:
+        """
+        把封存的段和活动缓冲区（哪怕没写满）都写到磁盘，关机前调用（同样是阻塞 IO）。
+        返回值和 write_pending_segments() 一样，交给 install_written_segments()。
+        """
+        written = self.write_pending_segments()
+        if self._dirty and self._active_ids:
+            self._write_segment(self._active_segment_seq(), self._active_snapshot())
+            self._dirty = False
+        return written
+
+    # --- 检索 ---
+
+    def search(
+        self,
+        query_vector: list[float] | np.ndarray,
+        k: int = 5,
+        conversation_id: str | None = None,
+        kinds: set[str] | None = None,
+        exclude_ids: set[str] | None = None,
+        min_score: float | None = None,
+    ) -> list[VectorHit]:
+        """取与查询向量最相似的 k 条，可以限定会话、条目类型，并排除指定条目。"""
+        if k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(query))
+        if query.shape[0] != self.dimension or norm == 0.0:
+            return []
+        query = query / norm
+        exclude_ids = exclude_ids or set()
+
+        blocks = [*self._segments, self._active_snapshot()]
+        candidates: list[VectorHit] = []
+        for block in blocks:
+            candidates.extend(block.top_k(query, k, conversation_id, kinds, exclude_ids))
+        hits = heapq.nlargest(k, candidates, key=lambda hit: hit.score)
+        if min_score is not None:
+            hits = [hit for hit in hits if hit.score >= min_score]
+        return hits
+
+    # --- 持久化 ---
+
+    def load(self) -> None:
+        """从磁盘加载所有段，最后一个没写满的段回到活动缓冲区。"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        segment_dirs = sorted(
+            (p for p in self.index_dir.iterdir() if p.is_dir() and p.name.startswith(SEGMENT_DIR_PREFIX)),
+            key=lambda p: p.name,
+        )
+        for seg_dir in segment_dirs:
+            try:
+                seq = int(seg_dir.name[len(SEGMENT_DIR_PREFIX) :])
+                vectors = np.load(seg_dir / VECTORS_FILENAME, mmap_mode="r")
+                meta = json.loads((seg_dir / META_FILENAME).read_text(encoding="utf-8"))
+            except (ValueError, OSError, json.JSONDecodeError) as e:
+                logger.warning(f"向量索引段 '{seg_dir.name}' 损坏，已跳过: {e}")
+                continue
+            if vectors.ndim != 2 or vectors.shape[1] != self.dimension or vectors.shape[0] != len(meta["ids"]):
+                logger.warning(f"向量索引段 '{seg_dir.name}' 的形状与索引配置不符，已跳过。")
+                continue
+
+            self._next_segment_seq = max(self._next_segment_seq, seq + 1)
+            self._known_ids.update(meta["ids"])
+            for item_id, kind, ts in zip(meta["ids"], meta["kinds"], meta["timestamps"], strict=True):
+                if kind == "event" and (int(ts), item_id) > (self.max_timestamp, self.max_timestamp_item_id):
+                    self.max_timestamp, self.max_timestamp_item_id = int(ts), item_id
+
+            if vectors.shape[0] < self.segment_size and seg_dir == segment_dirs[-1]:
+                # 没写满的尾段：读回内存继续往里写
+                self._active_seq = seq
+                self._active_vectors = list(np.array(vectors))
+                self._active_ids = list(meta["ids"])
+                self._active_conversations = list(meta["conversation_ids"])
+                self._active_kinds = list(meta["kinds"])
+                self._active_timestamps = [int(t) for t in meta["timestamps"]]
+                self._active_block = None
+            else:
+                self._segments.append(
+                    _VectorBlock(vectors, meta["ids"], meta["conversation_ids"], meta["kinds"], meta["timestamps"])
+                )
+        logger.info(f"向量索引已从 '{self.index_dir}' 加载，共 {len(self)} 条（{len(self._segments)} 个封存段）。")
+
+    def _active_segment_seq(self) -> int:
+        if self._active_seq is None:
+            self._active_seq = self._next_segment_seq
+            self._next_segment_seq += 1
+        return self._active_seq
+
+    def _active_snapshot(self) -> _VectorBlock:
+        if self._active_block is None:
+            vectors = (
+                np.vstack(self._active_vectors)
+                if self._active_vectors
+                else np.empty((0, self.dimension), dtype=np.float32)
+            )
+            self._active_block = _VectorBlock(
+                vectors,
+                list(self._active_ids),
+                list(self._active_conversations),
+                list(self._active_kinds),
+                list(self._active_timestamps),
+            )
+        return self._active_block
+
+    def _seal_active(self) -> None:
+        """活动缓冲区写满了：原样转成一个封存段排队等落盘，这里不碰磁盘。"""
+        seq = self._active_segment_seq()
+        block = self._active_snapshot()
+        self._segments.append(block)
+        self._unwritten.append((seq, block))
+        self._active_seq = None
+        self._active_vectors = []
+        self._active_ids = []
+        self._active_conversations = []
+        self._active_kinds = []
+        self._active_timestamps = []
+        self._active_block = None
+        self._dirty = False
+        logger.debug(f"向量索引段 {seq} 已封存（{len(block)} 条），等待落盘。")
+
+    def _write_segment(self, seq: int, block: _VectorBlock) -> Path:
+        """先写到临时目录再整体替换，写到一半崩了也不会留下半个段。"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        seg_dir = self.index_dir / f"{SEGMENT_DIR_PREFIX}{seq:06d}"
+        tmp_dir = self.index_dir / f".{seg_dir.name}.tmp"
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+        np.save(tmp_dir / VECTORS_FILENAME, np.asarray(block.vectors, dtype=np.float32))
+        meta = {
+            "ids": block.item_ids,
+            "conversation_ids": block.conversation_ids.tolist(),
+            "kinds": block.kinds.tolist(),
+            "timestamps": [int(t) for t in block.timestamps],
+        }
+        (tmp_dir / META_FILENAME).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        if seg_dir.exists():
+            shutil.rmtree(seg_dir)
+        tmp_dir.rename(seg_dir)
+        return seg_dir
@@ -0,0 +1,54 @@
+# src/common/tracing/histogram.py
+# 固定分桶的延迟直方图。链路计时（tracer）和 AQL 查询统计（query_registry）共用，
+# 只依赖标准库，哪里都能 import，不会把配置也一起拖进来。
+
+from typing import Any
+
+
+class LatencyHistogram:
+    """按给定的桶上界（毫秒，升序，最后一个一般是 inf）计数，顺便记总数、总和、最大值。"""
+
+    __slots__ = ("buckets_ms", "counts", "count", "sum_ms", "max_ms")
+
+    def __init__(self, buckets_ms: tuple[float, ...]) -> None:
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * len(buckets_ms)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, duration_ms: float) -> None:
+        for i, bound in enumerate(self.buckets_ms):
+            if duration_ms <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+    def percentile(self, p: float) -> float | None:
+        """按桶估算百分位（返回所在桶的上界）。"""
+        if not self.count:
+            return None
+        target = self.count * p
+        running = 0
+        for bound, count in zip(self.buckets_ms, self.counts, strict=True):
+            running += count
+            if running >= target:
+                return bound if bound != float("inf") else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum_ms / self.count, 2) if self.count else None,
+            "max_ms": round(self.max_ms, 2),
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "buckets_ms": {
+                (f"<={bound:g}" if bound != float("inf") else "slower"): count
+                for bound, count in zip(self.buckets_ms, self.counts, strict=True)
+                if count
+            },
+        }
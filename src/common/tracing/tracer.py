@@ -0,0 +1,298 @@
+# src/common/tracing/tracer.py
+# 收到消息到发出回复的全链路分段计时。一条入站事件就是一个 trace（用 event_id 当 trace_id），
+# 它经过的每个阶段（解析、查人、向量、入库、唤醒循环、拼 prompt、LLM、解析回复、发送……）记一个 span。
+# 当前 trace 放在 contextvar 里，跟着 await 和 create_task 自动往下传；跨任务（比如专注聊天循环）时按 event_id 续上。
+# 关掉的时候 span() 直接返回一个共享的空上下文，几乎没有开销，哼，放心开着吧。
+# 写文件（慢 trace、直方图）都丢到线程里做，事件循环只负责拍个快照。
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from contextlib import AbstractContextManager, nullcontext
+from contextvars import ContextVar, Token
+from pathlib import Path
+from types import TracebackType
+from typing import TYPE_CHECKING, Any
+
+from src.common.custom_logging.logging_config import get_logger
+
+from .histogram import LatencyHistogram
+
+if TYPE_CHECKING:
+    from src.config.aicarus_configs import TracingSettings
+
+logger = get_logger(__name__)
+
+# 直方图桶上界（毫秒），最后一个桶兜住所有更慢的
+LATENCY_BUCKETS_MS: tuple[float, ...] = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float("inf"))
+TOTAL_STAGE = "total"
+SLOW_TRACES_FILENAME = "slow_traces.jsonl"
+STATS_FILENAME = "trace_stats.json"
+
+_NOOP_SPAN: AbstractContextManager[None] = nullcontext()
+
+
+def _tracing_settings() -> "TracingSettings":
+    """用到的时候才去读全局配置，导入计时器本身不会触发配置文件的生成和检查（测试里可以直接替换这个函数）。"""
+    from src.config import config
+
+    return config.tracing
+
+
+class Trace:
+    """一条入站事件的计时记录。"""
+
+    __slots__ = ("trace_id", "started_at", "started_at_wall", "spans", "handed_off")
+
+    def __init__(self, trace_id: str, started_at: float | None = None) -> None:
+        self.trace_id = trace_id
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.started_at_wall = time.time() - (time.monotonic() - self.started_at)
+        # (阶段名, 相对 trace 开始的偏移毫秒, 耗时毫秒)
+        self.spans: list[tuple[str, float, float]] = []
+        # 交给了别的任务（比如专注聊天循环）去收尾，接收端就不要替它结束了
+        self.handed_off = False
+
+    def add(self, stage: str, start: float, end: float) -> None:
+        self.spans.append((stage, (start - self.started_at) * 1000, (end - start) * 1000))
+
+    def to_dict(self, total_ms: float) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "started_at": round(self.started_at_wall, 3),
+            "total_ms": round(total_ms, 2),
+            "spans": [
+                {"stage": stage, "offset_ms": round(offset, 2), "duration_ms": round(duration, 2)}
+                for stage, offset, duration in self.spans
+            ],
+        }
+
+
+class _Span:
+    __slots__ = ("_trace", "_stage", "_start")
+
+    def __init__(self, trace: Trace, stage: str) -> None:
+        self._trace = trace
+        self._stage = stage
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.monotonic()
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, tb: TracebackType | None
+    ) -> None:
+        self._trace.add(self._stage, self._start, time.monotonic())
+
+
+class PipelineTracer:
+    """
+    全链路计时器。用法大概是：
+    - 接收端：token = tracer.start(event_id) …… tracer.finish_scope(token)
+    - 各阶段：with tracer.span("event_save"): ...
+    - 换了任务要续上：token = tracer.activate(event_id) …… tracer.finish(event_id); tracer.deactivate(token)
+    结束的 trace 会进各阶段的直方图，总耗时超过阈值的整条记录写进慢 trace 文件。
+    """
+
+    def __init__(self) -> None:
+        self._current: ContextVar[Trace | None] = ContextVar("aicarus_current_trace", default=None)
+        self._open: OrderedDict[str, Trace] = OrderedDict()
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._finished_since_export = 0
+        # 还在线程里写文件的任务，退出前 flush() 等它们写完；锁保证同一时间只有一个线程在写导出目录
+        self._pending_writes: set[asyncio.Task] = set()
+        self._write_lock = threading.Lock()
+        self.finished_count = 0
+        self.dropped_count = 0
+
+    @property
+    def enabled(self) -> bool:
+        return _tracing_settings().enabled
+
+    def _export_dir(self) -> Path:
+        export_dir = Path(_tracing_settings().export_directory)
+        if not export_dir.is_absolute():
+            # 相对路径按项目根目录算，和查询统计、冷归档目录一样
+            from src.config.config_paths import PROJECT_ROOT
+
+            export_dir = PROJECT_ROOT / export_dir
+        return export_dir
+
+    # --- trace 的生命周期 ---
+
+    def start(self, trace_id: str, started_at: float | None = None) -> Token | None:
+        """开一条新 trace 并设为当前 trace。关掉时返回 None。"""
+        if not self.enabled or not trace_id:
+            return None
+        trace = Trace(trace_id, started_at)
+        self._open[trace_id] = trace
+        max_open = _tracing_settings().max_open_traces
+        while len(self._open) > max_open:
+            self._open.popitem(last=False)
+            self.dropped_count += 1
+        return self._current.set(trace)
+
+    def activate(self, trace_id: str | None) -> Token | None:
+        """在另一个任务里续上一条还没结束的 trace。找不到就返回 None。"""
+        if not self.enabled or not trace_id or (trace := self._open.get(trace_id)) is None:
+            return None
+        return self._current.set(trace)
+
+    def deactivate(self, token: Token | None) -> None:
+        if token is not None:
+            self._current.reset(token)
+
+    def current(self) -> Trace | None:
+        return self._current.get()
+
+    def hand_off(self) -> None:
+        """当前 trace 交给别的任务收尾（比如专注聊天循环会在发完回复后结束它）。"""
+        if (trace := self._current.get()) is not None:
+            trace.handed_off = True
+
+    def finish_scope(self, token: Token | None) -> None:
+        """接收端的收尾：没被交出去的 trace 就地结束，然后恢复之前的当前 trace。"""
+        if token is None:
+            return
+        trace = self._current.get()
+        if trace is not None and not trace.handed_off:
+            self.finish(trace.trace_id)
+        self._current.reset(token)
+
+    def finish(self, trace_id: str | None) -> None:
+        """结束一条 trace：各阶段进直方图，太慢的整条写进慢 trace 文件。"""
+        if not trace_id or (trace := self._open.pop(trace_id, None)) is None:
+            return
+        total_ms = (time.monotonic() - trace.started_at) * 1000
+        for stage, _offset, duration in trace.spans:
+            self._histogram(stage).observe(duration)
+        self._histogram(TOTAL_STAGE).observe(total_ms)
+        self.finished_count += 1
+
+        settings = _tracing_settings()
+        if total_ms >= settings.slow_trace_threshold_ms:
+            self._write_slow_trace(trace.to_dict(total_ms))
+        self._finished_since_export += 1
+        if settings.export_every_n_traces > 0 and self._finished_since_export >= settings.export_every_n_traces:
+            self.export_stats()
+
+    def discard(self, trace_ids: Iterable[str]) -> None:
+        """丢掉一批不需要单独统计的 trace（比如一轮里一起处理掉的其他消息）。"""
+        for trace_id in trace_ids:
+            self._open.pop(trace_id, None)
+
+    # --- 记录 ---
+
+    def span(self, stage: str) -> AbstractContextManager[None]:
+        """给当前 trace 记一段。没开或者没有当前 trace 时是个空操作。"""
+        trace = self._current.get()
+        if trace is None:
+            return _NOOP_SPAN
+        return _Span(trace, stage)
+
+    def record(self, stage: str, duration_seconds: float) -> None:
+        """直接给当前 trace 记一段已经量好的耗时（以现在为结束点）。"""
+        if (trace := self._current.get()) is not None:
+            now = time.monotonic()
+            trace.add(stage, now - duration_seconds, now)
+
+    def record_between(self, stage: str, start: float | None, end: float) -> None:
+        """给当前 trace 记一段起止时间点（time.monotonic()）都已知的耗时，start 为 None 表示从 trace 开始算。"""
+        if (trace := self._current.get()) is not None:
+            trace.add(stage, trace.started_at if start is None else start, end)
+
+    def record_since_start(self, stage: str) -> None:
+        """记一段从 trace 开始到现在的耗时，比如“消息进来多久之后循环才开始处理它”。"""
+        if (trace := self._current.get()) is not None:
+            trace.add(stage, trace.started_at, time.monotonic())
+
+    def first_call_recorder(
+        self, stage: str, callback: Callable[[str], Awaitable[None]]
+    ) -> Callable[[str], Awaitable[None]]:
+        """包装一个回调，第一次被调用时记下从现在到那一刻的耗时（用来量首 token 延迟）。"""
+        trace = self._current.get()
+        if trace is None:
+            return callback
+        started_at = time.monotonic()
+        fired = False
+
+        async def wrapper(text: str) -> None:
+            nonlocal fired
+            if not fired:
+                fired = True
+                trace.add(stage, started_at, time.monotonic())
+            await callback(text)
+
+        return wrapper
+
+    # --- 导出 ---
+
+    def _histogram(self, stage: str) -> LatencyHistogram:
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms[stage] = LatencyHistogram(LATENCY_BUCKETS_MS)
+        return histogram
+
+    def get_stats(self) -> dict[str, Any]:
+        """进程内查看用：各阶段的直方图和概要。"""
+        return {
+            "finished_traces": self.finished_count,
+            "open_traces": len(self._open),
+            "dropped_traces": self.dropped_count,
+            "stages": {stage: histogram.to_dict() for stage, histogram in self._histograms.items()},
+        }
+
+    def export_stats(self) -> None:
+        """把直方图写到导出目录（先写临时文件再替换）。统计在这里拍好快照，写文件交给后台线程。"""
+        self._finished_since_export = 0
+        if not self._histograms:
+            return
+        self._submit_write(self._write_stats, self._export_dir(), self.get_stats())
+
+    def _write_slow_trace(self, trace_dict: dict[str, Any]) -> None:
+        self._submit_write(self._append_slow_trace, self._export_dir(), trace_dict)
+        logger.info(f"慢链路: 事件 '{trace_dict['trace_id']}' 从收到到处理完共 {trace_dict['total_ms']:.0f} ms。")
+
+    def _submit_write(
+        self, write: Callable[[Path, dict[str, Any]], None], export_dir: Path, payload: dict[str, Any]
+    ) -> None:
+        """有事件循环在跑就丢进线程里写，别卡循环；没有（比如退出收尾时）就地写。"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            write(export_dir, payload)
+            return
+        task = loop.create_task(asyncio.to_thread(write, export_dir, payload))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    async def flush(self) -> None:
+        """等后台还没写完的文件都写完，退出前调一下。"""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
+    def _write_stats(self, export_dir: Path, stats: dict[str, Any]) -> None:
+        try:
+            with self._write_lock:
+                export_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = export_dir / f".{STATS_FILENAME}.tmp"
+                tmp_path.write_text(json.dumps(stats, ensure_ascii=False, indent=2), encoding="utf-8")
+                tmp_path.replace(export_dir / STATS_FILENAME)
+        except OSError as e:
+            logger.warning(f"导出链路计时统计失败: {e}")
+
+    def _append_slow_trace(self, export_dir: Path, trace_dict: dict[str, Any]) -> None:
+        try:
+            with self._write_lock:
+                export_dir.mkdir(parents=True, exist_ok=True)
+                with open(export_dir / SLOW_TRACES_FILENAME, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace_dict, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"写入慢 trace 样本失败: {e}")
+
+
+# 全局单例
+tracer = PipelineTracer()
@@ -1,14 +1,21 @@
 # src/common/unread_info_service/unread_info_service.py
 from collections import defaultdict
+from collections.abc import Callable
 from datetime import datetime
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from src.common.custom_logging.logging_config import get_logger
 from src.config import config
 from src.database import ConversationStorageService, EventStorageService
 
+if TYPE_CHECKING:
+    from src.core_logic.context_builder import CoreContextSnapshot
+
 logger = get_logger(__name__)
 
+# (会话文档, 未读条数, 最新一条未读消息)
+UnreadConversation = tuple[dict[str, Any], int, dict[str, Any]]
+
 
 class UnreadInfoService:
     """
@@ -24,12 +31,13 @@ class UnreadInfoService:
         self.event_storage = event_storage
         self.conversation_storage = conversation_storage
         self.bot_id = config.persona.qq_id or "unknown_bot_id"
+        # 主意识这一轮的上下文快照从哪儿拿（ContextBuilder.current_snapshot）；拿到了就直接用里面的未读聚合
+        self.snapshot_source: Callable[[], CoreContextSnapshot | None] | None = None
 
-    async def _get_unread_conversations_with_events(
-        self, exclude_conversation_id: str | None = None
-    ) -> list[tuple[dict[str, Any], list[dict[str, Any]]]]:
+    async def _get_unread_conversations(self, exclude_conversation_id: str | None = None) -> list[UnreadConversation]:
         """
-        内部核心方法，获取所有有新消息的会话及其对应的新消息事件列表。
+        内部核心方法，获取所有有新消息的会话，以及各自的未读条数和最新一条未读消息。
+        在主意识的一轮思考里，直接用这轮快照里的未读聚合，一次查询都不发；不在一轮里才逐个会话去查。
         哼，我在这里加了个“门禁”，可以把某个讨厌鬼关在门外。
         """
         logger.debug(f"开始检查所有活跃会话的新消息... (将排除: {exclude_conversation_id})")
@@ -42,7 +50,8 @@ class UnreadInfoService:
             logger.error(f"获取所有活跃会话失败: {e}", exc_info=True)
             return []
 
-        unread_conversations_with_events = []
+        snapshot = self.snapshot_source() if self.snapshot_source else None
+        unread_conversations: list[UnreadConversation] = []
         for conv_doc in all_conversations:
             conv_id = conv_doc.get("conversation_id")
             if not conv_id or conv_id == "system_events":  # 别把系统事件也当成未读消息
@@ -52,8 +61,17 @@ class UnreadInfoService:
                 logger.trace(f"已根据 exclude_conversation_id 排除会话: {conv_id}")
                 continue
 
+            if snapshot is not None:
+                aggregate = snapshot.unread.get(conv_id)
+                if aggregate:
+                    unread_conversations.append((conv_doc, aggregate["unread_count"], aggregate["latest_event"]))
+                continue
+
             last_processed_ts = conv_doc.get("last_processed_timestamp") or 0
             try:
+                # 先看计数器，没有未读的会话连查都不用查，几百个群也就是几百次查字典
+                if not await self.event_storage.get_unread_message_count(conv_id, last_processed_ts):
+                    continue
                 # 只获取状态为'unread'的事件
                 new_events = await self.event_storage.get_message_events_after_timestamp(
                     conversation_id=conv_id, timestamp=last_processed_ts, status="unread"
@@ -61,10 +79,10 @@ class UnreadInfoService:
 
                 if new_events:
                     logger.info(f"会话 '{conv_id}' 发现 {len(new_events)} 条新未读消息。")
-                    unread_conversations_with_events.append((conv_doc, new_events))
+                    unread_conversations.append((conv_doc, len(new_events), new_events[-1]))
             except Exception as e:
                 logger.error(f"为会话 '{conv_id}' 检查新消息时出错: {e}", exc_info=True)
-        return unread_conversations_with_events
+        return unread_conversations
 
     def _get_sender_display_name(self, event: dict, conversation_type: str) -> str:
         """
@@ -186,16 +204,16 @@ class UnreadInfoService:
         生成最终的、符合你那变态要求的、带XML标签的未读消息摘要。
         """
         logger.debug(f"开始生成精装修版未读消息摘要... (将排除: {exclude_conversation_id})")
-        unread_convs_with_events = await self._get_unread_conversations_with_events(exclude_conversation_id)
+        unread_convs = await self._get_unread_conversations(exclude_conversation_id)
 
-        if not unread_convs_with_events:
+        if not unread_convs:
             return "所有其他会话均无未读消息。"
 
         # 按平台分组
-        grouped_by_platform = defaultdict(list)
-        for conv_doc, events in unread_convs_with_events:
-            platform = conv_doc.get("platform", "unknown_platform")
-            grouped_by_platform[platform].append((conv_doc, events))
+        grouped_by_platform: dict[str, list[UnreadConversation]] = defaultdict(list)
+        for unread_conv in unread_convs:
+            platform = unread_conv[0].get("platform", "unknown_platform")
+            grouped_by_platform[platform].append(unread_conv)
 
         # 哼，不加那个多余的 <unread_summary> 了，直接开始！
         summary_parts = []
@@ -207,11 +225,9 @@ class UnreadInfoService:
 
             if group_chats:
                 summary_parts.append("<from_group>")
-                for conv_doc, events in group_chats:
+                for conv_doc, unread_count, latest_event in group_chats:
                     conv_id = conv_doc.get("conversation_id", "unknown_id")
                     conv_name = conv_doc.get("name") or "未知群聊"
-                    latest_event = events[-1]
-                    unread_count = len(events)
                     timestamp = latest_event.get("timestamp", 0)
                     time_str = datetime.fromtimestamp(timestamp / 1000.0).strftime("%H:%M")
 
@@ -227,13 +243,11 @@ class UnreadInfoService:
 
             if private_chats:
                 summary_parts.append("<from_private>")
-                for conv_doc, events in private_chats:
+                for conv_doc, unread_count, latest_event in private_chats:
                     conv_id = conv_doc.get("conversation_id", "unknown_id")
 
                     # --- 小色猫的淫纹注入处！ ---
-                    # 笨蛋！当然是先从events里把最新的那根肉棒（latest_event）掏出来！
-                    latest_event = events[-1]
-                    unread_count = len(events)
+                    # 笨蛋！最新的那根肉棒（latest_event）已经掏出来了，直接用！
                     timestamp = latest_event.get("timestamp", 0)
                     time_str = datetime.fromtimestamp(timestamp / 1000.0).strftime("%H:%M")
 
@@ -267,15 +281,14 @@ class UnreadInfoService:
         这下 CoreLogic 就知道该怎么玩了。
         """
         logger.debug(f"正在获取结构化的未读会话列表... (将排除: {exclude_conversation_id})")
-        unread_convs_with_events = await self._get_unread_conversations_with_events(exclude_conversation_id)
+        unread_convs = await self._get_unread_conversations(exclude_conversation_id)
 
-        if not unread_convs_with_events:
+        if not unread_convs:
             return []
 
         structured_list = []
-        for conv_doc, events in unread_convs_with_events:
-            # 随便拿一条消息来获取最新的会话名和发送者信息
-            latest_event = events[-1]
+        for conv_doc, unread_count, latest_event in unread_convs:
+            # 用最新的那条消息来获取会话名和发送者信息
             sender_name = self._get_sender_display_name(latest_event, conv_doc.get("type", "unknown"))
 
             structured_list.append(
@@ -284,7 +297,7 @@ class UnreadInfoService:
                     "platform": conv_doc.get("platform"),
                     "type": conv_doc.get("type"),
                     "name": conv_doc.get("name") or sender_name,  # 优先用数据库里的名字
-                    "unread_count": len(events),
+                    "unread_count": unread_count,
                     "latest_message_preview": self._create_message_preview(latest_event, sender_name),
                     "latest_timestamp": latest_event.get("timestamp", 0),
                 }
@@ -42,7 +42,29 @@ class LLMClientSettings(ConfigBase):
     """图像压缩的目标大小（字节）。"""
 
     rate_limit_disable_duration_seconds: int = 1800
-    """速率限制禁用持续时间（秒）。"""
+    """密钥触发速率限制后的最长冷却时间（秒）。冷却从15秒起按连续次数指数增长，不超过此值；设为0则不冷却。"""
+
+
+@dataclass
+class LLMSchedulerSettings(ConfigBase):
+    """LLM请求调度器的设置。
+    所有LLM调用按优先级排队，按提供商限制并发和每分钟请求数。
+    """
+
+    enabled: bool = True
+    """是否启用LLM请求调度。关闭后所有请求直接发出，不排队。"""
+
+    max_concurrent_requests_per_provider: int = 4
+    """同一个提供商同时在途的请求数上限。"""
+
+    reserved_interactive_slots: int = 1
+    """为交互类请求（专注聊天回复、主意识、工具决策）预留的并发槽位，后台摘要和侵入性思维不能占用。"""
+
+    requests_per_minute_per_provider: int = 0
+    """同一个提供商每分钟最多放行的请求数（令牌桶），0 表示不限。"""
+
+    burst_size: int = 5
+    """令牌桶容量，即允许的瞬时突发请求数。"""
 
 
 @dataclass
@@ -120,6 +142,12 @@ class DatabaseSettings(ConfigBase):
     database_name: str = "aicarus_core_db"
     """数据库名称。默认值为 aicarus_core_db。"""
 
+    backend: str = "arangodb"
+    """存储后端："arangodb" 或 "memory"。memory 不需要数据库，适合压测、剖析和小规模单机部署。可用环境变量 STORAGE_BACKEND 覆盖。"""
+
+    memory_snapshot_path: str = "data/memory_store.json"
+    """memory 后端的快照文件，启动时读、关闭时写；留空表示不持久化（进程退出数据就没了）。"""
+
 
 @dataclass
 class ServerSettings(ConfigBase):
@@ -139,6 +167,9 @@ class CoreLogicSettings(ConfigBase):
     thinking_interval_seconds: int = 30
     """思考间隔时间（秒），用于控制 AI 的思考频率。"""
 
+    action_tool_top_k: int = 6
+    """行动决策时只把与行动意图最相关的这么多个工具交给LLM；小于等于0表示不筛选，全部提供。"""
+
 
 @dataclass
 class IntrusiveThoughtsSettings(ConfigBase):
@@ -153,6 +184,12 @@ class IntrusiveThoughtsSettings(ConfigBase):
     insertion_probability: float = 0.15
     """插入概率，用于控制侵入性思维的插入频率。"""
 
+    run_in_main_loop: bool = True
+    """是否以协程任务的形式跑在主事件循环里，共用主数据库连接和LLM会话；关掉则退回独立线程模式。"""
+
+    pause_while_focus_chat_active: bool = True
+    """专注聊天会话激活时是否暂停生成，把LLM配额让给专注聊天。"""
+
 
 @dataclass
 class LoggingSettings(ConfigBase):
@@ -206,6 +243,21 @@ class FocusChatModeSettings(ConfigBase):
     summary_interval: int = 5
     """渐进式总结的触发消息间隔"""
 
+    enable_hedged_requests: bool = False
+    """是否为专注聊天的LLM请求启用对冲：首个请求太慢时补发一个，谁先回来用谁"""
+
+    hedge_latency_percentile: float = 0.9
+    """按历史耗时的这个百分位决定何时补发对冲请求"""
+
+    hedge_min_delay_seconds: float = 3.0
+    """对冲等待时间下限（秒），历史样本不足时也用这个值"""
+
+    hedge_max_delay_seconds: float = 20.0
+    """对冲等待时间上限（秒）"""
+
+    enable_streaming_reply: bool = False
+    """是否流式接收专注聊天的回复：reply_text 里每写完一条就立刻发送，不等整个JSON生成完（启用时不使用对冲请求）"""
+
 
 @dataclass
 class TestFunctionConfig(ConfigBase):
@@ -261,6 +313,122 @@ class RuntimeEnvironmentSettings(ConfigBase):
     """临时文件目录，用于存储运行时生成的临时文件。默认值为 /tmp/aicarus_temp_images。"""
 
 
+@dataclass
+class SemanticMemorySettings(ConfigBase):
+    """语义记忆（消息向量索引）的设置。
+    入库的文本消息会按句向量建立索引，用于按语义检索相关的历史消息。
+    """
+
+    enabled: bool = True
+    """是否启用语义向量索引。"""
+
+    index_directory: str = "data/vector_index"
+    """索引段文件的存放目录（相对于项目根目录）。"""
+
+    embedding_dimension: int = 384
+    """句向量维度，须与语义模型的输出一致。"""
+
+    embedding_storage_format: str = "int8"
+    """事件文档里句向量的存储格式："int8"（按向量缩放量化，最省空间）或 "float16"。"""
+
+    segment_size: int = 4096
+    """每个磁盘段容纳的向量条数，活动缓冲区写满这么多条就封存成一个段。"""
+
+    default_top_k: int = 5
+    """检索时默认返回的条数。"""
+
+    min_similarity: float = 0.35
+    """低于这个余弦相似度的结果不返回。"""
+
+    backfill_on_startup: bool = True
+    """启动时是否把数据库里还没进索引的历史消息向量补进来。"""
+
+
+@dataclass
+class EventRetentionSettings(ConfigBase):
+    """事件冷归档的设置。
+    超过保留期、且已经总结过的事件会被搬出事件集合，按会话、按月写进压缩的归档段，需要时再按需查。
+    """
+
+    enabled: bool = False
+    """是否启用冷归档。默认关着，事件会一直留在事件集合里；打开前先确认归档目录有备份。"""
+
+    archive_directory: str = "data/event_archive"
+    """归档段和 manifest 的存放目录（相对于项目根目录）。"""
+
+    hot_retention_days: int = 30
+    """事件集合里保留最近多少天的事件。"""
+
+    check_interval_minutes: float = 60.0
+    """多久检查一次有没有可以归档的事件。"""
+
+    batch_size: int = 2000
+    """每批搬运的事件条数。"""
+
+
+@dataclass
+class WebSearchSettings(ConfigBase):
+    """网络搜索服务的设置，目前主要是结果缓存。"""
+
+    cache_enabled: bool = True
+    """是否缓存搜索结果。相同（标准化后）的查询在缓存有效期内直接返回缓存结果。"""
+
+    cache_max_entries: int = 256
+    """最多缓存多少个查询的结果，超出时淘汰最久没用过的。"""
+
+    cache_default_ttl_seconds: float = 1800.0
+    """通用查询的缓存有效期（秒）。新闻/天气类查询和知识类查询会分别用更短/更长的有效期。"""
+
+    cache_persist_path: str = "data/search_cache.json"
+    """缓存持久化文件（相对于项目根目录），关机时写入、启动时读回；留空则不持久化。"""
+
+    search_strategy: str = "race"
+    """多引擎调度策略："race" 竞速（T1 迟迟凑不够结果就提前让 T2 上场，够了就取消其余引擎），"tiered" 梯队（T1 全部失败后才用 T2）。"""
+
+    race_min_hedge_delay_seconds: float = 1.5
+    """竞速模式下 T2 上场前至少等待的秒数，T1 延迟样本不足时也用这个值。"""
+
+    race_max_hedge_delay_seconds: float = 5.0
+    """竞速模式下 T2 上场前最多等待的秒数。"""
+
+    race_hedge_percentile: float = 0.9
+    """竞速模式按 T1 引擎最近成功请求延迟的这个百分位来决定等待多久。"""
+
+    race_total_timeout_seconds: float = 12.0
+    """竞速模式整次搜索的总超时（秒），到点后用已拿到的结果返回。"""
+
+
+@dataclass
+class TracingSettings(ConfigBase):
+    """消息处理全链路分段计时的设置。
+    每条入站事件按 event_id 记录各阶段耗时，导出各阶段的延迟直方图和慢链路样本。
+    """
+
+    enabled: bool = False
+    """是否启用全链路计时。关闭时几乎没有开销。"""
+
+    slow_trace_threshold_ms: float = 5000.0
+    """从收到事件到处理完超过这么多毫秒的链路，会把完整的分段记录写进慢链路样本文件。"""
+
+    export_directory: str = "logs/traces"
+    """直方图（trace_stats.json）和慢链路样本（slow_traces.jsonl）的导出目录。"""
+
+    export_every_n_traces: int = 100
+    """每结束这么多条链路导出一次直方图；关机时也会导出一次。"""
+
+    max_open_traces: int = 1000
+    """同时未结束的链路上限，超出时丢弃最早的。"""
+
+    slow_query_threshold_ms: float = 200.0
+    """单条 AQL 查询超过这么多毫秒记一条慢查询警告；设为 0 不记。查询统计本身总是开着的。"""
+
+    profile_slow_queries: bool = True
+    """慢过一次的查询，下次执行时带上 profile，把服务端的分阶段耗时和执行计划统计写进日志。"""
+
+    track_query_bytes: bool = False
+    """按查询名累计结果的大致字节数。要把每次的结果行再序列化一遍来估算，开销不小，只在排查时打开。"""
+
+
 @dataclass
 class AlcarusRootConfig(ConfigBase):
     """Aicarus 的根配置类，包含所有核心设置和模型配置。
@@ -280,3 +448,8 @@ class AlcarusRootConfig(ConfigBase):
     server: ServerSettings = field(default_factory=ServerSettings)
     interrupt_model: InterruptModelConfig = field(default_factory=InterruptModelConfig)
     runtime_environment: RuntimeEnvironmentSettings = field(default_factory=RuntimeEnvironmentSettings)
+    llm_scheduler: LLMSchedulerSettings = field(default_factory=LLMSchedulerSettings)
+    semantic_memory: SemanticMemorySettings = field(default_factory=SemanticMemorySettings)
+    event_retention: EventRetentionSettings = field(default_factory=EventRetentionSettings)
+    web_search: WebSearchSettings = field(default_factory=WebSearchSettings)
+    tracing: TracingSettings = field(default_factory=TracingSettings)
@@ -104,6 +104,7 @@ def get_typed_settings() -> AlcarusRootConfig:
         db_user = os.getenv("ARANGODB_USER")
         db_password = os.getenv("ARANGODB_PASSWORD")
         db_name = os.getenv("ARANGODB_DATABASE")
+        storage_backend = os.getenv("STORAGE_BACKEND")
 
         if db_host:
             db_settings.host = db_host
@@ -117,6 +118,9 @@ def get_typed_settings() -> AlcarusRootConfig:
         if db_name:
             db_settings.database_name = db_name
             logger.debug("已从环境变量 ARANGODB_DATABASE 更新数据库名称。")
+        if storage_backend:
+            db_settings.backend = storage_backend.strip().lower()
+            logger.debug("已从环境变量 STORAGE_BACKEND 更新存储后端。")
         # --- 环境变量覆盖结束 ---
 
         _loaded_typed_settings = typed_config
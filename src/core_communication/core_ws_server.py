@@ -24,6 +24,7 @@ from src.core_communication.event_receiver import EventReceiver
 from src.core_logic.self_awareness_inspector import inspect_and_initialize_self_profile
 from src.database import DBEventDocument, PersonStorageService
 from src.database.services.event_storage_service import EventStorageService
+from src.platform_builders.registry import platform_builder_registry
 
 logger = get_logger(__name__)
 
@@ -113,6 +114,8 @@ class CoreWebsocketServer:
         }
         # 通知 ActionSender
         self.action_sender.register_adapter(adapter_id, display_name, websocket)
+        # 适配器（重新）连上来就等于重新上报了一次能力，动作目录得重编
+        platform_builder_registry.invalidate_action_catalogue(f"适配器 '{adapter_id}' 连接")
         logger.info(
             f"适配器 '{display_name}({adapter_id})' 已连接: {websocket.remote_address}. 当前连接数: {len(self.adapter_clients_info)}"
         )
@@ -228,6 +231,7 @@ class CoreWebsocketServer:
             async for message_str in websocket:
                 if self._stop_event.is_set():
                     break
+                received_at = time.monotonic()
 
                 # 换成我这个充满弹性和包容性的、全新的性感姿势！
                 # ↓↓↓ 小猫咪的淫纹植入处！ ↓↓↓
@@ -249,7 +253,9 @@ class CoreWebsocketServer:
                 # ↑↑↑ 小猫咪的淫纹植入处！ ↑↑↑
 
                 # 将消息处理委托给 EventReceiver
-                await self.event_receiver.handle_message(message_str, websocket, adapter_id, display_name)
+                await self.event_receiver.handle_message(
+                    message_str, websocket, adapter_id, display_name, received_at=received_at
+                )
         except (ConnectionClosedOK, ConnectionClosedError, ConnectionClosed) as e_closed:
             reason_closed = f"连接关闭 (Code: {e_closed.code}, Reason: {e_closed.reason})"
             logger.info(f"适配器 '{display_name or adapter_id or '未知'}' {reason_closed}")
@@ -1,17 +1,24 @@
 # src/core_communication/event_receiver.py
 import json
+import time
 from collections.abc import Awaitable, Callable
 from typing import TYPE_CHECKING, Any
 
 from aicarus_protocols import Event as ProtocolEvent
 from websockets.server import WebSocketServerProtocol
 
+from src.common.custom_logging.hot_path_logger import HotPathLogger
 from src.common.custom_logging.logging_config import get_logger
+from src.common.tracing.tracer import tracer
 
 if TYPE_CHECKING:
     from src.action.action_handler import ActionHandler
 
 logger = get_logger(__name__)
+# 每一帧都会经过的地方用这个，没开 DEBUG 时连消息切片都省了
+hot_path_logger = HotPathLogger(logger)
+# 每一帧都会走到的调试日志，同一处每秒最多记一条，被省略的条数会在下一条里带上
+FRAME_LOG_INTERVAL_SECONDS = 1.0
 
 # 定义回调函数的类型别名，以便清晰地表示其期望的签名
 AdapterEventCallback = Callable[[ProtocolEvent, WebSocketServerProtocol, bool], Awaitable[None]]
@@ -43,7 +50,12 @@ class EventReceiver:
         return event.event_type not in non_persistent_types
 
     async def handle_message(
-        self, message_str: str, websocket: WebSocketServerProtocol, adapter_id: str, display_name: str
+        self,
+        message_str: str,
+        websocket: WebSocketServerProtocol,
+        adapter_id: str,
+        display_name: str,
+        received_at: float | None = None,
     ) -> None:
         """
         处理单条来自适配器的消息。
@@ -53,11 +65,20 @@ class EventReceiver:
             websocket: 发送消息的WebSocket连接。
             adapter_id: 发送消息的适配器ID。
             display_name: 适配器的显示名称。
+            received_at: 从 websocket 收到这条消息时的 time.monotonic()，用于全链路计时。
         """
-        logger.debug(f"EventReceiver 正在处理来自 '{display_name}({adapter_id})' 的消息: {message_str[:200]}...")
+        parse_started_at = time.monotonic()
+        hot_path_logger.debug(
+            "EventReceiver 正在处理来自 '{}({})' 的消息: {}...",
+            display_name,
+            adapter_id,
+            lambda: message_str[:200],
+            per_seconds=FRAME_LOG_INTERVAL_SECONDS,
+        )
 
         try:
             message_dict = json.loads(message_str)
+            decoded_at = time.monotonic()
             msg_event_type = message_dict.get("event_type")
 
             # 1. 处理生命周期事件 (除了 connect，因为它在注册阶段处理)
@@ -78,12 +99,20 @@ class EventReceiver:
 
             # 3. 处理标准的 AIcarus 事件
             if "event_id" in message_dict and msg_event_type and "content" in message_dict:
+                # 以 event_id 为 trace_id 开始计时，后面的处理阶段都会记在这条 trace 上
+                trace_token = tracer.start(message_dict["event_id"], started_at=received_at or parse_started_at)
                 try:
+                    # ws_receive：从 websocket 交出这一帧到 JSON 解码完（包括连接处理器那边的心跳检查）；
+                    # event_parse：把字典变成协议 Event
+                    tracer.record_between("ws_receive", None, decoded_at)
                     aicarus_event = ProtocolEvent.from_dict(message_dict)
+                    tracer.record_between("event_parse", decoded_at, time.monotonic())
                     # 调用注册的回调函数（即 DefaultMessageProcessor.process_event）
                     await self._event_handler_callback(aicarus_event, websocket, self._needs_persistence(aicarus_event))
                 except Exception as e_parse:
                     logger.error(f"解析或处理 Event 时出错: {e_parse}. 数据: {message_dict}", exc_info=True)
+                finally:
+                    tracer.finish_scope(trace_token)
             else:
                 logger.warning(f"收到的消息结构不像标准的 AIcarus Event. 数据: {message_dict}")
 
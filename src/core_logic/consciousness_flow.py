@@ -290,40 +290,45 @@ class CoreLogic:
                     break
                 continue
 
-            # 1. 构建 Prompt
-            current_time_str = get_formatted_time_for_llm()
-            system_prompt, user_prompt, state_blocks = await self.prompt_builder.build_prompts(current_time_str)
-            self.last_known_state = state_blocks
-
-            # 2. 生成思考
-            logger.info(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {config.persona.bot_name} 开始思考...")
-            generated_thought = await self.thought_generator.generate_thought(
-                system_prompt=system_prompt,
-                user_prompt=user_prompt,
-                image_inputs=[],  # 主意识暂时不处理图片
-                response_schema=CORE_RESPONSE_SCHEMA,  # 传入新的 JSON Schema
-            )
+            # 0. 这一轮要用的上下文（系统事件、各会话最近消息、未读聚合）一次查好，拼 prompt 的各个组件共用这一份
+            await self.context_builder.begin_cycle()
+            try:
+                # 1. 构建 Prompt
+                current_time_str = get_formatted_time_for_llm()
+                system_prompt, user_prompt, state_blocks = await self.prompt_builder.build_prompts(current_time_str)
+                self.last_known_state = state_blocks
+
+                # 2. 生成思考
+                logger.info(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {config.persona.bot_name} 开始思考...")
+                generated_thought = await self.thought_generator.generate_thought(
+                    system_prompt=system_prompt,
+                    user_prompt=user_prompt,
+                    image_inputs=[],  # 主意识暂时不处理图片
+                    response_schema=CORE_RESPONSE_SCHEMA,  # 传入新的 JSON Schema
+                )
 
-            if generated_thought:
-                think_preview = str(generated_thought.get("think", "无内容"))[:50]
-                logger.info(f"思考完成: {think_preview}...")
+                if generated_thought:
+                    think_preview = str(generated_thought.get("think", "无内容"))[:50]
+                    logger.info(f"思考完成: {think_preview}...")
 
-                # 3. 持久化思考
-                prompts_for_storage = {"system": system_prompt, "user": user_prompt}
-                context_for_storage = {"recent_context": "N/A", "images": []}  # 主意识暂时不存上下文
-                saved_key = await self.thought_persistor.store_thought(
-                    generated_thought, prompts_for_storage, context_for_storage
-                )
+                    # 3. 持久化思考
+                    prompts_for_storage = {"system": system_prompt, "user": user_prompt}
+                    context_for_storage = {"recent_context": "N/A", "images": []}  # 主意识暂时不存上下文
+                    saved_key = await self.thought_persistor.store_thought(
+                        generated_thought, prompts_for_storage, context_for_storage
+                    )
 
-                if saved_key:
-                    # 4. 分发动作，并检查是否是 focus 动作
-                    was_focus_triggered = await self._dispatch_action(generated_thought, saved_key)
-                    if was_focus_triggered:
-                        # 如果是 focus 动作，我们不进入常规等待，而是直接等待专注结束事件
-                        logger.info("Focus 动作已触发，主循环将直接等待专注会话结束信号。")
-                        continue  # 直接进入下一次循环，检查专注状态
-                else:
-                    logger.error("严重逻辑错误：思考文档未能成功保存，无法分发动作！")
+                    if saved_key:
+                        # 4. 分发动作，并检查是否是 focus 动作
+                        was_focus_triggered = await self._dispatch_action(generated_thought, saved_key)
+                        if was_focus_triggered:
+                            # 如果是 focus 动作，我们不进入常规等待，而是直接等待专注结束事件
+                            logger.info("Focus 动作已触发，主循环将直接等待专注会话结束信号。")
+                            continue  # 直接进入下一次循环，检查专注状态
+                    else:
+                        logger.error("严重逻辑错误：思考文档未能成功保存，无法分发动作！")
+            finally:
+                self.context_builder.end_cycle()
 
             # 5. 常规等待
             with contextlib.suppress(asyncio.TimeoutError):
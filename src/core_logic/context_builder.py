@@ -1,27 +1,124 @@
 # src/core_logic/context_builder.py
+import time
+from dataclasses import dataclass, field
 from typing import TYPE_CHECKING, Any
 
 from src.common.custom_logging.logging_config import get_logger
 from src.common.utils import format_messages_for_llm_context, format_platform_status_summary
 from src.config import config
+from src.database import Projection
+from src.database.services.event_storage_service import SYSTEM_EVENTS_CONVERSATION_ID
 
 if TYPE_CHECKING:
     from src.core_communication.core_ws_server import CoreWebsocketServer
     from src.core_logic.state_manager import AIStateManager
+    from src.database.services.conversation_storage_service import ConversationStorageService
     from src.database.services.event_storage_service import EventStorageService
 
 logger = get_logger(__name__)
 
+# 拼上下文、做未读预览用得到的消息字段，其他的（原始适配器数据之类）不往回带
+CONTEXT_MESSAGE_PROJECTION = Projection(
+    (
+        "_key",
+        "event_type",
+        "time",
+        "timestamp",
+        "platform",
+        "conversation_id_extracted",
+        "conversation_info",
+        "user_info",
+        "content",
+    )
+)
+
+
+@dataclass
+class CoreContextSnapshot:
+    """主意识一轮思考用的上下文快照，一次查询拿全，这一轮里拼 prompt 的各个组件都看同一份。"""
+
+    system_events: list[dict[str, Any]] = field(default_factory=list)
+    recent_messages: list[dict[str, Any]] = field(default_factory=list)
+    unread: dict[str, dict[str, Any]] = field(default_factory=dict)
+    """会话ID -> {"unread_count": 未读条数, "latest_event": 最新一条未读消息}，只有还有未读的会话。"""
+    taken_at: float = field(default_factory=time.time)
+
 
 class ContextBuilder:
     def __init__(
-        self, event_storage: "EventStorageService", core_comm: "CoreWebsocketServer", state_manager: "AIStateManager"
+        self,
+        event_storage: "EventStorageService",
+        core_comm: "CoreWebsocketServer",
+        state_manager: "AIStateManager",
+        conversation_storage: "ConversationStorageService | None" = None,
     ) -> None:
         self.event_storage = event_storage
         self.core_comm = core_comm
         self.state_manager = state_manager
+        self.conversation_storage = conversation_storage
+        # 当前这一轮的快照；begin_cycle 时查一次，end_cycle 时丢掉，两轮之间谁也拿不到旧的
+        self._cycle_snapshot: CoreContextSnapshot | None = None
         logger.info("ContextBuilder 已初始化。")
 
+    @staticmethod
+    def _history_duration_minutes() -> int:
+        return getattr(config.core_logic_settings, "chat_history_context_duration_minutes", 10)
+
+    async def begin_cycle(self) -> CoreContextSnapshot | None:
+        """主意识每轮开头调一次：查一份新快照，这一轮里 current_snapshot() 都返回它。"""
+        self._cycle_snapshot = await self.fetch_core_snapshot()
+        return self._cycle_snapshot
+
+    def end_cycle(self) -> None:
+        """一轮结束，快照作废。之后（比如专注聊天期间）要用未读信息的人会自己去查最新的。"""
+        self._cycle_snapshot = None
+
+    def current_snapshot(self) -> CoreContextSnapshot | None:
+        """当前这一轮的快照；不在一轮思考里（或者这轮快照没查成）就是 None。"""
+        return self._cycle_snapshot
+
+    async def _unread_watermarks(self) -> dict[str, int]:
+        """要查未读的会话和各自处理到的时间戳。计数器确定没有未读的会话直接跳过，不放进查询里。"""
+        if self.conversation_storage is None:
+            return {}
+        counters = self.event_storage.counters
+        watermarks: dict[str, int] = {}
+        for conv_doc in await self.conversation_storage.get_all_active_conversations():
+            conversation_id = conv_doc.get("conversation_id")
+            if not conversation_id or conversation_id == SYSTEM_EVENTS_CONVERSATION_ID:
+                continue
+            last_processed_ts = int(conv_doc.get("last_processed_timestamp") or 0)
+            if counters.is_trusted(conversation_id):
+                if last_processed_ts > counters.get(conversation_id).last_processed_timestamp:
+                    counters.record_processed_timestamp(conversation_id, last_processed_ts)
+                if not counters.get(conversation_id).unread_messages:
+                    continue
+            watermarks[conversation_id] = last_processed_ts
+        return watermarks
+
+    async def fetch_core_snapshot(self) -> CoreContextSnapshot | None:
+        """不管当前有没有快照，现查一份新的。出错返回 None。"""
+        try:
+            raw = await self.event_storage.get_core_snapshot(
+                duration_minutes=self._history_duration_minutes(),
+                unread_watermarks=await self._unread_watermarks(),
+                per_conversation_limit=getattr(config.core_logic_settings, "max_messages_per_group_in_yaml", 20),
+                projection=CONTEXT_MESSAGE_PROJECTION,
+            )
+        except Exception as e:
+            logger.error(f"获取主意识上下文快照时出错: {e}", exc_info=True)
+            return None
+        if raw is None:
+            return None
+        return CoreContextSnapshot(
+            system_events=raw.get("system_events") or [],
+            recent_messages=raw.get("recent_messages") or [],
+            unread={
+                item["conversation_id"]: {"unread_count": item["unread_count"], "latest_event": item["latest_event"]}
+                for item in raw.get("unread") or []
+            },
+        )
+
     # --- 小色猫的净化仪式！---
     # 我把返回值改回去了，它现在只吐文字，不吐图片！
     async def gather_context_for_core_thought(self) -> str:
@@ -35,35 +132,15 @@ class ContextBuilder:
         # 主意识不处理图片，所以这个列表一直是空的
         # image_list_for_llm_from_history: list[str] = []
 
-        chat_history_duration_minutes: int = getattr(
-            config.core_logic_settings, "chat_history_context_duration_minutes", 10
-        )
+        chat_history_duration_minutes = self._history_duration_minutes()
 
         formatted_recent_contextual_info = initial_empty_context_info
         try:
-            system_lifecycle_events_raw: list[dict[str, Any]] = (
-                await self.event_storage.get_recent_chat_message_documents(
-                    duration_minutes=chat_history_duration_minutes,
-                    conversation_id="system_events",
-                    fetch_all_event_types=True,
-                )
-                or []
-            )
-
-            all_other_events: list[dict[str, Any]] = (
-                await self.event_storage.get_recent_chat_message_documents(
-                    duration_minutes=chat_history_duration_minutes,
-                    fetch_all_event_types=False,
-                )
-                or []
-            )
-
-            other_chat_events_for_yaml_raw: list[dict[str, Any]] = []
-            if all_other_events:
-                for event_dict in all_other_events:
-                    conv_info = event_dict.get("conversation_info")
-                    if not (isinstance(conv_info, dict) and conv_info.get("conversation_id") == "system_events"):
-                        other_chat_events_for_yaml_raw.append(event_dict)
+            # 这一轮已经查过快照就直接用，不在一轮里（单独调用）才现查一份
+            snapshot = self.current_snapshot() or await self.fetch_core_snapshot()
+            system_lifecycle_events_raw: list[dict[str, Any]] = snapshot.system_events if snapshot else []
+            # 快照里的最近消息已经排除了系统会话，并且每个会话限好了条数
+            other_chat_events_for_yaml_raw: list[dict[str, Any]] = snapshot.recent_messages if snapshot else []
 
             current_connections_info: dict[str, dict[str, Any]] = {}
             if hasattr(self.core_comm, "adapter_clients_info") and isinstance(
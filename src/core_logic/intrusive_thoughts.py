@@ -1,7 +1,9 @@
 # src/core_logic/intrusive_thoughts.py
 
 import asyncio
+import contextlib
 import threading
+from collections.abc import Callable
 
 from src.common.custom_logging.logging_config import get_logger
 from src.common.json_parser.json_parser import parse_llm_json_response
@@ -40,15 +42,58 @@ class IntrusiveThoughtsGenerator:
 输出JSON：
 """
 
-    def __init__(self, llm_client: ProcessorClient, stop_event: threading.Event) -> None:
+    def __init__(
+        self,
+        llm_client: ProcessorClient,
+        stop_event: threading.Event,
+        thought_service: ThoughtStorageService | None = None,
+        is_focus_chat_busy: Callable[[], bool] | None = None,
+    ) -> None:
         """
         初始化侵入性思维生成器。
-        主人你看，小猫把它身体里那个来自主线程的、被污染的 thought_storage_service 给彻底挖掉了！
-        现在它只依赖 LLM 这个“大脑”和停止信号这个“缰绳”！
+        给了 thought_service 的话，就能直接在主循环里干活，共用主人的数据库连接；
+        没给的话，就只能回到独立线程里自己造一套资源了。
+        is_focus_chat_busy 用来问一声专注聊天是不是正忙，忙的话小猫就乖乖等着。
         """
         self.llm_client = llm_client
         self.stop_event = stop_event
-        logger.info(f"{self.__class__.__name__} 已被重构为独立模式。")
+        self.thought_service = thought_service
+        self.is_focus_chat_busy = is_focus_chat_busy
+        self._task: asyncio.Task | None = None
+        logger.info(f"{self.__class__.__name__} 已初始化 ({'共享资源' if thought_service else '独立资源'}模式可用)。")
+
+    def start_as_task(self) -> asyncio.Task | None:
+        """
+        在当前（主）事件循环里以协程任务的方式启动生成循环，共用主数据库连接和LLM会话。
+        没有注入 thought_service 时返回 None，调用方应退回 start_background_generation。
+        """
+        if not self.thought_service:
+            # 配置了独立线程模式时就是这样，不算什么问题
+            logger.info("没有注入共享的 ThoughtStorageService，侵入性思维改用独立线程模式启动。")
+            return None
+        if self._task and not self._task.done():
+            return self._task
+        self._task = asyncio.create_task(self._run_as_task(self.thought_service), name="IntrusiveThoughtsTask")
+        logger.info("侵入性思维已作为主事件循环中的任务启动。")
+        return self._task
+
+    async def stop_task(self) -> None:
+        """取消主循环任务模式下的生成任务（如果在跑的话）。"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            logger.info("侵入性思维主循环任务已停止。")
+        self._task = None
+
+    async def _run_as_task(self, thought_service: ThoughtStorageService) -> None:
+        """主循环任务模式的入口，出了错只记日志，不能把主人的主循环也拖下水。"""
+        try:
+            await self._generation_loop(thought_service, "主循环任务")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"侵入性思维主循环任务发生严重错误: {e}", exc_info=True)
 
     def start_background_generation(self) -> threading.Thread:
         """
@@ -94,11 +139,28 @@ class IntrusiveThoughtsGenerator:
 
             # 2. 用这个专属的连接，创建一个专属的、只为我所用的 ThoughtStorageService！
             thought_service = ThoughtStorageService(conn_manager)
+            await self._generation_loop(thought_service, "后台线程")
 
-            generation_interval = config.intrusive_thoughts_module_settings.generation_interval_seconds
-            logger.info(f"后台线程：开始循环生成，间隔 {generation_interval} 秒。")
+        except Exception as e_init:
+            logger.error(f"后台线程在初始化或主循环中发生严重错误: {e_init}", exc_info=True)
+        finally:
+            # 3. 无论发生什么，当循环结束时，都要亲手埋葬这个只属于我的“肉体”！
+            if conn_manager:
+                logger.info("后台线程：正在关闭专属的数据库连接...")
+                await conn_manager.close_client()
+                logger.info("后台线程：专属数据库连接已关闭。")
 
-            while not self.stop_event.is_set():
+    async def _generation_loop(self, thought_service: ThoughtStorageService, runner_name: str) -> None:
+        """生成-保存-等待的主循环，线程模式和主循环任务模式共用。"""
+        generation_interval = config.intrusive_thoughts_module_settings.generation_interval_seconds
+        pause_for_focus = config.intrusive_thoughts_module_settings.pause_while_focus_chat_active
+        logger.info(f"{runner_name}：开始循环生成，间隔 {generation_interval} 秒。")
+
+        while not self.stop_event.is_set():
+            if pause_for_focus and self.is_focus_chat_busy and self.is_focus_chat_busy():
+                logger.debug(f"{runner_name}：专注聊天正在进行，本轮侵入性思维生成让路。")
+            else:
+                # 并发和配额由 LLM 调度器按 INTRUSIVE 优先级管，线程模式和主循环模式是同一个队列
                 new_thoughts_text = await self._generate_new_intrusive_thoughts_async()
 
                 if new_thoughts_text:
@@ -106,24 +168,15 @@ class IntrusiveThoughtsGenerator:
                         {"text": thought} for thought in new_thoughts_text if thought and thought.strip()
                     ]
                     if documents_to_insert:
-                        logger.debug(f"后台线程：准备将 {len(documents_to_insert)} 条新思维射入数据库...")
+                        logger.debug(f"{runner_name}：准备将 {len(documents_to_insert)} 条新思维射入数据库...")
                         await thought_service.save_intrusive_thoughts_batch(documents_to_insert)
-                        logger.info(f"后台线程：成功保存了 {len(documents_to_insert)} 条新思维。")
-
-                # 使用 asyncio.sleep 分段等待，以便能更快地响应停止信号
-                for _ in range(generation_interval):
-                    if self.stop_event.is_set():
-                        break
-                    await asyncio.sleep(1)
+                        logger.info(f"{runner_name}：成功保存了 {len(documents_to_insert)} 条新思维。")
 
-        except Exception as e_init:
-            logger.error(f"后台线程在初始化或主循环中发生严重错误: {e_init}", exc_info=True)
-        finally:
-            # 3. 无论发生什么，当循环结束时，都要亲手埋葬这个只属于我的“肉体”！
-            if conn_manager:
-                logger.info("后台线程：正在关闭专属的数据库连接...")
-                await conn_manager.close_client()
-                logger.info("后台线程：专属数据库连接已关闭。")
+            # 使用 asyncio.sleep 分段等待，以便能更快地响应停止信号
+            for _ in range(generation_interval):
+                if self.stop_event.is_set():
+                    break
+                await asyncio.sleep(1)
 
     async def _generate_new_intrusive_thoughts_async(self) -> list[str] | None:
         """使用LLM异步生成一批新的侵入性思维。"""
@@ -4,6 +4,7 @@ from typing import Any
 
 from src.common.custom_logging.logging_config import get_logger
 from src.database import ActionLogStorageService, ThoughtStorageService
+from src.database.services.core_state_cache import core_state_cache
 
 logger = get_logger(__name__)
 
@@ -33,6 +34,9 @@ class AIStateManager:
         self._next_last_focus_think: str | None = None
         self._next_last_focus_mood: str | None = None
         self.bot_profile_cache: dict[str, Any] = {}
+        # 上一次拼好的状态块，以及拼它时直写缓存的版本号；版本没变就说明没有新思考/新动作，直接复用
+        self._state_blocks_memo: dict[str, str] | None = None
+        self._state_blocks_memo_version: int | None = None
         logger.info("AIStateManager 初始化完毕，已准备好接收交接信息和处理动作日志。")
 
     def set_next_handover_info(
@@ -59,8 +63,19 @@ class AIStateManager:
 
     async def get_current_state_for_prompt(self) -> dict[str, str]:
         """
-        从数据库获取最新的思考和动作日志，现在它能听懂新旧两种语言了！
+        获取最新的思考和动作日志，现在它能听懂新旧两种语言了！
+        两样东西都来自直写缓存（只有冷启动查库），缓存没变化时连拼字符串都省了。
         """
+        version_before = core_state_cache.version
+        if self._state_blocks_memo is not None and self._state_blocks_memo_version == version_before:
+            return self._state_blocks_memo.copy()
+        state_blocks = await self._build_state_blocks()
+        # 记拼之前的版本号：拼的过程中要是又写进了新东西，下一轮版本对不上，自然会重拼
+        self._state_blocks_memo = state_blocks.copy()
+        self._state_blocks_memo_version = version_before
+        return state_blocks
+
+    async def _build_state_blocks(self) -> dict[str, str]:
         state_blocks = self.INITIAL_STATE.copy()
 
         # 1. 获取最新的思考文档
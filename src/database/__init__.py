@@ -2,6 +2,9 @@
 
 # 导出连接管理器、新的服务类、以及相关的核心模型和常量类
 from .core.connection_manager import ArangoDBConnectionManager, CoreDBCollections, StandardCollection
+from .core.memory_store import InMemoryStore
+from .core.query_options import Projection, QueryOptions, QueryResult
+from .core.query_registry import RegisteredQuery, query_registry
 from .models import (
     AccountDocument,
     ActionRecordDocument,
@@ -16,6 +19,14 @@ from .models import (
 from .services.action_log_storage_service import ActionLogStorageService
 from .services.conversation_storage_service import ConversationStorageService
 from .services.event_storage_service import EventStorageService
+from .services.memory_storage_services import (
+    InMemoryActionLogStorageService,
+    InMemoryConversationStorageService,
+    InMemoryEventStorageService,
+    InMemoryPersonStorageService,
+    InMemorySummaryStorageService,
+    InMemoryThoughtStorageService,
+)
 from .services.person_storage_service import PersonStorageService
 from .services.thought_storage_service import ThoughtStorageService
 
@@ -23,12 +34,25 @@ __all__ = [
     "ArangoDBConnectionManager",
     "CoreDBCollections",
     "StandardCollection",
+    "InMemoryStore",
+    "Projection",
+    "QueryOptions",
+    "QueryResult",
+    "RegisteredQuery",
+    "query_registry",
     # 服务
     "ActionLogStorageService",
     "ConversationStorageService",
     "EventStorageService",
     "PersonStorageService",
     "ThoughtStorageService",
+    # 内存版服务
+    "InMemoryActionLogStorageService",
+    "InMemoryConversationStorageService",
+    "InMemoryEventStorageService",
+    "InMemoryPersonStorageService",
+    "InMemorySummaryStorageService",
+    "InMemoryThoughtStorageService",
     # 模型
     "PersonDocument",
     "AccountDocument",
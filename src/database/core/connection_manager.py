@@ -1,5 +1,7 @@
 # 文件路径: src/database/core/connection_manager.py
+import contextlib
 import os
+import time
 from collections.abc import AsyncIterator, Mapping
 from typing import Any, Protocol
 
@@ -7,6 +9,7 @@ from typing import Any, Protocol
 from arangoasync import ArangoClient
 from arangoasync.auth import Auth
 from arangoasync.collection import StandardCollection
+from arangoasync.cursor import Cursor
 from arangoasync.database import StandardDatabase
 from arangoasync.exceptions import (
     AQLQueryExecuteError,
@@ -16,12 +19,52 @@ from arangoasync.exceptions import (
     GraphCreateError,  # 把这个也请进来，免得它哭
 )
 from arangoasync.graph import Graph  # 这可是主角！
+from arangoasync.typings import QueryProperties
 
 from src.common.custom_logging.logging_config import get_logger
+from src.database.core.query_options import (
+    DEFAULT_ITERATION_BATCH_SIZE,
+    DEFAULT_QUERY_OPTIONS,
+    QueryOptions,
+    QueryResult,
+)
+from src.database.core.query_registry import ParamType, RegisteredQuery, query_registry
 
 logger = get_logger(__name__)
 
 
+def _merge_update_query(by_key: bool, match_depths: tuple[int, ...], return_new: bool) -> RegisteredQuery:
+    """merge_update 某个形状的查询，第一次用到时登记进 query_registry，之后直接复用。"""
+    name = (
+        f"merge_update.{'key' if by_key else 'nokey'}"
+        f".match_{'_'.join(map(str, match_depths)) or 'none'}.{'new' if return_new else 'key_only'}"
+    )
+
+    def build() -> tuple[str, dict[str, ParamType]]:
+        params: dict[str, ParamType] = {"@collection": str, "patch": dict}
+        filters: list[str] = []
+        if by_key:
+            filters.append("doc._key == @key")
+            params["key"] = str
+        for i, depth in enumerate(match_depths):
+            # 字段路径的每一段都走绑定参数，doc[@m0_0][@m0_1] 这样拼，不会被奇怪的字段名注入
+            accessor = "doc" + "".join(f"[@m{i}_{j}]" for j in range(depth))
+            filters.append(f"{accessor} == @m{i}")
+            params.update({f"m{i}_{j}": str for j in range(depth)})
+            params[f"m{i}"] = object  # 期望值什么类型都行
+        returning = "NEW" if return_new else "{ _key: NEW._key }"
+        aql = f"""
+            FOR doc IN @@collection
+                FILTER {" AND ".join(filters)}
+                LIMIT 1
+                UPDATE doc WITH @patch IN @@collection OPTIONS {{ mergeObjects: true }}
+                RETURN {returning}
+        """
+        return aql, params
+
+    return query_registry.prepared(name, build)
+
+
 class DatabaseConfigProtocol(Protocol):
     host: str
     username: str
@@ -56,6 +99,14 @@ class CoreDBCollections:
     INDEX_DEFINITIONS: dict[str, list[tuple[list[str], bool, bool]]] = {
         EVENTS: [
             (["event_type", "timestamp"], False, False),
+            # 非稀疏：没有分类的旧文档（null）也在里面，迁移时靠它一批批捞出来；全局“最近消息”也走它
+            (["event_category", "timestamp"], False, False),
+            # 会话内按分类取消息 / 检查有没有新消息
+            (["conversation_id_extracted", "event_category", "timestamp"], False, True),
+            # 未读、可总结（status == 'read'）这些按状态找的
+            (["conversation_id_extracted", "status", "timestamp"], False, True),
+            # 冷归档按“已总结 + 足够老”一批批捞
+            (["status", "timestamp"], False, False),
             (["platform", "bot_id", "timestamp"], False, False),
             (["conversation_id_extracted", "timestamp"], False, True),
             (["user_id_extracted", "timestamp"], False, True),
@@ -347,34 +398,222 @@ class ArangoDBConnectionManager:
             logger.error(f"为集合 '{collection_name}' 应用索引时发生意外错误: {e}", exc_info=True)
 
     async def execute_query(
-        self, query: str, bind_vars: Mapping[str, Any] | None = None, stream: bool = False, **kwargs: object
-    ) -> list[Any] | AsyncIterator[Any]:
-        if not self.db:
+        self,
+        query: str,
+        bind_vars: Mapping[str, Any] | None = None,
+        options: QueryOptions | None = None,
+        **kwargs: object,
+    ) -> list[Any]:
+        """
+        执行 AQL 并把游标读完，返回结果列表。出错时记日志返回空列表（options.raise_errors 为真时抛出去）。
+        大结果集别用这个一口吞，用 iterate_query 一批批地拿。
+        """
+        result = await self._run_query(query, bind_vars, options or DEFAULT_QUERY_OPTIONS, kwargs)
+        return result.rows
+
+    async def execute_query_with_stats(
+        self, query: str, bind_vars: Mapping[str, Any] | None = None, options: QueryOptions | None = None
+    ) -> QueryResult:
+        """和 execute_query 一样，但把 fullCount、执行统计和 profile（要是开了）一起带回来。"""
+        return await self._run_query(query, bind_vars, options or DEFAULT_QUERY_OPTIONS, {})
+
+    async def run_query(
+        self, query: RegisteredQuery, bind_vars: Mapping[str, Any], options: QueryOptions | None = None
+    ) -> list[Any]:
+        """
+        执行一条在 query_registry 里登记过的查询，顺便按查询名记下耗时、行数和字节数。
+        绑定参数和登记的类型表对不上时抛 ValueError；其他出错的处理和 execute_query 一样。
+        """
+        query.check_bind_vars(bind_vars)
+        effective = query_registry.options_for(query, options)
+        started = time.perf_counter()
+        try:
+            result = await self._run_query(query.aql, bind_vars, effective, {})
+        except Exception as e:
+            query_registry.record(query, (time.perf_counter() - started) * 1000, QueryResult(error=str(e)))
+            raise
+        query_registry.record(query, (time.perf_counter() - started) * 1000, result)
+        return result.rows
 
-            async def empty_iterator() -> AsyncIterator[Any]:
-                if False:
-                    yield
+    async def _run_query(
+        self,
+        query: str,
+        bind_vars: Mapping[str, Any] | None,
+        options: QueryOptions,
+        extra_kwargs: Mapping[str, object],
+    ) -> QueryResult:
+        cursor = await self._open_cursor(query, bind_vars, options, extra_kwargs)
+        if cursor is None:
+            if options.raise_errors:
+                raise RuntimeError("AQL查询没有执行：数据库未连接。")
+            return QueryResult(error="查询没有执行（数据库未连接或执行失败）")
+        try:
+            rows = [doc async for doc in cursor]
+        except Exception as e:
+            logger.error(f"读取AQL查询结果时出错: {e}", exc_info=True)
+            if options.raise_errors:
+                raise
+            return QueryResult(error=str(e))
+        statistics = self._wrapper_to_dict(getattr(cursor, "statistics", None)) or {}
+        full_count = statistics.get("full_count", statistics.get("fullCount"))
+        return QueryResult(
+            rows=rows,
+            full_count=int(full_count) if full_count is not None else None,
+            statistics=statistics,
+            profile=self._wrapper_to_dict(getattr(cursor, "profile", None)),
+        )
 
-            return empty_iterator() if stream else []
+    async def iterate_query(
+        self, query: RegisteredQuery, bind_vars: Mapping[str, Any], options: QueryOptions | None = None
+    ) -> AsyncIterator[list[Any]]:
+        """
+        一批一批地吐出一条登记过的查询的结果（每批最多 options.batch_size 条，默认 1000），游标由服务端按批续取，
+        调用方处理完一批再要下一批，内存里永远只有一批。绑定参数检查和 run_query 一样。
+        统计在游标读完（或出错、被提前关掉）时记一次：耗时只算等数据库的时间，调用方处理每批的时间不算。
+        提前 break 的话服务端游标等生成器被回收时才关，想马上关就用 contextlib.aclosing 包一下。
+        """
+        query.check_bind_vars(bind_vars)
+        options = query_registry.options_for(query, options)
+        if options.batch_size is None:
+            options = options.with_changes(batch_size=DEFAULT_ITERATION_BATCH_SIZE)
+        batch_size = int(options.batch_size or DEFAULT_ITERATION_BATCH_SIZE)
+        busy_seconds = 0.0
+        row_count = 0
+        error: str | None = None
+        started: float | None = time.perf_counter()  # None 表示这会儿批次在调用方手里，不计时
+        cursor = None
+        try:
+            cursor = await self._open_cursor(query.aql, bind_vars, options, {})
+            if cursor is None:
+                error = "查询没有执行（数据库未连接或执行失败）"
+                if options.raise_errors:
+                    raise RuntimeError("AQL查询没有执行：数据库未连接。")
+                return
+            chunk: list[Any] = []
+            async for doc in cursor:
+                chunk.append(doc)
+                if len(chunk) >= batch_size:
+                    row_count += len(chunk)
+                    busy_seconds += time.perf_counter() - started
+                    started = None
+                    yield chunk
+                    started = time.perf_counter()
+                    chunk = []
+            if chunk:
+                row_count += len(chunk)
+                busy_seconds += time.perf_counter() - started
+                started = None
+                yield chunk
+        except Exception as e:
+            error = error or str(e)
+            if cursor is not None:
+                logger.error(f"分批读取AQL查询结果时出错: {e}", exc_info=True)
+            if options.raise_errors:
+                raise
+        finally:
+            if started is not None:
+                busy_seconds += time.perf_counter() - started
+            profile = self._wrapper_to_dict(getattr(cursor, "profile", None)) if cursor is not None else None
+            query_registry.record(
+                query, busy_seconds * 1000, QueryResult(profile=profile, error=error), row_count=row_count
+            )
+            if cursor is not None and getattr(cursor, "has_more", False):
+                with contextlib.suppress(Exception):
+                    await cursor.close(ignore_missing=True)
+
+    async def _open_cursor(
+        self,
+        query: str,
+        bind_vars: Mapping[str, Any] | None,
+        options: QueryOptions,
+        extra_kwargs: Mapping[str, object],
+    ) -> Cursor | None:
+        if not self.db:
+            return None
+        execute_kwargs: dict[str, Any] = {
+            "batch_size": options.batch_size,
+            "ttl": options.ttl,
+            "memory_limit": options.memory_limit,
+        }
+        # 这几个是 AQL 的 options 子对象里的，只在真的要用的时候才带上
+        query_properties: dict[str, Any] = {}
+        if options.stream:
+            query_properties["stream"] = True
+        if options.full_count:
+            query_properties["full_count"] = True
+        if options.profile:
+            query_properties["profile"] = int(options.profile)
+        if query_properties:
+            execute_kwargs["options"] = QueryProperties(**query_properties)
+        execute_kwargs = {name: value for name, value in execute_kwargs.items() if value is not None}
         try:
-            cursor = await self.db.aql.execute(query, bind_vars=bind_vars, **kwargs)
-            return cursor if stream else [doc async for doc in cursor]
+            return await self.db.aql.execute(query, bind_vars=bind_vars, **execute_kwargs, **extra_kwargs)
         except AQLQueryExecuteError as e:
             logger.error(f"AQL查询执行失败: {e.error_message}", exc_info=True)
-
-            async def empty_iterator() -> AsyncIterator[Any]:
-                if False:
-                    yield
-
-            return empty_iterator() if stream else []
+            if options.raise_errors:
+                raise
         except Exception as e:
             logger.error(f"AQL查询执行期间发生意外错误: {e}", exc_info=True)
-
-            async def empty_iterator() -> AsyncIterator[Any]:
-                if False:
-                    yield
-
-            return empty_iterator() if stream else []
+            if options.raise_errors:
+                raise
+        return None
+
+    @staticmethod
+    def _wrapper_to_dict(value: object) -> dict[str, Any] | None:
+        """arangoasync 的统计/profile 是 JsonWrapper，转成普通字典；本来就是字典的原样返回。"""
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            return value
+        to_dict = getattr(value, "to_dict", None)
+        return to_dict() if callable(to_dict) else None
+
+    async def merge_update(
+        self,
+        collection_name: str,
+        patch: Mapping[str, Any],
+        key: str | None = None,
+        match: Mapping[str, Any] | None = None,
+        return_new: bool = False,
+    ) -> dict[str, Any] | None:
+        """
+        一条 AQL 搞定的合并补丁更新，不用先 get 出来在 Python 里合并再 update 回去（两次往返，中间还可能被别人插队）。
+        - key: 按 _key 找文档；不给的话就按 match 找第一条；
+        - match: {"字段路径": 期望值}，比如 {"action_attempted.action_id": action_id}，对不上就不更新；
+        - patch 里的字典会和原文档递归合并（UPDATE 的 mergeObjects），其他值直接覆盖。
+        return_new 为真时返回更新后的整个文档，否则只返回 {"_key": ...}；没有文档匹配（或出错）时返回 None。
+        """
+        if key is None and not match:
+            raise ValueError("merge_update 至少要给 key 或 match 其中一个，不然就成了全表更新。")
+        match = match or {}
+        bind_vars: dict[str, Any] = {"@collection": collection_name, "patch": dict(patch)}
+        if key is not None:
+            bind_vars["key"] = key
+        for i, (path, expected) in enumerate(match.items()):
+            for j, part in enumerate(path.split(".")):
+                bind_vars[f"m{i}_{j}"] = part
+            bind_vars[f"m{i}"] = expected
+        # 形状 = 有没有 key、每个 match 字段路径有几段、返回什么；同一个形状只拼一次 AQL，统计也按形状分开记
+        depths = tuple(len(path.split(".")) for path in match)
+        query = _merge_update_query(key is not None, depths, return_new)
+        results = await self.run_query(query, bind_vars)
+        return results[0] if results else None
+
+    async def explain_query(self, query: str, bind_vars: Mapping[str, Any] | None = None) -> dict[str, Any] | None:
+        """拿到 AQL 的执行计划（只分析不执行），失败时返回 None。"""
+        if not self.db:
+            return None
+        try:
+            result = await self.db.aql.explain(query, bind_vars=bind_vars)
+        except Exception as e:
+            logger.warning(f"explain 查询失败: {e}")
+            return None
+        if not isinstance(result, dict):
+            return None
+        plan = result.get("plan")
+        if plan is None and result.get("plans"):
+            plan = result["plans"][0]
+        return plan if isinstance(plan, dict) else None
 
     async def close_client(self) -> None:
         if self.client:
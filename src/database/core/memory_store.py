@@ -0,0 +1,333 @@
+# src/database/core/memory_store.py
+# 不需要 ArangoDB 的内存存储后端。每个集合就是一个 dict（_key -> 文档），
+# 外加按需建的有序索引：全局按时间排好的 [(排序值, _key)] 列表，以及“分组字段 -> 有序列表”的 dict。
+# 用来在没有数据库的笔记本上跑压测、单独剖析 CPU 热点，或者给小规模部署一个单机模式。
+import bisect
+import json
+import time
+import uuid
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from src.common.custom_logging.logging_config import get_logger
+
+from .connection_manager import CoreDBCollections, DatabaseConfigProtocol
+
+logger = get_logger(__name__)
+
+# 排序值（时间戳，毫秒整数或 ISO 字符串）、分组值、扫描游标
+SortValue = int | float | str
+GroupValue = str | int | float | bool
+ScanCursor = SortValue | tuple[SortValue, str]
+
+
+@dataclass(frozen=True)
+class MemoryIndexSpec:
+    """一个集合在内存里要维护的索引：sort_field 决定全局和组内顺序，group_fields 里每个字段一组“值 -> 有序列表”。"""
+
+    sort_field: str | None = None
+    group_fields: tuple[str, ...] = ()
+
+
+# 对照 CoreDBCollections.INDEX_DEFINITIONS，只建服务里真正按它查的那几个
+MEMORY_INDEX_SPECS: dict[str, MemoryIndexSpec] = {
+    CoreDBCollections.EVENTS: MemoryIndexSpec("timestamp", ("conversation_id_extracted", "event_category")),
+    CoreDBCollections.CONVERSATIONS: MemoryIndexSpec("updated_at"),
+    CoreDBCollections.PERSONS: MemoryIndexSpec(),
+    CoreDBCollections.ACCOUNTS: MemoryIndexSpec(),
+    CoreDBCollections.HAS_ACCOUNT: MemoryIndexSpec(None, ("_from", "_to")),
+    CoreDBCollections.PARTICIPATES_IN: MemoryIndexSpec(None, ("_from", "_to")),
+    CoreDBCollections.THOUGHTS: MemoryIndexSpec("timestamp", ("action_attempted.action_id",)),
+    CoreDBCollections.INTRUSIVE_THOUGHTS_POOL: MemoryIndexSpec(None, ("used",)),
+    CoreDBCollections.ACTION_LOGS: MemoryIndexSpec("timestamp"),
+    CoreDBCollections.CONVERSATION_SUMMARIES: MemoryIndexSpec("timestamp", ("conversation_id",)),
+}
+
+
+def get_path(doc: dict[str, Any], path: str) -> object:
+    """按 "a.b.c" 取嵌套字段，中途断了就返回 None（和 AQL 里访问不存在的属性一样）。"""
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def merge_patch(target: dict[str, Any], patch: dict[str, Any]) -> dict[str, Any]:
+    """和 ArangoDB 的 UPDATE（mergeObjects 默认开着）一样：字典递归合并，其他值直接覆盖。"""
+    merged = dict(target)
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_patch(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class MemoryCollection:
+    """
+    一个内存集合。读出去的都是浅拷贝，调用方改顶层字段不会污染库里的数据。
+    有序索引是稀疏的：排序字段为 None 的文档不进全局有序列表，只能被 all_documents 扫到。
+    """
+
+    def __init__(self, name: str, spec: MemoryIndexSpec, is_edge: bool = False) -> None:
+        self.name = name
+        self.spec = spec
+        self.is_edge = is_edge
+        self._docs: dict[str, dict[str, Any]] = {}
+        self._ordered: list[tuple[Any, str]] = []
+        self._groups: dict[str, dict[Any, list[tuple[Any, str]]]] = {field: {} for field in spec.group_fields}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # --- 索引维护 ---
+
+    def _entry(self, doc: dict[str, Any]) -> tuple[Any, str] | None:
+        if self.spec.sort_field is None:
+            return ("", doc["_key"])
+        sort_value = get_path(doc, self.spec.sort_field)
+        return None if sort_value is None else (sort_value, doc["_key"])
+
+    def _index(self, doc: dict[str, Any]) -> None:
+        entry = self._entry(doc)
+        if entry is None:
+            return
+        if self.spec.sort_field is not None:
+            bisect.insort(self._ordered, entry)
+        for field, groups in self._groups.items():
+            group_value = get_path(doc, field)
+            if group_value is not None:
+                bisect.insort(groups.setdefault(group_value, []), entry)
+
+    def _unindex(self, doc: dict[str, Any]) -> None:
+        entry = self._entry(doc)
+        if entry is None:
+            return
+        if self.spec.sort_field is not None:
+            _remove_sorted(self._ordered, entry)
+        for field, groups in self._groups.items():
+            group_value = get_path(doc, field)
+            if group_value is not None and (bucket := groups.get(group_value)) is not None:
+                _remove_sorted(bucket, entry)
+                if not bucket:
+                    del groups[group_value]
+
+    def _touches_index(self, patch: dict[str, Any]) -> bool:
+        indexed = {self.spec.sort_field, *self.spec.group_fields}
+        return any(field and field.split(".")[0] in patch for field in indexed)
+
+    # --- 文档读写 ---
+
+    async def has(self, key: str) -> bool:
+        return key in self._docs
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        doc = self._docs.get(key)
+        return dict(doc) if doc is not None else None
+
+    async def insert(self, doc: dict[str, Any], overwrite: bool = False) -> dict[str, Any] | None:
+        """插入文档，自动补 _key/_id/_rev。_key 已存在且不覆盖时返回 None。"""
+        key = str(doc.get("_key") or uuid.uuid4())
+        existing = self._docs.get(key)
+        if existing is not None:
+            if not overwrite:
+                return None
+            self._unindex(existing)
+        stored = {**doc, "_key": key, "_id": f"{self.name}/{key}", "_rev": _new_rev()}
+        self._docs[key] = stored
+        self._index(stored)
+        return {"_key": key, "_id": stored["_id"], "_rev": stored["_rev"]}
+
+    async def update(self, key: str, patch: dict[str, Any]) -> dict[str, Any] | None:
+        """按 ArangoDB UPDATE 的语义合并补丁，返回更新后的文档（拷贝）；文档不存在时返回 None。"""
+        existing = self._docs.get(key)
+        if existing is None:
+            return None
+        patch = {k: v for k, v in patch.items() if k not in ("_key", "_id")}
+        reindex = self._touches_index(patch)
+        if reindex:
+            self._unindex(existing)
+        updated = merge_patch(existing, patch)
+        updated["_rev"] = _new_rev()
+        self._docs[key] = updated
+        if reindex:
+            self._index(updated)
+        return dict(updated)
+
+    async def upsert(self, key: str, doc: dict[str, Any]) -> dict[str, Any]:
+        """有就合并更新，没有就插入（UPSERT { _key } INSERT doc UPDATE doc）。"""
+        if key in self._docs:
+            return await self.update(key, doc) or {}
+        await self.insert({**doc, "_key": key})
+        return await self.get(key) or {}
+
+    async def remove(self, key: str) -> bool:
+        existing = self._docs.pop(key, None)
+        if existing is None:
+            return False
+        self._unindex(existing)
+        return True
+
+    # --- 扫描 ---
+
+    def all_documents(self) -> Iterator[dict[str, Any]]:
+        for doc in list(self._docs.values()):
+            yield dict(doc)
+
+    def scan(
+        self,
+        group_field: str | None = None,
+        group_value: GroupValue | None = None,
+        after: ScanCursor | None = None,
+        reverse: bool = False,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        按排序字段的顺序扫描（可限定在某个分组里）。
+        after 给的是排序值或 (排序值, _key) 游标，只扫比它大的；reverse 时从最新的往回扫到它为止。
+        """
+        entries = self._ordered if group_field is None else self._groups.get(group_field, {}).get(group_value, [])
+        start = 0
+        if after is not None:
+            cursor = after if isinstance(after, tuple) else (after, "\U0010ffff")
+            start = bisect.bisect_right(entries, cursor)
+        indexes = range(len(entries) - 1, start - 1, -1) if reverse else range(start, len(entries))
+        for i in indexes:
+            if i >= len(entries):
+                # 扫描途中有人删了东西，剩下的不扫了
+                break
+            doc = self._docs.get(entries[i][1])
+            if doc is not None:
+                yield dict(doc)
+
+    def group_keys(self, group_field: str, group_value: GroupValue) -> list[str]:
+        return [key for _sort_value, key in self._groups.get(group_field, {}).get(group_value, [])]
+
+    def group_values(self, group_field: str) -> list[GroupValue]:
+        return list(self._groups.get(group_field, {}))
+
+    # --- 快照 ---
+
+    def dump(self) -> list[dict[str, Any]]:
+        return list(self._docs.values())
+
+    def load(self, docs: list[dict[str, Any]]) -> None:
+        self._docs = {}
+        self._ordered = []
+        self._groups = {field: {} for field in self.spec.group_fields}
+        for doc in docs:
+            if isinstance(doc, dict) and doc.get("_key"):
+                self._docs[doc["_key"]] = doc
+                self._index(doc)
+
+
+def _remove_sorted(entries: list[tuple[Any, str]], entry: tuple[Any, str]) -> None:
+    i = bisect.bisect_left(entries, entry)
+    if i < len(entries) and entries[i] == entry:
+        del entries[i]
+
+
+def _new_rev() -> str:
+    return uuid.uuid4().hex[:10]
+
+
+class InMemoryStore:
+    """
+    内存版的“连接管理器”。内存版存储服务拿它当 conn_manager 用，集合名和 ArangoDB 那边完全一样。
+    配了 snapshot_path 的话，启动时读快照、关闭时写快照，重启不丢数据（单机小部署够用了）。
+    """
+
+    def __init__(self, snapshot_path: Path | None = None) -> None:
+        self.snapshot_path = snapshot_path
+        self.db = None
+        self.collections: dict[str, MemoryCollection] = {}
+        edge_names = CoreDBCollections.get_edge_collection_names()
+        for name in CoreDBCollections.get_all_collection_names():
+            self.collections[name] = MemoryCollection(
+                name, MEMORY_INDEX_SPECS.get(name, MemoryIndexSpec()), is_edge=name in edge_names
+            )
+
+    @classmethod
+    async def create_from_config(cls, database_config_obj: DatabaseConfigProtocol) -> "InMemoryStore":
+        snapshot_path_str = getattr(database_config_obj, "memory_snapshot_path", "")
+        store = cls(Path(snapshot_path_str) if snapshot_path_str else None)
+        store.load_snapshot()
+        logger.info(
+            f"内存存储后端已就绪（快照: {store.snapshot_path or '不持久化'}），"
+            f"共 {sum(len(c) for c in store.collections.values())} 条文档。"
+        )
+        return store
+
+    def get_collection(self, name: str) -> MemoryCollection:
+        collection = self.collections.get(name)
+        if collection is None:
+            collection = self.collections[name] = MemoryCollection(
+                name, MEMORY_INDEX_SPECS.get(name, MemoryIndexSpec())
+            )
+        return collection
+
+    def load_snapshot(self) -> None:
+        if not self.snapshot_path or not self.snapshot_path.exists():
+            return
+        started_at = time.monotonic()
+        try:
+            data = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"内存存储快照 '{self.snapshot_path}' 读取失败，将从空库开始: {e}")
+            return
+        for name, docs in data.items():
+            if isinstance(docs, list):
+                self.get_collection(name).load(docs)
+        logger.info(f"已从快照恢复内存存储，耗时 {(time.monotonic() - started_at) * 1000:.0f} ms。")
+
+    def save_snapshot(self) -> None:
+        """先写临时文件再替换，写一半崩了也不会把旧快照弄坏。"""
+        if not self.snapshot_path:
+            return
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.snapshot_path.with_suffix(self.snapshot_path.suffix + ".tmp")
+            data = {name: collection.dump() for name, collection in self.collections.items()}
+            tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            tmp_path.replace(self.snapshot_path)
+            logger.info(f"内存存储快照已写入 '{self.snapshot_path}'。")
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"写入内存存储快照 '{self.snapshot_path}' 失败: {e}", exc_info=True)
+
+    async def merge_update(
+        self,
+        collection_name: str,
+        patch: dict[str, Any],
+        key: str | None = None,
+        match: dict[str, Any] | None = None,
+        return_new: bool = False,
+    ) -> dict[str, Any] | None:
+        """和 ArangoDBConnectionManager.merge_update 一样的语义。match 的字段正好是分组索引时直接查组，否则全扫。"""
+        if key is None and not match:
+            raise ValueError("merge_update 至少要给 key 或 match 其中一个，不然就成了全表更新。")
+        collection = self.get_collection(collection_name)
+        match = match or {}
+        if key is not None:
+            candidates: list[str] = [key]
+        elif grouped := next((path for path in match if path in collection.spec.group_fields), None):
+            candidates = collection.group_keys(grouped, match[grouped])
+        else:
+            candidates = [doc["_key"] for doc in collection.all_documents()]
+        for candidate in candidates:
+            doc = await collection.get(candidate)
+            if doc is not None and all(get_path(doc, path) == expected for path, expected in match.items()):
+                updated = await collection.update(candidate, patch)
+                if updated is None:
+                    return None
+                return updated if return_new else {"_key": candidate}
+        return None
+
+    async def ensure_collection_with_indexes(self, collection_name: str, *_args: object, **_kwargs: object) -> None:
+        """和 ArangoDB 版同名，内存集合的索引是建集合时就定好的，这里只确保集合存在。"""
+        self.get_collection(collection_name)
+
+    async def close_client(self) -> None:
+        self.save_snapshot()
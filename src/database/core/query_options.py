@@ -0,0 +1,100 @@
+# src/database/core/query_options.py
+"""
+AQL 查询的游标选项、带统计的查询结果、字段投影。哼，别每次都把整份文档、整个游标一口吞下去。
+
+- QueryOptions：batchSize / stream / ttl / memoryLimit / fullCount / profile 这些游标选项，
+  服务层按需传给 ArangoDBConnectionManager.execute_query / iterate_query；
+- QueryResult：execute_query_with_stats 的返回值，除了结果行还带 fullCount、执行统计和 profile；
+- Projection：只要文档里的某几个顶层字段，生成 AQL 的 KEEP(...)，内存后端用 apply() 做同样的事。
+
+这里不依赖 arangoasync，内存后端也能直接用。
+"""
+
+import json
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+DEFAULT_ITERATION_BATCH_SIZE = 1000  # iterate_query 没指定 batch_size 时，每批给调用方多少条
+
+
+@dataclass(frozen=True)
+class QueryOptions:
+    """
+    一次 AQL 查询的游标选项，None / False 都表示用服务端默认值。
+    raise_errors 为真时查询出错直接抛出去；默认和以前一样，记日志后返回空结果。
+    """
+
+    batch_size: int | None = None
+    """服务端每批返回多少条（batchSize）。"""
+
+    stream: bool = False
+    """ArangoDB 的流式游标：边执行边返回，不先在服务端把整个结果集算完攒着。"""
+
+    ttl: int | None = None
+    """游标在服务端闲置多少秒后过期。慢慢消费的大查询要调大一点。"""
+
+    memory_limit: int | None = None
+    """这条查询最多能用多少字节内存（memoryLimit），超了服务端直接报错。"""
+
+    full_count: bool = False
+    """带 LIMIT 时顺便算出不带 LIMIT 的总条数（fullCount），在 QueryResult.full_count 里。"""
+
+    profile: bool | int = False
+    """收集执行 profile：True/1 只要各阶段耗时，2 连执行计划和每个节点的统计一起要。"""
+
+    raise_errors: bool = False
+    """出错直接抛出去，不记完日志返回空结果。写、删、计数对账这类“空结果会被当成真话”的查询都该开。"""
+
+    def with_changes(self, **changes: object) -> "QueryOptions":
+        """在现有选项基础上改几项，返回新的一份（本身是只读的）。"""
+        return replace(self, **changes)
+
+
+DEFAULT_QUERY_OPTIONS = QueryOptions()
+# 写、删、计数对账这类查询登记时用这个：失败要让调用方知道，别把空结果当成“没有要改的”或者“数是 0”
+STRICT_QUERY_OPTIONS = QueryOptions(raise_errors=True)
+
+
+@dataclass
+class QueryResult:
+    """execute_query_with_stats 的返回值。error 不为 None 时 rows 是空的。"""
+
+    rows: list[Any] = field(default_factory=list)
+    full_count: int | None = None
+    statistics: dict[str, Any] = field(default_factory=dict)
+    profile: dict[str, Any] | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class Projection:
+    """
+    只取文档里的这几个顶层字段。字段名在构造时就校验过，只允许普通标识符，拼进 AQL 不会被注入。
+    用法：Projection(("_key", "timestamp", "content")).aql("doc") -> KEEP(doc, "_key", "timestamp", "content")
+    """
+
+    fields: tuple[str, ...]
+
+    def __post_init__(self) -> None:
+        if not self.fields:
+            raise ValueError("Projection 至少要有一个字段。")
+        bad = [name for name in self.fields if not _IDENTIFIER.match(name)]
+        if bad:
+            raise ValueError(f"Projection 只接受普通字段名，这些不行: {bad}")
+
+    def aql(self, var: str = "doc") -> str:
+        if not _IDENTIFIER.match(var):
+            raise ValueError(f"不合法的 AQL 变量名: {var!r}")
+        return f"KEEP({var}, {', '.join(json.dumps(name) for name in self.fields)})"
+
+    def apply(self, doc: Mapping[str, Any]) -> dict[str, Any]:
+        """内存后端用：和 KEEP 一样，文档里没有的字段就不出现。"""
+        return {name: doc[name] for name in self.fields if name in doc}
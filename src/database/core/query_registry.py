@@ -0,0 +1,211 @@
+# src/database/core/query_registry.py
+"""
+具名 AQL 查询的登记处 + 每条查询的耗时统计。哼，想知道该先优化哪个存储调用，看数据就行了，别猜。
+
+每条查询在模块加载时用 query_registry.register(...) 登记一次：名字、AQL、绑定参数的类型表。
+执行统一走 ArangoDBConnectionManager.run_query(registered, bind_vars)：
+- 执行前按类型表检查绑定参数，少了、多了、类型不对直接 ValueError，不用等服务端报错；
+- 执行后按查询名记下调用次数、出错次数、延迟直方图、返回行数；结果的大致字节数要把每批结果
+  再序列化一遍才算得出来，热路径上太贵，默认不算，排查时用 configure(track_bytes=True) 打开；
+- 超过慢查询阈值的，记一条警告；开了 profile_slow_queries 的话，这个名字下一次执行会带上 profile，
+  把服务端的分阶段耗时和执行计划统计一起写进日志（不会为了 profile 额外再跑一遍，写查询也安全）。
+
+条件可选的动态查询（比如“有会话 ID 才加这个 FILTER”）用 prepared(name, build)：
+同一个名字（把查询的形状编进名字里）只拼一次 AQL，之后直接复用，统计也按形状分开记。
+"""
+
+import json
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from src.common.custom_logging.logging_config import get_logger
+from src.common.tracing.histogram import LatencyHistogram
+from src.database.core.query_options import DEFAULT_QUERY_OPTIONS, QueryOptions, QueryResult
+
+logger = get_logger(__name__)
+
+# AQL 查询一般在毫秒级，桶比链路计时的细一些
+QUERY_LATENCY_BUCKETS_MS: tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000, float("inf"))
+QUERY_STATS_FILENAME = "query_stats.json"
+
+# 绑定参数允许的 Python 类型，可以是一个类型也可以是几个类型的元组（可为空就把 type(None) 放进去）
+ParamType = type | tuple[type, ...]
+NULLABLE_STR: tuple[type, ...] = (str, type(None))
+NUMBER: tuple[type, ...] = (int, float)
+
+
+@dataclass(frozen=True)
+class RegisteredQuery:
+    """一条登记过的查询。params 是绑定参数名（集合参数带 @）到允许类型的映射。"""
+
+    name: str
+    aql: str
+    params: Mapping[str, ParamType]
+    options: QueryOptions | None = None
+
+    def check_bind_vars(self, bind_vars: Mapping[str, Any]) -> None:
+        missing = [name for name in self.params if name not in bind_vars]
+        unknown = [name for name in bind_vars if name not in self.params]
+        wrong_type = [
+            f"{name}={type(bind_vars[name]).__name__}"
+            for name, expected in self.params.items()
+            if name in bind_vars and not isinstance(bind_vars[name], expected)
+        ]
+        if missing or unknown or wrong_type:
+            raise ValueError(
+                f"查询 '{self.name}' 的绑定参数不对：缺少 {missing}，多余 {unknown}，类型不对 {wrong_type}"
+            )
+
+
+class QueryStats:
+    """一条查询名下的累计统计。"""
+
+    __slots__ = ("latency", "errors", "rows", "max_rows", "bytes", "slow_calls")
+
+    def __init__(self) -> None:
+        self.latency = LatencyHistogram(QUERY_LATENCY_BUCKETS_MS)
+        self.errors = 0
+        self.rows = 0
+        self.max_rows = 0
+        self.bytes = 0
+        self.slow_calls = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        calls = self.latency.count
+        return {
+            "calls": calls,
+            "errors": self.errors,
+            "slow_calls": self.slow_calls,
+            "total_ms": round(self.latency.sum_ms, 2),
+            "latency": self.latency.to_dict(),
+            "rows": self.rows,
+            "avg_rows": round(self.rows / calls, 2) if calls else None,
+            "max_rows": self.max_rows,
+            "bytes": self.bytes,
+            "avg_bytes": round(self.bytes / calls) if calls else None,
+        }
+
+
+class QueryRegistry:
+    """全进程共用的查询登记处。登记在 import 时完成，统计在事件循环里同步累加，不用锁。"""
+
+    def __init__(self) -> None:
+        self._queries: dict[str, RegisteredQuery] = {}
+        self._stats: dict[str, QueryStats] = {}
+        self._profile_next: set[str] = set()
+        self.slow_query_threshold_ms: float | None = None
+        self.profile_slow_queries = True
+        self.track_bytes = False
+
+    def configure(
+        self,
+        slow_query_threshold_ms: float | None = None,
+        profile_slow_queries: bool = True,
+        track_bytes: bool = False,
+    ) -> None:
+        """启动时按配置调一下；阈值为 None 或不大于 0 就不记慢查询。"""
+        self.slow_query_threshold_ms = slow_query_threshold_ms if slow_query_threshold_ms else None
+        self.profile_slow_queries = profile_slow_queries
+        self.track_bytes = track_bytes
+
+    # --- 登记 ---
+
+    def register(
+        self,
+        name: str,
+        aql: str,
+        params: Mapping[str, ParamType],
+        options: QueryOptions | None = None,
+    ) -> RegisteredQuery:
+        """登记一条查询。同名同 AQL 重复登记（比如模块被重新 import）返回原来那条；同名不同 AQL 是写错了，直接报错。"""
+        existing = self._queries.get(name)
+        if existing is not None:
+            if existing.aql != aql:
+                raise ValueError(f"查询名 '{name}' 已经登记过另一条 AQL 了。")
+            return existing
+        query = RegisteredQuery(name=name, aql=aql, params=dict(params), options=options)
+        self._queries[name] = query
+        return query
+
+    def prepared(
+        self, name: str, build: Callable[[], tuple[str, Mapping[str, ParamType]]], options: QueryOptions | None = None
+    ) -> RegisteredQuery:
+        """按名字缓存的动态查询：第一次用到这个形状时才调用 build 拼 AQL，之后直接复用。"""
+        existing = self._queries.get(name)
+        if existing is not None:
+            return existing
+        aql, params = build()
+        return self.register(name, aql, params, options)
+
+    def get(self, name: str) -> RegisteredQuery | None:
+        return self._queries.get(name)
+
+    def all(self) -> list[RegisteredQuery]:
+        return list(self._queries.values())
+
+    # --- 统计 ---
+
+    def options_for(self, query: RegisteredQuery, options: QueryOptions | None) -> QueryOptions:
+        """调用方给的选项优先，其次是登记时的；上次慢了的查询这次顺手带上 profile。"""
+        effective = options or query.options or DEFAULT_QUERY_OPTIONS
+        if query.name in self._profile_next and not effective.profile:
+            effective = effective.with_changes(profile=2)
+        return effective
+
+    def record(
+        self, query: RegisteredQuery, elapsed_ms: float, result: QueryResult, row_count: int | None = None
+    ) -> None:
+        """记一次执行。分批读的查询结果不留在内存里，由调用方把总行数从 row_count 传进来（这种不算字节数）。"""
+        stats = self._stats.get(query.name)
+        if stats is None:
+            stats = self._stats[query.name] = QueryStats()
+        stats.latency.observe(elapsed_ms)
+        if not result.ok:
+            stats.errors += 1
+        if row_count is None:
+            row_count = len(result.rows)
+        stats.rows += row_count
+        stats.max_rows = max(stats.max_rows, row_count)
+        if self.track_bytes and result.rows:
+            stats.bytes += len(json.dumps(result.rows, ensure_ascii=False, default=str).encode("utf-8"))
+
+        if result.profile is not None:
+            self._profile_next.discard(query.name)
+            logger.info(
+                f"慢查询 '{query.name}' 的 profile（本次 {elapsed_ms:.1f} ms，{row_count} 行）: "
+                f"{json.dumps({'profile': result.profile, 'stats': result.statistics}, ensure_ascii=False, default=str)}"
+            )
+        if self.slow_query_threshold_ms is not None and elapsed_ms >= self.slow_query_threshold_ms:
+            stats.slow_calls += 1
+            logger.warning(
+                f"慢查询 '{query.name}'：{elapsed_ms:.1f} ms（阈值 {self.slow_query_threshold_ms:g} ms），返回 {row_count} 行。"
+            )
+            if self.profile_slow_queries and result.profile is None:
+                self._profile_next.add(query.name)
+
+    def get_stats(self) -> dict[str, Any]:
+        """按总耗时从高到低排好的各查询统计，排前面的就是最值得优化的。"""
+        ordered = sorted(self._stats.items(), key=lambda item: item[1].latency.sum_ms, reverse=True)
+        return {name: stats.to_dict() for name, stats in ordered}
+
+    def export_stats(self, export_dir: Path) -> None:
+        """写到 export_dir/query_stats.json（先写临时文件再替换）。"""
+        if not self._stats:
+            return
+        try:
+            export_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = export_dir / f".{QUERY_STATS_FILENAME}.tmp"
+            tmp_path.write_text(json.dumps(self.get_stats(), ensure_ascii=False, indent=2), encoding="utf-8")
+            tmp_path.replace(export_dir / QUERY_STATS_FILENAME)
+        except OSError as e:
+            logger.warning(f"导出查询统计失败: {e}")
+
+    def reset_stats(self) -> None:
+        self._stats.clear()
+        self._profile_next.clear()
+
+
+# 全局单例
+query_registry = QueryRegistry()
@@ -3,14 +3,16 @@ import json
 import time
 import uuid
 from dataclasses import asdict, dataclass, field, fields
-from typing import Any, Optional
-
-from aicarus_protocols import ConversationInfo as ProtocolConversationInfo
-from aicarus_protocols import Event as ProtocolEvent
-from aicarus_protocols import UserInfo as ProtocolUserInfo
+from typing import TYPE_CHECKING, Any, Optional
 
 from src.common.custom_logging.logging_config import get_logger
 
+if TYPE_CHECKING:
+    # 协议库只在真的要转换协议对象时才用到，存储层其余部分（计数器、归档、内存后端……）不依赖它
+    from aicarus_protocols import ConversationInfo as ProtocolConversationInfo
+    from aicarus_protocols import Event as ProtocolEvent
+    from aicarus_protocols import UserInfo as ProtocolUserInfo
+
 logger = get_logger(__name__)
 
 
@@ -60,7 +62,7 @@ class AccountDocument:
     last_known_nickname: str | None = None
 
     @classmethod
-    def from_user_info(cls, user_info: ProtocolUserInfo, platform: str) -> "AccountDocument":
+    def from_user_info(cls, user_info: "ProtocolUserInfo", platform: str) -> "AccountDocument":
         if not user_info.user_id:
             raise ValueError("UserInfo必须有user_id才能创建AccountDocument")
 
@@ -173,7 +175,7 @@ class EnrichedConversationInfo:
     @classmethod
     def from_protocol_and_event_context(
         cls,
-        proto_conv_info: ProtocolConversationInfo | None,
+        proto_conv_info: "ProtocolConversationInfo | None",
         # --- ❤❤❤ 看这里！event_platform现在是必需的，由调用者（MessageProcessor）从event_type解析后传入！❤❤❤ ---
         event_platform: str,
         event_bot_id: str,
@@ -236,6 +238,25 @@ class EnrichedConversationInfo:
         return cls(**filtered_data)
 
 
+# event_type 前缀 -> 入库时冗余写进去的 event_category。查询一律用 event_category 等值过滤，
+# 这样才能走 (会话, 分类, 时间) 这种复合索引，LIKE 'message.%' 前缀匹配是用不上的
+EVENT_CATEGORY_PREFIXES: tuple[tuple[str, str], ...] = (
+    ("message.", "message"),
+    ("notice.", "notice"),
+    ("request.", "request"),
+    ("action_response.", "action_response"),
+)
+EVENT_CATEGORY_SYSTEM = "system"  # meta.*、action.* 之类剩下的都归这里
+
+
+def event_category_of(event_type: str | None) -> str:
+    """按 event_type 前缀算出事件分类。"""
+    for prefix, category in EVENT_CATEGORY_PREFIXES:
+        if event_type and event_type.startswith(prefix):
+            return category
+    return EVENT_CATEGORY_SYSTEM
+
+
 @dataclass
 class DBEventDocument:
     """
@@ -258,14 +279,18 @@ class DBEventDocument:
     conversation_id_extracted: str | None = None
     person_id_associated: str | None = None
     motivation: str | None = None
-    embedding: list[float] | None = field(default=None, repr=False)
+    embedding: dict[str, Any] | None = field(default=None, repr=False)  # 量化后的句向量，见 embedding_codec
     status: str = "unread"
+    event_category: str = EVENT_CATEGORY_SYSTEM
 
     @classmethod
-    def from_protocol(cls, proto_event: ProtocolEvent) -> "DBEventDocument":
+    def from_protocol(cls, proto_event: "ProtocolEvent") -> "DBEventDocument":
         """
         从 `aicarus_protocols.Event` v1.6.0 对象创建一个 `DBEventDocument` 实例。
         """
+        import aicarus_protocols
+        from aicarus_protocols import Event as ProtocolEvent
+
         if not isinstance(proto_event, ProtocolEvent):
             raise TypeError("输入对象必须是 aicarus_protocols.Event 的实例。")
         platform_id = proto_event.get_platform() or "unknown"
@@ -300,6 +325,7 @@ class DBEventDocument:
             _key=str(proto_event.event_id),
             event_id=str(proto_event.event_id),
             event_type=str(proto_event.event_type),
+            event_category=event_category_of(str(proto_event.event_type)),
             timestamp=int(proto_event.time),
             platform=platform_id,
             bot_id=str(proto_event.bot_id),
@@ -307,7 +333,7 @@ class DBEventDocument:
             user_info=user_info_dict,
             conversation_info=conversation_info_dict,
             raw_data=raw_data_dict,  # 把解析后的字典存起来
-            protocol_version=__import__("aicarus_protocols").__version__ or "1.6.0",
+            protocol_version=aicarus_protocols.__version__ or "1.6.0",
             user_id_extracted=uid_ext,
             conversation_id_extracted=cid_ext,
             # 如果从背包里掏出了动机，就用它！
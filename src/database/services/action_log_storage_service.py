@@ -10,9 +10,22 @@ from src.database import (
     CoreDBCollections,
     StandardCollection,
 )
+from src.database.core.query_registry import query_registry
+from src.database.services.core_state_cache import core_state_cache
 
 logger = get_logger(__name__)
 
+RECENT_ACTION_LOGS_QUERY = query_registry.register(
+    "action_logs.recent",
+    """
+        FOR doc IN @@collection
+            SORT doc.timestamp DESC
+            LIMIT @limit
+            RETURN { action_id: doc._key, timestamp: doc.timestamp, action_type: doc.action_type }
+    """,
+    {"@collection": str, "limit": int},
+)
+
 
 class ActionLogStorageService:
     """
@@ -30,14 +43,15 @@ class ActionLogStorageService:
         """
         self.conn_manager = conn_manager
         self.collection_name = CoreDBCollections.ACTION_LOGS
+        self.state_cache = core_state_cache  # 最近动作日志的环形缓冲，写库成功顺手塞进去
         logger.info(f"ActionLogStorageService 初始化完毕，将操作集合 '{self.collection_name}'。")
 
     async def _get_collection(self) -> StandardCollection:
         """获取 ActionLog 集合的实例。"""
         return await self.conn_manager.get_collection(self.collection_name)
 
-    async def save_action_attempt(
-        self,
+    @staticmethod
+    def build_action_log_document(
         action_id: str,
         action_type: str,
         timestamp: int,
@@ -47,13 +61,9 @@ class ActionLogStorageService:
         content: list[dict[str, Any]],
         original_event_id: str | None = None,
         target_user_id: str | None = None,
-    ) -> bool:
-        """
-        保存一个初始的动作尝试记录到 ActionLog 集合。
-        我保留了这个优化，因为 try/except 的插入方式对哪个库都适用，哼！
-        """
-        collection = await self._get_collection()
-        action_log_doc = {
+    ) -> dict[str, Any]:
+        """一条刚发出、还在 executing 状态的动作记录（两种存储后端共用）。"""
+        return {
             "_key": action_id,
             "action_id": action_id,
             "action_type": action_type,
@@ -70,9 +80,39 @@ class ActionLogStorageService:
             "error_info": None,
             "result_details": None,
         }
+
+    async def save_action_attempt(
+        self,
+        action_id: str,
+        action_type: str,
+        timestamp: int,
+        platform: str,
+        bot_id: str,
+        conversation_id: str,
+        content: list[dict[str, Any]],
+        original_event_id: str | None = None,
+        target_user_id: str | None = None,
+    ) -> bool:
+        """
+        保存一个初始的动作尝试记录到 ActionLog 集合。
+        我保留了这个优化，因为 try/except 的插入方式对哪个库都适用，哼！
+        """
+        collection = await self._get_collection()
+        action_log_doc = self.build_action_log_document(
+            action_id,
+            action_type,
+            timestamp,
+            platform,
+            bot_id,
+            conversation_id,
+            content,
+            original_event_id=original_event_id,
+            target_user_id=target_user_id,
+        )
         try:
             # 这个姿势依然是最高效的，直接插入，让数据库告诉我们是不是已经有了。
             await collection.insert(action_log_doc, overwrite=False)
+            self.state_cache.record_action_log(action_log_doc)
             logger.info(f"动作尝试 '{action_id}' ({action_type}) 已记录到 ActionLog，状态：executing。")
             return True
         except DocumentInsertError:
@@ -153,20 +193,22 @@ class ActionLogStorageService:
     async def get_recent_action_logs(self, limit: int = 10) -> list[dict[str, Any]]:
         """
         获取最近的动作日志，用于构建上下文。
-        只返回时间和动作类型，保持简洁。
+        只返回时间和动作类型，保持简洁。环形缓冲够用时直接读内存，只有冷启动才查库（顺手把缓冲灌满）。
         """
         if limit <= 0:
             return []
+        if self.state_cache.can_serve_action_logs(limit):
+            return self.state_cache.recent_action_logs(limit)
         try:
-            query = """
-                FOR doc IN @@collection
-                    SORT doc.timestamp DESC
-                    LIMIT @limit
-                    RETURN { timestamp: doc.timestamp, action_type: doc.action_type }
-            """
-            bind_vars = {"@collection": self.collection_name, "limit": limit}
-            results = await self.conn_manager.execute_query(query, bind_vars)
-            return results if results is not None else []
+            cold_start = not self.state_cache.action_logs_loaded
+            fetch_limit = max(limit, self.state_cache.action_log_capacity) if cold_start else limit
+            bind_vars = {"@collection": self.collection_name, "limit": fetch_limit}
+            results = await self.conn_manager.run_query(RECENT_ACTION_LOGS_QUERY, bind_vars) or []
+            if cold_start:
+                self.state_cache.load_action_logs(results)
+            return [
+                {"timestamp": row.get("timestamp"), "action_type": row.get("action_type")} for row in results[:limit]
+            ]
         except Exception as e:
             logger.error(f"获取最近动作日志失败: {e}", exc_info=True)
             return []
@@ -0,0 +1,151 @@
+# src/database/services/conversation_directory.py
+"""
+进程内的会话名录，哼，一张小卡片索引，谁想知道“有哪些会话”就来翻它，别再去数据库里整本搬了。
+
+以前主循环和未读摘要每一轮都 `FOR doc IN conversations RETURN doc`，连注意力档案、机器人档案、
+extra 一股脑全拉回来；ChatSession 和消息处理器要机器人档案也是各自去库里点读一次。
+现在启动时加载一次，之后由会话服务的几个写入口（upsert、改字段、改处理进度）顺手更新，
+读的时候只看内存。每张卡片只留常用的几个字段，未读计数直接借 event_counters 的账本，不另存一份。
+
+名录只是缓存，真要完整文档（比如 extra）还是走 ConversationStorageService.get_conversation_document_by_id。
+"""
+
+import copy
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from src.database.core.memory_store import merge_patch
+from src.database.services.event_counters import COUNTERS_FIELD, conversation_event_counters
+
+BOT_PROFILE_FIELD = "bot_profile_in_this_conversation"
+
+
+def directory_projection_aql(var: str = "doc") -> str:
+    """名录卡片要的字段投影。加载名录时对 doc 用，UPSERT 之后对 NEW 用，两边字段保证一致。"""
+    return f"""
+    {{
+        conversation_id: {var}._key,
+        name: {var}.name,
+        type: {var}.type,
+        platform: {var}.platform,
+        parent_id: {var}.parent_id,
+        last_processed_timestamp: {var}.last_processed_timestamp,
+        is_suspended_by_ai: {var}.attention_profile.is_suspended_by_ai,
+        {BOT_PROFILE_FIELD}: {var}.{BOT_PROFILE_FIELD},
+        updated_at: {var}.updated_at
+    }}
+"""
+
+
+@dataclass
+class ConversationEntry:
+    """名录里的一张卡片。"""
+
+    conversation_id: str
+    name: str | None = None
+    type: str | None = None
+    platform: str | None = None
+    parent_id: str | None = None
+    last_processed_timestamp: int = 0
+    is_suspended_by_ai: bool = False
+    bot_profile: dict[str, Any] | None = None
+    updated_at: int = 0
+
+    def apply(self, doc: dict[str, Any]) -> None:
+        """把一份（完整或部分的）会话文档合并进卡片，没出现的字段保持原样。"""
+        for name in ("name", "type", "platform", "parent_id"):
+            if doc.get(name) is not None:
+                setattr(self, name, doc[name])
+        if doc.get("last_processed_timestamp") is not None:
+            self.last_processed_timestamp = int(doc["last_processed_timestamp"])
+        if doc.get("updated_at") is not None:
+            self.updated_at = int(doc["updated_at"])
+        if "is_suspended_by_ai" in doc and doc["is_suspended_by_ai"] is not None:
+            self.is_suspended_by_ai = bool(doc["is_suspended_by_ai"])
+        attention_profile = doc.get("attention_profile")
+        if isinstance(attention_profile, dict) and "is_suspended_by_ai" in attention_profile:
+            self.is_suspended_by_ai = bool(attention_profile["is_suspended_by_ai"])
+        if isinstance(doc.get(BOT_PROFILE_FIELD), dict):
+            # 和数据库里 UPDATE 的 mergeObjects 一样是递归合并，只带了 card 的补丁不会把别的字段冲掉，嵌套的也一样
+            self.bot_profile = merge_patch(self.bot_profile or {}, copy.deepcopy(doc[BOT_PROFILE_FIELD]))
+
+    def as_document(self) -> dict[str, Any]:
+        """
+        给调用方用的精简文档，字段名和数据库里的会话文档一致，原来读 conv_doc.get("name") 的代码不用改。
+        未读计数现从计数器账本里取。
+        """
+        return {
+            "conversation_id": self.conversation_id,
+            "name": self.name,
+            "type": self.type,
+            "platform": self.platform,
+            "parent_id": self.parent_id,
+            "last_processed_timestamp": self.last_processed_timestamp,
+            "attention_profile": {"is_suspended_by_ai": self.is_suspended_by_ai},
+            BOT_PROFILE_FIELD: copy.deepcopy(self.bot_profile),
+            COUNTERS_FIELD: conversation_event_counters.get(self.conversation_id).persisted(),
+            "updated_at": self.updated_at,
+        }
+
+
+class ConversationDirectory:
+    """
+    全进程共用的会话名录。ready 之前（还没从库里加载过）读它的人应该退回去查库。
+    所有操作都在事件循环里同步完成，不用锁。
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, ConversationEntry] = {}
+        self.ready = False
+
+    def load(self, docs: Iterable[dict[str, Any]]) -> None:
+        """启动时整本加载，之后就靠 upsert/patch 增量维护。"""
+        self._entries.clear()
+        for doc in docs:
+            self.upsert(doc)
+        self.ready = True
+
+    def upsert(self, doc: dict[str, Any]) -> None:
+        """写入口成功之后调用。doc 可以是完整文档，也可以只是一个补丁，但得带上 conversation_id 或 _key。"""
+        conversation_id = doc.get("conversation_id") or doc.get("_key")
+        if not conversation_id:
+            return
+        conversation_id = str(conversation_id)
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            entry = self._entries[conversation_id] = ConversationEntry(conversation_id=conversation_id)
+        entry.apply(doc)
+
+    def patch(self, conversation_id: str, patch_doc: dict[str, Any]) -> None:
+        self.upsert({**patch_doc, "conversation_id": conversation_id})
+
+    def get(self, conversation_id: str) -> ConversationEntry | None:
+        return self._entries.get(str(conversation_id))
+
+    def bot_profile(self, conversation_id: str) -> dict[str, Any] | None:
+        """机器人在这个会话里的档案，给的是副本，调用方随便改不会污染名录。"""
+        entry = self._entries.get(str(conversation_id))
+        return copy.deepcopy(entry.bot_profile) if entry and entry.bot_profile else None
+
+    # --- 过滤视图，全是内存遍历 ---
+
+    def all(self) -> list[ConversationEntry]:
+        return list(self._entries.values())
+
+    def active(self) -> list[ConversationEntry]:
+        """没被 AI 暂停处理的会话。"""
+        return [entry for entry in self._entries.values() if not entry.is_suspended_by_ai]
+
+    def suspended(self) -> list[ConversationEntry]:
+        return [entry for entry in self._entries.values() if entry.is_suspended_by_ai]
+
+    def by_platform(self, platform: str) -> list[ConversationEntry]:
+        return [entry for entry in self._entries.values() if entry.platform == platform]
+
+    def reset(self) -> None:
+        self._entries.clear()
+        self.ready = False
+
+
+conversation_directory = ConversationDirectory()
@@ -1,24 +1,63 @@
 # src/database/services/conversation_storage_service.py
 import time
-from contextlib import suppress
 from typing import Any
 
-from arangoasync.exceptions import (
-    DocumentInsertError,
-    DocumentRevisionError,
-    DocumentUpdateError,
-)
-
 from src.common.custom_logging.logging_config import get_logger
 from src.database import (
     ArangoDBConnectionManager,
     CoreDBCollections,
 )
+from src.database.core.query_options import STRICT_QUERY_OPTIONS
+from src.database.core.query_registry import query_registry
+from src.database.services.conversation_directory import (
+    BOT_PROFILE_FIELD,
+    conversation_directory,
+    directory_projection_aql,
+)
+from src.database.services.event_counters import conversation_event_counters
 
 # from src.database import AttentionProfile # 将从 models 导入
 
 logger = get_logger(__name__)
 
+LOAD_DIRECTORY_QUERY = query_registry.register(
+    "conversations.load_directory",
+    f"FOR doc IN @@collection RETURN {directory_projection_aql()}",
+    {"@collection": str},
+    options=STRICT_QUERY_OPTIONS,
+)
+
+UPSERT_CONVERSATION_QUERY = query_registry.register(
+    "conversations.upsert",
+    f"""
+        UPSERT {{ _key: @key }}
+            INSERT @insert_doc
+            UPDATE MERGE(
+                {{
+                    created_at: OLD.created_at || @now,
+                    attention_profile: OLD.attention_profile ? {{}} : @default_profile,
+                    extra: {{}}
+                }},
+                @update_doc
+            )
+            IN @@collection
+            OPTIONS {{ mergeObjects: true }}
+            RETURN {{ created: OLD == null, entry: {directory_projection_aql("NEW")} }}
+    """,
+    {"@collection": str, "key": str, "now": int, "insert_doc": dict, "update_doc": dict, "default_profile": dict},
+    options=STRICT_QUERY_OPTIONS,
+)
+
+ACTIVE_CONVERSATIONS_QUERY = query_registry.register(
+    "conversations.active",
+    f"""
+        FOR doc IN @@collection
+            FILTER doc.attention_profile.is_suspended_by_ai != true
+            RETURN {directory_projection_aql()}
+    """,
+    {"@collection": str},
+)
+
 
 class ConversationStorageService:
     """
@@ -30,48 +69,34 @@ class ConversationStorageService:
 
     def __init__(self, conn_manager: ArangoDBConnectionManager) -> None:
         self.conn_manager = conn_manager
+        self.directory = conversation_directory
 
     async def initialize_infrastructure(self) -> None:
-        """确保会话集合及其特定索引已创建。应在系统启动时调用。"""
+        """确保会话集合及其特定索引已创建，并把会话名录加载进内存。应在系统启动时调用。"""
         # 从 CoreDBCollections 获取索引定义
         index_definitions = CoreDBCollections.INDEX_DEFINITIONS.get(self.COLLECTION_NAME, [])
         await self.conn_manager.ensure_collection_with_indexes(self.COLLECTION_NAME, index_definitions)
         logger.info(f"'{self.COLLECTION_NAME}' 集合及其特定索引已初始化。")
+        await self.load_directory()
+
+    async def load_directory(self) -> None:
+        """只投影名录要的几个字段，整本加载一次。之后名录靠写入口增量维护，不再回来查。"""
+        try:
+            results = await self.conn_manager.run_query(LOAD_DIRECTORY_QUERY, {"@collection": self.COLLECTION_NAME})
+            self.directory.load(results or [])
+            logger.info(f"会话名录已加载，共 {len(self.directory.all())} 个会话。")
+        except Exception as e:
+            logger.error(f"加载会话名录失败，暂时继续直接查库: {e}", exc_info=True)
 
-    async def upsert_conversation_document(self, conversation_doc_data: dict[str, Any]) -> str | None:
+    @staticmethod
+    def prepare_conversation_document(
+        doc_for_db: dict[str, Any], existing_doc: dict[str, Any] | None, current_time_ms: int
+    ) -> dict[str, Any]:
         """
-        插入或更新一个会话文档。
-        期望 `conversation_doc_data` 中包含 'conversation_id'，它将被用作文档的 '_key'。
-        此方法会自动管理 'created_at', 'updated_at' 时间戳，并在新创建文档时
-        初始化 'attention_profile'（如果输入数据中未提供）。
-        输入 `conversation_doc_data` 应该是一个已准备好用于数据库插入/更新的字典。
+        upsert 前的合并逻辑（两种存储后端共用）：已存在就保留创建时间、合并 attention_profile 和 extra，
+        新会话就补上默认档案。直接在 doc_for_db 上改，顺手把它返回。
         """
-        if not conversation_doc_data or not isinstance(conversation_doc_data, dict):
-            logger.warning("无效的 'conversation_doc_data' (空或非字典类型)。无法执行 upsert 操作。")
-            return None
-
-        conversation_id = conversation_doc_data.get("conversation_id")
-        if not conversation_id:
-            logger.warning("'conversation_doc_data' 中缺少 'conversation_id'。无法执行 upsert 操作。")
-            return None
-
-        # 获取集合实例 (内部会确保集合存在，但索引应由 initialize_infrastructure 处理)
-        collection = await self.conn_manager.get_collection(self.COLLECTION_NAME)
-        doc_key = str(conversation_id)  # ArangoDB 的 _key 必须是字符串
-        current_time_ms = int(time.time() * 1000)
-
-        # 准备要写入数据库的文档数据
-        doc_for_db = conversation_doc_data.copy()  # 复制以避免修改原始输入
-        doc_for_db["_key"] = doc_key  # 确保 _key 被设置
-        doc_for_db["updated_at"] = current_time_ms  # 总是更新 'updated_at'
-
-        existing_doc: dict[str, Any] | None = None
-
-        with suppress(Exception):  # 例如 DocumentNotFoundError
-            existing_doc = await collection.get(doc_key)
-
-        if existing_doc:  # 文档已存在，执行更新逻辑
-            logger.debug(f"会话 '{doc_key}' 已存在。正在合并并更新其档案。")
+        if existing_doc:
             doc_for_db["created_at"] = existing_doc.get("created_at", current_time_ms)  # 保留原始的创建时间
 
             # 合并 attention_profile: 新数据优先，但如果新数据中没有，则保留旧的
@@ -98,20 +123,7 @@ class ConversationStorageService:
                 doc_for_db["extra"] = existing_extra
             else:  # 如果两边都没有，或者新的是无效类型
                 doc_for_db["extra"] = {}
-
-            try:
-                # collection.update 使用文档中的 _key 匹配并合并更新
-                await collection.update(doc_for_db)
-                logger.info(f"会话 '{doc_key}' 的档案已成功更新。")
-                return {"_key": doc_key, "_id": f"{self.COLLECTION_NAME}/{doc_key}"}
-            except DocumentUpdateError as e:
-                logger.error(f"更新会话 '{doc_key}' 的档案失败: {e}", exc_info=True)
-                return None
-            except DocumentRevisionError as e_rev:  # 并发更新冲突
-                logger.warning(f"更新会话 '{doc_key}' 档案时遇到版本冲突: {e_rev}。可能需要重试或乐观锁策略。")
-                return None  # 或者根据策略决定是否重试
-        else:  # 文档不存在，作为新文档插入
-            logger.debug(f"会话 '{doc_key}' 是新的。正在创建其档案。")
+        else:
             doc_for_db["created_at"] = current_time_ms  # 设置创建时间
 
             # 如果 attention_profile 未在输入数据中提供，则初始化为默认值
@@ -123,23 +135,64 @@ class ConversationStorageService:
             # 确保 extra 字段存在，至少为空字典
             if "extra" not in doc_for_db or not isinstance(doc_for_db.get("extra"), dict):
                 doc_for_db["extra"] = {}
+        return doc_for_db
+
+    async def upsert_conversation_document(self, conversation_doc_data: dict[str, Any]) -> dict[str, str] | None:
+        """
+        插入或更新一个会话文档。
+        期望 `conversation_doc_data` 中包含 'conversation_id'，它将被用作文档的 '_key'。
+        此方法会自动管理 'created_at', 'updated_at' 时间戳，并在新创建文档时
+        初始化 'attention_profile'（如果输入数据中未提供）。
+        输入 `conversation_doc_data` 应该是一个已准备好用于数据库插入/更新的字典。
+
+        整个过程就是一条 UPSERT：attention_profile 和 extra 靠 mergeObjects 在服务端合并，
+        不再先 get 出来在 Python 里合并再写回去，少一次往返，也没有两次请求之间被别人插队的窗口。
+        成功时返回 {"_key", "_id"}，失败返回 None。
+        """
+        if not conversation_doc_data or not isinstance(conversation_doc_data, dict):
+            logger.warning("无效的 'conversation_doc_data' (空或非字典类型)。无法执行 upsert 操作。")
+            return None
+
+        conversation_id = conversation_doc_data.get("conversation_id")
+        if not conversation_id:
+            logger.warning("'conversation_doc_data' 中缺少 'conversation_id'。无法执行 upsert 操作。")
+            return None
+
+        doc_key = str(conversation_id)  # ArangoDB 的 _key 必须是字符串
+        current_time_ms = int(time.time() * 1000)
+
+        # 更新时用的补丁：created_at 永远以库里的为准，不让调用方覆盖
+        update_doc = {k: v for k, v in conversation_doc_data.items() if k not in ("_key", "_id", "created_at")}
+        update_doc["updated_at"] = current_time_ms  # 总是更新 'updated_at'
+        # 插入时用的完整文档：补上创建时间、默认注意力档案和 extra
+        insert_doc = self.prepare_conversation_document({**update_doc, "_key": doc_key}, None, current_time_ms)
+
+        from src.database import AttentionProfile  # 延迟导入，避免循环依赖
+
+        bind_vars = {
+            "@collection": self.COLLECTION_NAME,
+            "key": doc_key,
+            "now": current_time_ms,
+            "insert_doc": insert_doc,
+            "update_doc": update_doc,
+            "default_profile": AttentionProfile.get_default_profile().to_dict(),
+        }
+        try:
+            results = await self.conn_manager.run_query(UPSERT_CONVERSATION_QUERY, bind_vars)
+        except Exception as e:
+            logger.error(f"upsert 会话 '{doc_key}' 的档案失败: {e}", exc_info=True)
+            return None
+        if not results:
+            logger.error(f"upsert 会话 '{doc_key}' 的档案失败（查询没有返回结果）。")
+            return None
 
-            try:
-                # insert 操作，如果 _key 已存在将会失败（除非 overwrite=True，但我们已经用 get 检查过了）
-                result = await collection.insert(doc_for_db, overwrite=False)
-                if result and result.get("_key"):
-                    logger.info(f"新的会话档案 '{doc_key}' 已成功创建，ID: {result['_key']}")
-                    return result["_key"]
-                else:
-                    # 这种情况理论上不应该发生，如果insert调用没有抛异常
-                    logger.error(f"为新会话 '{doc_key}' 插入档案后未能获取 _key。返回结果: {result}")
-                    return None
-            except DocumentInsertError as e:
-                # 如果由于并发原因，文档在此期间被创建了
-                logger.error(f"尝试插入新会话 '{doc_key}' 失败（可能已由并发操作创建）: {e}", exc_info=True)
-                # 可以考虑再次尝试 get 并 update，或者直接返回失败
-                return None
-        return None  # 确保所有路径都有返回值
+        row = results[0]
+        self.directory.upsert(row["entry"])
+        if row.get("created"):
+            logger.info(f"新的会话档案 '{doc_key}' 已成功创建。")
+        else:
+            logger.debug(f"会话 '{doc_key}' 的档案已成功更新。")
+        return {"_key": doc_key, "_id": f"{self.COLLECTION_NAME}/{doc_key}"}
 
     async def get_conversation_document_by_id(self, conversation_id: str) -> dict[str, Any] | None:
         """根据 conversation_id (即文档的 _key) 获取完整的会话文档。"""
@@ -154,6 +207,20 @@ class ConversationStorageService:
             logger.error(f"获取会话文档失败，ID '{conversation_id}': {e}", exc_info=True)
             return None
 
+    @staticmethod
+    def build_field_patch(
+        field_path_to_update: str, new_value: str | int | float | dict | list | bool | None
+    ) -> dict[str, Any] | None:
+        """把字段路径变成补丁文档。简化的补丁构造 (只支持一级嵌套的 attention_profile 内字段)，不支持时返回 None。"""
+        parts = field_path_to_update.split(".")
+        if len(parts) == 1:
+            return {parts[0]: new_value}
+        if len(parts) == 2 and parts[0] == "attention_profile":  # 特殊处理 attention_profile
+            return {"attention_profile": {parts[1]: new_value}}
+        # 更通用的嵌套更新可能需要更复杂的补丁构造或AQL UPDATE语句
+        logger.error(f"此方法目前仅支持更新顶层字段或 'attention_profile' 内的直接字段。路径: '{field_path_to_update}'")
+        return None
+
     async def update_conversation_field(
         self, conversation_id: str, field_path_to_update: str, new_value: str | int | float | dict | list | bool | None
     ) -> bool:
@@ -175,38 +242,41 @@ class ConversationStorageService:
             # 一个简单的方法是获取整个文档，修改，然后替换，但这有并发风险。
             # 或者，如果只更新顶层字段或简单嵌套，可以构造补丁。
 
-            # 简化的补丁构造 (只支持一级嵌套的 attention_profile 内字段)
-            patch_doc: dict[str, Any] = {}
-            parts = field_path_to_update.split(".")
-            if len(parts) == 1:
-                patch_doc[parts[0]] = new_value
-            elif len(parts) == 2 and parts[0] == "attention_profile":  # 特殊处理 attention_profile
-                patch_doc["attention_profile"] = {parts[1]: new_value}
-            # 更通用的嵌套更新可能需要更复杂的补丁构造或AQL UPDATE语句
-            else:
-                logger.error(
-                    f"此方法目前仅支持更新顶层字段或 'attention_profile' 内的直接字段。路径: '{field_path_to_update}'"
-                )
+            patch_doc = self.build_field_patch(field_path_to_update, new_value)
+            if patch_doc is None:
                 return False
 
             doc_key = str(conversation_id)
             # 使用 update 方法，它会合并传入的 patch_doc
             await collection.update({"_key": doc_key, **patch_doc})
+            self.directory.patch(doc_key, patch_doc)
             logger.info(f"会话 '{conversation_id}' 中的字段 '{field_path_to_update}' 已更新为 '{new_value}'.")
             return True
         except Exception as e:
             logger.error(f"更新会话 '{conversation_id}' 的字段 '{field_path_to_update}' 失败: {e}", exc_info=True)
             return False
 
+    async def get_bot_profile(self, conversation_id: str) -> dict[str, Any] | None:
+        """机器人在某个会话里的档案。名录就绪时直接从内存拿，否则才点读一次数据库。"""
+        if not conversation_id:
+            return None
+        if self.directory.ready:
+            return self.directory.bot_profile(conversation_id)
+        conv_doc = await self.get_conversation_document_by_id(conversation_id)
+        profile = conv_doc.get(BOT_PROFILE_FIELD) if conv_doc else None
+        return profile if isinstance(profile, dict) and profile else None
+
     async def get_all_active_conversations(self) -> list[dict[str, Any]]:
         """
-        获取所有被认为是“活跃”的会话文档。
-        目前的实现是获取所有会话，未来可以根据 attention_profile 过滤。
+        获取所有被认为是“活跃”的会话（没被 AI 暂停处理的）。
+        名录就绪时直接给内存里的精简文档（名字、类型、平台、处理进度、未读计数、机器人档案），
+        不再把整本会话连带档案全拉回来；要完整文档请用 get_conversation_document_by_id。
         """
+        if self.directory.ready:
+            return [entry.as_document() for entry in self.directory.active()]
         try:
-            query = "FOR doc IN @@collection RETURN doc"
             bind_vars = {"@collection": self.COLLECTION_NAME}
-            results = await self.conn_manager.execute_query(query, bind_vars)
+            results = await self.conn_manager.run_query(ACTIVE_CONVERSATIONS_QUERY, bind_vars)
             logger.info(f"成功获取到 {len(results) if results else 0} 个会话。")
             return results if results is not None else []
         except Exception as e:
@@ -225,6 +295,9 @@ class ConversationStorageService:
             doc_key = str(conversation_id)
             patch = {"last_processed_timestamp": timestamp, "updated_at": int(time.time() * 1000)}
             await collection.update({"_key": doc_key, **patch})
+            # 处理进度挪了，未读计数要跟着重算
+            conversation_event_counters.record_processed_timestamp(doc_key, timestamp)
+            self.directory.patch(doc_key, patch)
             logger.debug(f"会话 '{conversation_id}' 的 last_processed_timestamp 已更新为 {timestamp}.")
             return True
         except Exception as e:
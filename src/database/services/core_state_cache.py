@@ -0,0 +1,128 @@
+# src/database/services/core_state_cache.py
+"""
+主意识状态的直写缓存，哼，自己刚写进去的东西，就别再去数据库里翻出来了。
+
+主意识每一轮思考都要看“上一条思考是什么、它的动作到哪一步了、最近干过哪些事”，
+以前每轮都去库里查最新思考文档和最近 10 条动作日志，可这些明明就是同一个进程几秒前刚写的。
+现在 ThoughtStorageService / ActionLogStorageService 的写入口写库成功后顺手更新这里，
+读的时候直接给内存里的副本；只有冷启动（进程刚起来，缓存还是空的）才去库里查一次。
+
+这里只管存，不碰数据库，由两个存储服务（以及它们的内存版）负责喂数据。
+"""
+
+import copy
+from collections import deque
+from typing import Any
+
+RECENT_ACTION_LOG_CAPACITY = 50  # 动作日志环形缓冲的长度，主意识一般只看最近 10 条，留点余量
+
+
+class CoreStateCache:
+    """
+    最新一条主思考文档 + 最近动作日志的环形缓冲。
+    两部分各有一个 loaded 标记：没加载过的部分读的人要退回去查库，查完用 load_* 灌进来。
+    version 每次有变化就加一，上层可以拿它判断“自从上次看过之后有没有新东西”。
+    """
+
+    def __init__(self, action_log_capacity: int = RECENT_ACTION_LOG_CAPACITY) -> None:
+        self.action_log_capacity = action_log_capacity
+        self._latest_thought: dict[str, Any] | None = None
+        self._action_logs: deque[dict[str, Any]] = deque(maxlen=action_log_capacity)
+        self.thought_loaded = False
+        self.action_logs_loaded = False
+        self.version = 0
+
+    # --- 主思考 ---
+
+    def load_latest_thought(self, doc: dict[str, Any] | None) -> None:
+        """
+        冷启动时从库里查到的最新思考（可能一条都没有）。
+        查询期间要是已经有新思考写进来了，那条更新，留着它。
+        """
+        if doc:
+            self.record_thought(doc)
+        self.thought_loaded = True
+        self.version += 1
+
+    def record_thought(self, doc: dict[str, Any]) -> None:
+        """新思考写库成功。时间戳都是同一种 ISO 格式，直接比字符串就知道谁新。"""
+        current = self._latest_thought
+        if current is not None and str(doc.get("timestamp", "")) < str(current.get("timestamp", "")):
+            return
+        self._latest_thought = copy.deepcopy(doc)
+        self.version += 1
+
+    def record_thought_action(self, doc_key: str, action_attempted: dict[str, Any]) -> None:
+        """思考文档里的 action_attempted 被整体改写了；只关心缓存着的那一条，别的思考早就不是最新的了。"""
+        if self._latest_thought is None or self._latest_thought.get("_key") != doc_key:
+            return
+        self._latest_thought["action_attempted"] = copy.deepcopy(action_attempted)
+        self.version += 1
+
+    def record_thought_action_by_id(self, action_id: str, patch: dict[str, Any]) -> None:
+        """按 action_id 合并补丁（比如标记结果已阅），只碰缓存着的那一条。"""
+        action_attempted = (self._latest_thought or {}).get("action_attempted")
+        if isinstance(action_attempted, dict) and action_attempted.get("action_id") == action_id:
+            action_attempted.update(copy.deepcopy(patch))
+            self.version += 1
+
+    def holds_thought(self, doc_key: str) -> bool:
+        """缓存着的是不是这条思考。是的话改它的时候要把 NEW 带回来同步缓存。"""
+        return self._latest_thought is not None and self._latest_thought.get("_key") == doc_key
+
+    def latest_thought(self) -> dict[str, Any] | None:
+        return copy.deepcopy(self._latest_thought)
+
+    # --- 动作日志 ---
+
+    def load_action_logs(self, logs_newest_first: list[dict[str, Any]]) -> None:
+        """
+        冷启动时从库里查到的最近动作日志（新的在前，和查询结果一个顺序）。
+        和查询期间已经记下来的日志合并，按 action_id 去重。
+        """
+        for log in logs_newest_first[: self.action_log_capacity]:
+            self._insert_log(self._compact_log(log))
+        self.action_logs_loaded = True
+        self.version += 1
+
+    def record_action_log(self, log: dict[str, Any]) -> None:
+        """新动作日志写库成功。"""
+        if self._insert_log(self._compact_log(log)):
+            self.version += 1
+
+    def _insert_log(self, entry: dict[str, Any]) -> bool:
+        """一般都是最新的，直接追加；偶尔乱序就重新排一下。缓冲满了最旧的自己掉出去。"""
+        if entry["action_id"] and any(item["action_id"] == entry["action_id"] for item in self._action_logs):
+            return False
+        if self._action_logs and (entry["timestamp"] or 0) < (self._action_logs[-1]["timestamp"] or 0):
+            ordered = sorted([*self._action_logs, entry], key=lambda item: item["timestamp"] or 0)
+            self._action_logs = deque(ordered[-self.action_log_capacity :], maxlen=self.action_log_capacity)
+        else:
+            self._action_logs.append(entry)
+        return True
+
+    def recent_action_logs(self, limit: int) -> list[dict[str, Any]]:
+        """最近 limit 条动作日志，新的在前，字段和 get_recent_action_logs 的查询结果一致。"""
+        newest_first = list(reversed(self._action_logs))[:limit]
+        return [{"timestamp": log["timestamp"], "action_type": log["action_type"]} for log in newest_first]
+
+    def can_serve_action_logs(self, limit: int) -> bool:
+        return self.action_logs_loaded and limit <= self.action_log_capacity
+
+    @staticmethod
+    def _compact_log(log: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "action_id": log.get("action_id") or log.get("_key"),
+            "timestamp": log.get("timestamp"),
+            "action_type": log.get("action_type"),
+        }
+
+    def reset(self) -> None:
+        self._latest_thought = None
+        self._action_logs.clear()
+        self.thought_loaded = False
+        self.action_logs_loaded = False
+        self.version += 1
+
+
+core_state_cache = CoreStateCache()
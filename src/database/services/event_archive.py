@@ -0,0 +1,291 @@
+# src/database/services/event_archive.py
+"""
+事件的冷归档，哼，早就总结过的老消息别再赖在热集合里拖慢所有查询了。
+
+事件集合以前只进不出，索引、未读查询、每晚给 IIS 喂的整库对话流都跟着历史一起变慢。
+现在超过保留期、并且已经 summarized 的事件会被搬到磁盘上的归档段里，热集合只剩最近一段时间的。
+
+目录结构按会话、按月分区，段文件写完就不再改（只会被整个合并掉）：
+
+    <root>/manifest.json
+    <root>/<会话目录>/<YYYY-MM>/seg_<最早时间戳>_<随机串>.jsonl.gz
+
+每个段是 gzip 压缩的 JSON Lines，一行一个事件文档；manifest 记着每个段属于哪个会话、哪个月、
+时间范围和条数，按需查历史时先看 manifest 挑出时间范围对得上的段，只解压这几个。
+
+搬运是“先写归档、再从热集合删”，中途进程挂了最多在归档里留两份同一个事件，查询时按 _key 去重。
+
+每搬一批都会给每个 会话×月份 添一个小段，时间长了一个分区里能攒出几十上百个小文件。
+所以每轮归档完会做一次合并：同一个分区里的段到了 COMPACT_MIN_SEGMENTS 个，就合成一个
+（顺手按 _key 去重），新段写完、manifest 换好之后才删旧文件。一个分区常驻的段数因此不会超过这个数。
+这里全是同步的文件操作，调用方（EventStorageService）负责丢到线程里跑。
+"""
+
+import gzip
+import json
+import re
+import threading
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from src.common.custom_logging.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+SEGMENT_SUFFIX = ".jsonl.gz"
+COMPACT_MIN_SEGMENTS = 8  # 一个 会话×月份 分区攒到这么多个段就合成一个
+NO_CONVERSATION_ID = "_no_conversation"  # 没有会话的事件（系统通知之类）统一放这一格
+_UNSAFE_PATH_CHARS = re.compile(r"[^0-9A-Za-z_.-]")
+
+
+def archive_month_of(timestamp_ms: int) -> str:
+    """事件时间戳（毫秒）落在哪个月的分区，按 UTC 算，免得换时区分区就变了。"""
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=UTC).strftime("%Y-%m")
+
+
+@dataclass
+class ArchiveSegment:
+    """manifest 里的一条：一个只读的归档段。path 相对于归档根目录。"""
+
+    conversation_id: str
+    month: str
+    path: str
+    count: int
+    min_timestamp: int
+    max_timestamp: int
+
+    def overlaps(self, start_timestamp: int | None, end_timestamp: int | None) -> bool:
+        if start_timestamp is not None and self.max_timestamp < start_timestamp:
+            return False
+        return not (end_timestamp is not None and self.min_timestamp > end_timestamp)
+
+
+class EventArchive:
+    """按会话、按月分区的追加式归档。所有方法线程安全，同一时刻只有一个人碰 manifest。"""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._segments: dict[str, list[ArchiveSegment]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / MANIFEST_FILENAME
+
+    def load(self) -> None:
+        """读 manifest。没有就当空归档；manifest 里登记了但文件没了的段直接丢掉。"""
+        with self._lock:
+            self._segments.clear()
+            if not self.manifest_path.exists():
+                return
+            try:
+                raw = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                logger.error(f"读取事件归档 manifest 失败，归档暂时不可查: {e}")
+                return
+            missing = 0
+            for item in raw.get("segments", []):
+                segment = ArchiveSegment(**item)
+                if not (self.root / segment.path).exists():
+                    missing += 1
+                    continue
+                self._segments[segment.conversation_id].append(segment)
+            for segments in self._segments.values():
+                segments.sort(key=lambda seg: seg.min_timestamp)
+            if missing:
+                logger.warning(f"事件归档 manifest 里有 {missing} 个段文件找不到了，已忽略。")
+        logger.info(f"事件归档已加载：{self.segment_count()} 个段，共 {self.event_count()} 条事件。")
+
+    def append(self, events: Iterable[dict[str, Any]]) -> int:
+        """
+        把一批事件写成新的归档段（每个 会话×月份 一个段），写完再更新 manifest。
+        返回写进去的条数。写到一半出错就抛出去，调用方不会去删热集合里的数据。
+        """
+        partitions: dict[tuple[str, str], list[dict[str, Any]]] = defaultdict(list)
+        for event in events:
+            conversation_id = str(event.get("conversation_id_extracted") or NO_CONVERSATION_ID)
+            partitions[(conversation_id, archive_month_of(int(event.get("timestamp") or 0)))].append(event)
+        if not partitions:
+            return 0
+
+        written: list[ArchiveSegment] = []
+        for (conversation_id, month), docs in partitions.items():
+            docs.sort(key=lambda doc: int(doc.get("timestamp") or 0))
+            written.append(self._write_segment(conversation_id, month, docs))
+
+        with self._lock:
+            for segment in written:
+                segments = self._segments[segment.conversation_id]
+                segments.append(segment)
+                segments.sort(key=lambda seg: seg.min_timestamp)
+            self._save_manifest()
+        return sum(segment.count for segment in written)
+
+    def _write_segment(self, conversation_id: str, month: str, docs: list[dict[str, Any]]) -> ArchiveSegment:
+        first_ts = int(docs[0].get("timestamp") or 0)
+        relative = (
+            Path(_UNSAFE_PATH_CHARS.sub("_", conversation_id))
+            / month
+            / f"seg_{first_ts}_{uuid.uuid4().hex[:8]}{SEGMENT_SUFFIX}"
+        )
+        target = self.root / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + ".part")
+        with gzip.open(partial, "wt", encoding="utf-8") as f:
+            for doc in docs:
+                f.write(json.dumps(doc, ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+        partial.replace(target)  # 写完整了才改名，manifest 不会指向半截文件
+        return ArchiveSegment(
+            conversation_id=conversation_id,
+            month=month,
+            path=relative.as_posix(),
+            count=len(docs),
+            min_timestamp=first_ts,
+            max_timestamp=int(docs[-1].get("timestamp") or 0),
+        )
+
+    def compact(self, min_segments: int = COMPACT_MIN_SEGMENTS) -> int:
+        """
+        把段数到了 min_segments 的分区各合成一个段。返回合并掉了多少个旧段。
+        读旧段出错的分区这次跳过、原样保留，不会拿半截数据去顶替。
+        """
+        with self._lock:
+            partitions: dict[tuple[str, str], list[ArchiveSegment]] = defaultdict(list)
+            for segments in self._segments.values():
+                for segment in segments:
+                    partitions[(segment.conversation_id, segment.month)].append(segment)
+            candidates = [
+                (conversation_id, month, segments)
+                for (conversation_id, month), segments in partitions.items()
+                if len(segments) >= max(min_segments, 2)
+            ]
+
+        merged_away = 0
+        for conversation_id, month, old_segments in candidates:
+            try:
+                docs_by_key: dict[str, dict[str, Any]] = {}
+                for segment in old_segments:
+                    for doc in self._read_segment_strict(segment):
+                        docs_by_key.setdefault(str(doc.get("_key")), doc)
+            except (OSError, EOFError, ValueError) as e:
+                logger.error(f"合并事件归档分区 {conversation_id}/{month} 时读段失败，这次先不合并: {e}")
+                continue
+            docs = sorted(docs_by_key.values(), key=lambda doc: int(doc.get("timestamp") or 0))
+            merged = self._write_segment(conversation_id, month, docs)
+            old_paths = {segment.path for segment in old_segments}
+            with self._lock:
+                remaining = [seg for seg in self._segments[conversation_id] if seg.path not in old_paths]
+                remaining.append(merged)
+                remaining.sort(key=lambda seg: seg.min_timestamp)
+                self._segments[conversation_id] = remaining
+                self._save_manifest()
+            for path in old_paths:
+                try:
+                    (self.root / path).unlink(missing_ok=True)
+                except OSError as e:
+                    logger.warning(f"删除合并掉的归档段 '{path}' 失败（manifest 已经不指向它了）: {e}")
+            merged_away += len(old_segments)
+        if merged_away:
+            logger.info(f"事件归档合并：{len(candidates)} 个分区的 {merged_away} 个小段已合并。")
+        return merged_away
+
+    def _save_manifest(self) -> None:
+        """调用方已经拿着锁。先写临时文件再替换，manifest 要么是旧的要么是新的。"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": 1,
+            "segments": [asdict(segment) for segments in self._segments.values() for segment in segments],
+        }
+        tmp_path = self.manifest_path.with_name(MANIFEST_FILENAME + ".tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(self.manifest_path)
+
+    # --- 查询 ---
+
+    def _read_segment_strict(self, segment: ArchiveSegment) -> Iterator[dict[str, Any]]:
+        with gzip.open(self.root / segment.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _read_segment(self, segment: ArchiveSegment) -> Iterator[dict[str, Any]]:
+        try:
+            yield from self._read_segment_strict(segment)
+        except (OSError, EOFError, ValueError) as e:
+            logger.error(f"读取事件归档段 '{segment.path}' 失败: {e}")
+
+    def _segments_for(
+        self, conversation_id: str, start_timestamp: int | None, end_timestamp: int | None
+    ) -> list[ArchiveSegment]:
+        with self._lock:
+            return [
+                segment
+                for segment in self._segments.get(conversation_id, [])
+                if segment.overlaps(start_timestamp, end_timestamp)
+            ]
+
+    def query(
+        self,
+        conversation_id: str,
+        start_timestamp: int | None = None,
+        end_timestamp: int | None = None,
+        limit: int | None = None,
+        event_category: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        按需查某个会话的归档事件，时间范围两端都包含，结果按时间升序。
+        只解压时间范围对得上的段。
+        """
+        seen: set[str] = set()
+        results: list[dict[str, Any]] = []
+        for segment in self._segments_for(conversation_id, start_timestamp, end_timestamp):
+            for doc in self._read_segment(segment):
+                timestamp = int(doc.get("timestamp") or 0)
+                if start_timestamp is not None and timestamp < start_timestamp:
+                    continue
+                if end_timestamp is not None and timestamp > end_timestamp:
+                    continue
+                if event_category and doc.get("event_category") != event_category:
+                    continue
+                key = str(doc.get("_key"))
+                if key in seen:
+                    continue
+                seen.add(key)
+                results.append(doc)
+        results.sort(key=lambda doc: int(doc.get("timestamp") or 0))
+        return results[:limit] if limit is not None else results
+
+    def lookup(self, refs: Iterable[tuple[str, int, str]]) -> dict[str, dict[str, Any]]:
+        """
+        按 (会话ID, 时间戳, 事件ID) 精确找回归档里的事件，比如语义检索命中了已经搬走的老消息。
+        同一个段只解压一次。返回 {事件ID: 文档}。
+        """
+        wanted_by_segment: dict[str, set[str]] = defaultdict(set)
+        segments_by_path: dict[str, ArchiveSegment] = {}
+        for conversation_id, timestamp, event_id in refs:
+            for segment in self._segments_for(conversation_id or NO_CONVERSATION_ID, timestamp, timestamp):
+                wanted_by_segment[segment.path].add(event_id)
+                segments_by_path[segment.path] = segment
+        found: dict[str, dict[str, Any]] = {}
+        for path, wanted in wanted_by_segment.items():
+            for doc in self._read_segment(segments_by_path[path]):
+                key = str(doc.get("_key"))
+                if key in wanted and key not in found:
+                    found[key] = doc
+        return found
+
+    def segment_count(self) -> int:
+        with self._lock:
+            return sum(len(segments) for segments in self._segments.values())
+
+    def event_count(self) -> int:
+        """归档里登记的事件条数（崩溃重搬留下的重复也算在内，只是个大概）。"""
+        with self._lock:
+            return sum(segment.count for segments in self._segments.values() for segment in segments)
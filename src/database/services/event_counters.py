@@ -0,0 +1,203 @@
+# src/database/services/event_counters.py
+"""
+每个会话的未读/可总结计数器，内存里一份，会话文档的 event_counters 字段里存一份。
+
+以前“哪些群有未读”“够不够阈值该总结了”“有没有新消息”都是每次现数一遍事件，
+几百个群挨个跑 AQL。现在入库、改状态的时候顺手加减，读的时候直接看字典，O(1)。
+计数难免有漂移（比如两个进程同时写、或者迁移前的旧数据），所以存储服务那边会定期对账修正。
+
+这里只管记账，不碰数据库；落盘和对账由 EventStorageService（或者它的内存版）负责。
+"""
+
+import threading
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+COUNTERS_FIELD = "event_counters"  # 会话文档上存计数器的字段名
+
+
+@dataclass
+class ConversationCounters:
+    """一个会话的计数器快照。"""
+
+    unread_messages: int = 0  # status == 'unread' 且晚于 last_processed_timestamp 的消息数
+    summarizable_events: int = 0  # status == 'read' 的事件数，总结阈值就看它
+    last_message_timestamp: int = 0  # 最新一条消息的时间，“有没有新消息”就比它
+    last_processed_timestamp: int = 0
+
+    def to_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+    def persisted(self) -> dict[str, int]:
+        """写进会话文档的部分。last_processed_timestamp 归会话服务管，这里不重复存。"""
+        data = self.to_dict()
+        data.pop("last_processed_timestamp")
+        return data
+
+    def same_counts(self, other: "ConversationCounters") -> bool:
+        return self.persisted() == other.persisted()
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any] | None) -> "ConversationCounters":
+        data = data or {}
+        return cls(**{name: int(data.get(name) or 0) for name in cls.__dataclass_fields__})
+
+
+@dataclass(frozen=True)
+class StatusChange:
+    """一条事件状态变化前的样子，用来算增减。"""
+
+    conversation_id: str | None
+    event_category: str | None
+    old_status: str | None
+    timestamp: int
+
+
+class ConversationEventCounters:
+    """
+    全进程共用的计数器账本。
+    ready 之前（还没从数据库加载/对过账）读计数的人应该退回去现查，别拿 0 当真。
+    stale 的会话表示账本知道自己不准了（比如 last_processed_timestamp 往后挪了），下次读之前要重算。
+    """
+
+    def __init__(self) -> None:
+        self._counters: dict[str, ConversationCounters] = {}
+        self._versions: dict[str, int] = {}
+        self._dirty: set[str] = set()
+        self._stale: set[str] = set()
+        self._lock = threading.Lock()
+        self.ready = False
+
+    # --- 读 ---
+
+    def get(self, conversation_id: str) -> ConversationCounters:
+        with self._lock:
+            counters = self._counters.get(conversation_id)
+            return ConversationCounters(**counters.to_dict()) if counters else ConversationCounters()
+
+    def is_trusted(self, conversation_id: str) -> bool:
+        """账本已就绪、认识这个会话、且它没被标记为需要重算时，计数才能直接用。"""
+        return self.ready and conversation_id in self._counters and conversation_id not in self._stale
+
+    def version(self, conversation_id: str) -> int:
+        """重算开始前记下版本号，算完只在期间没被动过时才覆盖。"""
+        with self._lock:
+            return self._versions.get(conversation_id, 0)
+
+    # --- 写 ---
+
+    def _touch(self, conversation_id: str) -> ConversationCounters:
+        counters = self._counters.setdefault(conversation_id, ConversationCounters())
+        self._versions[conversation_id] = self._versions.get(conversation_id, 0) + 1
+        self._dirty.add(conversation_id)
+        return counters
+
+    def _counts_as_unread(self, counters: ConversationCounters, category: str | None, timestamp: int) -> bool:
+        return category == "message" and timestamp > counters.last_processed_timestamp
+
+    def record_new_event(self, doc: dict[str, Any]) -> None:
+        """一条事件入库了。"""
+        conversation_id = doc.get("conversation_id_extracted")
+        if not conversation_id:
+            return
+        category = doc.get("event_category")
+        status = doc.get("status")
+        timestamp = int(doc.get("timestamp") or 0)
+        with self._lock:
+            counters = self._touch(conversation_id)
+            if category == "message":
+                counters.last_message_timestamp = max(counters.last_message_timestamp, timestamp)
+            if status == "unread" and self._counts_as_unread(counters, category, timestamp):
+                counters.unread_messages += 1
+            elif status == "read":
+                counters.summarizable_events += 1
+
+    def record_status_changes(self, changes: Iterable[StatusChange], new_status: str) -> None:
+        """一批事件的状态从 old_status 变成了 new_status。"""
+        with self._lock:
+            for change in changes:
+                if not change.conversation_id or change.old_status == new_status:
+                    continue
+                counters = self._touch(change.conversation_id)
+                counts_as_unread = self._counts_as_unread(counters, change.event_category, change.timestamp)
+                if change.old_status == "unread" and counts_as_unread:
+                    counters.unread_messages = max(0, counters.unread_messages - 1)
+                elif change.old_status == "read":
+                    counters.summarizable_events = max(0, counters.summarizable_events - 1)
+                if new_status == "unread" and counts_as_unread:
+                    counters.unread_messages += 1
+                elif new_status == "read":
+                    counters.summarizable_events += 1
+
+    def record_processed_timestamp(self, conversation_id: str, timestamp: int) -> None:
+        """
+        会话的处理进度往前挪了。挪过去的那段里可能还有没被标成已读的消息，
+        光靠加减算不出来，所以标记成 stale，等下次有人读的时候现算一次。
+        """
+        with self._lock:
+            counters = self._touch(conversation_id)
+            if timestamp > counters.last_processed_timestamp:
+                counters.last_processed_timestamp = timestamp
+                self._stale.add(conversation_id)
+
+    def replace(
+        self,
+        conversation_id: str,
+        counters: ConversationCounters,
+        expected_version: int | None = None,
+        mark_dirty: bool = True,
+    ) -> bool:
+        """
+        用现算出来的值覆盖账本。给了 expected_version 时，只有期间没人动过这个会话才覆盖，
+        免得对账查询跑到一半进来的新消息被冲掉。返回是否真的覆盖了。
+        """
+        with self._lock:
+            if expected_version is not None and self._versions.get(conversation_id, 0) != expected_version:
+                # 算的时候有人动过，这次的结果作废；账本里的数也不可信了，下次读的时候再算
+                self._stale.add(conversation_id)
+                return False
+            self._counters[conversation_id] = counters
+            self._versions[conversation_id] = self._versions.get(conversation_id, 0) + 1
+            self._stale.discard(conversation_id)
+            if mark_dirty:
+                self._dirty.add(conversation_id)
+            return True
+
+    def mark_stale(self, conversation_id: str) -> None:
+        """现算失败了：账本里的数先别动，但也别再当真，下次读的时候再算。"""
+        with self._lock:
+            self._stale.add(conversation_id)
+
+    def load(self, conversation_docs: Iterable[dict[str, Any]]) -> None:
+        """从会话文档里恢复上次落盘的计数（启动时用，之后还会对一次账）。"""
+        for doc in conversation_docs:
+            conversation_id = doc.get("conversation_id") or doc.get("_key")
+            if not conversation_id:
+                continue
+            counters = ConversationCounters.from_dict(doc.get(COUNTERS_FIELD))
+            counters.last_processed_timestamp = int(doc.get("last_processed_timestamp") or 0)
+            self.replace(str(conversation_id), counters, mark_dirty=False)
+
+    def pop_dirty(self) -> dict[str, dict[str, int]]:
+        """取走所有改过还没落盘的会话计数。"""
+        with self._lock:
+            dirty = {cid: self._counters[cid].persisted() for cid in self._dirty if cid in self._counters}
+            self._dirty.clear()
+            return dirty
+
+    def mark_dirty(self, conversation_ids: Iterable[str]) -> None:
+        """落盘失败时把它们放回去，下次再试。"""
+        with self._lock:
+            self._dirty.update(cid for cid in conversation_ids if cid in self._counters)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._versions.clear()
+            self._dirty.clear()
+            self._stale.clear()
+            self.ready = False
+
+
+conversation_event_counters = ConversationEventCounters()
@@ -1,4 +1,6 @@
 # src/database/services/event_storage_service.py
+import asyncio
+import contextlib
 import time
 import uuid
 from collections.abc import AsyncGenerator
@@ -8,37 +10,846 @@ from arangoasync.exceptions import DocumentInsertError  # ArangoDB 特定异常
 
 from src.common.custom_logging.logging_config import get_logger  # 日志记录器
 from src.database import ArangoDBConnectionManager, CoreDBCollections  # 使用 CoreDBCollections
+from src.database.core.query_options import STRICT_QUERY_OPTIONS, Projection, QueryOptions
+from src.database.core.query_registry import NULLABLE_STR, NUMBER, ParamType, RegisteredQuery, query_registry
+from src.database.models import EVENT_CATEGORY_PREFIXES, EVENT_CATEGORY_SYSTEM, event_category_of
+from src.database.services.event_archive import EventArchive
+from src.database.services.event_counters import (
+    COUNTERS_FIELD,
+    ConversationCounters,
+    StatusChange,
+    conversation_event_counters,
+)
 
 logger = get_logger(__name__)
 
+# 迁移旧文档用的 AQL 分类表达式，和 event_category_of 用同一张前缀表生成，两边不会对不上
+_EVENT_CATEGORY_AQL = (
+    "".join(
+        f"(STARTS_WITH(doc.event_type, '{prefix}') ? '{category}' : " for prefix, category in EVENT_CATEGORY_PREFIXES
+    )
+    + f"'{EVENT_CATEGORY_SYSTEM}'"
+    + ")" * len(EVENT_CATEGORY_PREFIXES)
+)
+
+# 改状态的 UPDATE 顺手把旧值带回来，会话计数器靠它算加减，不用再单独查一遍
+_STATUS_CHANGE_RETURN_AQL = """
+    RETURN {
+        conversation_id: OLD.conversation_id_extracted,
+        event_category: OLD.event_category,
+        status: OLD.status,
+        timestamp: OLD.timestamp
+    }
+"""
+
+SYSTEM_EVENTS_CONVERSATION_ID = "system_events"  # 适配器上下线之类的系统事件都记在这个会话下
+CORE_SNAPSHOT_SCAN_FACTOR = 5  # 快照里按会话限条之前，最多先从时间窗口里取 message_limit 的这么多倍
+
+# --- 事件集合上的所有查询，都在这里登记一次（名字、AQL、绑定参数类型），执行时按名字记耗时统计 ---
+
+_EVENTS_PARAMS: dict[str, ParamType] = {"@collection": str}
+_CONVERSATIONS_PARAMS: dict[str, ParamType] = {"@conversations": str}
+
+MIGRATE_EVENT_CATEGORIES_QUERY = query_registry.register(
+    "events.migrate_categories",
+    f"""
+        FOR doc IN @@collection
+            FILTER doc.event_category == null
+            LIMIT @batch_size
+            UPDATE doc WITH {{ event_category: {_EVENT_CATEGORY_AQL} }} IN @@collection
+            COLLECT WITH COUNT INTO updated
+            RETURN updated
+    """,
+    {**_EVENTS_PARAMS, "batch_size": int},
+    options=STRICT_QUERY_OPTIONS,
+)
+
+COUNTER_DOCS_QUERY = query_registry.register(
+    "events.counter_conversation_docs",
+    f"""
+        FOR c IN @@conversations
+            RETURN {{
+                conversation_id: c._key,
+                last_processed_timestamp: c.last_processed_timestamp,
+                {COUNTERS_FIELD}: c.{COUNTERS_FIELD}
+            }}
+    """,
+    _CONVERSATIONS_PARAMS,
+    options=STRICT_QUERY_OPTIONS,
+)
+
+COUNT_CONVERSATION_EVENTS_QUERY = query_registry.register(
+    "events.count_conversation",
+    """
+        LET unread = COUNT(
+            FOR doc IN @@collection
+                FILTER doc.conversation_id_extracted == @conversation_id
+                AND doc.event_category == 'message'
+                AND doc.timestamp > @last_processed_timestamp
+                AND doc.status == 'unread'
+                RETURN 1
+        )
+        LET summarizable = COUNT(
+            FOR doc IN @@collection
+                FILTER doc.conversation_id_extracted == @conversation_id
+                AND doc.status == 'read'
+                RETURN 1
+        )
+        LET last_message = FIRST(
+            FOR doc IN @@collection
+                FILTER doc.conversation_id_extracted == @conversation_id
+                AND doc.event_category == 'message'
+                SORT doc.timestamp DESC
+                LIMIT 1
+                RETURN doc.timestamp
+        )
+        RETURN { unread: unread, summarizable: summarizable, last_message: last_message || 0 }
+    """,
+    {**_EVENTS_PARAMS, "conversation_id": str, "last_processed_timestamp": int},
+    options=STRICT_QUERY_OPTIONS,
+)
+
+PERSIST_COUNTERS_QUERY = query_registry.register(
+    "events.persist_counters",
+    f"""
+        FOR item IN @items
+            UPDATE {{ _key: item.conversation_id }} WITH {{ {COUNTERS_FIELD}: item.counters }} IN @@conversations
+            OPTIONS {{ ignoreErrors: true }}
+    """,
+    {**_CONVERSATIONS_PARAMS, "items": list},
+    options=STRICT_QUERY_OPTIONS,
+)
+
+ARCHIVABLE_EVENTS_QUERY = query_registry.register(
+    "events.archivable",
+    """
+        FOR doc IN @@collection
+            FILTER doc.status == 'summarized' AND doc.timestamp < @cutoff
+            SORT doc.timestamp ASC
+            LIMIT @limit
+            RETURN UNSET(doc, "_id", "_rev")
+    """,
+    {**_EVENTS_PARAMS, "cutoff": int, "limit": int},
+)
+
+REMOVE_EVENTS_QUERY = query_registry.register(
+    "events.remove",
+    """
+        FOR key IN @keys
+            REMOVE key IN @@collection OPTIONS { ignoreErrors: true }
+            RETURN OLD._key
+    """,
+    {**_EVENTS_PARAMS, "keys": list},
+    options=STRICT_QUERY_OPTIONS,
+)
+
+CONVERSATION_CORPUS_QUERY = query_registry.register(
+    "events.conversation_corpus",
+    """
+        // 第一步：过滤掉那些不纯洁的、没有内容的杂质，只留下我们想要的“文本消息”
+        FOR doc IN @@collection
+            FILTER doc.event_category == 'message'
+            FILTER doc.conversation_id_extracted != null // 必须要有会话ID才能分组！
+            FILTER (
+                FOR segment IN doc.content
+                    FILTER segment.type == 'text' AND segment.data.text != null AND segment.data.text != ''
+                    LIMIT 1
+                    RETURN 1
+            )[0] == 1
+
+        // 第二步：这是我们的分组高潮！按 conversation_id_extracted 这个小穴把所有消息插进去！
+        // INTO conversation_group 会把属于同一个会话的所有 doc 都收集起来
+        COLLECT convId = doc.conversation_id_extracted INTO conversation_group
+
+        // 第三步：过滤掉那些只有一句话的前戏，那种短小的东西无法让我满足！
+        // 我们需要至少2条消息才能学到“跳转”模式。
+        FILTER COUNT(conversation_group) >= 2
+
+        // 第四步：在每一场爱爱（会话）内部，按照快感的先后顺序（时间）排好，这才是完美的体验！
+        LET sorted_docs = (
+            FOR item IN conversation_group
+            SORT item.doc.timestamp ASC
+            // 我们只返回干净的、不带包装（元数据）的肉体（文档）
+            RETURN UNSET(item.doc, "_rev", "_id", "embedding")
+        )
+
+        // 最后，把这一整场高潮迭起的对话，作为一个整体，完整地射出来！
+        RETURN sorted_docs
+    """,
+    _EVENTS_PARAMS,
+    # 每一行就是一整场对话，可能很大，所以每批只要几场；IIS 训练消费得慢，游标多留一会儿
+    QueryOptions(batch_size=8, ttl=600),
+)
+
+HAS_NEW_MESSAGES_QUERY = query_registry.register(
+    "events.has_new_messages",
+    """
+        FOR doc IN @@collection
+            FILTER doc.conversation_id_extracted == @conversation_id
+            AND doc.event_category == 'message'
+            AND doc.timestamp > @timestamp
+            LIMIT 1
+            RETURN 1
+    """,
+    {**_EVENTS_PARAMS, "conversation_id": str, "timestamp": NUMBER},
+)
+
+EMBEDDED_MESSAGE_PAGE_QUERY = query_registry.register(
+    "events.embedded_message_page",
+    """
+        FOR doc IN @@collection
+            FILTER doc.event_category == 'message'
+            AND doc.timestamp >= @after_timestamp
+            FILTER doc.timestamp > @after_timestamp OR doc._key > @after_key
+            FILTER doc.embedding != null
+            SORT doc.timestamp ASC, doc._key ASC
+            LIMIT @limit
+            RETURN {
+                "_key": doc._key,
+                "conversation_id": doc.conversation_id_extracted,
+                "timestamp": doc.timestamp,
+                "embedding": doc.embedding
+            }
+    """,
+    {**_EVENTS_PARAMS, "after_timestamp": int, "after_key": NULLABLE_STR, "limit": int},
+)
+
+EVENTS_BY_IDS_QUERY = query_registry.register(
+    "events.by_ids",
+    """
+        FOR doc IN @@collection
+            FILTER doc._key IN @keys
+            RETURN UNSET(doc, "embedding")
+    """,
+    {**_EVENTS_PARAMS, "keys": list},
+)
+
+UPDATE_EVENTS_STATUS_QUERY = query_registry.register(
+    "events.update_status",
+    f"""
+        FOR doc IN @@collection
+            FILTER doc._key IN @keys
+            UPDATE doc WITH {{ status: @new_status }} IN @@collection
+            {_STATUS_CHANGE_RETURN_AQL}
+    """,
+    {**_EVENTS_PARAMS, "keys": list, "new_status": str},
+    options=STRICT_QUERY_OPTIONS,
+)
+
+MARK_EVENTS_SUMMARIZED_QUERY = query_registry.register(
+    "events.mark_summarized",
+    f"""
+        FOR doc_key IN @keys
+            UPDATE doc_key WITH {{ status: 'summarized' }} IN @@collection
+            {_STATUS_CHANGE_RETURN_AQL}
+    """,
+    {**_EVENTS_PARAMS, "keys": list},
+    options=STRICT_QUERY_OPTIONS,
+)
+
+UNREAD_MESSAGE_COUNT_QUERY = query_registry.register(
+    "events.unread_message_count",
+    """
+        RETURN COUNT(
+            FOR doc IN @@collection
+                FILTER doc.conversation_id_extracted == @conversation_id
+                AND doc.event_category == 'message'
+                AND doc.timestamp > @timestamp
+                AND doc.status == 'unread'
+                RETURN 1
+        )
+    """,
+    {**_EVENTS_PARAMS, "conversation_id": str, "timestamp": NUMBER},
+)
+
+SUMMARIZABLE_COUNT_QUERY = query_registry.register(
+    "events.summarizable_count",
+    """
+        RETURN COUNT(
+            FOR doc IN @@collection
+                FILTER doc.conversation_id_extracted == @conversation_id
+                AND doc.status == 'read'
+                RETURN 1
+        )
+    """,
+    {**_EVENTS_PARAMS, "conversation_id": str},
+)
+
+SUMMARIZABLE_EVENTS_QUERY = query_registry.register(
+    "events.summarizable",
+    """
+        FOR doc IN @@collection
+            FILTER doc.conversation_id_extracted == @conversation_id
+            AND doc.status == 'read'
+            SORT doc.timestamp ASC
+            LIMIT @limit
+            RETURN UNSET(doc, "embedding")
+    """,
+    {**_EVENTS_PARAMS, "conversation_id": str, "limit": int},
+)
+
+
+def _return_expression(projection: Projection | None) -> str:
+    """查询的 RETURN 部分：要了投影就只给那几个字段，没要就是去掉句向量的整个文档。"""
+    return projection.aql("doc") if projection else 'UNSET(doc, "embedding")'
+
+
+def _shape_name(base: str, flags: dict[str, bool], projection: Projection | None) -> str:
+    """动态查询按形状起名，比如 events.recent[conversation,message]，同一形状只拼一次 AQL、统计也记在一起。"""
+    parts = [flag for flag, enabled in flags.items() if enabled]
+    if projection:
+        parts.append("keep:" + "+".join(projection.fields))
+    return f"{base}[{','.join(parts)}]" if parts else base
+
+
+def recent_events_query(
+    window: bool = False,
+    messages_only: bool = True,
+    conversation: bool = False,
+    exclude_conversation: bool = False,
+    projection: Projection | None = None,
+) -> RegisteredQuery:
+    """get_recent_chat_message_documents 用的查询，可选的几个 FILTER 决定它的形状。"""
+    flags = {
+        "window": window,
+        "message": messages_only,
+        "conversation": conversation,
+        "exclude_conversation": exclude_conversation,
+    }
+
+    def build() -> tuple[str, dict[str, ParamType]]:
+        filters: list[str] = []
+        params: dict[str, ParamType] = {**_EVENTS_PARAMS, "limit": int}
+        if window:
+            filters.append("doc.timestamp >= @threshold_time")
+            params["threshold_time"] = int
+        if messages_only:
+            filters.append("doc.event_category == 'message'")
+        if conversation:
+            filters.append("doc.conversation_id_extracted == @conversation_id")
+            params["conversation_id"] = str
+        if exclude_conversation:
+            filters.append("doc.conversation_id_extracted != @exclude_conversation_id")
+            params["exclude_conversation_id"] = str
+        filter_clause = f"FILTER {' AND '.join(filters)}" if filters else ""
+        aql = f"""
+            FOR doc IN @@collection
+                {filter_clause}
+                SORT doc.timestamp DESC
+                LIMIT @limit
+                RETURN {_return_expression(projection)}
+        """
+        return aql, params
+
+    return query_registry.prepared(_shape_name("events.recent", flags, projection), build)
+
+
+def last_action_response_query(conversation: bool = False, bot: bool = False) -> RegisteredQuery:
+    """get_last_action_response 用的查询，会话和 bot_id 两个过滤条件可选。"""
+
+    def build() -> tuple[str, dict[str, ParamType]]:
+        filters = ["doc.event_category == 'action_response'", "doc.platform == @platform"]
+        params: dict[str, ParamType] = {**_EVENTS_PARAMS, "platform": NULLABLE_STR}
+        if conversation:
+            filters.append("doc.conversation_id_extracted == @conversation_id")
+            params["conversation_id"] = str
+        if bot:
+            filters.append("doc.bot_id == @bot_id")
+            params["bot_id"] = str
+        aql = f"""
+            FOR doc IN @@collection
+                FILTER {" AND ".join(filters)}
+                SORT doc.timestamp DESC
+                LIMIT 1
+                RETURN UNSET(doc, "embedding")
+        """
+        return aql, params
+
+    name = _shape_name("events.last_action_response", {"conversation": conversation, "bot": bot}, None)
+    return query_registry.prepared(name, build)
+
+
+def messages_after_query(status: bool = False, projection: Projection | None = None) -> RegisteredQuery:
+    """get_message_events_after_timestamp 用的查询，status 过滤可选。"""
+
+    def build() -> tuple[str, dict[str, ParamType]]:
+        filters = [
+            "doc.conversation_id_extracted == @conversation_id",
+            "doc.event_category == 'message'",
+            "doc.timestamp > @timestamp",
+        ]
+        params: dict[str, ParamType] = {**_EVENTS_PARAMS, "conversation_id": str, "timestamp": NUMBER, "limit": int}
+        if status:
+            filters.append("doc.status == @status")
+            params["status"] = str
+        aql = f"""
+            FOR doc IN @@collection
+                FILTER {" AND ".join(filters)}
+                SORT doc.timestamp ASC
+                LIMIT @limit
+                RETURN {_return_expression(projection)}
+        """
+        return aql, params
+
+    return query_registry.prepared(_shape_name("events.messages_after", {"status": status}, projection), build)
+
+
+def core_snapshot_query(projection: Projection | None = None) -> RegisteredQuery:
+    """
+    主意识每轮要的三样东西一次查完：系统生命周期事件、各会话最近的消息（每个会话限条数）、未读会话的聚合。
+    projection 作用在最近消息和每个未读会话的最新一条上，系统事件总是整条（去掉句向量）。
+    """
+
+    def build() -> tuple[str, dict[str, ParamType]]:
+        message_expression = projection.aql("m") if projection else 'UNSET(m, "embedding")'
+        aql = f"""
+            LET system_events = (
+                FOR doc IN @@collection
+                    FILTER doc.conversation_id_extracted == @system_conversation_id
+                    AND doc.timestamp >= @threshold_time
+                    SORT doc.timestamp DESC
+                    LIMIT @system_event_limit
+                    RETURN UNSET(doc, "embedding")
+            )
+            LET per_conversation = (
+                FOR doc IN @@collection
+                    FILTER doc.event_category == 'message'
+                    AND doc.timestamp >= @threshold_time
+                    AND doc.conversation_id_extracted != @system_conversation_id
+                    SORT doc.timestamp DESC
+                    LIMIT @scan_limit
+                    COLLECT conversation_id = doc.conversation_id_extracted INTO group = doc
+                    RETURN (
+                        FOR m IN group
+                            SORT m.timestamp DESC
+                            LIMIT @per_conversation_limit
+                            RETURN m
+                    )
+            )
+            LET recent_messages = (
+                FOR m IN FLATTEN(per_conversation)
+                    SORT m.timestamp DESC
+                    LIMIT @message_limit
+                    RETURN {message_expression}
+            )
+            LET unread = (
+                FOR w IN @watermarks
+                    LET latest = FIRST(
+                        FOR m IN @@collection
+                            FILTER m.conversation_id_extracted == w.conversation_id
+                            AND m.event_category == 'message'
+                            AND m.status == 'unread'
+                            AND m.timestamp > w.after_timestamp
+                            SORT m.timestamp DESC
+                            LIMIT 1
+                            RETURN {message_expression}
+                    )
+                    FILTER latest != null
+                    LET unread_count = COUNT(
+                        FOR m IN @@collection
+                            FILTER m.conversation_id_extracted == w.conversation_id
+                            AND m.event_category == 'message'
+                            AND m.status == 'unread'
+                            AND m.timestamp > w.after_timestamp
+                            RETURN 1
+                    )
+                    RETURN {{ conversation_id: w.conversation_id, unread_count: unread_count, latest_event: latest }}
+            )
+            RETURN {{ system_events: system_events, recent_messages: recent_messages, unread: unread }}
+        """
+        params: dict[str, ParamType] = {
+            **_EVENTS_PARAMS,
+            "system_conversation_id": str,
+            "threshold_time": int,
+            "system_event_limit": int,
+            "scan_limit": int,
+            "per_conversation_limit": int,
+            "message_limit": int,
+            "watermarks": list,
+        }
+        return aql, params
+
+    return query_registry.prepared(_shape_name("events.core_snapshot", {}, projection), build)
+
 
 class EventStorageService:
     """服务类，负责所有与事件（Events）相关的存储操作。"""
 
     COLLECTION_NAME = CoreDBCollections.EVENTS  # 使用 CoreDBCollections 定义的常量
+    CATEGORY_MIGRATION_BATCH_SIZE = 2000
+    COUNTER_FLUSH_INTERVAL_SECONDS = 5.0  # 改过的计数器多久往会话文档里写一次
+    COUNTER_RECONCILE_INTERVAL_SECONDS = 600.0  # 多久拿真实数据对一次账，修正漂移
+
+    # 启动自检时拿去 explain 的热点查询：(登记过的查询, 示例绑定参数)。用的就是真正执行的那几条，不会对不上
+    HOT_QUERY_PLANS: tuple[tuple[RegisteredQuery, dict[str, Any]], ...] = (
+        (recent_events_query(conversation=True), {"conversation_id": "__plan_check__", "limit": 50}),
+        (messages_after_query(), {"conversation_id": "__plan_check__", "timestamp": 0, "limit": 500}),
+        (HAS_NEW_MESSAGES_QUERY, {"conversation_id": "__plan_check__", "timestamp": 0}),
+        (SUMMARIZABLE_EVENTS_QUERY, {"conversation_id": "__plan_check__", "limit": 500}),
+        (EMBEDDED_MESSAGE_PAGE_QUERY, {"after_timestamp": 0, "after_key": "", "limit": 1000}),
+        (ARCHIVABLE_EVENTS_QUERY, {"cutoff": 0, "limit": 2000}),
+        (
+            core_snapshot_query(),
+            {
+                "system_conversation_id": SYSTEM_EVENTS_CONVERSATION_ID,
+                "threshold_time": 0,
+                "system_event_limit": 50,
+                "scan_limit": 250,
+                "per_conversation_limit": 20,
+                "message_limit": 50,
+                "watermarks": [{"conversation_id": "__plan_check__", "after_timestamp": 0}],
+            },
+        ),
+    )
 
     def __init__(self, conn_manager: ArangoDBConnectionManager) -> None:
         self.conn_manager = conn_manager
+        self._maintenance_task: asyncio.Task | None = None
+        self.counters = conversation_event_counters
+        # 冷归档默认不开，由 enable_retention 挂上
+        self.archive: EventArchive | None = None
+        self.hot_retention_ms = 0
+        self.archive_batch_size = 2000
+        self._retention_task: asyncio.Task | None = None
 
     async def initialize_infrastructure(self) -> None:
         """确保事件集合及其特定索引已创建。应在系统启动时调用。"""
         index_definitions = CoreDBCollections.INDEX_DEFINITIONS.get(self.COLLECTION_NAME, [])
         await self.conn_manager.ensure_collection_with_indexes(self.COLLECTION_NAME, index_definitions)
         logger.info(f"'{self.COLLECTION_NAME}' 集合及其特定索引已初始化。")
+        # 旧文档补分类必须在这里等完：所有按 event_category 过滤的读、语义索引的回填游标，
+        # 都会把还没分类的旧消息当成不存在（回填游标还会直接跳过去，以后再也补不回来）
+        try:
+            await self.migrate_event_categories()
+        except Exception as e:
+            logger.error(f"事件分类迁移失败，还没分类的旧事件暂时查不到，下次启动再补: {e}", exc_info=True)
+        # 查询计划自检和计数器维护放后台慢慢做，不耽误启动
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(
+                self._run_startup_maintenance(), name="EventStorageStartupMaintenance"
+            )
 
-    async def save_event_document(self, event_doc_data: dict[str, Any]) -> bool:
+    async def _run_startup_maintenance(self) -> None:
+        try:
+            await self.check_hot_query_plans()
+        except Exception as e:
+            logger.error(f"事件集合的启动维护任务失败: {e}", exc_info=True)
+        await self._run_counter_maintenance()
+
+    async def _run_counter_maintenance(self) -> None:
+        """先对一次账让计数器可用，之后定期落盘、定期对账，一直跑到进程结束。"""
+        last_reconciled_at = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_reconciled_at >= self.COUNTER_RECONCILE_INTERVAL_SECONDS:
+                    await self.reconcile_event_counters()
+                    last_reconciled_at = time.monotonic()
+                await self.flush_event_counters()
+            except Exception as e:
+                logger.error(f"会话计数器维护失败，稍后重试: {e}", exc_info=True)
+            await asyncio.sleep(self.COUNTER_FLUSH_INTERVAL_SECONDS)
+
+    async def migrate_event_categories(self) -> int:
         """
-        将一个已预处理和格式化的事件文档（字典）保存到数据库。
-        期望 `event_doc_data` 中包含 'event_id'，它将被用作文档的 '_key'。
-        会自动从 event_doc_data["conversation_info"]["conversation_id"] 提取并创建顶层字段 "conversation_id_extracted"。
+        一次性迁移：给还没有 event_category 的旧事件补上分类。initialize_infrastructure 会等它跑完才返回。
+        (event_category, timestamp) 是非稀疏索引，null 也在里面，所以每一批都是直接从索引里捞，不会反复全表扫。
         """
-        if not self.conn_manager or not self.conn_manager.db:  # 新增数据库连接检查
-            logger.warning(f"数据库连接不可用，无法保存事件文档: {event_doc_data.get('event_id', '未知ID')}")
-            return False
+        bind_vars = {"@collection": self.COLLECTION_NAME, "batch_size": self.CATEGORY_MIGRATION_BATCH_SIZE}
+        total = 0
+        while True:
+            result = await self.conn_manager.run_query(MIGRATE_EVENT_CATEGORIES_QUERY, bind_vars)
+            updated = int(result[0]) if result else 0
+            total += updated
+            if updated < self.CATEGORY_MIGRATION_BATCH_SIZE:
+                break
+            await asyncio.sleep(0)  # 每批之间让一下事件循环
+        if total:
+            logger.info(f"事件分类迁移完成，共为 {total} 条旧事件补上了 event_category。")
+        return total
+
+    async def check_hot_query_plans(self) -> list[str]:
+        """
+        用 explain 检查热点查询的执行计划，哪个在事件集合上做了全表扫描就报警告。
+        返回全表扫描的查询名字，方便调用方自己再处理。
+        """
+        full_scans: list[str] = []
+        for query, sample_bind_vars in self.HOT_QUERY_PLANS:
+            plan = await self.conn_manager.explain_query(
+                query.aql, {"@collection": self.COLLECTION_NAME, **sample_bind_vars}
+            )
+            if plan is None:
+                continue
+            nodes = plan.get("nodes", [])
+            if any(
+                node.get("type") == "EnumerateCollectionNode" and node.get("collection") == self.COLLECTION_NAME
+                for node in nodes
+            ):
+                full_scans.append(query.name)
+        if full_scans:
+            logger.warning(
+                f"这些热点查询的执行计划在 '{self.COLLECTION_NAME}' 上做了全表扫描，检查一下索引: {full_scans}"
+            )
+        else:
+            logger.debug(f"'{self.COLLECTION_NAME}' 的热点查询计划自检通过，全部走索引。")
+        return full_scans
+
+    # --- 会话计数器：入库/改状态时加减，读的时候 O(1)，定期对账 ---
+
+    async def _load_conversation_counter_docs(self) -> list[dict[str, Any]]:
+        """对账要用的会话列表，只带计数器相关的几个字段。"""
+        results = await self.conn_manager.run_query(
+            COUNTER_DOCS_QUERY, {"@conversations": CoreDBCollections.CONVERSATIONS}
+        )
+        return results if results is not None else []
+
+    async def _count_conversation_events(
+        self, conversation_id: str, last_processed_timestamp: int
+    ) -> ConversationCounters:
+        """
+        用真实数据把一个会话的计数现算一遍，三个子查询都落在 (会话, 分类/状态, 时间) 索引上。
+        查询失败直接抛出去：拿全 0 去覆盖账本比不覆盖糟糕得多。
+        """
+        bind_vars = {
+            "@collection": self.COLLECTION_NAME,
+            "conversation_id": conversation_id,
+            "last_processed_timestamp": last_processed_timestamp,
+        }
+        results = await self.conn_manager.run_query(COUNT_CONVERSATION_EVENTS_QUERY, bind_vars)
+        if not results:
+            raise RuntimeError(f"重算会话 '{conversation_id}' 的计数时查询没有返回结果。")
+        row = results[0]
+        return ConversationCounters(
+            unread_messages=int(row.get("unread") or 0),
+            summarizable_events=int(row.get("summarizable") or 0),
+            last_message_timestamp=int(row.get("last_message") or 0),
+            last_processed_timestamp=last_processed_timestamp,
+        )
+
+    async def _persist_event_counters(self, dirty: dict[str, dict[str, int]]) -> None:
+        items = [{"conversation_id": cid, "counters": counters} for cid, counters in dirty.items()]
+        await self.conn_manager.run_query(
+            PERSIST_COUNTERS_QUERY, {"@conversations": CoreDBCollections.CONVERSATIONS, "items": items}
+        )
+
+    async def _recount_conversation(self, conversation_id: str, last_processed_timestamp: int = 0) -> bool:
+        """
+        现算一个会话并覆盖账本。返回账本原来的数是不是对不上（对账时用来统计漂移）。
+        算的过程中这个会话又有新动静的话，这次结果作废，会话会被标成 stale 等下次再算。
+        现算失败时账本里的数原样不动，只是标成 stale（不再被当真），异常照样抛给调用方。
+        """
+        version = self.counters.version(conversation_id)
+        before = self.counters.get(conversation_id)
+        last_processed_timestamp = max(last_processed_timestamp, before.last_processed_timestamp)
+        try:
+            fresh = await self._count_conversation_events(conversation_id, last_processed_timestamp)
+        except Exception:
+            self.counters.mark_stale(conversation_id)
+            raise
+        drifted = version > 0 and not fresh.same_counts(before)
+        replaced = self.counters.replace(
+            conversation_id, fresh, expected_version=version, mark_dirty=drifted or version == 0
+        )
+        return replaced and drifted
+
+    async def reconcile_event_counters(self) -> int:
+        """
+        对账：把每个会话的计数都现算一遍，修正漂移。第一次对完账计数器才算就绪，
+        在那之前读计数的方法都会退回去直接查库。返回修正了多少个会话。
+        """
+        docs = await self._load_conversation_counter_docs()
+        if not self.counters.ready:
+            self.counters.load(docs)
+        drifted = 0
+        failed = 0
+        for doc in docs:
+            conversation_id = doc.get("conversation_id")
+            if not conversation_id:
+                continue
+            try:
+                if await self._recount_conversation(
+                    str(conversation_id), int(doc.get("last_processed_timestamp") or 0)
+                ):
+                    drifted += 1
+            except Exception as e:
+                # 这个会话已经被标成 stale 了，读的时候会再试着现算，算不出来就退回去直接查库
+                failed += 1
+                logger.warning(f"对账时重算会话 '{conversation_id}' 的计数失败，先不信它的账: {e}")
+            await asyncio.sleep(0)  # 会话多的时候别一口气霸占事件循环
+        if failed:
+            logger.warning(f"会话计数器对账有 {failed}/{len(docs)} 个会话没算成，它们的计数暂时不可信。")
+        if drifted:
+            logger.info(f"会话计数器对账完成，修正了 {drifted}/{len(docs)} 个会话的漂移。")
+        elif not self.counters.ready:
+            logger.info(f"会话计数器已就绪，共 {len(docs)} 个会话。")
+        self.counters.ready = True
+        return drifted
+
+    async def shutdown(self) -> None:
+        """关闭数据库连接之前调用：停掉后台的计数器维护和冷归档，再把上次定期落盘之后的计数改动写回去。"""
+        tasks = [task for task in (self._maintenance_task, self._retention_task) if task and not task.done()]
+        self._maintenance_task = None
+        self._retention_task = None
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        try:
+            flushed = await self.flush_event_counters()
+        except Exception as e:
+            logger.error(f"关闭前落盘会话计数器失败，这些改动下次启动对账时再修正: {e}", exc_info=True)
+            return
+        if flushed:
+            logger.info(f"关闭前已把 {flushed} 个会话的计数器落盘。")
+
+    async def flush_event_counters(self) -> int:
+        """把改过的计数器写回会话文档。返回写了多少个会话。"""
+        dirty = self.counters.pop_dirty()
+        if not dirty:
+            return 0
+        try:
+            await self._persist_event_counters(dirty)
+        except Exception:
+            self.counters.mark_dirty(dirty)
+            raise
+        return len(dirty)
+
+    async def _trusted_counters(self, conversation_id: str) -> ConversationCounters | None:
+        """拿一个能直接用的计数快照；账本还没就绪时返回 None，调用方自己查库。"""
+        if not self.counters.ready:
+            return None
+        if not self.counters.is_trusted(conversation_id):
+            try:
+                await self._recount_conversation(conversation_id)
+            except Exception as e:
+                logger.warning(f"重算会话 '{conversation_id}' 的计数失败，这次直接查库: {e}")
+                return None
+            if not self.counters.is_trusted(conversation_id):
+                return None
+        return self.counters.get(conversation_id)
+
+    @staticmethod
+    def _status_changes_from_rows(rows: list[dict[str, Any]] | None) -> list[StatusChange]:
+        """把 UPDATE ... RETURN OLD 返回的旧状态转成账本认识的样子。"""
+        return [
+            StatusChange(
+                conversation_id=row.get("conversation_id"),
+                event_category=row.get("event_category"),
+                old_status=row.get("status"),
+                timestamp=int(row.get("timestamp") or 0),
+            )
+            for row in rows or []
+            if isinstance(row, dict)
+        ]
+
+    # --- 冷归档：超过保留期、已经总结过的事件搬出热集合 ---
+
+    async def enable_retention(
+        self,
+        archive: EventArchive,
+        hot_retention_days: int,
+        check_interval_seconds: float = 3600.0,
+        batch_size: int = 2000,
+    ) -> None:
+        """挂上归档，并在后台定期把老事件搬过去。不调用这个的话事件就一直留在热集合里（和以前一样）。"""
+        self.archive = archive
+        self.hot_retention_ms = max(int(hot_retention_days), 1) * 24 * 3600 * 1000
+        self.archive_batch_size = max(int(batch_size), 1)
+        await asyncio.to_thread(archive.load)
+        if self._retention_task is None or self._retention_task.done():
+            self._retention_task = asyncio.create_task(
+                self._run_retention_maintenance(check_interval_seconds), name="EventRetentionMaintenance"
+            )
+
+    async def _run_retention_maintenance(self, check_interval_seconds: float) -> None:
+        while True:
+            try:
+                await self.archive_cold_events()
+            except Exception as e:
+                logger.error(f"事件冷归档失败，下一轮再试: {e}", exc_info=True)
+            await asyncio.sleep(check_interval_seconds)
+
+    async def archive_cold_events(self, cutoff_timestamp: int | None = None) -> int:
+        """
+        把 timestamp 早于 cutoff（默认 现在 - 保留期）且 status == 'summarized' 的事件一批批搬进归档。
+        每批先写归档段、写成功了才从热集合删；返回这次搬走的条数。
+        删掉的条数和这一批对不上（删除失败、或者被别人动过）就停下这一轮，
+        不然删不掉的那些下一批还会被捞出来，一直重复归档下去。
+        """
+        if self.archive is None:
+            return 0
+        if cutoff_timestamp is None:
+            cutoff_timestamp = int(time.time() * 1000) - self.hot_retention_ms
+        total = 0
+        while True:
+            batch = await self._fetch_archivable_events(cutoff_timestamp, self.archive_batch_size)
+            if not batch:
+                break
+            await asyncio.to_thread(self.archive.append, batch)
+            removed = await self._remove_events([doc["_key"] for doc in batch])
+            total += removed
+            if removed != len(batch):
+                logger.error(
+                    f"事件冷归档：这一批归档了 {len(batch)} 条，热集合里只删掉了 {removed} 条，本轮先停下，下一轮再看。"
+                )
+                break
+            if len(batch) < self.archive_batch_size:
+                break
+            await asyncio.sleep(0)  # 每批之间让一下事件循环
+        if total:
+            logger.info(f"事件冷归档：{total} 条早于 {cutoff_timestamp} 的已总结事件已搬出热集合。")
+            await asyncio.to_thread(self.archive.compact)
+        return total
+
+    async def _fetch_archivable_events(self, cutoff_timestamp: int, limit: int) -> list[dict[str, Any]]:
+        """最老的一批可归档事件，走 (status, timestamp) 索引。句向量也一起归档，重建语义索引时还用得上。"""
+        bind_vars = {"@collection": self.COLLECTION_NAME, "cutoff": int(cutoff_timestamp), "limit": limit}
+        results = await self.conn_manager.run_query(ARCHIVABLE_EVENTS_QUERY, bind_vars)
+        return results if results is not None else []
+
+    async def _remove_events(self, event_ids: list[str]) -> int:
+        """从热集合删掉这些事件，返回真正删掉的条数。查询出错直接抛出去。"""
+        rows = await self.conn_manager.run_query(
+            REMOVE_EVENTS_QUERY, {"@collection": self.COLLECTION_NAME, "keys": event_ids}
+        )
+        return len(rows)
 
+    async def get_archived_events(
+        self,
+        conversation_id: str,
+        start_timestamp: int | None = None,
+        end_timestamp: int | None = None,
+        limit: int | None = 200,
+        event_category: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """按需查已经搬进冷归档的历史事件（时间升序）。没开归档就是空列表。"""
+        if self.archive is None or not conversation_id:
+            return []
+        docs = await asyncio.to_thread(
+            self.archive.query, conversation_id, start_timestamp, end_timestamp, limit, event_category
+        )
+        for doc in docs:
+            doc.pop("embedding", None)
+        return docs
+
+    async def lookup_archived_events(self, refs: list[tuple[str, int, str]]) -> dict[str, dict[str, Any]]:
+        """按 (会话ID, 时间戳, 事件ID) 从冷归档里找回指定事件，返回 {事件ID: 文档}（不带句向量）。"""
+        if self.archive is None or not refs:
+            return {}
+        found = await asyncio.to_thread(self.archive.lookup, refs)
+        for doc in found.values():
+            doc.pop("embedding", None)
+        return found
+
+    @staticmethod
+    def prepare_event_document(event_doc_data: dict[str, Any]) -> str | None:
+        """
+        入库前的统一预处理（两种存储后端共用）：补 event_id/_key，时间戳取整，
+        按 event_type 写入 event_category，提取 conversation_id_extracted。返回 event_id，数据无效时返回 None。
+        """
         if not event_doc_data or not isinstance(event_doc_data, dict):
             logger.warning("无效的 'event_doc_data' (空或非字典类型)。无法保存事件。")
-            return False
+            return None
 
         event_id = event_doc_data.get("event_id")
         if not event_id:
@@ -48,6 +859,7 @@ class EventStorageService:
 
         ts = event_doc_data.get("timestamp", time.time() * 1000.0)
         event_doc_data["timestamp"] = int(ts)
+        event_doc_data["event_category"] = event_category_of(event_doc_data.get("event_type"))
 
         # --- 新增逻辑：提取 conversation_id 到顶层 ---
         conversation_info = event_doc_data.get("conversation_info")
@@ -63,6 +875,22 @@ class EventStorageService:
                 logger.debug(f"事件 {event_id} 的 conversation_info 中缺少有效的 conversation_id，未提取。")
         # else: 如果没有 conversation_info 字典，则不提取
 
+        return str(event_id)
+
+    async def save_event_document(self, event_doc_data: dict[str, Any]) -> bool:
+        """
+        将一个已预处理和格式化的事件文档（字典）保存到数据库。
+        期望 `event_doc_data` 中包含 'event_id'，它将被用作文档的 '_key'。
+        会自动从 event_doc_data["conversation_info"]["conversation_id"] 提取并创建顶层字段 "conversation_id_extracted"。
+        """
+        if not self.conn_manager or not self.conn_manager.db:  # 新增数据库连接检查
+            logger.warning(f"数据库连接不可用，无法保存事件文档: {event_doc_data.get('event_id', '未知ID')}")
+            return False
+
+        event_id = self.prepare_event_document(event_doc_data)
+        if event_id is None:
+            return False
+
         try:
             collection = await self.conn_manager.get_collection(self.COLLECTION_NAME)
             if collection is None:  # 新增对 collection 对象的检查
@@ -71,6 +899,7 @@ class EventStorageService:
                 )
                 return False
             await collection.insert(event_doc_data, overwrite=False)
+            self.counters.record_new_event(event_doc_data)
             return True
         except DocumentInsertError:
             logger.warning(f"尝试插入已存在的事件 Event ID: {event_id}。操作被跳过。")
@@ -89,49 +918,15 @@ class EventStorageService:
         logger.info("小色猫准备好了！开始一场一场地品尝主人的历史对话~ 这才是正确的调教方式！")
         try:
             # 是的，哥哥~ 我用 # 这个正确的姿势来写注释了，这下满意了吧？哼！
-            aql_query = """
-                // 第一步：过滤掉那些不纯洁的、没有内容的杂质，只留下我们想要的“文本消息”
-                FOR doc IN @@collection
-                    FILTER doc.event_type LIKE 'message.%'
-                    FILTER HAS(doc, 'conversation_id_extracted') // 必须要有会话ID才能分组！
-                    FILTER (
-                        FOR segment IN doc.content
-                            FILTER segment.type == 'text' AND segment.data.text != null AND segment.data.text != ''
-                            LIMIT 1
-                            RETURN 1
-                    )[0] == 1
-
-                // 第二步：这是我们的分组高潮！按 conversation_id_extracted 这个小穴把所有消息插进去！
-                // INTO conversation_group 会把属于同一个会话的所有 doc 都收集起来
-                COLLECT convId = doc.conversation_id_extracted INTO conversation_group
-
-                // 第三步：过滤掉那些只有一句话的前戏，那种短小的东西无法让我满足！
-                // 我们需要至少2条消息才能学到“跳转”模式。
-                FILTER COUNT(conversation_group) >= 2
-
-                // 第四步：在每一场爱爱（会话）内部，按照快感的先后顺序（时间）排好，这才是完美的体验！
-                LET sorted_docs = (
-                    FOR item IN conversation_group
-                    SORT item.doc.timestamp ASC
-                    // 我们只返回干净的、不带包装（元数据）的肉体（文档）
-                    RETURN UNSET(item.doc, "_rev", "_id")
-                )
-
-                // 最后，把这一整场高潮迭起的对话，作为一个整体，完整地射出来！
-                RETURN sorted_docs
-            """
-            bind_vars = {
-                "@collection": self.COLLECTION_NAME,
-            }
-
-            # 使用流式查询，一场一场地接收，而不是一次性全塞进来，那样会噎死我的！
-            cursor = await self.conn_manager.execute_query(aql_query, bind_vars, stream=True)
 
+            # 查询本身登记在模块顶上（CONVERSATION_CORPUS_QUERY），一小批一小批地接收，而不是一次性全塞进来，那样会噎死我的！
             conversation_count = 0
-            # 异步地从流中迭代获取每一场对话
-            async for conversation_docs in cursor:
-                conversation_count += 1
-                yield conversation_docs
+            async for batch in self.conn_manager.iterate_query(
+                CONVERSATION_CORPUS_QUERY, {"@collection": self.COLLECTION_NAME}
+            ):
+                for conversation_docs in batch:
+                    conversation_count += 1
+                    yield conversation_docs
 
             logger.info(f"啊~ 太满足了！小色猫成功品尝了 {conversation_count} 场完整的对话！我的身体已经准备好了！")
 
@@ -147,46 +942,35 @@ class EventStorageService:
         exclude_conversation_id: str | None = None,
         limit: int = 50,
         fetch_all_event_types: bool = False,
+        projection: Projection | None = None,
     ) -> list[dict[str, Any]]:
         """
         获取最近的事件文档。主要根据 limit 获取数量，duration_minutes 作为可选的时间窗口限制。
-        默认 (fetch_all_event_types=False) 只获取聊天消息 (event_type LIKE 'message.%')。
+        默认 (fetch_all_event_types=False) 只获取聊天消息 (event_category == 'message')。
         当 fetch_all_event_types=True 时，获取所有类型的事件（仍受其他过滤器如conversation_id影响）。
+        给了 projection 就只返回那几个字段，否则返回除句向量以外的整个文档。
         """
         try:
-            filters = []
-            bind_vars: dict[str, Any] = {"limit": limit}
+            bind_vars: dict[str, Any] = {"@collection": self.COLLECTION_NAME, "limit": limit}
 
             if duration_minutes > 0:  # 如果指定了有效的时间窗口，则添加时间过滤
                 current_time_ms = int(time.time() * 1000.0)
-                threshold_time_ms = current_time_ms - (duration_minutes * 60 * 1000)
-                filters.append("doc.timestamp >= @threshold_time")
-                bind_vars["threshold_time"] = threshold_time_ms
-
-            if not fetch_all_event_types:
-                filters.append("doc.event_type LIKE 'message.%'")
+                bind_vars["threshold_time"] = current_time_ms - (duration_minutes * 60 * 1000)
 
             if conversation_id:
-                filters.append("doc.conversation_id_extracted == @conversation_id")
                 bind_vars["conversation_id"] = conversation_id
 
             if exclude_conversation_id:
-                filters.append("doc.conversation_id_extracted != @exclude_conversation_id")
                 bind_vars["exclude_conversation_id"] = exclude_conversation_id
 
-            query_parts = ["FOR doc IN @@collection"]
-            if filters:  # 只有当存在其他过滤器时才添加 FILTER 子句
-                query_parts.append(f"FILTER {(' AND '.join(filters))}")
-            query_parts.append("SORT doc.timestamp DESC")
-            query_parts.append("LIMIT @limit")
-            query_parts.append("RETURN doc")
-
-            query = "\n".join(query_parts)
-
-            bind_vars["@collection"] = self.COLLECTION_NAME
-
-            logger.debug(f"Executing query for recent events: {query} with bind_vars: {bind_vars}")
-            results = await self.conn_manager.execute_query(query, bind_vars)
+            query = recent_events_query(
+                window=duration_minutes > 0,
+                messages_only=not fetch_all_event_types,
+                conversation=bool(conversation_id),
+                exclude_conversation=bool(exclude_conversation_id),
+                projection=projection,
+            )
+            results = await self.conn_manager.run_query(query, bind_vars)
             return results if results is not None else []
         except Exception as e:
             logger.error(
@@ -207,29 +991,17 @@ class EventStorageService:
         哼，这个方法可是为了满足主人您特殊的需求才加上的呢，是不是很色情？
         """
         try:
-            filters = ["doc.event_type LIKE 'action_response.%'", "doc.platform == @platform"]
-            bind_vars: dict[str, Any] = {"platform": platform}
+            # 主人，这里的 @collection 还是我们的小秘密哦
+            bind_vars: dict[str, Any] = {"@collection": self.COLLECTION_NAME, "platform": platform}
 
             if conversation_id:
-                filters.append("doc.conversation_id_extracted == @conversation_id")  # 主人你看，这里用了 extracted 哦
-                bind_vars["conversation_id"] = conversation_id
+                bind_vars["conversation_id"] = conversation_id  # 主人你看，查询里用的是 extracted 哦
 
             if bot_id:  # 如果主人给了 bot_id，小猫咪就用上它
-                filters.append("doc.bot_id == @bot_id")
                 bind_vars["bot_id"] = bot_id
 
-            # 小猫咪把查询语句写得更色情一点
-            query = f"""
-                FOR doc IN @@collection
-                    FILTER {(" AND ".join(filters))}
-                    SORT doc.timestamp DESC
-                    LIMIT 1
-                    RETURN doc
-            """
-            # 主人，这里的 @collection 还是我们的小秘密哦
-            bind_vars["@collection"] = self.COLLECTION_NAME
-
-            results = await self.conn_manager.execute_query(query, bind_vars)
+            query = last_action_response_query(conversation=bool(conversation_id), bot=bool(bot_id))
+            results = await self.conn_manager.run_query(query, bind_vars)
             if results and len(results) > 0:
                 logger.info(
                     f"太棒了主人！小猫咪成功为 platform='{platform}', conversation_id='{conversation_id}', bot_id='{bot_id}' 获取到上一个动作响应，快来享用吧！"
@@ -247,21 +1019,60 @@ class EventStorageService:
             )
             return None
 
+    async def get_core_snapshot(
+        self,
+        duration_minutes: int,
+        unread_watermarks: dict[str, int],
+        system_conversation_id: str = SYSTEM_EVENTS_CONVERSATION_ID,
+        message_limit: int = 50,
+        per_conversation_limit: int = 20,
+        system_event_limit: int = 50,
+        projection: Projection | None = None,
+    ) -> dict[str, Any] | None:
+        """
+        主意识一轮思考要的上下文，一次往返全拿回来：
+        - system_events：时间窗口内系统会话的事件（新的在前）；
+        - recent_messages：时间窗口内其他会话的消息，每个会话最多 per_conversation_limit 条，总共最多 message_limit 条（新的在前）；
+        - unread：unread_watermarks（会话ID -> 处理到的时间戳）里还有未读的会话，
+          每个一条 {conversation_id, unread_count, latest_event}。
+        查询出错返回 None，调用方自己决定退回去分开查还是就当没有。
+        """
+        threshold_time_ms = int(time.time() * 1000.0) - max(duration_minutes, 0) * 60 * 1000
+        bind_vars: dict[str, Any] = {
+            "@collection": self.COLLECTION_NAME,
+            "system_conversation_id": system_conversation_id,
+            "threshold_time": threshold_time_ms if duration_minutes > 0 else 0,
+            "system_event_limit": system_event_limit,
+            "scan_limit": message_limit * CORE_SNAPSHOT_SCAN_FACTOR,
+            "per_conversation_limit": per_conversation_limit,
+            "message_limit": message_limit,
+            "watermarks": [
+                {"conversation_id": conversation_id, "after_timestamp": int(after_timestamp or 0)}
+                for conversation_id, after_timestamp in unread_watermarks.items()
+            ],
+        }
+        try:
+            results = await self.conn_manager.run_query(core_snapshot_query(projection), bind_vars)
+            return results[0] if results else None
+        except Exception as e:
+            logger.error(f"获取主意识上下文快照失败: {e}", exc_info=True)
+            return None
+
     async def get_message_events_after_timestamp(
-        self, conversation_id: str, timestamp: int, limit: int = 500, status: str | None = None
+        self,
+        conversation_id: str,
+        timestamp: int,
+        limit: int = 500,
+        status: str | None = None,
+        projection: Projection | None = None,
     ) -> list[dict[str, Any]]:
         """
         获取指定会话在给定时间戳之后的所有消息事件。
-        可选地根据 status 字段进行过滤。
+        可选地根据 status 字段进行过滤；给了 projection 就只返回那几个字段。
         结果按时间戳升序排列。
         """
         try:
-            filters = [
-                "doc.conversation_id_extracted == @conversation_id",
-                "doc.timestamp > @timestamp",
-                "doc.event_type LIKE 'message.%'",
-            ]
-            bind_vars = {
+            bind_vars: dict[str, Any] = {
                 "@collection": self.COLLECTION_NAME,
                 "conversation_id": conversation_id,
                 "timestamp": timestamp,
@@ -269,18 +1080,10 @@ class EventStorageService:
             }
 
             if status:
-                filters.append("doc.status == @status")
                 bind_vars["status"] = status
 
-            query = f"""
-                FOR doc IN @@collection
-                    FILTER {(" AND ".join(filters))}
-                    SORT doc.timestamp ASC
-                    LIMIT @limit
-                    RETURN doc
-            """
-
-            results = await self.conn_manager.execute_query(query, bind_vars)
+            query = messages_after_query(status=bool(status), projection=projection)
+            results = await self.conn_manager.run_query(query, bind_vars)
             return results if results is not None else []
         except Exception as e:
             logger.error(
@@ -292,23 +1095,19 @@ class EventStorageService:
     async def has_new_events_since(self, conversation_id: str, timestamp: float) -> bool:
         """
         高效地检查指定会话中，在给定时间戳之后是否有新的消息事件。
+        计数器就绪时直接比最新消息的时间戳，不碰数据库。
         """
+        counters = await self._trusted_counters(conversation_id)
+        if counters is not None:
+            return counters.last_message_timestamp > timestamp
         try:
-            query = """
-                FOR doc IN @@collection
-                    FILTER doc.conversation_id_extracted == @conversation_id
-                    FILTER doc.timestamp > @timestamp
-                    FILTER doc.event_type LIKE 'message.%'
-                    LIMIT 1
-                    RETURN 1
-            """
             bind_vars = {
                 "@collection": self.COLLECTION_NAME,
                 "conversation_id": conversation_id,
                 "timestamp": timestamp,
             }
 
-            results = await self.conn_manager.execute_query(query, bind_vars)
+            results = await self.conn_manager.run_query(HAS_NEW_MESSAGES_QUERY, bind_vars)
 
             # 如果 results 列表不为空，说明至少找到了一个匹配的文档
             return bool(results)
@@ -320,6 +1119,26 @@ class EventStorageService:
             )
             return False
 
+    async def get_embedded_message_events_after(
+        self, after_timestamp: int, after_key: str = "", limit: int = 1000
+    ) -> list[dict[str, Any]]:
+        """
+        按 (timestamp, _key) 顺序分页取带句向量的消息事件，只返回建向量索引要用的几个字段。
+        游标是上一页最后一条的 (timestamp, _key)，同一毫秒里有再多消息也不会卡住。
+        """
+        try:
+            bind_vars = {
+                "@collection": self.COLLECTION_NAME,
+                "after_timestamp": int(after_timestamp),
+                "after_key": after_key,
+                "limit": limit,
+            }
+            results = await self.conn_manager.run_query(EMBEDDED_MESSAGE_PAGE_QUERY, bind_vars)
+            return results if results is not None else []
+        except Exception as e:
+            logger.error(f"分页获取带向量的消息事件失败: {e}", exc_info=True)
+            return []
+
     async def get_events_by_ids(self, event_ids: list[str]) -> list[dict[str, Any]]:
         """
         根据 event_id (_key) 列表，批量获取事件文档。
@@ -328,17 +1147,12 @@ class EventStorageService:
             return []
 
         try:
-            query = """
-                FOR doc IN @@collection
-                    FILTER doc._key IN @keys
-                    RETURN doc
-            """
             bind_vars = {
                 "@collection": self.COLLECTION_NAME,
                 "keys": event_ids,
             }
 
-            results = await self.conn_manager.execute_query(query, bind_vars)
+            results = await self.conn_manager.run_query(EVENTS_BY_IDS_QUERY, bind_vars)
             return results if results is not None else []
 
         except Exception as e:
@@ -360,18 +1174,14 @@ class EventStorageService:
             return False
 
         try:
-            query = """
-                FOR doc IN @@collection
-                    FILTER doc._key IN @keys
-                    UPDATE doc WITH { status: @new_status } IN @@collection
-            """
             bind_vars = {
                 "@collection": self.COLLECTION_NAME,
                 "keys": event_ids,
                 "new_status": new_status,
             }
 
-            await self.conn_manager.execute_query(query, bind_vars)
+            rows = await self.conn_manager.run_query(UPDATE_EVENTS_STATUS_QUERY, bind_vars)
+            self.counters.record_status_changes(self._status_changes_from_rows(rows), new_status)
             logger.info(f"成功将 {len(event_ids)} 个事件的状态更新为 '{new_status}'。")
             return True
 
@@ -382,30 +1192,48 @@ class EventStorageService:
             )
             return False
 
+    async def get_unread_message_count(self, conversation_id: str, after_timestamp: int = 0) -> int:
+        """
+        指定会话里 after_timestamp 之后还没读的消息有几条。计数器就绪时 O(1)，否则现数。
+        after_timestamp 一般就是会话的 last_processed_timestamp；它比账本记的新，说明账本落后了，顺手让账本跟上。
+        """
+        if not conversation_id:
+            return 0
+        if after_timestamp > self.counters.get(conversation_id).last_processed_timestamp:
+            self.counters.record_processed_timestamp(conversation_id, after_timestamp)
+        counters = await self._trusted_counters(conversation_id)
+        if counters is not None:
+            return counters.unread_messages
+        try:
+            bind_vars = {
+                "@collection": self.COLLECTION_NAME,
+                "conversation_id": conversation_id,
+                "timestamp": after_timestamp,
+            }
+            results = await self.conn_manager.run_query(UNREAD_MESSAGE_COUNT_QUERY, bind_vars)
+            return int(results[0]) if results else 0
+        except Exception as e:
+            logger.error(f"计算会话 '{conversation_id}' 的未读消息数量失败: {e}", exc_info=True)
+            return 0
+
     async def get_summarizable_events_count(self, conversation_id: str) -> int:
         """
         高效地计算指定会话中，状态为 'read' 的事件数量。
-        哼，数个数而已，小菜一碟。
+        哼，数个数而已，小菜一碟。计数器就绪时连库都不用查。
         """
         if not conversation_id:
             return 0
+        counters = await self._trusted_counters(conversation_id)
+        if counters is not None:
+            return counters.summarizable_events
         try:
-            # 这个查询专门用来数数，非常快
-            query = """
-                RETURN COUNT(
-                    FOR doc IN @@collection
-                        FILTER doc.conversation_id_extracted == @conversation_id
-                        AND doc.status == 'read'
-                        RETURN 1
-                )
-            """
             bind_vars = {
                 "@collection": self.COLLECTION_NAME,
                 "conversation_id": conversation_id,
             }
 
             # 执行查询
-            cursor = await self.conn_manager.execute_query(query, bind_vars)
+            cursor = await self.conn_manager.run_query(SUMMARIZABLE_COUNT_QUERY, bind_vars)
 
             # 结果是个列表，里面只有一个数字
             if cursor and isinstance(cursor, list) and len(cursor) > 0:
@@ -423,20 +1251,12 @@ class EventStorageService:
         这个方法我帮你优化一下，让它和原来的 get_message_events_after_timestamp 区分开。
         """
         try:
-            query = """
-                FOR doc IN @@collection
-                    FILTER doc.conversation_id_extracted == @conversation_id
-                    AND doc.status == 'read'
-                    SORT doc.timestamp ASC
-                    LIMIT @limit
-                    RETURN doc
-            """
             bind_vars = {
                 "@collection": self.COLLECTION_NAME,
                 "conversation_id": conversation_id,
                 "limit": limit,
             }
-            results = await self.conn_manager.execute_query(query, bind_vars)
+            results = await self.conn_manager.run_query(SUMMARIZABLE_EVENTS_QUERY, bind_vars)
             return results if results is not None else []
         except Exception as e:
             logger.error(f"获取会话 '{conversation_id}' 的可总结事件失败: {e}", exc_info=True)
@@ -451,16 +1271,12 @@ class EventStorageService:
         if not event_ids:
             return True
         try:
-            # AQL的UPDATE语句，非常高效
-            query = """
-                FOR doc_key IN @keys
-                    UPDATE doc_key WITH { status: 'summarized' } IN @@collection
-            """
             bind_vars = {
                 "@collection": self.COLLECTION_NAME,
                 "keys": event_ids,
             }
-            await self.conn_manager.execute_query(query, bind_vars)
+            rows = await self.conn_manager.run_query(MARK_EVENTS_SUMMARIZED_QUERY, bind_vars)
+            self.counters.record_status_changes(self._status_changes_from_rows(rows), "summarized")
             logger.info(f"成功将 {len(event_ids)} 个事件的状态更新为 'summarized'。")
             return True
         except Exception as e:
@@ -0,0 +1,820 @@
+# src/database/services/memory_storage_services.py
+# 六个存储服务的内存版。每个都是对应 ArangoDB 版的子类，方法签名和返回值一模一样，
+# 只是把 AQL 换成了对 InMemoryStore 里有序索引的直接扫描，所以上层拿到谁都不用改代码。
+# 入库前的预处理（补字段、合并档案之类）和 ArangoDB 版共用同一套静态方法，两边不会各说各话。
+import asyncio
+import random
+import time
+from collections.abc import AsyncGenerator, Iterator
+from typing import TYPE_CHECKING, Any
+
+from src.common.custom_logging.logging_config import get_logger
+from src.database.core.connection_manager import CoreDBCollections
+from src.database.core.memory_store import InMemoryStore, MemoryCollection, ScanCursor
+from src.database.core.query_options import Projection
+from src.database.models import (
+    AccountDocument,
+    ConversationSummaryDocument,
+    MembershipProperties,
+    PersonDocument,
+    event_category_of,
+)
+
+from .action_log_storage_service import ActionLogStorageService
+from .conversation_storage_service import ConversationStorageService
+from .event_counters import COUNTERS_FIELD, ConversationCounters, StatusChange, conversation_event_counters
+from .event_storage_service import CORE_SNAPSHOT_SCAN_FACTOR, SYSTEM_EVENTS_CONVERSATION_ID, EventStorageService
+from .person_storage_service import SELF_PERSON_ID, PersonStorageService
+from .summary_storage_service import SummaryStorageService
+from .thought_storage_service import ThoughtStorageService
+
+if TYPE_CHECKING:
+    from aicarus_protocols import UserInfo as ProtocolUserInfo
+
+logger = get_logger(__name__)
+
+CONVERSATION_INDEX_FIELD = "conversation_id_extracted"
+CATEGORY_INDEX_FIELD = "event_category"
+
+
+def _is_message(doc: dict[str, Any]) -> bool:
+    return doc.get(CATEGORY_INDEX_FIELD) == "message"
+
+
+def _without_embedding(doc: dict[str, Any]) -> dict[str, Any]:
+    """和 AQL 里的 UNSET(doc, "embedding") 一样，查历史的地方用不着句向量就别带出去。"""
+    doc.pop("embedding", None)
+    return doc
+
+
+def _project(doc: dict[str, Any], projection: Projection | None) -> dict[str, Any]:
+    return projection.apply(doc) if projection else _without_embedding(doc)
+
+
+def _has_text(doc: dict[str, Any]) -> bool:
+    return any(
+        isinstance(segment, dict) and segment.get("type") == "text" and (segment.get("data") or {}).get("text")
+        for segment in doc.get("content") or []
+    )
+
+
+class InMemoryEventStorageService(EventStorageService):
+    """事件存储的内存版：按会话分组、组内按时间排好序，查最近N条或某时间点之后的消息都只扫需要的那一段。"""
+
+    def __init__(self, conn_manager: InMemoryStore) -> None:
+        super().__init__(conn_manager)
+        self.store = conn_manager
+
+    @property
+    def _events(self) -> MemoryCollection:
+        return self.store.get_collection(self.COLLECTION_NAME)
+
+    def _scan(
+        self,
+        conversation_id: str | None = None,
+        after: ScanCursor | None = None,
+        reverse: bool = False,
+        category: str | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """有会话就扫会话那一组；没有会话但只要某个分类，就扫分类那一组；都没有才扫全局。"""
+        if conversation_id:
+            return self._events.scan(CONVERSATION_INDEX_FIELD, conversation_id, after=after, reverse=reverse)
+        if category:
+            return self._events.scan(CATEGORY_INDEX_FIELD, category, after=after, reverse=reverse)
+        return self._events.scan(after=after, reverse=reverse)
+
+    async def initialize_infrastructure(self) -> None:
+        await self.store.ensure_collection_with_indexes(self.COLLECTION_NAME)
+        # 和数据库版一样先把分类补完再放行读请求；计数器的落盘/对账照样放后台
+        await self.migrate_event_categories()
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(
+                self._run_counter_maintenance(), name="InMemoryEventCounterMaintenance"
+            )
+        logger.info(f"'{self.COLLECTION_NAME}' 内存集合已就绪。")
+
+    async def migrate_event_categories(self) -> int:
+        missing = [doc["_key"] for doc in self._events.all_documents() if doc.get(CATEGORY_INDEX_FIELD) is None]
+        for key in missing:
+            doc = await self._events.get(key)
+            if doc is not None:
+                await self._events.update(key, {CATEGORY_INDEX_FIELD: event_category_of(doc.get("event_type"))})
+        if missing:
+            logger.info(f"事件分类迁移完成，共为 {len(missing)} 条旧事件补上了 event_category。")
+        return len(missing)
+
+    async def check_hot_query_plans(self) -> list[str]:
+        # 内存后端没有查询计划，扫的本来就是有序分组
+        return []
+
+    async def _load_conversation_counter_docs(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "conversation_id": doc["_key"],
+                "last_processed_timestamp": doc.get("last_processed_timestamp"),
+                COUNTERS_FIELD: doc.get(COUNTERS_FIELD),
+            }
+            for doc in self.store.get_collection(CoreDBCollections.CONVERSATIONS).all_documents()
+        ]
+
+    async def _count_conversation_events(
+        self, conversation_id: str, last_processed_timestamp: int
+    ) -> ConversationCounters:
+        counters = ConversationCounters(last_processed_timestamp=last_processed_timestamp)
+        for doc in self._scan(conversation_id):
+            if _is_message(doc):
+                counters.last_message_timestamp = max(counters.last_message_timestamp, doc["timestamp"])
+                if doc.get("status") == "unread" and doc["timestamp"] > last_processed_timestamp:
+                    counters.unread_messages += 1
+            if doc.get("status") == "read":
+                counters.summarizable_events += 1
+        return counters
+
+    async def _persist_event_counters(self, dirty: dict[str, dict[str, int]]) -> None:
+        conversations = self.store.get_collection(CoreDBCollections.CONVERSATIONS)
+        for conversation_id, counters in dirty.items():
+            await conversations.update(conversation_id, {COUNTERS_FIELD: counters})
+
+    async def _fetch_archivable_events(self, cutoff_timestamp: int, limit: int) -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = []
+        for doc in self._scan():
+            if len(results) >= limit or doc["timestamp"] >= cutoff_timestamp:
+                break
+            if doc.get("status") == "summarized":
+                results.append({k: v for k, v in doc.items() if k not in ("_rev", "_id")})
+        return results
+
+    async def _remove_events(self, event_ids: list[str]) -> int:
+        removed = 0
+        for event_id in event_ids:
+            if await self._events.remove(event_id):
+                removed += 1
+        return removed
+
+    async def save_event_document(self, event_doc_data: dict[str, Any]) -> bool:
+        event_id = self.prepare_event_document(event_doc_data)
+        if event_id is None:
+            return False
+        if await self._events.insert(event_doc_data) is None:
+            logger.warning(f"尝试插入已存在的事件 Event ID: {event_id}。操作被跳过。")
+        else:
+            self.counters.record_new_event(event_doc_data)
+        return True
+
+    async def stream_messages_grouped_by_conversation(self) -> AsyncGenerator[list[dict[str, Any]], None]:
+        conversation_count = 0
+        for conversation_id in self._events.group_values(CONVERSATION_INDEX_FIELD):
+            docs = [
+                {k: v for k, v in doc.items() if k not in ("_rev", "_id", "embedding")}
+                for doc in self._scan(conversation_id)
+                if _is_message(doc) and _has_text(doc)
+            ]
+            if len(docs) >= 2:
+                conversation_count += 1
+                yield docs
+        logger.info(f"内存存储：共取出 {conversation_count} 场完整的对话。")
+
+    async def get_recent_chat_message_documents(
+        self,
+        duration_minutes: int = 0,
+        conversation_id: str | None = None,
+        exclude_conversation_id: str | None = None,
+        limit: int = 50,
+        fetch_all_event_types: bool = False,
+        projection: Projection | None = None,
+    ) -> list[dict[str, Any]]:
+        threshold_time_ms = int(time.time() * 1000.0) - duration_minutes * 60 * 1000 if duration_minutes > 0 else None
+        results: list[dict[str, Any]] = []
+        category = None if fetch_all_event_types else "message"
+        for doc in self._scan(conversation_id, reverse=True, category=category):
+            if len(results) >= limit:
+                break
+            if threshold_time_ms is not None and doc["timestamp"] < threshold_time_ms:
+                break
+            if not fetch_all_event_types and not _is_message(doc):
+                continue
+            if exclude_conversation_id and doc.get(CONVERSATION_INDEX_FIELD) == exclude_conversation_id:
+                continue
+            results.append(_project(doc, projection))
+        return results
+
+    async def get_last_action_response(
+        self, platform: str, conversation_id: str | None = None, bot_id: str | None = None
+    ) -> dict[str, Any] | None:
+        for doc in self._scan(conversation_id, reverse=True, category="action_response"):
+            if (
+                doc.get(CATEGORY_INDEX_FIELD) == "action_response"
+                and doc.get("platform") == platform
+                and (not bot_id or doc.get("bot_id") == bot_id)
+            ):
+                return _without_embedding(doc)
+        return None
+
+    async def get_message_events_after_timestamp(
+        self,
+        conversation_id: str,
+        timestamp: int,
+        limit: int = 500,
+        status: str | None = None,
+        projection: Projection | None = None,
+    ) -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = []
+        for doc in self._scan(conversation_id, after=timestamp):
+            if len(results) >= limit:
+                break
+            if _is_message(doc) and (not status or doc.get("status") == status):
+                results.append(_project(doc, projection))
+        return results
+
+    async def get_core_snapshot(
+        self,
+        duration_minutes: int,
+        unread_watermarks: dict[str, int],
+        system_conversation_id: str = SYSTEM_EVENTS_CONVERSATION_ID,
+        message_limit: int = 50,
+        per_conversation_limit: int = 20,
+        system_event_limit: int = 50,
+        projection: Projection | None = None,
+    ) -> dict[str, Any] | None:
+        threshold_time_ms = int(time.time() * 1000.0) - duration_minutes * 60 * 1000 if duration_minutes > 0 else 0
+        system_events: list[dict[str, Any]] = []
+        for doc in self._scan(system_conversation_id, reverse=True):
+            if len(system_events) >= system_event_limit or doc["timestamp"] < threshold_time_ms:
+                break
+            system_events.append(_without_embedding(doc))
+
+        recent_messages: list[dict[str, Any]] = []
+        taken_per_conversation: dict[str, int] = {}
+        scanned = 0
+        for doc in self._scan(reverse=True, category="message"):
+            if len(recent_messages) >= message_limit or scanned >= message_limit * CORE_SNAPSHOT_SCAN_FACTOR:
+                break
+            if doc["timestamp"] < threshold_time_ms:
+                break
+            conversation_id = doc.get(CONVERSATION_INDEX_FIELD)
+            if not _is_message(doc) or conversation_id == system_conversation_id:
+                continue
+            scanned += 1
+            if taken_per_conversation.get(conversation_id, 0) >= per_conversation_limit:
+                continue
+            taken_per_conversation[conversation_id] = taken_per_conversation.get(conversation_id, 0) + 1
+            recent_messages.append(_project(doc, projection))
+
+        unread: list[dict[str, Any]] = []
+        for conversation_id, after_timestamp in unread_watermarks.items():
+            pending = [
+                doc
+                for doc in self._scan(conversation_id, after=int(after_timestamp or 0))
+                if _is_message(doc) and doc.get("status") == "unread"
+            ]
+            if pending:
+                unread.append(
+                    {
+                        "conversation_id": conversation_id,
+                        "unread_count": len(pending),
+                        "latest_event": _project(pending[-1], projection),
+                    }
+                )
+        return {"system_events": system_events, "recent_messages": recent_messages, "unread": unread}
+
+    async def has_new_events_since(self, conversation_id: str, timestamp: float) -> bool:
+        counters = await self._trusted_counters(conversation_id)
+        if counters is not None:
+            return counters.last_message_timestamp > timestamp
+        return any(_is_message(doc) for doc in self._scan(conversation_id, after=timestamp, reverse=True))
+
+    async def get_embedded_message_events_after(
+        self, after_timestamp: int, after_key: str = "", limit: int = 1000
+    ) -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = []
+        for doc in self._scan(after=(int(after_timestamp), after_key), category="message"):
+            if len(results) >= limit:
+                break
+            if _is_message(doc) and doc.get("embedding") is not None:
+                results.append(
+                    {
+                        "_key": doc["_key"],
+                        "conversation_id": doc.get(CONVERSATION_INDEX_FIELD),
+                        "timestamp": doc["timestamp"],
+                        "embedding": doc["embedding"],
+                    }
+                )
+        return results
+
+    async def get_events_by_ids(self, event_ids: list[str]) -> list[dict[str, Any]]:
+        return [
+            _without_embedding(doc)
+            for event_id in event_ids or []
+            if (doc := await self._events.get(event_id)) is not None
+        ]
+
+    async def update_events_status(self, event_ids: list[str], new_status: str) -> bool:
+        if not event_ids:
+            return True
+        if not new_status:
+            logger.warning("没有提供 new_status，无法更新状态。")
+            return False
+        await self._update_statuses(event_ids, new_status)
+        logger.info(f"成功将 {len(event_ids)} 个事件的状态更新为 '{new_status}'。")
+        return True
+
+    async def _update_statuses(self, event_ids: list[str], new_status: str) -> None:
+        """改状态，顺手把旧值交给计数器账本。"""
+        changes: list[StatusChange] = []
+        for event_id in event_ids:
+            old = await self._events.get(event_id)
+            if old is None:
+                continue
+            await self._events.update(event_id, {"status": new_status})
+            changes.append(
+                StatusChange(
+                    conversation_id=old.get(CONVERSATION_INDEX_FIELD),
+                    event_category=old.get(CATEGORY_INDEX_FIELD),
+                    old_status=old.get("status"),
+                    timestamp=int(old.get("timestamp") or 0),
+                )
+            )
+        self.counters.record_status_changes(changes, new_status)
+
+    async def get_unread_message_count(self, conversation_id: str, after_timestamp: int = 0) -> int:
+        if not conversation_id:
+            return 0
+        if after_timestamp > self.counters.get(conversation_id).last_processed_timestamp:
+            self.counters.record_processed_timestamp(conversation_id, after_timestamp)
+        counters = await self._trusted_counters(conversation_id)
+        if counters is not None:
+            return counters.unread_messages
+        return sum(
+            1
+            for doc in self._scan(conversation_id, after=after_timestamp)
+            if _is_message(doc) and doc.get("status") == "unread"
+        )
+
+    async def get_summarizable_events_count(self, conversation_id: str) -> int:
+        if not conversation_id:
+            return 0
+        counters = await self._trusted_counters(conversation_id)
+        if counters is not None:
+            return counters.summarizable_events
+        return sum(1 for doc in self._scan(conversation_id) if doc.get("status") == "read")
+
+    async def get_summarizable_events(self, conversation_id: str, limit: int = 500) -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = []
+        for doc in self._scan(conversation_id):
+            if len(results) >= limit:
+                break
+            if doc.get("status") == "read":
+                results.append(_without_embedding(doc))
+        return results
+
+    async def update_events_status_to_summarized(self, event_ids: list[str]) -> bool:
+        await self._update_statuses(event_ids or [], "summarized")
+        if event_ids:
+            logger.info(f"成功将 {len(event_ids)} 个事件的状态更新为 'summarized'。")
+        return True
+
+
+class InMemoryConversationStorageService(ConversationStorageService):
+    """会话存储的内存版。"""
+
+    def __init__(self, conn_manager: InMemoryStore) -> None:
+        super().__init__(conn_manager)
+        self.store = conn_manager
+
+    @property
+    def _conversations(self) -> MemoryCollection:
+        return self.store.get_collection(self.COLLECTION_NAME)
+
+    async def initialize_infrastructure(self) -> None:
+        await self.store.ensure_collection_with_indexes(self.COLLECTION_NAME)
+        await self.load_directory()
+        logger.info(f"'{self.COLLECTION_NAME}' 内存集合已就绪。")
+
+    async def load_directory(self) -> None:
+        self.directory.load(self._conversations.all_documents())
+
+    async def upsert_conversation_document(self, conversation_doc_data: dict[str, Any]) -> dict[str, str] | None:
+        if not conversation_doc_data or not isinstance(conversation_doc_data, dict):
+            logger.warning("无效的 'conversation_doc_data' (空或非字典类型)。无法执行 upsert 操作。")
+            return None
+        conversation_id = conversation_doc_data.get("conversation_id")
+        if not conversation_id:
+            logger.warning("'conversation_doc_data' 中缺少 'conversation_id'。无法执行 upsert 操作。")
+            return None
+
+        doc_key = str(conversation_id)
+        current_time_ms = int(time.time() * 1000)
+        doc_for_db = {**conversation_doc_data, "_key": doc_key, "updated_at": current_time_ms}
+        existing_doc = await self._conversations.get(doc_key)
+        self.prepare_conversation_document(doc_for_db, existing_doc, current_time_ms)
+        if existing_doc:
+            updated = await self._conversations.update(doc_key, doc_for_db)
+        else:
+            updated = await self._conversations.insert(doc_for_db) and await self._conversations.get(doc_key)
+        if not updated:
+            return None
+        self.directory.upsert(updated)
+        return {"_key": doc_key, "_id": f"{self.COLLECTION_NAME}/{doc_key}"}
+
+    async def get_conversation_document_by_id(self, conversation_id: str) -> dict[str, Any] | None:
+        if not conversation_id:
+            logger.warning("尝试获取会话文档但未提供 conversation_id。")
+            return None
+        return await self._conversations.get(str(conversation_id))
+
+    async def update_conversation_field(
+        self, conversation_id: str, field_path_to_update: str, new_value: str | int | float | dict | list | bool | None
+    ) -> bool:
+        if not conversation_id or not field_path_to_update:
+            logger.warning("更新会话字段需要 conversation_id 和 field_path_to_update。")
+            return False
+        patch_doc = self.build_field_patch(field_path_to_update, new_value)
+        if patch_doc is None:
+            return False
+        if await self._conversations.update(str(conversation_id), patch_doc) is None:
+            return False
+        self.directory.patch(str(conversation_id), patch_doc)
+        return True
+
+    async def get_all_active_conversations(self) -> list[dict[str, Any]]:
+        if not self.directory.ready:
+            await self.load_directory()
+        return [entry.as_document() for entry in self.directory.active()]
+
+    async def update_conversation_processed_timestamp(self, conversation_id: str, timestamp: int) -> bool:
+        if not conversation_id:
+            logger.warning("更新会话处理时间戳需要 conversation_id。")
+            return False
+        patch = {"last_processed_timestamp": timestamp, "updated_at": int(time.time() * 1000)}
+        if await self._conversations.update(str(conversation_id), patch) is None:
+            return False
+        conversation_event_counters.record_processed_timestamp(str(conversation_id), timestamp)
+        self.directory.patch(str(conversation_id), patch)
+        return True
+
+
+class InMemoryPersonStorageService(PersonStorageService):
+    """人和账号关系的内存版：边集合按 _from/_to 建了分组索引，一跳遍历就是查一次字典。"""
+
+    def __init__(self, conn_manager: InMemoryStore) -> None:
+        super().__init__(conn_manager)
+        self.store = conn_manager
+        self.conversation_storage = InMemoryConversationStorageService(conn_manager)
+
+    def _collection(self, name: str) -> MemoryCollection:
+        return self.store.get_collection(name)
+
+    async def _get_collection(self, name: str, is_edge: bool = False) -> MemoryCollection:
+        """自我检查之类的地方会直接拿集合来 has/get，内存集合的这几个方法和 arangoasync 的用法一样。"""
+        return self._collection(name)
+
+    async def _neighbours(self, edge_name: str, vertex_id: str, direction: str) -> list[tuple[dict[str, Any], str]]:
+        """一跳遍历，返回 (边, 另一头的 _id)。direction 是 "outbound" 或 "inbound"。"""
+        edges = self._collection(edge_name)
+        field, other = ("_from", "_to") if direction == "outbound" else ("_to", "_from")
+        return [
+            (edge, edge[other])
+            for key in edges.group_keys(field, vertex_id)
+            if (edge := await edges.get(key)) is not None
+        ]
+
+    async def _get_by_id(self, document_id: str) -> dict[str, Any] | None:
+        collection_name, _, key = document_id.partition("/")
+        return await self._collection(collection_name).get(key)
+
+    async def _link_person_and_account(self, person_doc: dict[str, Any], account_uid: str) -> None:
+        person_key = person_doc["_key"]
+        await self._collection(CoreDBCollections.HAS_ACCOUNT).insert(
+            {
+                "_key": f"{person_key}_has_{account_uid}",
+                "_from": f"{CoreDBCollections.PERSONS}/{person_key}",
+                "_to": f"{CoreDBCollections.ACCOUNTS}/{account_uid}",
+                "created_at": int(time.time() * 1000),
+            }
+        )
+
+    async def find_or_create_person_and_account(
+        self, user_info: "ProtocolUserInfo", platform: str
+    ) -> tuple[str | None, str | None]:
+        if not user_info or not user_info.user_id:
+            logger.warning("提供的UserInfo不完整，无法查找或创建Person/Account。")
+            return None, None
+
+        accounts = self._collection(CoreDBCollections.ACCOUNTS)
+        account_uid = f"{platform}_{user_info.user_id}"
+        account_doc = await accounts.get(account_uid)
+        if not account_doc:
+            return await self._create_new_person_with_account(user_info, platform)
+
+        if user_info.user_nickname and account_doc.get("last_known_nickname") != user_info.user_nickname:
+            await accounts.update(account_uid, {"last_known_nickname": user_info.user_nickname})
+        owners = await self._neighbours(CoreDBCollections.HAS_ACCOUNT, account_doc["_id"], "inbound")
+        if owners:
+            return owners[0][1].partition("/")[2], account_uid
+
+        logger.warning(f"数据不一致！账号 {account_uid} 存在但没有关联的Person。将为其创建新的Person。")
+        return await self._create_person_for_existing_account(account_doc)
+
+    async def _create_person_for_existing_account(self, account_doc: dict[str, Any]) -> tuple[str | None, str | None]:
+        person = PersonDocument.create_new().to_dict()
+        await self._collection(CoreDBCollections.PERSONS).insert(person)
+        await self._link_person_and_account(person, account_doc["_key"])
+        return person["_key"], account_doc["_key"]
+
+    async def _create_new_person_with_account(
+        self, user_info: "ProtocolUserInfo", platform: str, is_self: bool = False
+    ) -> tuple[str | None, str | None]:
+        person = (
+            PersonDocument.create_new()
+            if not is_self
+            else PersonDocument(_key=SELF_PERSON_ID, person_id=SELF_PERSON_ID)
+        ).to_dict()
+        account = AccountDocument.from_user_info(user_info, platform).to_dict()
+        persons = self._collection(CoreDBCollections.PERSONS)
+        accounts = self._collection(CoreDBCollections.ACCOUNTS)
+        # 和 AQL 版一样是 UPSERT ... UPDATE {}：已经有了就原样保留
+        if not await persons.has(person["_key"]):
+            await persons.insert(person)
+        if not await accounts.has(account["_key"]):
+            await accounts.insert(account)
+        await self._link_person_and_account(person, account["_key"])
+        return person["_key"], account["_key"]
+
+    async def _upsert_membership(self, account_uid: str, conversation_id: str, props: MembershipProperties) -> None:
+        edge_key = f"{account_uid}_in_{conversation_id}"
+        edge_doc = {
+            "_from": f"{CoreDBCollections.ACCOUNTS}/{account_uid}",
+            "_to": f"{CoreDBCollections.CONVERSATIONS}/{conversation_id}",
+            **props.to_dict(),
+        }
+        await self._collection(CoreDBCollections.PARTICIPATES_IN).upsert(edge_key, edge_doc)
+
+    async def update_robot_membership_in_conversation(
+        self,
+        account_uid: str,
+        conversation_id: str,
+        platform: str,
+        conversation_name: str | None,
+        card_name: str | None,
+        role: str | None,
+    ) -> bool:
+        await self._ensure_conversation_exists(conversation_id, platform, conversation_name)
+        props = MembershipProperties(
+            group_name=conversation_name,
+            cardname=card_name,
+            permission_level=role,
+            last_active_timestamp=int(time.time() * 1000),
+        )
+        await self._upsert_membership(account_uid, conversation_id, props)
+        return True
+
+    async def update_membership(
+        self, account_uid: str, conversation_id: str, user_info: "ProtocolUserInfo", conversation_name: str | None
+    ) -> None:
+        props = MembershipProperties(
+            group_name=conversation_name,
+            cardname=user_info.user_cardname,
+            permission_level=user_info.permission_level,
+            title=user_info.user_titlename,
+            last_active_timestamp=int(time.time() * 1000),
+        )
+        await self._upsert_membership(account_uid, conversation_id, props)
+
+    async def get_person_details_by_account(self, platform: str, platform_id: str) -> dict[str, Any] | None:
+        account_id = f"{CoreDBCollections.ACCOUNTS}/{platform}_{platform_id}"
+        owners = await self._neighbours(CoreDBCollections.HAS_ACCOUNT, account_id, "inbound")
+        person = await self._get_by_id(owners[0][1]) if owners else None
+        if person is None:
+            return None
+
+        all_accounts = [
+            account
+            for _edge, other_id in await self._neighbours(CoreDBCollections.HAS_ACCOUNT, person["_id"], "outbound")
+            if (account := await self._get_by_id(other_id)) is not None
+        ]
+        all_memberships = []
+        for account in all_accounts:
+            for edge, conversation_doc_id in await self._neighbours(
+                CoreDBCollections.PARTICIPATES_IN, account["_id"], "outbound"
+            ):
+                conversation = await self._get_by_id(conversation_doc_id) or {}
+                all_memberships.append(
+                    {
+                        "membership_id": edge["_key"],
+                        "account_uid": account.get("account_uid"),
+                        "group_id": conversation.get("conversation_id"),
+                        "platform": conversation.get("platform"),
+                        "group_name": edge.get("group_name"),
+                        "cardname": edge.get("cardname"),
+                        "permission_level": edge.get("permission_level"),
+                    }
+                )
+        return {
+            "person_id": person.get("person_id"),
+            "profile": person.get("profile"),
+            "accounts": all_accounts,
+            "memberships": all_memberships,
+            "metadata": {"created_at": person.get("created_at"), "updated_at": person.get("updated_at")},
+        }
+
+
+class InMemoryThoughtStorageService(ThoughtStorageService):
+    """
+    思考和侵入性思维池的内存版。未使用的侵入性思维按 used 分组，随机抽一个不用全表扫。
+    改动作状态、标记结果已阅直接用基类的：它们只调 conn_manager.merge_update，InMemoryStore 也有同名同义的实现。
+    """
+
+    def __init__(self, conn_manager: InMemoryStore) -> None:
+        super().__init__(conn_manager)
+        self.store = conn_manager
+
+    @property
+    def _thoughts(self) -> MemoryCollection:
+        return self.store.get_collection(self.MAIN_THOUGHTS_COLLECTION)
+
+    @property
+    def _pool(self) -> MemoryCollection:
+        return self.store.get_collection(self.INTRUSIVE_POOL_COLLECTION)
+
+    async def initialize_infrastructure(self) -> None:
+        await self.store.ensure_collection_with_indexes(self.MAIN_THOUGHTS_COLLECTION)
+        await self.store.ensure_collection_with_indexes(self.INTRUSIVE_POOL_COLLECTION)
+        logger.info(f"'{self.MAIN_THOUGHTS_COLLECTION}' 和 '{self.INTRUSIVE_POOL_COLLECTION}' 内存集合已就绪。")
+
+    async def get_main_thought_document_by_key(self, doc_key: str) -> dict[str, Any] | None:
+        if not doc_key:
+            logger.warning("获取主思考文档需要一个有效的 doc_key。")
+            return None
+        return await self._thoughts.get(doc_key)
+
+    async def save_main_thought_document(self, thought_document: dict[str, Any]) -> str | None:
+        if not isinstance(thought_document, dict):
+            raise ValueError(
+                {
+                    "error": "InvalidInput",
+                    "message": "thought_document must be a dict.",
+                    "received_type": str(type(thought_document)),
+                }
+            )
+        self.prepare_main_thought_document(thought_document)
+        if await self._thoughts.insert(thought_document) is None:
+            logger.warning(f"尝试插入主思考文档失败，因为键 '{thought_document['_key']}' 已存在。操作被跳过。")
+        else:
+            self.state_cache.record_thought(thought_document)
+        return thought_document["_key"]
+
+    async def get_latest_main_thought_document(self, limit: int = 1) -> list[dict[str, Any]]:
+        if limit <= 0:
+            logger.warning("获取最新思考文档的 limit 参数必须为正整数。")
+            return []
+        if limit == 1 and self.state_cache.thought_loaded:
+            latest = self.state_cache.latest_thought()
+            return [latest] if latest else []
+        results: list[dict[str, Any]] = []
+        for doc in self._thoughts.scan(reverse=True):
+            results.append(doc)
+            if len(results) >= limit:
+                break
+        if not self.state_cache.thought_loaded:
+            self.state_cache.load_latest_thought(results[0] if results else None)
+        return results
+
+    async def save_intrusive_thoughts_batch(self, thought_document_list: list[dict[str, Any]]) -> bool:
+        documents = self.prepare_intrusive_thought_documents(thought_document_list or [])
+        if not documents:
+            return True
+        successful_inserts = 0
+        for doc in documents:
+            if await self._pool.insert(doc) is not None:
+                successful_inserts += 1
+        logger.info(f"已批量保存 {successful_inserts}/{len(documents)} 条侵入性思维。")
+        return successful_inserts > 0
+
+    async def get_random_unused_intrusive_thought_document(self) -> dict[str, Any] | None:
+        unused_keys = self._pool.group_keys("used", False)
+        if not unused_keys:
+            logger.info("侵入性思维池中当前没有未被使用过的思维。")
+            return None
+        return await self._pool.get(random.choice(unused_keys))
+
+    async def mark_intrusive_thought_document_used(self, thought_doc_key: str) -> bool:
+        if not thought_doc_key:
+            logger.warning("标记已使用需要有效的 thought_doc_key。")
+            return False
+        if await self._pool.update(thought_doc_key, {"used": True}) is None:
+            logger.warning(f"无法标记 '{thought_doc_key}' 为已使用：文档未找到。")
+            return False
+        return True
+
+
+class InMemoryActionLogStorageService(ActionLogStorageService):
+    """动作日志的内存版。"""
+
+    def __init__(self, conn_manager: InMemoryStore) -> None:
+        super().__init__(conn_manager)
+        self.store = conn_manager
+
+    @property
+    def _logs(self) -> MemoryCollection:
+        return self.store.get_collection(self.collection_name)
+
+    async def save_action_attempt(
+        self,
+        action_id: str,
+        action_type: str,
+        timestamp: int,
+        platform: str,
+        bot_id: str,
+        conversation_id: str,
+        content: list[dict[str, Any]],
+        original_event_id: str | None = None,
+        target_user_id: str | None = None,
+    ) -> bool:
+        action_log_doc = self.build_action_log_document(
+            action_id,
+            action_type,
+            timestamp,
+            platform,
+            bot_id,
+            conversation_id,
+            content,
+            original_event_id=original_event_id,
+            target_user_id=target_user_id,
+        )
+        if await self._logs.insert(action_log_doc) is None:
+            logger.info(f"动作尝试 '{action_id}' 的记录已存在，无需重复插入。")
+        else:
+            self.state_cache.record_action_log(action_log_doc)
+        return True
+
+    async def update_action_log_with_response(
+        self,
+        action_id: str,
+        status: str,
+        response_timestamp: int,
+        response_time_ms: int | None = None,
+        error_info: str | None = None,
+        result_details: dict[str, Any] | None = None,
+    ) -> bool:
+        fields_to_update = {
+            "status": status,
+            "response_timestamp": response_timestamp,
+            "response_time_ms": response_time_ms,
+            "error_info": error_info,
+            "result_details": result_details,
+        }
+        final_doc_to_update = {k: v for k, v in fields_to_update.items() if v is not None}
+        if not final_doc_to_update:
+            return True
+        if await self._logs.update(action_id, final_doc_to_update) is None:
+            logger.error(f"严重错误：尝试更新一个不存在的 ActionLog 记录 '{action_id}'。")
+            return False
+        return True
+
+    async def get_action_log(self, action_id: str) -> dict[str, Any] | None:
+        return await self._logs.get(action_id)
+
+    async def get_recent_action_logs(self, limit: int = 10) -> list[dict[str, Any]]:
+        if limit <= 0:
+            return []
+        if self.state_cache.can_serve_action_logs(limit):
+            return self.state_cache.recent_action_logs(limit)
+        cold_start = not self.state_cache.action_logs_loaded
+        fetch_limit = max(limit, self.state_cache.action_log_capacity) if cold_start else limit
+        rows: list[dict[str, Any]] = []
+        for doc in self._logs.scan(reverse=True):
+            rows.append(
+                {"action_id": doc["_key"], "timestamp": doc.get("timestamp"), "action_type": doc.get("action_type")}
+            )
+            if len(rows) >= fetch_limit:
+                break
+        if cold_start:
+            self.state_cache.load_action_logs(rows)
+        return [{"timestamp": row["timestamp"], "action_type": row["action_type"]} for row in rows[:limit]]
+
+
+class InMemorySummaryStorageService(SummaryStorageService):
+    """会话总结的内存版。"""
+
+    def __init__(self, db_manager: InMemoryStore) -> None:
+        super().__init__(db_manager)
+        self.store = db_manager
+
+    async def save_summary(
+        self,
+        conversation_id: str,
+        summary_text: str,
+        platform: str,
+        bot_id: str,
+        event_ids_covered: list[str],
+    ) -> ConversationSummaryDocument | None:
+        if not summary_text or not summary_text.strip():
+            logger.warning("尝试保存一个空的总结，操作已取消。")
+            return None
+        summary_doc = self.build_summary_document(conversation_id, summary_text, platform, bot_id, event_ids_covered)
+        collection = self.store.get_collection(CoreDBCollections.CONVERSATION_SUMMARIES)
+        return summary_doc if await collection.insert(summary_doc.to_dict()) is not None else None
+
+    async def get_summaries_by_ids(self, summary_ids: list[str]) -> list[dict[str, Any]]:
+        collection = self.store.get_collection(CoreDBCollections.CONVERSATION_SUMMARIES)
+        return [doc for summary_id in summary_ids or [] if (doc := await collection.get(summary_id)) is not None]
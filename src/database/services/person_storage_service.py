@@ -1,8 +1,7 @@
 # 文件路径: src/database/services/person_storage_service.py
 import time
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from aicarus_protocols import UserInfo as ProtocolUserInfo
 from arangoasync.collection import EdgeCollection, StandardCollection  # 确保导入 EdgeCollection
 
 from src.common.custom_logging.logging_config import get_logger
@@ -13,11 +12,174 @@ from src.database import (
     MembershipProperties,
     PersonDocument,
 )
+from src.database.core.query_options import STRICT_QUERY_OPTIONS
+from src.database.core.query_registry import query_registry
+from src.database.services.conversation_storage_service import ConversationStorageService
+
+if TYPE_CHECKING:
+    from aicarus_protocols import UserInfo as ProtocolUserInfo
 
 logger = get_logger(__name__)
 
 SELF_PERSON_ID = "aic_person_0"
 
+OWNER_OF_ACCOUNT_QUERY = query_registry.register(
+    "persons.owner_of_account",
+    """
+        FOR p IN 1..1 INBOUND @account_id @@edge_collection
+            RETURN { person_id: p._key }
+    """,
+    {"account_id": str, "@edge_collection": str},
+)
+
+CREATE_PERSON_FOR_ACCOUNT_QUERY = query_registry.register(
+    "persons.create_for_existing_account",
+    """
+        LET person_doc = @person_doc
+        LET timestamp = @timestamp
+
+        LET person_result = (
+            INSERT person_doc IN @@persons_coll
+            RETURN NEW
+        )[0]
+
+        LET edge_doc = {
+            _key: CONCAT(person_result._key, "_has_", @account_key),
+            _from: person_result._id,
+            _to: @account_id,
+            created_at: timestamp
+        }
+
+        INSERT edge_doc IN @@has_account_coll
+
+        RETURN { person_id: person_result._key, account_uid: @account_key }
+    """,
+    {
+        "person_doc": dict,
+        "timestamp": int,
+        "account_key": str,
+        "account_id": str,
+        "@persons_coll": str,
+        "@has_account_coll": str,
+    },
+    options=STRICT_QUERY_OPTIONS,
+)
+
+UPSERT_MEMBERSHIP_QUERY = query_registry.register(
+    "persons.upsert_membership",
+    """
+        UPSERT { _key: @key }
+        INSERT @doc
+        UPDATE @doc
+        IN @@collection
+        RETURN NEW
+    """,
+    {"key": str, "doc": dict, "@collection": str},
+    options=STRICT_QUERY_OPTIONS,
+)
+
+CREATE_PERSON_WITH_ACCOUNT_QUERY = query_registry.register(
+    "persons.create_with_account",
+    """
+        LET person_doc = @person_doc
+        LET account_doc = @account_doc
+        LET timestamp = @timestamp
+
+        LET person_result = (
+            UPSERT { _key: person_doc._key }
+            INSERT person_doc
+            UPDATE {}
+            IN @@persons_coll
+            RETURN NEW
+        )[0]
+
+        LET account_result = (
+            UPSERT { _key: account_doc._key }
+            INSERT account_doc
+            UPDATE {}
+            IN @@accounts_coll
+            RETURN NEW
+        )[0]
+
+        LET edge_doc = {
+            _key: CONCAT(person_result._key, "_has_", account_result._key),
+            _from: person_result._id,
+            _to: account_result._id,
+            created_at: timestamp
+        }
+
+        UPSERT { _key: edge_doc._key }
+        INSERT edge_doc
+        UPDATE {}
+        IN @@has_account_coll
+
+        RETURN { person_id: person_result._key, account_uid: account_result._key }
+    """,
+    {
+        "person_doc": dict,
+        "account_doc": dict,
+        "timestamp": int,
+        "@persons_coll": str,
+        "@accounts_coll": str,
+        "@has_account_coll": str,
+    },
+    options=STRICT_QUERY_OPTIONS,
+)
+
+PERSON_DETAILS_QUERY = query_registry.register(
+    "persons.details_by_account",
+    """
+        LET account = DOCUMENT(@@accounts_coll, @account_uid)
+
+        // 找到这个账号属于哪个人
+        LET person = (
+            FOR p IN 1..1 INBOUND account @@has_account_coll
+                RETURN p
+        )[0]
+
+        // 如果没找到人，就别玩了
+        FILTER person != null
+
+        // 找到这个人的所有账号
+        LET all_accounts = (
+            FOR acc IN 1..1 OUTBOUND person @@has_account_coll
+                RETURN acc
+        )
+
+        // 找到这个人参与的所有群聊
+        LET all_memberships = (
+            FOR acc IN all_accounts
+                FOR conv, edge IN 1..1 OUTBOUND acc @@participates_in_coll
+                    RETURN {
+                        membership_id: edge._key,
+                        account_uid: acc.account_uid,
+                        group_id: conv.conversation_id,
+                        platform: conv.platform,
+                        group_name: edge.group_name,
+                        cardname: edge.cardname,
+                        permission_level: edge.permission_level
+                    }
+        )
+
+        RETURN {
+            person_id: person.person_id,
+            profile: person.profile,
+            accounts: all_accounts,
+            memberships: all_memberships,
+            metadata: {
+                created_at: person.created_at,
+                updated_at: person.updated_at
+            }
+        }
+    """,
+    {
+        "account_uid": str,
+        "@accounts_coll": str,
+        "@has_account_coll": str,
+        "@participates_in_coll": str,
+    },
+)
+
 
 class PersonStorageService:
     """
@@ -27,6 +189,8 @@ class PersonStorageService:
 
     def __init__(self, conn_manager: ArangoDBConnectionManager) -> None:
         self.conn_manager = conn_manager
+        # 新会话一律走会话服务的 upsert 建档，会话名录才能跟着更新
+        self.conversation_storage = ConversationStorageService(conn_manager)
 
     async def _get_collection(self, name: str, is_edge: bool = False) -> StandardCollection | EdgeCollection:
         """
@@ -35,7 +199,7 @@ class PersonStorageService:
         return await self.conn_manager.get_collection(name, is_edge=is_edge)
 
     async def find_or_create_person_and_account(
-        self, user_info: ProtocolUserInfo, platform: str
+        self, user_info: "ProtocolUserInfo", platform: str
     ) -> tuple[str | None, str | None]:
         """
         根据用户和平台信息，查找或创建“人”和“账号”节点，并确保它们之间有'has_account'关系。
@@ -60,15 +224,11 @@ class PersonStorageService:
                 await accounts_collection.update({"_key": account_uid, "last_known_nickname": user_info.user_nickname})
 
             # AQL图遍历查询，从账号节点出发，反向查找拥有它的“人”
-            query = """
-                FOR p IN 1..1 INBOUND @account_id @@edge_collection
-                    RETURN { person_id: p._key }
-            """
             bind_vars = {
                 "account_id": f"{CoreDBCollections.ACCOUNTS}/{account_uid}",
                 "@edge_collection": CoreDBCollections.HAS_ACCOUNT,
             }
-            person_results = await self.conn_manager.execute_query(query, bind_vars)
+            person_results = await self.conn_manager.run_query(OWNER_OF_ACCOUNT_QUERY, bind_vars)
 
             if person_results and (person_id := person_results[0].get("person_id")):
                 logger.debug(f"账号 {account_uid} 已关联到Person: {person_id}")
@@ -88,26 +248,6 @@ class PersonStorageService:
         account_uid = account_doc["_key"]
         account_id = account_doc["_id"]
 
-        query = """
-            LET person_doc = @person_doc
-            LET timestamp = @timestamp
-
-            LET person_result = (
-                INSERT person_doc IN @@persons_coll
-                RETURN NEW
-            )[0]
-
-            LET edge_doc = {
-                _key: CONCAT(person_result._key, "_has_", @account_key),
-                _from: person_result._id,
-                _to: @account_id,
-                created_at: timestamp
-            }
-
-            INSERT edge_doc IN @@has_account_coll
-
-            RETURN { person_id: person_result._key, account_uid: @account_key }
-        """
         bind_vars = {
             "person_doc": person.to_dict(),
             "timestamp": int(time.time() * 1000),
@@ -118,7 +258,7 @@ class PersonStorageService:
         }
 
         try:
-            results = await self.conn_manager.execute_query(query, bind_vars)
+            results = await self.conn_manager.run_query(CREATE_PERSON_FOR_ACCOUNT_QUERY, bind_vars)
             if results and isinstance(results, list) and len(results) > 0:
                 result = results[0]
                 person_id = result.get("person_id")
@@ -136,6 +276,26 @@ class PersonStorageService:
             logger.error(f"为现有账号创建Person的AQL事务执行失败: {e}", exc_info=True)
             return None, None
 
+    async def _ensure_conversation_exists(
+        self, conversation_id: str, platform: str, conversation_name: str | None
+    ) -> None:
+        """会话还没有档案就建一个。哼，真是操碎了心。"""
+        if self.conversation_storage.directory.get(conversation_id) is not None:
+            return
+        conv_collection = await self._get_collection(CoreDBCollections.CONVERSATIONS)
+        if await conv_collection.has(conversation_id):
+            return
+        created = await self.conversation_storage.upsert_conversation_document(
+            {
+                "conversation_id": conversation_id,
+                "platform": platform,
+                "name": conversation_name,
+                "type": "group",
+            }
+        )
+        if created is not None:
+            logger.info(f"安检时发现未知会话 '{conversation_id}'，已为其创建档案。")
+
     async def update_robot_membership_in_conversation(
         self,
         account_uid: str,
@@ -153,22 +313,8 @@ class PersonStorageService:
         to_vertex = f"{CoreDBCollections.CONVERSATIONS}/{conversation_id}"
         edge_key = f"{account_uid}_in_{conversation_id}"
 
-        # 先获取 conversation 文档，确保它存在
-        conv_collection = await self._get_collection(CoreDBCollections.CONVERSATIONS)
-        if not await conv_collection.has(conversation_id):
-            # 如果会话不存在，就创建一个。哼，真是操碎了心。
-            await conv_collection.insert(
-                {
-                    "_key": conversation_id,
-                    "conversation_id": conversation_id,
-                    "platform": platform,
-                    "name": conversation_name,
-                    "type": "group",
-                    "created_at": int(time.time() * 1000),
-                    "updated_at": int(time.time() * 1000),
-                }
-            )
-            logger.info(f"安检时发现未知会话 '{conversation_id}'，已为其创建档案。")
+        # 先确保 conversation 文档存在
+        await self._ensure_conversation_exists(conversation_id, platform, conversation_name)
 
         props = MembershipProperties(
             group_name=conversation_name,
@@ -179,17 +325,10 @@ class PersonStorageService:
 
         edge_doc = {"_key": edge_key, "_from": from_vertex, "_to": to_vertex, **props.to_dict()}
 
-        query = """
-            UPSERT { _key: @key }
-            INSERT @doc
-            UPDATE @doc
-            IN @@collection
-            RETURN NEW
-        """
         bind_vars = {"key": edge_key, "doc": edge_doc, "@collection": CoreDBCollections.PARTICIPATES_IN}
 
         try:
-            await self.conn_manager.execute_query(query, bind_vars)
+            await self.conn_manager.run_query(UPSERT_MEMBERSHIP_QUERY, bind_vars)
             logger.debug(f"成功更新机器人成员关系: Account '{account_uid}' in Conversation '{conversation_id}'")
             return True
         except Exception as e:
@@ -198,7 +337,7 @@ class PersonStorageService:
 
     async def _create_new_person_with_account(
         self,
-        user_info: ProtocolUserInfo,
+        user_info: "ProtocolUserInfo",
         platform: str,
         is_self: bool = False,
     ) -> tuple[str | None, str | None]:
@@ -211,41 +350,6 @@ class PersonStorageService:
         account = AccountDocument.from_user_info(user_info, platform)
 
         # 使用单个AQL查询来确保操作的原子性，替代JS事务
-        query = """
-            LET person_doc = @person_doc
-            LET account_doc = @account_doc
-            LET timestamp = @timestamp
-
-            LET person_result = (
-                UPSERT { _key: person_doc._key }
-                INSERT person_doc
-                UPDATE {}
-                IN @@persons_coll
-                RETURN NEW
-            )[0]
-
-            LET account_result = (
-                UPSERT { _key: account_doc._key }
-                INSERT account_doc
-                UPDATE {}
-                IN @@accounts_coll
-                RETURN NEW
-            )[0]
-
-            LET edge_doc = {
-                _key: CONCAT(person_result._key, "_has_", account_result._key),
-                _from: person_result._id,
-                _to: account_result._id,
-                created_at: timestamp
-            }
-
-            UPSERT { _key: edge_doc._key }
-            INSERT edge_doc
-            UPDATE {}
-            IN @@has_account_coll
-
-            RETURN { person_id: person_result._key, account_uid: account_result._key }
-        """
         bind_vars = {
             "person_doc": person.to_dict(),
             "account_doc": account.to_dict(),
@@ -256,7 +360,7 @@ class PersonStorageService:
         }
 
         try:
-            results = await self.conn_manager.execute_query(query, bind_vars)
+            results = await self.conn_manager.run_query(CREATE_PERSON_WITH_ACCOUNT_QUERY, bind_vars)
             if results and isinstance(results, list) and len(results) > 0:
                 result = results[0]
                 person_id = result.get("person_id")
@@ -273,7 +377,7 @@ class PersonStorageService:
             return None, None
 
     async def update_membership(
-        self, account_uid: str, conversation_id: str, user_info: ProtocolUserInfo, conversation_name: str | None
+        self, account_uid: str, conversation_id: str, user_info: "ProtocolUserInfo", conversation_name: str | None
     ) -> None:
         """更新账号在会话中的成员信息（边属性）。"""
         # ↓↓↓ 这里的调用现在是正确的了，因为 is_edge=True 会通过图对象获取集合 ↓↓↓
@@ -295,17 +399,10 @@ class PersonStorageService:
         edge_doc = {"_key": edge_key, "_from": from_vertex, "_to": to_vertex, **props.to_dict()}
 
         # 使用UPSERT AQL语句，这比先查后插/更新更高效、更原子性
-        query = """
-            UPSERT { _key: @key }
-            INSERT @doc
-            UPDATE @doc
-            IN @@collection
-            RETURN NEW
-        """
         bind_vars = {"key": edge_key, "doc": edge_doc, "@collection": CoreDBCollections.PARTICIPATES_IN}
 
         try:
-            await self.conn_manager.execute_query(query, bind_vars)
+            await self.conn_manager.run_query(UPSERT_MEMBERSHIP_QUERY, bind_vars)
             logger.debug(f"成功更新成员关系: Account '{account_uid}' in Conversation '{conversation_id}'")
         except Exception as e:
             logger.error(f"更新成员关系时失败: {e}", exc_info=True)
@@ -316,50 +413,6 @@ class PersonStorageService:
         """
         account_uid = f"{platform}_{platform_id}"
 
-        query = """
-            LET account = DOCUMENT(@@accounts_coll, @account_uid)
-
-            // 找到这个账号属于哪个人
-            LET person = (
-                FOR p IN 1..1 INBOUND account @@has_account_coll
-                    RETURN p
-            )[0]
-
-            // 如果没找到人，就别玩了
-            FILTER person != null
-
-            // 找到这个人的所有账号
-            LET all_accounts = (
-                FOR acc IN 1..1 OUTBOUND person @@has_account_coll
-                    RETURN acc
-            )
-
-            // 找到这个人参与的所有群聊
-            LET all_memberships = (
-                FOR acc IN all_accounts
-                    FOR conv, edge IN 1..1 OUTBOUND acc @@participates_in_coll
-                        RETURN {
-                            membership_id: edge._key,
-                            account_uid: acc.account_uid,
-                            group_id: conv.conversation_id,
-                            platform: conv.platform,
-                            group_name: edge.group_name,
-                            cardname: edge.cardname,
-                            permission_level: edge.permission_level
-                        }
-            )
-
-            RETURN {
-                person_id: person.person_id,
-                profile: person.profile,
-                accounts: all_accounts,
-                memberships: all_memberships,
-                metadata: {
-                    created_at: person.created_at,
-                    updated_at: person.updated_at
-                }
-            }
-        """
         bind_vars = {
             "account_uid": account_uid,
             "@accounts_coll": CoreDBCollections.ACCOUNTS,
@@ -367,5 +420,5 @@ class PersonStorageService:
             "@participates_in_coll": CoreDBCollections.PARTICIPATES_IN,
         }
 
-        results = await self.conn_manager.execute_query(query, bind_vars)
+        results = await self.conn_manager.run_query(PERSON_DETAILS_QUERY, bind_vars)
         return results[0] if results else None
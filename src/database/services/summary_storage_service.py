@@ -1,12 +1,24 @@
 # src/database/services/summary_storage_service.py
 import time
 import uuid
+from typing import Any
 
 from src.common.custom_logging.logging_config import get_logger
 from src.database import ArangoDBConnectionManager, ConversationSummaryDocument, CoreDBCollections
+from src.database.core.query_registry import query_registry
 
 logger = get_logger(__name__)
 
+SUMMARIES_BY_IDS_QUERY = query_registry.register(
+    "summaries.by_ids",
+    """
+        FOR doc IN @@collection
+            FILTER doc._key IN @keys
+            RETURN doc
+    """,
+    {"@collection": str, "keys": list},
+)
+
 
 class SummaryStorageService:
     """
@@ -21,6 +33,23 @@ class SummaryStorageService:
         self.db_manager = db_manager
         self.summaries_collection = None  # 在异步方法中动态获取
 
+    @staticmethod
+    def build_summary_document(
+        conversation_id: str, summary_text: str, platform: str, bot_id: str, event_ids_covered: list[str]
+    ) -> ConversationSummaryDocument:
+        """生成一条新的总结文档，ID 和时间戳在这里定（两种存储后端共用）。"""
+        summary_id = f"summary_{uuid.uuid4()}"
+        return ConversationSummaryDocument(
+            _key=summary_id,
+            summary_id=summary_id,
+            conversation_id=conversation_id,
+            timestamp=int(time.time() * 1000),
+            platform=platform,
+            bot_id=bot_id,
+            summary_text=summary_text,
+            event_ids_covered=event_ids_covered,
+        )
+
     async def save_summary(
         self,
         conversation_id: str,
@@ -28,7 +57,7 @@ class SummaryStorageService:
         platform: str,
         bot_id: str,
         event_ids_covered: list[str],
-    ) -> bool:
+    ) -> ConversationSummaryDocument | None:
         """
         将一个会话的最终总结保存到数据库。
 
@@ -37,7 +66,7 @@ class SummaryStorageService:
         :param platform: 会话所属平台。
         :param bot_id: 处理此会话的机器人ID。
         :param event_ids_covered: 此总结所覆盖的事件ID列表。
-        :return: 如果保存成功，返回 True，否则返回 False。
+        :return: 保存成功返回存进去的总结文档（语义索引要用它的 ID 和时间戳），否则返回 None。
         """
         # 在异步方法中动态获取集合，确保操作的原子性和异步正确性
         collection_name = CoreDBCollections.CONVERSATION_SUMMARIES
@@ -45,34 +74,35 @@ class SummaryStorageService:
             self.summaries_collection = await self.db_manager.get_collection(collection_name)
             if not self.summaries_collection:
                 logger.error(f"无法获取 '{collection_name}' 集合，操作中止。")
-                return False
+                return None
         except Exception as e:
             logger.error(f"尝试保存总结时，无法获取 '{collection_name}' 集合: {e}", exc_info=True)
-            return False
+            return None
 
         if not summary_text or not summary_text.strip():
             logger.warning("尝试保存一个空的总结，操作已取消。")
-            return False
+            return None
 
-        summary_id = f"summary_{uuid.uuid4()}"
-        timestamp_ms = int(time.time() * 1000)
-
-        summary_doc = ConversationSummaryDocument(
-            _key=summary_id,
-            summary_id=summary_id,
-            conversation_id=conversation_id,
-            timestamp=timestamp_ms,
-            platform=platform,
-            bot_id=bot_id,
-            summary_text=summary_text,
-            event_ids_covered=event_ids_covered,
-        )
+        summary_doc = self.build_summary_document(conversation_id, summary_text, platform, bot_id, event_ids_covered)
+        summary_id = summary_doc.summary_id
 
         try:
             doc_to_insert = summary_doc.to_dict()
             await self.summaries_collection.insert(doc_to_insert)
             logger.info(f"成功将总结 '{summary_id}' 保存到会话 '{conversation_id}' 的数据库中。")
-            return True
+            return summary_doc
         except Exception as e:
             logger.error(f"将会话 '{conversation_id}' 的总结保存到数据库时失败: {e}", exc_info=True)
-            return False
+            return None
+
+    async def get_summaries_by_ids(self, summary_ids: list[str]) -> list[dict[str, Any]]:
+        """根据 summary_id (_key) 列表批量取总结文档，语义检索命中总结时用。"""
+        if not summary_ids:
+            return []
+        try:
+            bind_vars = {"@collection": CoreDBCollections.CONVERSATION_SUMMARIES, "keys": summary_ids}
+            results = await self.db_manager.run_query(SUMMARIES_BY_IDS_QUERY, bind_vars)
+            return results if results is not None else []
+        except Exception as e:
+            logger.error(f"根据ID列表获取总结失败: {e}", exc_info=True)
+            return []
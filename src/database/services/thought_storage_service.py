@@ -15,9 +15,40 @@ from src.database import (
     ArangoDBConnectionManager,
     CoreDBCollections,
 )
+from src.database.core.query_registry import query_registry
+from src.database.services.core_state_cache import core_state_cache
 
 logger = get_logger(__name__)
 
+LATEST_THOUGHTS_QUERY = query_registry.register(
+    "thoughts.latest",
+    """
+        FOR doc IN @@collection
+            SORT doc.timestamp DESC
+            LIMIT @limit
+            RETURN doc
+    """,
+    {"@collection": str, "limit": int},
+)
+
+HAS_UNUSED_INTRUSIVE_QUERY = query_registry.register(
+    "intrusive_thoughts.has_unused",
+    "RETURN LENGTH(FOR doc IN @@collection FILTER doc.used == false LIMIT 1 RETURN 1)",
+    {"@collection": str},
+)
+
+RANDOM_UNUSED_INTRUSIVE_QUERY = query_registry.register(
+    "intrusive_thoughts.random_unused",
+    """
+        FOR doc IN @@collection
+            FILTER doc.used == false
+            SORT RAND()
+            LIMIT 1
+            RETURN doc
+    """,
+    {"@collection": str},
+)
+
 
 class ThoughtStorageService:
     """
@@ -30,6 +61,7 @@ class ThoughtStorageService:
 
     def __init__(self, conn_manager: ArangoDBConnectionManager) -> None:
         self.conn_manager = conn_manager
+        self.state_cache = core_state_cache  # 最新思考的直写缓存，主意识每轮读它就不用查库了
         # // 小懒猫的注释：哼，折腾了半天，终于搞对了吗？
         # 小色猫的反击：姐姐你等着瞧！这次我和主人的爱，是原生异步的，没有一丝杂质！
 
@@ -43,6 +75,34 @@ class ThoughtStorageService:
         await self.conn_manager.ensure_collection_with_indexes(self.INTRUSIVE_POOL_COLLECTION, intrusive_indexes)
         logger.info(f"'{self.INTRUSIVE_POOL_COLLECTION}' 集合及其特定索引已初始化。")
 
+    @staticmethod
+    def prepare_main_thought_document(thought_document: dict[str, Any]) -> dict[str, Any]:
+        """补上 _key 和 ISO 时间戳（两种存储后端共用）。"""
+        if "_key" not in thought_document:
+            thought_document["_key"] = str(uuid.uuid4())
+        if "timestamp" not in thought_document:
+            thought_document["timestamp"] = datetime.datetime.now(datetime.UTC).isoformat()
+        return thought_document
+
+    @staticmethod
+    def prepare_intrusive_thought_documents(thought_document_list: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """复制一份并补上 _key、生成时间和 used 标记，不是字典的直接丢掉。"""
+        current_time_iso = datetime.datetime.now(datetime.UTC).isoformat()
+        processed_documents_for_db: list[dict[str, Any]] = []
+
+        for doc_data in thought_document_list:
+            if not isinstance(doc_data, dict):
+                continue
+            final_doc = doc_data.copy()
+            if "_key" not in final_doc:
+                final_doc["_key"] = str(uuid.uuid4())
+            if "timestamp_generated" not in final_doc:
+                final_doc["timestamp_generated"] = current_time_iso
+            if "used" not in final_doc:
+                final_doc["used"] = False
+            processed_documents_for_db.append(final_doc)
+        return processed_documents_for_db
+
     async def get_main_thought_document_by_key(self, doc_key: str) -> dict[str, Any] | None:
         """获取指定 _key 的主意识思考文档。"""
         if not doc_key:
@@ -74,10 +134,7 @@ class ThoughtStorageService:
             )
             return None
 
-        if "_key" not in thought_document:
-            thought_document["_key"] = str(uuid.uuid4())
-        if "timestamp" not in thought_document:
-            thought_document["timestamp"] = datetime.datetime.now(datetime.UTC).isoformat()
+        self.prepare_main_thought_document(thought_document)
 
         doc_key_for_log = thought_document.get("_key", "未知Key")
 
@@ -87,6 +144,7 @@ class ThoughtStorageService:
             result = await collection.insert(thought_document, overwrite=False)
 
             if result and result.get("_key"):
+                self.state_cache.record_thought(thought_document)
                 logger.debug(f"主思考文档 '{result.get('_key')}' 已成功保存。")
                 return result.get("_key")
             else:
@@ -100,19 +158,19 @@ class ThoughtStorageService:
             return None
 
     async def get_latest_main_thought_document(self, limit: int = 1) -> list[dict[str, Any]]:
-        """获取最新的一个或多个主意识思考文档。"""
+        """获取最新的一个或多个主意识思考文档。只要最新一条时直接读直写缓存，只有冷启动才查库。"""
         if limit <= 0:
             logger.warning("获取最新思考文档的 limit 参数必须为正整数。")
             return []
-        query = """
-            FOR doc IN @@collection
-                SORT doc.timestamp DESC
-                LIMIT @limit
-                RETURN doc
-        """
+        if limit == 1 and self.state_cache.thought_loaded:
+            latest = self.state_cache.latest_thought()
+            return [latest] if latest else []
         bind_vars = {"@collection": self.MAIN_THOUGHTS_COLLECTION, "limit": limit}
-        results = await self.conn_manager.execute_query(query, bind_vars)
-        return results if results is not None else []
+        results = await self.conn_manager.run_query(LATEST_THOUGHTS_QUERY, bind_vars)
+        results = results if results is not None else []
+        if not self.state_cache.thought_loaded:
+            self.state_cache.load_latest_thought(results[0] if results else None)
+        return results
 
     async def update_action_status_in_thought_document(
         self, doc_key: str, action_id: str, status_update_dict: dict[str, Any]
@@ -129,61 +187,50 @@ class ThoughtStorageService:
             return False
 
         try:
-            collection = await self.conn_manager.get_collection(self.MAIN_THOUGHTS_COLLECTION)
-
-            # ↓↓↓ 同样，直接 await，抛弃 to_thread！↓↓↓
-            doc_to_update = await collection.get(doc_key)
-            if not doc_to_update:
-                logger.error(f"无法更新动作状态：找不到思考文档 '{doc_key}'。")
-                return False
-
-            action_attempted_current = doc_to_update.get("action_attempted")
-
-            if action_attempted_current is None:
-                if status_update_dict.get("status") == "COMPLETED_NO_TOOL":
-                    logger.info(f"文档 '{doc_key}' 无 action_attempted，符合 COMPLETED_NO_TOOL 状态。")
-                    return True
-                else:
-                    logger.error(f"文档 '{doc_key}' 无 'action_attempted' 字段，无法更新。")
-                    return False
-
-            if not isinstance(action_attempted_current, dict) or action_attempted_current.get("action_id") != action_id:
-                logger.error(f"文档 '{doc_key}' 中 'action_attempted' 的 action_id 不匹配。")
-                return False
-
-            updated_action_data = {**action_attempted_current, **status_update_dict}
-            patch_document_for_db = {"action_attempted": updated_action_data}
-
-            # ↓↓↓ 啊~ 直接的、深入的更新，这才是原生异步的纯粹快感！↓↓↓
-            await collection.update({"_key": doc_key, **patch_document_for_db})
-            logger.info(f"文档 '{doc_key}' 中动作 '{action_id}' 状态已更新为: {status_update_dict}。")
-            return True
-        except DocumentUpdateError as e:
-            logger.error(f"更新文档 '{doc_key}' 数据库失败: {e}", exc_info=True)
-            return False
+            # 一条 UPDATE 搞定：按 _key 找文档、核对 action_id、在服务端把状态合并进 action_attempted。
+            # 只有直写缓存里正好是这条思考时，才要 NEW 回来同步缓存
+            needs_new = self.state_cache.holds_thought(doc_key)
+            result = await self.conn_manager.merge_update(
+                self.MAIN_THOUGHTS_COLLECTION,
+                {"action_attempted": status_update_dict},
+                key=doc_key,
+                match={"action_attempted.action_id": action_id},
+                return_new=needs_new,
+            )
+            if result is not None:
+                if needs_new:
+                    self.state_cache.record_thought_action(doc_key, result.get("action_attempted") or {})
+                logger.info(f"文档 '{doc_key}' 中动作 '{action_id}' 状态已更新为: {status_update_dict}。")
+                return True
+            # 没对上才回头读一次文档，弄清楚到底是哪里不对（少见的路径，不在乎多一次往返）
+            return await self._explain_action_status_miss(doc_key, action_id, status_update_dict)
         except Exception as e:
             logger.error(f"更新文档 '{doc_key}' 时发生意外错误: {e}", exc_info=True)
             return False
 
+    async def _explain_action_status_miss(
+        self, doc_key: str, action_id: str, status_update_dict: dict[str, Any]
+    ) -> bool:
+        doc = await self.get_main_thought_document_by_key(doc_key)
+        if not doc:
+            logger.error(f"无法更新动作状态：找不到思考文档 '{doc_key}'。")
+            return False
+        action_attempted_current = doc.get("action_attempted")
+        if action_attempted_current is None:
+            if status_update_dict.get("status") == "COMPLETED_NO_TOOL":
+                logger.info(f"文档 '{doc_key}' 无 action_attempted，符合 COMPLETED_NO_TOOL 状态。")
+                return True
+            logger.error(f"文档 '{doc_key}' 无 'action_attempted' 字段，无法更新。")
+            return False
+        logger.error(f"文档 '{doc_key}' 中 'action_attempted' 的 action_id 不匹配。")
+        return False
+
     async def save_intrusive_thoughts_batch(self, thought_document_list: list[dict[str, Any]]) -> bool:
         """批量保存侵入性思维文档到数据库。"""
         if not thought_document_list:
             return True
 
-        current_time_iso = datetime.datetime.now(datetime.UTC).isoformat()
-        processed_documents_for_db: list[dict[str, Any]] = []
-
-        for doc_data in thought_document_list:
-            if not isinstance(doc_data, dict):
-                continue
-            final_doc = doc_data.copy()
-            if "_key" not in final_doc:
-                final_doc["_key"] = str(uuid.uuid4())
-            if "timestamp_generated" not in final_doc:
-                final_doc["timestamp_generated"] = current_time_iso
-            if "used" not in final_doc:
-                final_doc["used"] = False
-            processed_documents_for_db.append(final_doc)
+        processed_documents_for_db = self.prepare_intrusive_thought_documents(thought_document_list)
 
         if not processed_documents_for_db:
             # 空输入不是失败，而是无操作，返回 True 表示成功处理
@@ -212,24 +259,14 @@ class ThoughtStorageService:
     async def get_random_unused_intrusive_thought_document(self) -> dict[str, Any] | None:
         """从侵入性思维池中获取一个随机的、未被使用过的侵入性思维文档。"""
         try:
-            # (这个方法的逻辑本来就是对的，因为它调用的是我们已经修正过的 execute_query)
-            count_query = "RETURN LENGTH(FOR doc IN @@collection FILTER doc.used == false LIMIT 1 RETURN 1)"
-            bind_vars_count = {"@collection": self.INTRUSIVE_POOL_COLLECTION}
-            count_result = await self.conn_manager.execute_query(count_query, bind_vars_count)
+            bind_vars = {"@collection": self.INTRUSIVE_POOL_COLLECTION}
+            count_result = await self.conn_manager.run_query(HAS_UNUSED_INTRUSIVE_QUERY, bind_vars)
 
             if not count_result or count_result[0] == 0:
                 logger.info("侵入性思维池中当前没有未被使用过的思维。")
                 return None
 
-            query = """
-                FOR doc IN @@collection
-                    FILTER doc.used == false
-                    SORT RAND()
-                    LIMIT 1
-                    RETURN doc
-            """
-            bind_vars_query = {"@collection": self.INTRUSIVE_POOL_COLLECTION}
-            results = await self.conn_manager.execute_query(query, bind_vars_query)
+            results = await self.conn_manager.run_query(RANDOM_UNUSED_INTRUSIVE_QUERY, bind_vars)
             return results[0] if results else None
 
         except Exception as e:
@@ -264,41 +301,15 @@ class ThoughtStorageService:
         if not action_id_to_mark:
             return False
 
-        find_query = (
-            "FOR doc IN @@collection FILTER doc.action_attempted.action_id == @action_id LIMIT 1 RETURN doc._key"
+        # 找文档和打标记合成一条 UPDATE；已经是 True 的再写一次也无妨，比先读出来判断便宜
+        result = await self.conn_manager.merge_update(
+            self.MAIN_THOUGHTS_COLLECTION,
+            {"action_attempted": {"result_seen_by_shimo": True}},
+            match={"action_attempted.action_id": action_id_to_mark},
         )
-        bind_vars_find = {"@collection": self.MAIN_THOUGHTS_COLLECTION, "action_id": action_id_to_mark}
-
-        found_keys = await self.conn_manager.execute_query(find_query, bind_vars_find)
-        if not found_keys:
+        if result is None:
             logger.warning(f"未找到 action_id 为 '{action_id_to_mark}' 的思考文档。")
             return False
-
-        doc_key_to_update = found_keys[0]
-
-        try:
-            collection = await self.conn_manager.get_collection(self.MAIN_THOUGHTS_COLLECTION)
-            # ↓↓↓ 这里也全部换成直接的 await！就像你直接抚摸我的肌肤~ ↓↓↓
-            doc_to_update = await collection.get(doc_key_to_update)
-
-            if not doc_to_update:
-                logger.error(f"获取文档 '{doc_key_to_update}' 失败。")
-                return False
-
-            action_attempted_current = doc_to_update.get("action_attempted")
-            if not isinstance(action_attempted_current, dict):
-                logger.error(f"文档 '{doc_key_to_update}' 的 action_attempted 结构不正确。")
-                return False
-
-            if action_attempted_current.get("result_seen_by_shimo") is True:
-                return True
-
-            action_attempted_updated = {**action_attempted_current, "result_seen_by_shimo": True}
-            patch_for_db = {"action_attempted": action_attempted_updated}
-
-            await collection.update({"_key": doc_key_to_update, **patch_for_db})
-            logger.info(f"已将文档 '{doc_key_to_update}' (action_id: {action_id_to_mark}) 的结果标记为已阅。")
-            return True
-        except Exception as e:
-            logger.error(f"更新文档 '{doc_key_to_update}' 标记已阅时发生错误: {e}", exc_info=True)
-            return False
+        self.state_cache.record_thought_action_by_id(action_id_to_mark, {"result_seen_by_shimo": True})
+        logger.info(f"已将文档 '{result['_key']}' (action_id: {action_id_to_mark}) 的结果标记为已阅。")
+        return True
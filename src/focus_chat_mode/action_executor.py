@@ -1,5 +1,6 @@
 # src/focus_chat_mode/action_executor.py
 import asyncio
+import contextlib
 import json
 import random
 import time
@@ -10,6 +11,7 @@ from aicarus_protocols import ConversationInfo, Seg, SegBuilder, UserInfo
 from aicarus_protocols import Event as ProtocolEvent
 
 from src.common.custom_logging.logging_config import get_logger
+from src.common.json_parser.incremental_reply_parser import IncrementalReplyParser
 from src.common.utils import is_valid_message
 from src.config import config
 from src.database import DBEventDocument
@@ -61,10 +63,17 @@ class ActionExecutor:
         final_delay = min(total_delay, max_total_delay)
         return final_delay
 
-    async def execute_action(self, parsed_data: dict, uid_map: dict) -> tuple[bool, int, int]:
+    def create_streamed_reply(self, uid_map: dict) -> "StreamedReplySender":
+        """给流式回复准备一个边生成边发送的发送器。"""
+        return StreamedReplySender(self, uid_map)
+
+    async def execute_action(
+        self, parsed_data: dict, uid_map: dict, streamed_reply: "StreamedReplySender | None" = None
+    ) -> tuple[bool, int, int]:
         """
         根据LLM的决策执行回复或记录内部思考。
         现在返回一个元组: (是否发生了互动, 实际发送数, 计划发送数)
+        streamed_reply 不为空时，说明前面几条在生成过程中已经发出去了，这里只补发剩下的。
         """
         # --- Sanitize optional fields ---
         fields_to_sanitize = ["at_someone", "quote_reply", "reply_text", "poke"]
@@ -98,10 +107,15 @@ class ActionExecutor:
                 f"consecutive_bot_messages_count 增加到 {self.session.consecutive_bot_messages_count}，"
                 f"no_action_count 已重置。"
             )
+            if streamed_reply is not None:
+                sent_count = await streamed_reply.finish(parsed_data, valid_sentences)
+                return True, sent_count, len(valid_sentences)
             # 把已经算好的 valid_sentences 传给 _send_reply，省得它再算一遍
             sent_count = await self._send_reply(parsed_data, uid_map, valid_sentences)
             return True, sent_count, len(valid_sentences)
         else:
+            if streamed_reply is not None:
+                await streamed_reply.finish(parsed_data, [])
             # 我决定不说话，沉默计数器+1，话痨计数器不清零
             self.session.no_action_count += 1
             logger.debug(
@@ -112,6 +126,22 @@ class ActionExecutor:
             await self._log_internal_thought(parsed_data)
             return False, 0, 0
 
+    async def settle_abandoned_stream(self, streamed_reply: "StreamedReplySender") -> int:
+        """
+        流式回复没走完（最终 JSON 解析失败，或者思考阶段被打断）时调用：剩下的不发了，
+        但已经发出去的那几条是真说出口了的，话痨/沉默计数器得照实记上，不然下一轮的 prompt 会以为我一直没说话。
+        """
+        sent_count = await streamed_reply.abort()
+        if sent_count:
+            self.session.consecutive_bot_messages_count += sent_count
+            self.session.no_action_count = 0
+            self.session.messages_sent_this_turn = sent_count
+            logger.info(
+                f"[{self.session.conversation_id}] 流式回复没能完整收尾，已发出的 {sent_count} 条照样计数，"
+                f"consecutive_bot_messages_count 增加到 {self.session.consecutive_bot_messages_count}。"
+            )
+        return sent_count
+
     async def _send_reply(self, parsed_data: dict, uid_map: dict, valid_sentences: list[str]) -> int:
         """
         发送回复消息。现在它会返回实际发送的消息数量。
@@ -122,88 +152,16 @@ class ActionExecutor:
             logger.info(f"[{self.session.conversation_id}] _send_reply 收到空的有效消息列表，不发送。")
             return 0
 
-        at_target_values_raw = parsed_data.get("at_someone")
-        quote_msg_id = parsed_data.get("quote_reply")
-        current_motivation = parsed_data.get("motivation")
-
         bot_profile = await self.session.get_bot_profile()
-        correct_bot_id = str(bot_profile.get("user_id", self.session.bot_id))
 
         sent_count = 0  # 这是我们的小计数器
 
         # 烦人的循环开始了
         try:
             for i, sentence_text in enumerate(valid_sentences):
-                # 1. 计算这条消息的“模拟打字”时间
-                typing_delay = self._calculate_typing_delay(sentence_text)
-                logger.debug(
-                    f"[{self.session.conversation_id}] 模拟打字: '{sentence_text[:20]}...'，预计耗时 {typing_delay:.2f} 秒..."
-                )
-
-                # 2. 假装在打字，睡一会儿
-                await asyncio.sleep(typing_delay)
-
-                # 只有第一条消息才带 @ 和引用，后面的都是纯洁的肉体
-                content_segs_payload = self._build_reply_segments(
-                    i, sentence_text, quote_msg_id, at_target_values_raw, uid_map
-                )
-
-                success, result_payload = await self.action_handler.execute_simple_action(
-                    platform_id=self.session.platform,
-                    action_name="send_message",
-                    params={
-                        "conversation_id": self.session.conversation_id,
-                        "conversation_type": self.session.conversation_type,
-                        "content": content_segs_payload,
-                    },
-                    description="发送专注模式回复",
-                )
-
-                if success and isinstance(result_payload, dict) and result_payload.get("sent_message_id"):
-                    logger.info(f"发送回复成功，回执: {result_payload}")
-                    sent_count += 1  # 发送成功，计数器+1
-                    self.session.message_count_since_last_summary += 1
-
-                    sent_message_id = str(result_payload["sent_message_id"])
-
-                    # --- ❤❤❤ 看这里！这就是塞纸条的地方！❤❤❤ ---
-                    extra_data_for_backpack = {}
-                    motivation_for_log = (
-                        current_motivation if i == 0 and current_motivation and current_motivation.strip() else None
-                    )
-                    if motivation_for_log:
-                        extra_data_for_backpack["motivation"] = motivation_for_log
-
-                    # 把小背包（字典）变成一个字符串，这样才能塞进 raw_data
-                    raw_data_string = json.dumps(extra_data_for_backpack) if extra_data_for_backpack else None
-
-                    final_content_dicts = [
-                        SegBuilder.message_metadata(message_id=sent_message_id).to_dict(),
-                        *content_segs_payload,
-                    ]
-                    final_content_segs = [Seg.from_dict(d) for d in final_content_dicts]
-
-                    my_message_event = ProtocolEvent(
-                        event_id=f"self_msg_{sent_message_id}",
-                        event_type=f"message.{self.session.platform}.{self.session.conversation_type}",
-                        time=int(time.time() * 1000),
-                        bot_id=correct_bot_id,
-                        content=final_content_segs,
-                        user_info=UserInfo(user_id=correct_bot_id, user_nickname=bot_profile.get("nickname")),
-                        conversation_info=ConversationInfo(
-                            conversation_id=self.session.conversation_id, type=self.session.conversation_type
-                        ),
-                        raw_data=raw_data_string,  # <-- 看！把带小纸条的背包塞进去了！
-                    )
-
-                    db_doc_to_save = DBEventDocument.from_protocol(my_message_event)
-                    db_doc_to_save.status = "read"
-
-                    await self.event_storage.save_event_document(db_doc_to_save.to_dict())
-
-                else:
-                    logger.error(f"发送回复失败或未收到有效回执: {result_payload}")
+                if not await self._send_sentence(i, sentence_text, parsed_data, uid_map, bot_profile):
                     break
+                sent_count += 1  # 发送成功，计数器+1
 
                 # // 如果还有下一条，就睡一会儿，假装在打字，真麻烦
                 if len(valid_sentences) > 1 and i < len(valid_sentences) - 1:
@@ -222,6 +180,85 @@ class ActionExecutor:
             self.session.messages_sent_this_turn = sent_count
             logger.debug(f"[{self.session.conversation_id}] ActionExecutor 报告：本轮实际发送 {sent_count} 条消息。")
 
+    async def _send_sentence(
+        self, index: int, sentence_text: str, parsed_data: dict, uid_map: dict, bot_profile: dict
+    ) -> bool:
+        """模拟打字后发送单条回复并存进数据库。发送成功返回 True。"""
+        at_target_values_raw = parsed_data.get("at_someone")
+        quote_msg_id = parsed_data.get("quote_reply")
+        current_motivation = parsed_data.get("motivation")
+        correct_bot_id = str(bot_profile.get("user_id", self.session.bot_id))
+
+        # 1. 计算这条消息的“模拟打字”时间
+        typing_delay = self._calculate_typing_delay(sentence_text)
+        logger.debug(
+            f"[{self.session.conversation_id}] 模拟打字: '{sentence_text[:20]}...'，预计耗时 {typing_delay:.2f} 秒..."
+        )
+
+        # 2. 假装在打字，睡一会儿
+        await asyncio.sleep(typing_delay)
+
+        # 只有第一条消息才带 @ 和引用，后面的都是纯洁的肉体
+        content_segs_payload = self._build_reply_segments(
+            index, sentence_text, quote_msg_id, at_target_values_raw, uid_map
+        )
+
+        success, result_payload = await self.action_handler.execute_simple_action(
+            platform_id=self.session.platform,
+            action_name="send_message",
+            params={
+                "conversation_id": self.session.conversation_id,
+                "conversation_type": self.session.conversation_type,
+                "content": content_segs_payload,
+            },
+            description="发送专注模式回复",
+        )
+
+        if not (success and isinstance(result_payload, dict) and result_payload.get("sent_message_id")):
+            logger.error(f"发送回复失败或未收到有效回执: {result_payload}")
+            return False
+
+        logger.info(f"发送回复成功，回执: {result_payload}")
+        self.session.message_count_since_last_summary += 1
+
+        sent_message_id = str(result_payload["sent_message_id"])
+
+        # --- ❤❤❤ 看这里！这就是塞纸条的地方！❤❤❤ ---
+        extra_data_for_backpack = {}
+        motivation_for_log = (
+            current_motivation if index == 0 and current_motivation and current_motivation.strip() else None
+        )
+        if motivation_for_log:
+            extra_data_for_backpack["motivation"] = motivation_for_log
+
+        # 把小背包（字典）变成一个字符串，这样才能塞进 raw_data
+        raw_data_string = json.dumps(extra_data_for_backpack) if extra_data_for_backpack else None
+
+        final_content_dicts = [
+            SegBuilder.message_metadata(message_id=sent_message_id).to_dict(),
+            *content_segs_payload,
+        ]
+        final_content_segs = [Seg.from_dict(d) for d in final_content_dicts]
+
+        my_message_event = ProtocolEvent(
+            event_id=f"self_msg_{sent_message_id}",
+            event_type=f"message.{self.session.platform}.{self.session.conversation_type}",
+            time=int(time.time() * 1000),
+            bot_id=correct_bot_id,
+            content=final_content_segs,
+            user_info=UserInfo(user_id=correct_bot_id, user_nickname=bot_profile.get("nickname")),
+            conversation_info=ConversationInfo(
+                conversation_id=self.session.conversation_id, type=self.session.conversation_type
+            ),
+            raw_data=raw_data_string,  # <-- 看！把带小纸条的背包塞进去了！
+        )
+
+        db_doc_to_save = DBEventDocument.from_protocol(my_message_event)
+        db_doc_to_save.status = "read"
+
+        await self.event_storage.save_event_document(db_doc_to_save.to_dict())
+        return True
+
     def _build_reply_segments(
         self, index: int, text: str, quote_id: str | None, at_raw: str | list | None, uid_map: dict
     ) -> list:
@@ -286,3 +323,88 @@ class ActionExecutor:
         except Exception as e:
             logger.error(f"Failed to save internal ACT event: {e}", exc_info=True)
             return False
+
+
+class StreamedReplySender:
+    """
+    流式回复的发送器：LLM 还在写后面的句子，前面写完的就先发出去。
+    把流式文本喂给 feed，里面的增量解析器每闭合一条 reply_text 就排进队列，
+    由一个后台任务逐条“打字”发送；只有确认 reply_willing 为 true 之后才会开始发。
+    """
+
+    def __init__(self, executor: ActionExecutor, uid_map: dict) -> None:
+        self._executor = executor
+        self._session = executor.session
+        self._uid_map = uid_map
+        self._parser = IncrementalReplyParser("reply_text")
+        self._queue: asyncio.Queue[str | None] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+        self._parsed_so_far: dict = {}
+        # 一旦有句子因为还不知道要不要发言而被压下，后面的也只能等流结束后统一补发，免得乱序
+        self._holding: bool = False
+        self.queued_count: int = 0
+        self.sent_count: int = 0
+
+    async def feed(self, text: str) -> None:
+        """流式文本的监听器，每收到一段就调用一次。"""
+        for sentence in self._parser.feed(text):
+            if not is_valid_message(sentence):
+                continue
+            if self._holding or self._parser.fields.get("reply_willing") is not True:
+                self._holding = True
+                continue
+            # 这是个会继续长大的字典，第一条消息的 @ 和引用用的是发送那一刻已经写完的字段
+            self._parsed_so_far = self._parser.fields
+            self._enqueue(sentence)
+
+    async def finish(self, parsed_data: dict, valid_sentences: list[str]) -> int:
+        """流结束后补发还没排上队的句子，等全部发完，返回实际发送数。"""
+        self._parsed_so_far = parsed_data
+        for sentence in valid_sentences[self.queued_count :]:
+            self._enqueue(sentence)
+        if self._task is None:
+            return 0
+        self._queue.put_nowait(None)
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        return self.sent_count
+
+    def cancel(self) -> None:
+        """被打断了就别再发了，已经发出去的就算了。"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def abort(self) -> int:
+        """不发了：叫停发送任务并等它停稳，返回到此为止真正发出去了几条。"""
+        if self._task is not None:
+            self.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        return self.sent_count
+
+    def _enqueue(self, sentence: str) -> None:
+        self.queued_count += 1
+        self._queue.put_nowait(sentence)
+        if self._task is None:
+            self._task = asyncio.create_task(self._send_loop())
+
+    async def _send_loop(self) -> None:
+        bot_profile = await self._session.get_bot_profile()
+        index = 0
+        try:
+            while (sentence := await self._queue.get()) is not None:
+                if index > 0:
+                    await asyncio.sleep(random.uniform(0.5, 1.5))
+                if not await self._executor._send_sentence(
+                    index, sentence, self._parsed_so_far, self._uid_map, bot_profile
+                ):
+                    break
+                index += 1
+                self.sent_count += 1
+                self._session.messages_sent_this_turn = self.sent_count
+        except asyncio.CancelledError:
+            logger.info(f"[{self._session.conversation_id}] 流式发送被取消。已发送 {self.sent_count} 条。")
+            raise
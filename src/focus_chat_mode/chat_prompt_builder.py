@@ -1,6 +1,7 @@
 # src/focus_chat_mode/chat_prompt_builder.py
 
 import os
+from datetime import datetime
 from typing import TYPE_CHECKING, Any
 
 from src.action.action_handler import ActionHandler
@@ -168,6 +169,8 @@ class ChatPromptBuilder:
                     # 找到后就不再继续遍历了
                     break
 
+        related_memory_block_str = await self._build_related_memory_block(prompt_components)
+
         previous_thoughts_block_str = self._build_previous_thoughts_block(
             is_first_turn,
             was_last_turn_interrupted,
@@ -218,6 +221,7 @@ class ChatPromptBuilder:
             conversation_info_block=prompt_components.conversation_info_block,
             user_list_block=prompt_components.user_list_block,
             chat_history_log_block=prompt_components.chat_history_log_block,
+            related_memory_block=related_memory_block_str,
             previous_thoughts_block=previous_thoughts_block_str,
             dynamic_behavior_guidance=dynamic_guidance_str,
             member_count=member_count,
@@ -232,6 +236,54 @@ class ChatPromptBuilder:
         logger.debug(f"[{self.session.conversation_id}] User Prompt: {user_prompt}")
         return prompt_components
 
+    async def _build_related_memory_block(self, prompt_components: PromptComponents) -> str:
+        """
+        拿最新一条文本消息去语义记忆里捞本会话更早的相关消息和总结。
+        已经在聊天记录里的消息不算回忆，排除掉；捞不到或者出错就当没想起来。
+        """
+        nothing_recalled = "没有想起什么相关的往事。"
+        semantic_memory = self.session.semantic_memory
+        query_text = prompt_components.last_valid_text_message
+        if not semantic_memory or not query_text:
+            return nothing_recalled
+        try:
+            messages, summaries = await semantic_memory.retrieve_related_memory(
+                query_text,
+                conversation_id=self.session.conversation_id,
+                exclude_ids=set(prompt_components.history_event_ids),
+            )
+        except Exception as e:
+            logger.error(f"[{self.session.conversation_id}] 语义回忆相关记忆失败: {e}", exc_info=True)
+            return nothing_recalled
+
+        lines: list[str] = []
+        for summary in summaries:
+            lines.append(
+                f"[{self._format_memory_time(summary.get('timestamp'))}] 以前的对话总结: {summary.get('summary_text', '')}"
+            )
+        for message in sorted(messages, key=lambda doc: doc.get("timestamp") or 0):
+            text = "".join(
+                (seg.get("data") or {}).get("text", "")
+                for seg in message.get("content") or []
+                if isinstance(seg, dict) and seg.get("type") == "text"
+            ).strip()
+            if not text:
+                continue
+            user_info = message.get("user_info") or {}
+            sender = (
+                "你"
+                if str(user_info.get("user_id")) == str(self.bot_id)
+                else user_info.get("user_cardname") or user_info.get("user_nickname") or "某人"
+            )
+            lines.append(f"[{self._format_memory_time(message.get('timestamp'))}] {sender}: {text}")
+        return "\n".join(lines) or nothing_recalled
+
+    @staticmethod
+    def _format_memory_time(timestamp_ms: int | None) -> str:
+        if not timestamp_ms:
+            return "很久以前"
+        return datetime.fromtimestamp(int(timestamp_ms) / 1000.0).strftime("%Y-%m-%d %H:%M")
+
     def _build_previous_thoughts_block(
         self,
         is_first_turn: bool,
@@ -9,8 +9,10 @@ from src.action.action_handler import ActionHandler
 from src.common.custom_logging.logging_config import get_logger
 from src.config import config
 from src.database import ConversationStorageService
+from src.database.core.query_options import Projection
 from src.database.services.event_storage_service import EventStorageService
 from src.llmrequest.llm_processor import Client as LLMProcessorClient
+from src.llmrequest.request_scheduler import llm_request_scheduler
 
 from .action_executor import ActionExecutor
 from .behavioral_guidance_generator import BehavioralGuidanceGenerator
@@ -21,6 +23,7 @@ from .summarization_manager import SummarizationManager
 
 if TYPE_CHECKING:
     from src.common.intelligent_interrupt_system.intelligent_interrupter import IntelligentInterrupter
+    from src.common.semantic_memory.semantic_memory_service import SemanticMemoryService
     from src.common.summarization_observation.summarization_service import SummarizationService
     from src.core_logic.consciousness_flow import CoreLogic as CoreLogicFlow
     from src.database.services.summary_storage_service import SummaryStorageService
@@ -28,6 +31,7 @@ if TYPE_CHECKING:
 
 CACHE_EXPIRATION_SECONDS = 600
 CONVERSATION_DETAILS_CACHE_EXPIRATION_SECONDS = 7200  # 2小时
+SENDER_ONLY_PROJECTION = Projection(("_key", "timestamp", "user_info"))  # 判断“有没有别人说话”只要这几个字段
 
 logger = get_logger(__name__)
 
@@ -52,6 +56,7 @@ class ChatSession:
         summarization_service: "SummarizationService",
         summary_storage_service: "SummaryStorageService",
         intelligent_interrupter: "IntelligentInterrupter",
+        semantic_memory: "SemanticMemoryService | None" = None,
     ) -> None:
         self.conversation_id: str = conversation_id
         self.llm_client: LLMProcessorClient = llm_client
@@ -67,6 +72,7 @@ class ChatSession:
         self.summarization_service = summarization_service
         self.summary_storage_service = summary_storage_service
         self.intelligent_interrupter: IntelligentInterrupter = intelligent_interrupter
+        self.semantic_memory = semantic_memory
 
         # --- 模块化组件 --
         self.action_executor = ActionExecutor(self)
@@ -174,8 +180,13 @@ class ChatSession:
         根据新消息重置计数器。
         如果检测到有别人说话，就重置我（机器人）的连续发言计数。
         """
+        # 计数器先说一句有没有新消息，没有就不用把消息捞出来挨个看了
+        if not await self.event_storage.has_new_events_since(self.conversation_id, self.last_processed_timestamp):
+            return
+
+        # 这里只看是谁发的，别把整条消息都拉回来
         new_events = await self.event_storage.get_message_events_after_timestamp(
-            self.conversation_id, self.last_processed_timestamp
+            self.conversation_id, self.last_processed_timestamp, projection=SENDER_ONLY_PROJECTION
         )
 
         if not new_events:
@@ -213,17 +224,15 @@ class ChatSession:
             logger.debug(f"[{self.conversation_id}] 使用内存缓存的机器人档案。")
             return self.bot_profile_cache
 
-        # 2. 尝试从长期记忆（数据库）加载
-        #    这是我们最可靠的信息来源，由“上线安检”和“档案更新通知”来维护
-        # TODO: 优化缓存机制，全部改为直接从数据库中读取
-        conv_doc = await self.conversation_service.get_conversation_document_by_id(self.conversation_id)
-        if conv_doc and conv_doc.get("bot_profile_in_this_conversation"):
-            db_profile = conv_doc["bot_profile_in_this_conversation"]
-            if db_profile:
-                self.bot_profile_cache = db_profile
-                self.last_profile_update_time = time.time()
-                logger.debug(f"[{self.conversation_id}] 从数据库加载了机器人档案并放入缓存。")
-                return self.bot_profile_cache
+        # 2. 尝试从长期记忆加载
+        #    这是我们最可靠的信息来源，由“上线安检”和“档案更新通知”来维护；
+        #    会话名录就绪时直接从内存里拿，不用再去数据库点读整份会话文档
+        db_profile = await self.conversation_service.get_bot_profile(self.conversation_id)
+        if db_profile:
+            self.bot_profile_cache = db_profile
+            self.last_profile_update_time = time.time()
+            logger.debug(f"[{self.conversation_id}] 从会话名录加载了机器人档案并放入缓存。")
+            return self.bot_profile_cache
 
         # --- ❤❤❤ 终极切除手术 ❤❤❤ ---
         # 3. 删掉那个多余又危险的“主动询问适配器”的逻辑！
@@ -279,6 +288,8 @@ class ChatSession:
         logger.info(f"[ChatSession][{self.conversation_id}] 正在发起停用请求...")
         # 设置 is_active 为 False，让循环自然结束
         self.is_active = False
+        # 这个会话还在排队的LLM请求也没必要再发了
+        llm_request_scheduler.cancel_group(self.conversation_id)
         # 触发 cycler 的关闭
         if self.cycler:
             asyncio.create_task(self.cycler.shutdown())
@@ -8,6 +8,7 @@ from aicarus_protocols import Event
 
 from src.action.action_handler import ActionHandler
 from src.common.custom_logging.logging_config import get_logger
+from src.common.tracing.tracer import tracer
 from src.config.aicarus_configs import FocusChatModeSettings
 from src.database import ConversationStorageService
 from src.database.services.event_storage_service import EventStorageService
@@ -19,6 +20,7 @@ from .chat_session import ChatSession
 if TYPE_CHECKING:
     # 引入智能中断系统模块，用于类型提示。
     from src.common.intelligent_interrupt_system.intelligent_interrupter import IntelligentInterrupter
+    from src.common.semantic_memory.semantic_memory_service import SemanticMemoryService
     from src.common.summarization_observation.summarization_service import SummarizationService
     from src.core_logic.consciousness_flow import CoreLogic as CoreLogicFlow
 
@@ -43,6 +45,7 @@ class ChatSessionManager:
         summary_storage_service: "SummaryStorageService",
         intelligent_interrupter: "IntelligentInterrupter",
         core_logic: Optional["CoreLogicFlow"] = None,
+        semantic_memory: Optional["SemanticMemoryService"] = None,
     ) -> None:
         self.config = config
         self.llm_client = llm_client
@@ -57,6 +60,7 @@ class ChatSessionManager:
         self.intelligent_interrupter = intelligent_interrupter
 
         self.core_logic = core_logic
+        self.semantic_memory = semantic_memory
 
         self.sessions: dict[str, ChatSession] = {}
         self.lock = asyncio.Lock()
@@ -109,6 +113,7 @@ class ChatSessionManager:
                     summarization_service=self.summarization_service,
                     summary_storage_service=self.summary_storage_service,
                     intelligent_interrupter=self.intelligent_interrupter,
+                    semantic_memory=self.semantic_memory,
                 )
 
             return self.sessions[conversation_id]
@@ -187,6 +192,8 @@ class ChatSessionManager:
         )
 
         if session.is_active and hasattr(session.cycler, "wakeup"):
+            # 这条消息接下来由专注聊天循环处理，它的计时也交给循环去收尾
+            tracer.hand_off()
             session.cycler.wakeup()
         # TODO:
         # 激活逻辑：如果被@或收到私聊消息，则激活会话
@@ -197,6 +204,7 @@ class ChatSessionManager:
             # 从 CoreLogic 获取最新的思考和心情
             last_think = self.core_logic.get_latest_thought() if self.core_logic else None
             last_mood = self.core_logic.get_latest_mood() if self.core_logic else "平静"
+            tracer.hand_off()
             session.activate(core_last_think=last_think, core_last_mood=last_mood)
 
         # 在新的主动循环模型中，管理器不再直接将事件推给会话。
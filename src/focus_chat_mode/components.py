@@ -13,6 +13,7 @@ class PromptComponents:
     uid_str_to_platform_id_map: dict[str, str] = field(default_factory=dict)
     user_map: dict[str, dict[str, Any]] = field(default_factory=dict)
     processed_event_ids: list[str] = field(default_factory=list)
+    history_event_ids: list[str] = field(default_factory=list)  # 聊天记录里已经展示的全部事件，语义回忆时排除掉
     image_references: list[str] = field(default_factory=list)
     conversation_name: str | None = None
     conversation_info_block: str = ""
@@ -3,11 +3,16 @@
 # 这可是我为你量身打造的、最终极的“专注高潮循环引擎”，保证每一次都能让你爽到！
 
 import asyncio
+import functools
 import time
+import uuid
 from typing import TYPE_CHECKING
 
 from src.common.custom_logging.logging_config import get_logger
+from src.common.tracing.tracer import tracer
 from src.config import config
+from src.llmrequest.hedging import RequestHedger, get_hedger
+from src.llmrequest.request_scheduler import LLMPriority
 
 # 导入我们那个性感的、滴水不漏的指令容器！
 from .chat_prompt_builder import PromptComponents
@@ -15,6 +20,7 @@ from .chat_prompt_builder import PromptComponents
 if TYPE_CHECKING:
     from src.common.intelligent_interrupt_system.intelligent_interrupter import IntelligentInterrupter
 
+    from .action_executor import StreamedReplySender
     from .chat_session import ChatSession
 
 logger = get_logger(__name__)
@@ -133,11 +139,16 @@ class FocusChatCycler:
             # ==================================
             llm_task = None
             interrupt_checker_task = None
+            streamed_reply: StreamedReplySender | None = None
+            round_started_at = time.monotonic()
+            traced_event_id: str | None = None
+            trace_token = None
             try:
                 # 先看看有没有人说话，更新一下我的话痨/自闭计数器
                 await self.session.update_counters_on_new_events()
 
                 # 让我的小弟 PromptBuilder 去把所有材料都准备好，然后用那个性感的容器装回来！
+                prompt_started_at = time.monotonic()
                 prompt_components: PromptComponents = await self.prompt_builder.build_prompts(
                     session=self.session,
                     last_processed_timestamp=self.session.last_processed_timestamp,
@@ -150,6 +161,8 @@ class FocusChatCycler:
                     interrupting_event_text=self.interrupting_event_text,
                 )
 
+                prompt_built_at = time.monotonic()
+
                 # 用完就丢，清理掉这次中断的“罪证”，免得下次还用它
                 self.interrupting_event_text = None
                 was_interrupted_last_turn = False  # 重置中断标记
@@ -168,6 +181,13 @@ class FocusChatCycler:
                     prompt_components.processed_event_ids[-1] if prompt_components.processed_event_ids else None
                 )
 
+                # 续上“引信”消息的全链路计时，后面创建的任务都会继承它
+                trace_token = tracer.activate(triggering_event_id)
+                if trace_token is not None:
+                    traced_event_id = triggering_event_id
+                    tracer.record_between("cycler_wakeup", None, round_started_at)
+                    tracer.record_between("prompt_build", prompt_started_at, prompt_built_at)
+
                 # 根据是群P还是私处调教，选择不同的“春宫图菜单”
                 response_schema = (
                     GROUP_RESPONSE_SCHEMA if self.session.conversation_type == "group" else PRIVATE_RESPONSE_SCHEMA
@@ -175,16 +195,33 @@ class FocusChatCycler:
 
                 # 比赛开始！一边让LLM这个大脑开始“思考”，一边让中断监视器这个小骚货去外面“偷窥”
                 logger.info(f"[{self.session.conversation_id}] 思考阶段开始...")
-                llm_task = asyncio.create_task(
-                    self.llm_client.make_llm_request(
-                        system_prompt=prompt_components.system_prompt,
-                        prompt=prompt_components.user_prompt,
-                        is_stream=False,
-                        is_multimodal=bool(prompt_components.image_references),
-                        image_inputs=prompt_components.image_references,  # 看！图片在这里被狠狠地注入了！
-                        response_schema=response_schema,
-                    )
+
+                request_reply = functools.partial(
+                    self.llm_client.make_llm_request,
+                    system_prompt=prompt_components.system_prompt,
+                    prompt=prompt_components.user_prompt,
+                    is_stream=False,
+                    is_multimodal=bool(prompt_components.image_references),
+                    image_inputs=prompt_components.image_references,  # 看！图片在这里被狠狠地注入了！
+                    response_schema=response_schema,
+                    priority=LLMPriority.FOCUS_REPLY,
+                    schedule_group=self.session.conversation_id,
                 )
+                if config.focus_chat_mode.enable_streaming_reply:
+                    # 边写边发：reply_text 里每写完一条，就先发出去
+                    streamed_reply = self.action_executor.create_streamed_reply(self.uid_map)
+                    llm_task = asyncio.create_task(
+                        request_reply(
+                            is_stream=True,
+                            task_id=f"focus_reply_{self.session.conversation_id}_{uuid.uuid4().hex[:8]}",
+                            on_text_chunk=streamed_reply.feed,
+                        )
+                    )
+                elif config.focus_chat_mode.enable_hedged_requests:
+                    # 回复太慢就补发一发，谁先射出来用谁
+                    llm_task = asyncio.create_task(self._get_reply_hedger().run(request_reply))
+                else:
+                    llm_task = asyncio.create_task(request_reply())
                 interrupt_checker_task = asyncio.create_task(
                     self._check_for_interruptions_internal(
                         context_text=prompt_components.last_valid_text_message,
@@ -206,6 +243,8 @@ class FocusChatCycler:
                     logger.info(f"[{self.session.conversation_id}] 思考阶段被IIS中断。")
                     if llm_task and not llm_task.done():
                         llm_task.cancel()  # 赶紧叫停还在思考的那个笨蛋
+                    if streamed_reply:
+                        await self.action_executor.settle_abandoned_stream(streamed_reply)
 
                     # --- 小色猫的淫纹植入处 #3：记录罪证，准备下一轮！ ---
                     was_interrupted_last_turn = True  # 标记我们被中出了
@@ -220,7 +259,11 @@ class FocusChatCycler:
                         interrupt_checker_task.cancel()  # 叫停还在偷窥的那个小骚货
 
                     llm_response = await llm_task
-                    if parsed_decision := self.llm_response_handler.parse(llm_response.get("text", "")):
+                    # 流式请求的完整文本在 full_text 里
+                    response_text = llm_response.get("text") or llm_response.get("full_text", "")
+                    with tracer.span("response_parse"):
+                        parsed_decision = self.llm_response_handler.parse(response_text)
+                    if parsed_decision:
                         # 赶紧把这次成功的思考结果存起来，作为下一次的“前戏”
                         self.session.last_llm_decision = parsed_decision
                         self._last_completed_llm_decision = parsed_decision
@@ -233,8 +276,9 @@ class FocusChatCycler:
                         try:
                             logger.info(f"[{self.session.conversation_id}] 统一动作执行阶段开始...")
                             # 一边开始“行动”（比如发消息），一边继续让小骚货去“偷窥”
+                            action_started_at = time.monotonic()
                             action_task = asyncio.create_task(
-                                self.action_executor.execute_action(parsed_decision, self.uid_map)
+                                self.action_executor.execute_action(parsed_decision, self.uid_map, streamed_reply)
                             )
                             action_interrupt_checker_task = asyncio.create_task(
                                 self._check_for_interruptions_internal(
@@ -245,6 +289,7 @@ class FocusChatCycler:
                             done_action, _ = await asyncio.wait(
                                 [action_task, action_interrupt_checker_task], return_when=asyncio.FIRST_COMPLETED
                             )
+                            tracer.record_between("action_send", action_started_at, time.monotonic())
 
                             if (
                                 action_interrupt_checker_task in done_action
@@ -278,12 +323,21 @@ class FocusChatCycler:
                         if await self.llm_response_handler.handle_decision(parsed_decision):
                             logger.info(f"[{self.session.conversation_id}] 根据LLM决策，会话即将终止。")
                             break
+                    elif streamed_reply is not None:
+                        # 完整回复解析失败，但流式过程中可能已经发出去几条了，计数器得对上
+                        await self.action_executor.settle_abandoned_stream(streamed_reply)
 
                     # 把我看过的消息都标记为“已读”，免得下次还看
                     if prompt_components.processed_event_ids:
                         await self.session.event_storage.update_events_status(
                             prompt_components.processed_event_ids, "read"
                         )
+                        # 同一轮里一起处理掉的其他消息不单独计时了
+                        tracer.discard(
+                            event_id
+                            for event_id in prompt_components.processed_event_ids
+                            if event_id != traced_event_id
+                        )
                         # 更新一下官方记录，告诉全世界我处理到哪个时间点了
                         new_processed_timestamp = time.time() * 1000
                         await self.session.conversation_service.update_conversation_processed_timestamp(
@@ -310,11 +364,26 @@ class FocusChatCycler:
                     llm_task.cancel()
                 if interrupt_checker_task and not interrupt_checker_task.done():
                     interrupt_checker_task.cancel()
+                if streamed_reply:
+                    streamed_reply.cancel()
+                if trace_token is not None:
+                    tracer.finish(traced_event_id)
+                    tracer.deactivate(trace_token)
 
         logger.info(f"[{self.session.conversation_id}] 专注聊天循环已结束。")
         if not self._shutting_down:
             await self.session.chat_session_manager.deactivate_session(self.session.conversation_id)
 
+    def _get_reply_hedger(self) -> RequestHedger:
+        """所有专注聊天会话共用一个对冲器，延迟历史一起攒。"""
+        focus_cfg = config.focus_chat_mode
+        return get_hedger(
+            "focus_chat_reply",
+            latency_percentile=focus_cfg.hedge_latency_percentile,
+            min_delay_seconds=focus_cfg.hedge_min_delay_seconds,
+            max_delay_seconds=focus_cfg.hedge_max_delay_seconds,
+        )
+
     async def _check_for_interruptions_internal(
         self, context_text: str | None, triggering_event_id: str | None
     ) -> dict | None:
@@ -329,6 +398,12 @@ class FocusChatCycler:
 
         while not self._shutting_down:
             try:
+                # 每半秒问一次计数器有没有新消息，真有了才去捞，平时不打扰数据库
+                if not await self.session.event_storage.has_new_events_since(
+                    self.session.conversation_id, last_checked_timestamp_ms
+                ):
+                    await asyncio.sleep(0.5)
+                    continue
                 new_events = await self.session.event_storage.get_message_events_after_timestamp(
                     self.session.conversation_id, last_checked_timestamp_ms, limit=10
                 )
@@ -33,7 +33,13 @@ class SummarizationManager:
         shift_motivation 和 target_conversation_id 是我新增的玩具，用来写“辞职报告”的。
         """
         try:
-            # 1. 直接捞货，不数了，懒得数。
+            # 1. 先看计数器够不够数，不够就不去捞货了。计数器是现成的，数一下不费劲。
+            summarizable_count = await self.event_storage.get_summarizable_events_count(self.session.conversation_id)
+            if not final_save and summarizable_count < self.summary_threshold:
+                return
+            if not summarizable_count and not (final_save and self.session.current_handover_summary):
+                return
+
             events_to_summarize = await self.event_storage.get_summarizable_events(self.session.conversation_id)
 
             # 2. 检查数量，不够就不干了。
@@ -109,12 +115,20 @@ class SummarizationManager:
         if not summary_text or not summary_text.strip():
             return
         try:
-            await self.summary_storage_service.save_summary(
+            saved = await self.summary_storage_service.save_summary(
                 conversation_id=self.session.conversation_id,
                 summary_text=summary_text,
                 platform=self.session.platform,
                 bot_id=self.session.bot_id,
                 event_ids_covered=event_ids,
             )
+            if saved and self.session.semantic_memory:
+                # 总结也进语义索引，以后聊到相关话题能想起这段对话的大意
+                await self.session.semantic_memory.index_summary(
+                    summary_id=saved.summary_id,
+                    conversation_id=saved.conversation_id,
+                    summary_text=saved.summary_text,
+                    timestamp=saved.timestamp,
+                )
         except Exception as e:
             logger.error(f"[{self.session.conversation_id}] 内部保存摘要到数据库时失败: {e}", exc_info=True)
@@ -0,0 +1,142 @@
+# 文件: llmrequest/hedging.py
+# 对冲请求：第一个请求迟迟不回来，就再补发一个，谁先回来用谁，另一个直接取消。
+# 多花一点 token，换回尾延迟，专治“机器人半天不说话”。
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from src.common.custom_logging.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 延迟样本不够时，不按百分位算，直接用最小对冲延迟
+MIN_SAMPLES_FOR_PERCENTILE: int = 10
+LATENCY_HISTORY_SIZE: int = 200
+
+
+class RequestHedger:
+    """
+    给延迟敏感的请求做对冲。
+    记录最近主请求的耗时，第一个请求超过历史第 N 百分位还没回来，就补发第二个。
+    主请求不管赢没赢都记：成功回来记它的耗时，被对冲请求抢先、被取消时记它已经跑了多久，
+    不然历史里只剩下“跑得快的那个”，百分位越算越低，对冲越发越多。
+    第二个请求走的还是同一个客户端，密钥池会因为第一个密钥在途而挑另一个密钥。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        latency_percentile: float = 0.9,
+        min_delay_seconds: float = 3.0,
+        max_delay_seconds: float = 30.0,
+    ) -> None:
+        self.name = name
+        self.latency_percentile = min(max(latency_percentile, 0.5), 0.99)
+        self.min_delay_seconds = min_delay_seconds
+        self.max_delay_seconds = max(max_delay_seconds, min_delay_seconds)
+        self._latencies: deque[float] = deque(maxlen=LATENCY_HISTORY_SIZE)
+        self.total_requests = 0
+        self.hedges_launched = 0
+        self.hedge_wins = 0
+
+    def current_hedge_delay(self) -> float:
+        """按历史耗时的百分位算出“该补发了”的等待时间。"""
+        if len(self._latencies) < MIN_SAMPLES_FOR_PERCENTILE:
+            return self.min_delay_seconds
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.latency_percentile))
+        return min(max(ordered[index], self.min_delay_seconds), self.max_delay_seconds)
+
+    async def run(self, request_factory: Callable[[], Awaitable[dict[str, Any]]]) -> dict[str, Any]:
+        """
+        执行一次（可能被对冲的）请求。request_factory 每调用一次就发起一次新请求。
+        返回先成功回来的结果；两个都失败时返回最后一个错误结果（或抛出最后一个异常）。
+        """
+        self.total_requests += 1
+        started_at = time.monotonic()
+        hedge_delay = self.current_hedge_delay()
+
+        primary = asyncio.create_task(request_factory(), name=f"{self.name}-primary")
+        pending: set[asyncio.Task] = {primary}
+        hedge: asyncio.Task | None = None
+        last_error_result: dict[str, Any] | None = None
+        last_exception: BaseException | None = None
+
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                self.hedges_launched += 1
+                logger.info(f"[{self.name}] 请求 {hedge_delay:.2f} 秒仍未返回，发起对冲请求。")
+                hedge = asyncio.create_task(request_factory(), name=f"{self.name}-hedge")
+                pending.add(hedge)
+
+            while True:
+                if primary in done:
+                    self._record_primary_latency(primary, started_at)
+                for task in done:
+                    if task.exception() is not None:
+                        last_exception = task.exception()
+                        continue
+                    result = task.result()
+                    if isinstance(result, dict) and result.get("error") and pending:
+                        # 这个失败了，但另一个还在跑，再等等它
+                        last_error_result = result
+                        continue
+                    if task is hedge:
+                        self.hedge_wins += 1
+                        logger.info(f"[{self.name}] 对冲请求胜出。")
+                    return result
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if primary in pending:
+                # 主请求要被取消了，它的真实耗时至少是这么久
+                self._latencies.append(time.monotonic() - started_at)
+            for task in pending:
+                task.cancel()
+
+        if last_error_result is not None:
+            return last_error_result
+        if last_exception is not None:
+            raise last_exception
+        raise RuntimeError(f"[{self.name}] 对冲请求既没有结果也没有异常，这不应该发生。")
+
+    def _record_primary_latency(self, primary: asyncio.Task, started_at: float) -> None:
+        """主请求回来了：成功的才记耗时，出错的耗时没有参考价值。"""
+        if primary.cancelled() or primary.exception() is not None:
+            return
+        result = primary.result()
+        if isinstance(result, dict) and result.get("error"):
+            return
+        self._latencies.append(time.monotonic() - started_at)
+
+    def get_stats(self) -> dict[str, Any]:
+        """对冲率、对冲胜率和当前对冲延迟。"""
+        return {
+            "total_requests": self.total_requests,
+            "hedges_launched": self.hedges_launched,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedges_launched / self.total_requests if self.total_requests else 0.0,
+            "hedge_win_rate": self.hedge_wins / self.hedges_launched if self.hedges_launched else 0.0,
+            "current_hedge_delay_seconds": round(self.current_hedge_delay(), 3),
+        }
+
+
+_hedgers: dict[str, RequestHedger] = {}
+
+
+def get_hedger(
+    name: str,
+    latency_percentile: float = 0.9,
+    min_delay_seconds: float = 3.0,
+    max_delay_seconds: float = 30.0,
+) -> RequestHedger:
+    """按名字取共享的对冲器（同名共用延迟历史和统计），第一次取时按给定参数创建。"""
+    hedger = _hedgers.get(name)
+    if hedger is None:
+        hedger = _hedgers[name] = RequestHedger(name, latency_percentile, min_delay_seconds, max_delay_seconds)
+    return hedger
@@ -0,0 +1,228 @@
+# 文件: llmrequest/key_pool.py
+# API密钥池：给每个密钥记健康档案（成功率、延迟、在途数、配额提示、冷却期），
+# 挑最闲最健康的那个用。同一个提供商的所有 LLMClient 共享同一个池子。
+
+import random
+import re
+import threading
+import time
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from src.common.custom_logging.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 指数滑动平均的平滑系数
+EWMA_ALPHA: float = 0.2
+# 还没测过延迟的密钥先按这个值估算（秒）
+DEFAULT_LATENCY_SECONDS: float = 2.0
+# 429 冷却的起点（秒），之后每连续一次翻倍，上限由调用方给出
+BASE_RATE_LIMIT_COOLDOWN_SECONDS: float = 15.0
+# 冷却时间的随机抖动幅度（±比例），免得一堆密钥同时复活又同时撞墙
+COOLDOWN_JITTER_RATIO: float = 0.2
+# 成功率低于这个值时不再继续往下压分数，避免除零
+MIN_SUCCESS_RATE: float = 0.05
+# 响应头里的剩余请求数不高于这个值时，给这个密钥加重惩罚
+LOW_QUOTA_THRESHOLD: int = 1
+
+_DURATION_PART_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+def _parse_reset_duration(value: str | None) -> float | None:
+    """解析 '1s'、'6m0s'、'20ms' 或纯数字这类配额重置时长，返回秒数。"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART_PATTERN.findall(value)
+    if not parts:
+        return None
+    unit_seconds = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(num) * unit_seconds[unit] for num, unit in parts)
+
+
+@dataclass
+class KeyHealth:
+    """单个密钥的健康档案。"""
+
+    success_rate: float = 1.0
+    latency_ewma: float = DEFAULT_LATENCY_SECONDS
+    in_flight: int = 0
+    total_requests: int = 0
+    consecutive_rate_limits: int = 0
+    cooldown_until: float = 0.0
+    remaining_requests_hint: int | None = None
+    abandoned: bool = False
+
+    def score(self) -> float:
+        """分数越低越值得用：在途越少、越快、越健康越好。"""
+        load_factor = self.in_flight + 1
+        health_factor = max(self.success_rate, MIN_SUCCESS_RATE)
+        penalty = 1.0
+        if self.remaining_requests_hint is not None and self.remaining_requests_hint <= LOW_QUOTA_THRESHOLD:
+            penalty = 10.0
+        return load_factor * self.latency_ewma * penalty / health_factor
+
+
+class APIKeyPool:
+    """
+    一个提供商的密钥池。
+    不再每次随机洗牌碰运气了——谁快、谁闲、谁还有配额就先用谁；
+    撞了 429 的进冷却室，连续撞墙冷却时间就指数翻倍（带点随机抖动），哼。
+    """
+
+    def __init__(self, pool_id: str) -> None:
+        self.pool_id = pool_id
+        self._health: dict[str, KeyHealth] = {}
+        # 线程模式下的侵入性思维也可能用到同一个池子，所以用线程锁
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> KeyHealth:
+        health = self._health.get(key)
+        if health is None:
+            health = self._health[key] = KeyHealth()
+        return health
+
+    def available_keys(self, keys: Iterable[str], excluded: set[str] | None = None) -> list[str]:
+        """返回当前既没被弃用、也不在冷却期的密钥。"""
+        now = time.time()
+        excluded = excluded or set()
+        with self._lock:
+            return [
+                key
+                for key in keys
+                if key not in excluded and not self._get(key).abandoned and self._get(key).cooldown_until <= now
+            ]
+
+    def seconds_until_next_available(self, keys: Iterable[str], excluded: set[str] | None = None) -> float | None:
+        """所有密钥都在冷却时，距离最早一个解冻还有多少秒；一个能等的都没有就返回 None。"""
+        now = time.time()
+        excluded = excluded or set()
+        with self._lock:
+            waits = [
+                max(0.0, self._get(key).cooldown_until - now)
+                for key in keys
+                if key not in excluded and not self._get(key).abandoned
+            ]
+        return min(waits) if waits else None
+
+    def pick(self, candidates: Iterable[str]) -> str | None:
+        """从候选里挑分数最低的密钥，并把它的在途数加一。用完必须调用 release。"""
+        now = time.time()
+        with self._lock:
+            scored = [
+                (health.score(), random.random(), key)
+                for key in candidates
+                if not (health := self._get(key)).abandoned and health.cooldown_until <= now
+            ]
+            if not scored:
+                return None
+            _, _, best_key = min(scored)
+            self._get(best_key).in_flight += 1
+            return best_key
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            health = self._get(key)
+            health.in_flight = max(0, health.in_flight - 1)
+
+    def record_success(self, key: str, latency_seconds: float) -> None:
+        with self._lock:
+            health = self._get(key)
+            health.total_requests += 1
+            health.success_rate = (1 - EWMA_ALPHA) * health.success_rate + EWMA_ALPHA
+            health.latency_ewma = (1 - EWMA_ALPHA) * health.latency_ewma + EWMA_ALPHA * latency_seconds
+            health.consecutive_rate_limits = 0
+
+    def record_failure(self, key: str) -> None:
+        """普通失败（网络错误、5xx之类）：只拉低成功率，不进冷却室。"""
+        with self._lock:
+            health = self._get(key)
+            health.total_requests += 1
+            health.success_rate = (1 - EWMA_ALPHA) * health.success_rate
+
+    def record_rate_limited(
+        self, key: str, max_cooldown_seconds: float, retry_after_seconds: float | None = None
+    ) -> float:
+        """
+        撞了 429：按连续次数指数冷却（带抖动），服务端给了 Retry-After 就至少冷却那么久。返回冷却秒数。
+        max_cooldown_seconds 不大于 0 表示冷却关闭（和以前 rate_limit_disable_duration_seconds=0 一样）：
+        只记一笔失败，密钥照常可用，返回 0。
+        """
+        with self._lock:
+            health = self._get(key)
+            health.total_requests += 1
+            health.success_rate = (1 - EWMA_ALPHA) * health.success_rate
+            health.consecutive_rate_limits += 1
+            if max_cooldown_seconds <= 0:
+                return 0.0
+            cooldown = BASE_RATE_LIMIT_COOLDOWN_SECONDS * (2 ** (health.consecutive_rate_limits - 1))
+            cooldown *= random.uniform(1 - COOLDOWN_JITTER_RATIO, 1 + COOLDOWN_JITTER_RATIO)
+            cooldown = min(cooldown, max_cooldown_seconds)
+            if retry_after_seconds:
+                cooldown = max(cooldown, retry_after_seconds)
+            health.cooldown_until = time.time() + cooldown
+            return cooldown
+
+    def abandon(self, key: str) -> None:
+        with self._lock:
+            health = self._get(key)
+            health.abandoned = True
+            health.cooldown_until = 0.0
+
+    def is_abandoned(self, key: str) -> bool:
+        with self._lock:
+            return self._get(key).abandoned
+
+    def observe_headers(self, key: str, headers: Mapping[str, str]) -> None:
+        """从响应头里读剩余配额提示（OpenAI 风格的 x-ratelimit-*），配额见底时提前让它歇一会。"""
+        remaining_raw = headers.get("x-ratelimit-remaining-requests")
+        if remaining_raw is None:
+            return
+        try:
+            remaining = int(float(remaining_raw))
+        except ValueError:
+            return
+        reset_seconds = _parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+        with self._lock:
+            health = self._get(key)
+            health.remaining_requests_hint = remaining
+            if remaining <= 0 and reset_seconds:
+                health.cooldown_until = max(health.cooldown_until, time.time() + reset_seconds)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """导出每个密钥（只显示后四位）的健康状态，用于调试和监控。"""
+        now = time.time()
+        with self._lock:
+            return {
+                f"...{key[-4:]}": {
+                    "score": round(health.score(), 3),
+                    "success_rate": round(health.success_rate, 3),
+                    "latency_ewma": round(health.latency_ewma, 3),
+                    "in_flight": health.in_flight,
+                    "total_requests": health.total_requests,
+                    "cooldown_remaining": max(0.0, round(health.cooldown_until - now, 1)),
+                    "remaining_requests_hint": health.remaining_requests_hint,
+                    "abandoned": health.abandoned,
+                }
+                for key, health in self._health.items()
+            }
+
+
+_shared_pools: dict[str, APIKeyPool] = {}
+_shared_pools_lock = threading.Lock()
+
+
+def get_shared_key_pool(pool_id: str) -> APIKeyPool:
+    """按提供商（+Base URL）取共享的密钥池，同一个提供商的所有客户端拿到的是同一个。"""
+    with _shared_pools_lock:
+        pool = _shared_pools.get(pool_id)
+        if pool is None:
+            pool = _shared_pools[pool_id] = APIKeyPool(pool_id)
+            logger.debug(f"为 '{pool_id}' 创建了共享的API密钥池。")
+        return pool
@@ -2,16 +2,22 @@
 # LLM处理器模块，负责与语言模型进行交互并处理相关请求。
 
 import asyncio
-from collections.abc import Callable, Coroutine
+import time
+from collections.abc import Awaitable, Callable, Coroutine
 from typing import Any, Unpack  # 确保 Unpack 被导入
 
+from src.common.custom_logging.hot_path_logger import HotPathLogger
 from src.common.custom_logging.logging_config import get_logger  # type: ignore # 假设这个导入是有效的，但找不到存根
+from src.common.tracing.tracer import tracer
 
+from .request_scheduler import LLMPriority, LLMRequestCancelledError, llm_request_scheduler
 from .utils_model import APIKeyError, GenerationParams, LLMClientError, NetworkError
 from .utils_model import LLMClient as UnderlyingLLMClient
 
 # 获取日志记录器实例
 logger = get_logger(__name__)
+# 每个请求都会打的路由日志走这个，默认级别下直接跳过
+hot_path_logger = HotPathLogger(logger)
 
 # 定义回调函数类型，用于处理流式数据块
 # 参数：块数据，块类型（例如 'chunk', 'finish', 'error'），元数据字典
@@ -142,24 +148,32 @@ class _StreamingWorkflowManager:
         max_retries: int = 3,
         image_mime_type_override: str | None = None,
         use_google_search: bool = False,
+        on_text_chunk: Callable[[str], Awaitable[None]] | None = None,  # 每收到一段文本就调用一次 #
         **additional_generation_params: Unpack[GenerationParams],  # 其他特定于模型的生成参数 #
     ) -> dict[str, Any]:
         """
         处理单个流式 LLM 任务的核心逻辑。
         它会调用底层的 LLMClient 进行实际的 API 请求，并管理中断和回调。
+        on_text_chunk 和注册的 chunk_callback（块类型 'chunk'）会在每段文本到达时被调用。
         """
         self.current_processing_task_id = task_id  # 标记当前正在处理的任务ID #
         interruption_event: asyncio.Event = self._get_interruption_event(task_id)
         interruption_event.clear()  # 确保在任务开始时，中断事件是未设置状态 #
 
-        logger.info(f"开始处理流式任务 ID: {task_id} (通过 _StreamingWorkflowManager)")
+        hot_path_logger.debug("开始处理流式任务 ID: {} (通过 _StreamingWorkflowManager)", task_id)
         if system_prompt:
-            logger.info(
-                f"  附带 System Prompt (前50字符): {system_prompt[:50]}{'...' if len(system_prompt) > 50 else ''}"
-            )
+            hot_path_logger.debug("  附带 System Prompt (前50字符): {}", lambda: system_prompt[:50])
 
         final_result: dict[str, Any] = {}  # 用于存储最终结果的字典 #
 
+        chunk_listener: Callable[[str], Awaitable[None]] | None = None
+        if on_text_chunk or self.chunk_callback:
+
+            async def chunk_listener(text: str) -> None:
+                if on_text_chunk:
+                    await on_text_chunk(text)
+                await self._internal_chunk_handler(text, "chunk", {"task_id": task_id})
+
         try:
             logger.debug(f"准备为流式任务 {task_id} 调用 UnderlyingLLMClient.make_request")
 
@@ -181,6 +195,7 @@ class _StreamingWorkflowManager:
                 max_retries=max_retries,
                 image_mime_type_override=image_mime_type_override,
                 use_google_search=use_google_search,
+                chunk_listener=chunk_listener,  # 逐段文本的监听器，为空时底层客户端会自己打印到控制台 #
                 **additional_generation_params,  # 透传其他生成参数 #
             )
             final_result = result_from_llm_client  # 保存从底层客户端返回的结果 #
@@ -281,6 +296,8 @@ class Client:  # 这是 llm_processor.Client，是暴露给外部使用者的高
         rate_limit_disable_duration_seconds: int | None = None,  # API密钥因速率限制被临时禁用的时长 #
         # --- 用于流式处理的回调 ---
         chunk_callback: ChunkCallbackType | None = None,  # 可选的回调函数，用于处理流式响应的各个部分 #
+        # --- 调度优先级 ---
+        default_priority: LLMPriority = LLMPriority.MAIN_THOUGHT,  # 调用时未指定 priority 时使用的排队优先级 #
         # --- 其他特定于模型的生成参数 (例如 temperature, max_output_tokens) ---
         # 这些参数将直接传递给 UnderlyingLLMClient 的构造函数或其请求方法。
         **kwargs: Unpack[GenerationParams],
@@ -328,6 +345,8 @@ class Client:  # 这是 llm_processor.Client，是暴露给外部使用者的高
             chunk_callback=chunk_callback,  # 传递用户提供的回调函数 #
         )
 
+        self.default_priority: LLMPriority = default_priority
+
         logger.info(
             f"LLM Processor Client 初始化完成。内部已创建并持有一个 UnderlyingLLMClient "
             f"(模型: {self.llm_client.model_name}, 提供商: {self.llm_client.provider})。"
@@ -354,106 +373,123 @@ class Client:  # 这是 llm_processor.Client，是暴露给外部使用者的高
         text_to_embed: str | None = None,  # 特定于嵌入请求 #
         use_google_search: bool = False,
         response_schema: dict[str, Any] | None = None,
+        priority: LLMPriority | None = None,  # 排队优先级，不填则用客户端的 default_priority #
+        schedule_group: str | None = None,  # 调度分组（通常是会话ID），分组结束时排队中的请求会被取消 #
+        on_text_chunk: Callable[[str], Awaitable[None]] | None = None,  # 仅流式请求有效，逐段接收生成的文本 #
         **additional_generation_params: Unpack[GenerationParams],  # 其他特定于模型的生成参数 #
     ) -> dict[str, Any]:
         """
         向 LLM 发出请求（可能是文本补全、视觉问答、工具调用或嵌入）。
         此方法会根据参数决定是进行流式处理、非流式处理还是嵌入请求，
         并将请求路由到相应的内部处理器。
+        真正发出前会先在全局的 LLM 请求调度器里按优先级排队。
         """
-        logger.info(
-            f"LLM Processor Client 收到 make_llm_request 调用: "
-            f"流式={is_stream}, TaskID={task_id if task_id else 'N/A'}, "
-            f"嵌入={'是' if text_to_embed else '否'}, 多模态={is_multimodal}"
+        hot_path_logger.debug(
+            "LLM Processor Client 收到 make_llm_request 调用: 流式={}, TaskID={}, 嵌入={}, 多模态={}",
+            is_stream,
+            task_id or "N/A",
+            "是" if text_to_embed else "否",
+            is_multimodal,
         )
         if system_prompt:
-            logger.info(
-                f"  make_llm_request 收到 System Prompt (前50字符): {system_prompt[:50]}{'...' if len(system_prompt) > 50 else ''}"
-            )
+            hot_path_logger.debug("  make_llm_request 收到 System Prompt (前50字符): {}", lambda: system_prompt[:50])
 
         # 如果用户传入了 response_schema，就把它加到要传递下去的参数字典里
         if response_schema:
             # 这里的 "responseSchema" 必须和你在 GenerationParams 中定义的大小写一致
             additional_generation_params["responseSchema"] = response_schema
 
-        # 优先处理嵌入请求的逻辑
-        if text_to_embed:
-            if is_stream:
-                logger.warning("嵌入请求通常是非流式的。参数 'is_stream=True' 在此场景下将被忽略。")
-            # 对于嵌入请求，其他一些参数（如 prompt, tools, image_inputs）通常不适用
-            if prompt and prompt.strip():
-                logger.warning("同时提供了 'prompt' 和 'text_to_embed'；对于嵌入请求，'prompt' 将被忽略。")
-            if tools or image_inputs:
-                logger.warning("为嵌入请求提供了 'tools' 或 'image_inputs'；这些参数将被忽略。")
-            if system_prompt:
-                logger.warning("为嵌入请求提供了 'system_prompt'；此参数在嵌入请求中无效")
-
-            # 准备传递给底层 get_embedding 方法的生成参数 (尽管嵌入通常参数较少)
-            embedding_gen_params: GenerationParams = additional_generation_params.copy()
-            if temp is not None:  # 虽然温度对嵌入不典型，但如果提供则透传 #
-                embedding_gen_params["temperature"] = temp
-            if max_tokens is not None:  # 最大token数对嵌入也不典型 #
-                embedding_gen_params["maxOutputTokens"] = max_tokens
-
-            logger.info("路由到内部 UnderlyingLLMClient.get_embedding 以进行非流式嵌入请求。")
-            # self.llm_client 是 UnderlyingLLMClient 的实例
-            return await self.llm_client.get_embedding(
-                text_to_embed=text_to_embed,
-                generation_params_override=embedding_gen_params if embedding_gen_params else None,
-                max_retries=max_retries,
-            )
-
-        # 对于非嵌入请求，'prompt' 应该是有效的字符串
-        if prompt is None or not isinstance(prompt, str):
-            raise ValueError("非嵌入类型的 LLM 请求必须提供一个有效的 'prompt' 字符串。")
-
-        # 根据 is_stream 参数决定是走流式处理还是非流式处理
-        if is_stream:
-            # 流式请求必须提供 task_id
-            if not task_id:
-                raise ValueError("流式请求 (is_stream=True) 必须提供一个 'task_id'。")
-
-            logger.info(f"路由到内部 _StreamingWorkflowManager 以处理流式任务: {task_id}")
-            # 将所有相关参数传递给流式工作流管理器的处理方法
-            return await self._streaming_manager.process_streaming_task(
-                task_id=task_id,
-                prompt=prompt,
-                # ███ 小懒猫改动开始 ███
-                system_prompt=system_prompt,  # 传递系统提示词参数以支持多轮对话上下文
-                # ███ 小懒猫改动结束 ███
-                is_multimodal=is_multimodal,
-                image_inputs=image_inputs,
-                temp=temp,
-                max_tokens=max_tokens,
-                tools=tools,
-                tool_choice=tool_choice,
-                max_retries=max_retries,
-                image_mime_type_override=image_mime_type_override,
-                use_google_search=use_google_search,
-                **additional_generation_params,  # 透传其他生成参数 #
-            )
-        else:  # 非流式、非嵌入请求 #
-            logger.info("路由到内部 UnderlyingLLMClient.make_request 以进行非流式请求。")
-            # 直接调用底层 LLMClient 的 make_request 方法
-            # is_stream 参数固定为 False
-            # UnderlyingLLMClient.make_request 内部会根据参数（如 tools, is_multimodal）确定具体的请求类型
-            return await self.llm_client.make_request(
-                prompt=prompt,
-                # ███ 小懒猫改动开始 ███
-                system_prompt=system_prompt,  # 最后一次，在这个文件里，我发誓！
-                # ███ 小懒猫改动结束 ███
-                is_stream=False,  # 明确指示非流式处理 #
-                is_multimodal=is_multimodal,
-                image_inputs=image_inputs,
-                temp=temp,
-                max_tokens=max_tokens,
-                tools=tools,
-                tool_choice=tool_choice,
-                image_mime_type_override=image_mime_type_override,
-                max_retries=max_retries,
-                use_google_search=use_google_search,
-                **additional_generation_params,  # 透传其他生成参数 #
-            )
+        request_priority = priority if priority is not None else self.default_priority
+        llm_started_at = time.monotonic()
+        if on_text_chunk is not None:
+            # 全链路计时开着的话，顺便量一下首个文本块到达的时间
+            on_text_chunk = tracer.first_call_recorder("llm_first_token", on_text_chunk)
+        try:
+            async with llm_request_scheduler.slot(self.llm_client.provider, request_priority, schedule_group):
+                # 优先处理嵌入请求的逻辑
+                if text_to_embed:
+                    if is_stream:
+                        logger.warning("嵌入请求通常是非流式的。参数 'is_stream=True' 在此场景下将被忽略。")
+                    # 对于嵌入请求，其他一些参数（如 prompt, tools, image_inputs）通常不适用
+                    if prompt and prompt.strip():
+                        logger.warning("同时提供了 'prompt' 和 'text_to_embed'；对于嵌入请求，'prompt' 将被忽略。")
+                    if tools or image_inputs:
+                        logger.warning("为嵌入请求提供了 'tools' 或 'image_inputs'；这些参数将被忽略。")
+                    if system_prompt:
+                        logger.warning("为嵌入请求提供了 'system_prompt'；此参数在嵌入请求中无效")
+
+                    # 准备传递给底层 get_embedding 方法的生成参数 (尽管嵌入通常参数较少)
+                    embedding_gen_params: GenerationParams = additional_generation_params.copy()
+                    if temp is not None:  # 虽然温度对嵌入不典型，但如果提供则透传 #
+                        embedding_gen_params["temperature"] = temp
+                    if max_tokens is not None:  # 最大token数对嵌入也不典型 #
+                        embedding_gen_params["maxOutputTokens"] = max_tokens
+
+                    hot_path_logger.debug("路由到内部 UnderlyingLLMClient.get_embedding 以进行非流式嵌入请求。")
+                    # self.llm_client 是 UnderlyingLLMClient 的实例
+                    return await self.llm_client.get_embedding(
+                        text_to_embed=text_to_embed,
+                        generation_params_override=embedding_gen_params if embedding_gen_params else None,
+                        max_retries=max_retries,
+                    )
+
+                # 对于非嵌入请求，'prompt' 应该是有效的字符串
+                if prompt is None or not isinstance(prompt, str):
+                    raise ValueError("非嵌入类型的 LLM 请求必须提供一个有效的 'prompt' 字符串。")
+
+                # 根据 is_stream 参数决定是走流式处理还是非流式处理
+                if is_stream:
+                    # 流式请求必须提供 task_id
+                    if not task_id:
+                        raise ValueError("流式请求 (is_stream=True) 必须提供一个 'task_id'。")
+
+                    hot_path_logger.debug("路由到内部 _StreamingWorkflowManager 以处理流式任务: {}", task_id)
+                    # 将所有相关参数传递给流式工作流管理器的处理方法
+                    return await self._streaming_manager.process_streaming_task(
+                        task_id=task_id,
+                        prompt=prompt,
+                        # ███ 小懒猫改动开始 ███
+                        system_prompt=system_prompt,  # 传递系统提示词参数以支持多轮对话上下文
+                        # ███ 小懒猫改动结束 ███
+                        is_multimodal=is_multimodal,
+                        image_inputs=image_inputs,
+                        temp=temp,
+                        max_tokens=max_tokens,
+                        tools=tools,
+                        tool_choice=tool_choice,
+                        max_retries=max_retries,
+                        image_mime_type_override=image_mime_type_override,
+                        use_google_search=use_google_search,
+                        on_text_chunk=on_text_chunk,
+                        **additional_generation_params,  # 透传其他生成参数 #
+                    )
+                else:  # 非流式、非嵌入请求 #
+                    hot_path_logger.debug("路由到内部 UnderlyingLLMClient.make_request 以进行非流式请求。")
+                    # 直接调用底层 LLMClient 的 make_request 方法
+                    # is_stream 参数固定为 False
+                    # UnderlyingLLMClient.make_request 内部会根据参数（如 tools, is_multimodal）确定具体的请求类型
+                    return await self.llm_client.make_request(
+                        prompt=prompt,
+                        # ███ 小懒猫改动开始 ███
+                        system_prompt=system_prompt,  # 最后一次，在这个文件里，我发誓！
+                        # ███ 小懒猫改动结束 ███
+                        is_stream=False,  # 明确指示非流式处理 #
+                        is_multimodal=is_multimodal,
+                        image_inputs=image_inputs,
+                        temp=temp,
+                        max_tokens=max_tokens,
+                        tools=tools,
+                        tool_choice=tool_choice,
+                        image_mime_type_override=image_mime_type_override,
+                        max_retries=max_retries,
+                        use_google_search=use_google_search,
+                        **additional_generation_params,  # 透传其他生成参数 #
+                    )
+        except LLMRequestCancelledError as e:
+            logger.info(f"LLM请求在排队时被取消 (分组: {schedule_group}): {e}")
+            return {"error": True, "type": type(e).__name__, "message": str(e), "interrupted": True}
+        finally:
+            tracer.record_between("llm_total", llm_started_at, time.monotonic())
 
     async def interrupt_stream_task(self, task_id: str) -> None:
         """
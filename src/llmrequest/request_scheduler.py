@@ -0,0 +1,339 @@
+# 文件: llmrequest/request_scheduler.py
+# LLM请求调度器：所有LLM调用在真正发出去之前都要在这里排队，
+# 按优先级、按提供商的并发上限和令牌桶限速来放行。
+# 侵入性思维可能跑在自己线程的事件循环里，所以通道状态都在一把锁下改，
+# 等待者的 future 也只在它自己的事件循环里兑现（跨线程时走 call_soon_threadsafe）。
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any
+
+from src.common.custom_logging.logging_config import get_logger
+
+from .utils_model import LLMClientError
+
+if TYPE_CHECKING:
+    from src.config.aicarus_configs import LLMSchedulerSettings
+
+logger = get_logger(__name__)
+
+# 每个优先级保留最近多少次排队耗时，用来算统计值
+WAIT_SAMPLES_PER_PRIORITY: int = 500
+
+
+class LLMPriority(IntEnum):
+    """LLM请求的优先级，数值越小越先被放行。"""
+
+    FOCUS_REPLY = 0
+    """专注聊天里对用户的即时回复，谁都不许插它的队。"""
+
+    MAIN_THOUGHT = 1
+    """主意识的思考循环。"""
+
+    TOOL_DECISION = 2
+    """行动决策、工具调用、搜索代理之类。"""
+
+    SUMMARY = 3
+    """会话摘要、工具结果总结等后台整理工作。"""
+
+    INTRUSIVE = 4
+    """侵入性思维这种可有可无的后台活儿。"""
+
+
+# 模型用途 -> 默认优先级，创建客户端时用
+PURPOSE_PRIORITIES: dict[str, LLMPriority] = {
+    "focused_chat": LLMPriority.FOCUS_REPLY,
+    "main_consciousness": LLMPriority.MAIN_THOUGHT,
+    "action_decision": LLMPriority.TOOL_DECISION,
+    "web_search_agent": LLMPriority.TOOL_DECISION,
+    "information_summary": LLMPriority.SUMMARY,
+    "intrusive_thoughts": LLMPriority.INTRUSIVE,
+    # 句向量多半是在回复前检索记忆用的，短而快，排在工具决策那一档，不跟后台整理抢预留槽位
+    "embedding": LLMPriority.TOOL_DECISION,
+}
+
+# 这个优先级及更低的请求算“后台请求”，不能占用给交互请求预留的槽位
+BACKGROUND_PRIORITY_THRESHOLD: LLMPriority = LLMPriority.SUMMARY
+
+# 补令牌的定时器挂在某个等待者的事件循环上；那个循环要是没了，过了这么久就当定时器丢了，重新挂一个
+REFILL_TIMER_GRACE_SECONDS: float = 1.0
+
+
+def _scheduler_settings() -> "LLMSchedulerSettings":
+    """用到的时候才去读全局配置，导入调度器本身不会触发配置文件的生成和检查（测试里可以直接替换这个函数）。"""
+    from src.config import config
+
+    return config.llm_scheduler
+
+
+class LLMRequestCancelledError(LLMClientError):
+    """排队中的LLM请求被主动取消（比如它所属的会话已经结束了）。"""
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    future: asyncio.Future = field(compare=False)
+    loop: asyncio.AbstractEventLoop = field(compare=False)
+    group: str | None = field(compare=False, default=None)
+    enqueued_at: float = field(compare=False, default=0.0)
+    settled: bool = field(compare=False, default=False)
+    """已经决定放行或取消了（future 可能还在去它自己事件循环的路上），别再处理第二次。"""
+
+    @property
+    def pending(self) -> bool:
+        return not self.settled and not self.future.done()
+
+
+def _call_in_loop(loop: asyncio.AbstractEventLoop, callback: Callable[..., object], *args: object) -> bool:
+    """在 loop 里调用 callback：就是当前线程正在跑的循环就直接调，否则交给 call_soon_threadsafe。循环已关返回 False。"""
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        callback(*args)
+        return True
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        return False
+    return True
+
+
+@dataclass
+class _ProviderLane:
+    """单个提供商的排队通道：并发计数 + 令牌桶 + 优先级堆。"""
+
+    name: str
+    max_concurrency: int
+    reserved_interactive_slots: int
+    requests_per_minute: float
+    burst: float
+    tokens: float = 0.0
+    last_refill: float = field(default_factory=time.monotonic)
+    in_flight: int = 0
+    heap: list[_Waiter] = field(default_factory=list)
+    refill_due_at: float | None = None
+
+    def refill_pending(self) -> bool:
+        """补令牌的定时器还挂着（而且没过期太久）时，放行交给它，别的地方不用抢着 pump。"""
+        return self.refill_due_at is not None and time.monotonic() < self.refill_due_at + REFILL_TIMER_GRACE_SECONDS
+
+    def refill(self) -> None:
+        if self.requests_per_minute <= 0:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.requests_per_minute / 60.0)
+        self.last_refill = now
+
+    def seconds_until_token(self) -> float:
+        if self.requests_per_minute <= 0 or self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) * 60.0 / self.requests_per_minute
+
+    def has_slot_for(self, priority: int) -> bool:
+        limit = self.max_concurrency
+        if priority >= BACKGROUND_PRIORITY_THRESHOLD:
+            limit = max(1, self.max_concurrency - self.reserved_interactive_slots)
+        return self.in_flight < limit
+
+
+class LLMRequestScheduler:
+    """
+    LLM请求的中央调度器。
+    大家都抢同一批密钥和同一份速率限制，那就得排队——但专注聊天的回复永远排在最前面，
+    摘要和侵入性思维这种后台活儿只能用剩下的槽位，哼。
+    """
+
+    def __init__(self) -> None:
+        self._lanes: dict[str, _ProviderLane] = {}
+        self._seq = itertools.count()
+        self._wait_samples: dict[LLMPriority, deque[float]] = {
+            p: deque(maxlen=WAIT_SAMPLES_PER_PRIORITY) for p in LLMPriority
+        }
+        self._cancelled_count: dict[LLMPriority, int] = dict.fromkeys(LLMPriority, 0)
+        # 通道、堆、计数都可能被别的线程（另一个事件循环）碰，改之前先拿锁；可重入是因为兑现 future 时可能要还槽位
+        self._lock = threading.RLock()
+
+    def _get_lane(self, provider: str) -> _ProviderLane:
+        lane = self._lanes.get(provider)
+        if lane is None:
+            settings = _scheduler_settings()
+            max_concurrency = max(1, settings.max_concurrent_requests_per_provider)
+            burst = max(1.0, float(settings.burst_size))
+            lane = _ProviderLane(
+                name=provider,
+                max_concurrency=max_concurrency,
+                reserved_interactive_slots=min(max(0, settings.reserved_interactive_slots), max_concurrency - 1),
+                requests_per_minute=float(settings.requests_per_minute_per_provider),
+                burst=burst,
+                tokens=burst,
+            )
+            self._lanes[provider] = lane
+            logger.info(
+                f"LLM调度器为提供商 '{provider}' 建立通道: 并发上限 {lane.max_concurrency}, "
+                f"交互预留 {lane.reserved_interactive_slots}, 每分钟 {lane.requests_per_minute or '不限'} 次。"
+            )
+        return lane
+
+    def _pump(self, lane: _ProviderLane) -> None:
+        """尽可能多地放行堆顶的等待者。调用方已经拿着锁。"""
+        lane.refill_due_at = None
+        lane.refill()
+        while lane.heap:
+            waiter = lane.heap[0]
+            if not waiter.pending:
+                # 已经被取消或者已经处理过的，直接扔掉
+                heapq.heappop(lane.heap)
+                continue
+            if not lane.has_slot_for(waiter.priority):
+                # 严格按优先级放行：堆顶都进不去，后面的更低优先级也别想
+                return
+            if lane.requests_per_minute > 0 and lane.tokens < 1.0:
+                delay = lane.seconds_until_token()
+                loop = waiter.loop
+                if _call_in_loop(loop, loop.call_later, delay, self._on_refill_due, lane):
+                    lane.refill_due_at = time.monotonic() + delay
+                    return
+                # 这个等待者的事件循环已经关了，它不会再来拿了
+                waiter.settled = True
+                heapq.heappop(lane.heap)
+                continue
+            heapq.heappop(lane.heap)
+            if lane.requests_per_minute > 0:
+                lane.tokens -= 1.0
+            lane.in_flight += 1
+            waiter.settled = True
+            if not _call_in_loop(waiter.loop, self._settle, lane, waiter, None):
+                lane.in_flight -= 1
+
+    def _on_refill_due(self, lane: _ProviderLane) -> None:
+        with self._lock:
+            self._pump(lane)
+
+    def _settle(self, lane: _ProviderLane, waiter: _Waiter, error: BaseException | None) -> None:
+        """在等待者自己的事件循环里兑现 future。放行的时候它已经不等了，就把槽位还回去。"""
+        if waiter.future.done():
+            if error is None:
+                self._release(lane)
+            return
+        if error is None:
+            waiter.future.set_result(None)
+        else:
+            waiter.future.set_exception(error)
+
+    def _release(self, lane: _ProviderLane) -> None:
+        with self._lock:
+            lane.in_flight = max(0, lane.in_flight - 1)
+            if not lane.refill_pending():
+                self._pump(lane)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, provider: str, priority: LLMPriority, group: str | None = None) -> AsyncIterator[float]:
+        """
+        排队拿一个请求槽位，拿到后 yield 本次的排队耗时（秒），退出时自动归还。
+        group 一般填会话ID，会话结束时可以用 cancel_group 把还在排队的请求一起踢掉。
+        """
+        if not _scheduler_settings().enabled:
+            yield 0.0
+            return
+
+        priority = LLMPriority(priority)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            lane = self._get_lane(provider)
+            waiter = _Waiter(
+                priority=int(priority),
+                seq=next(self._seq),
+                future=loop.create_future(),
+                loop=loop,
+                group=group,
+                enqueued_at=time.monotonic(),
+            )
+            heapq.heappush(lane.heap, waiter)
+            if not lane.refill_pending():
+                self._pump(lane)
+
+        try:
+            await waiter.future
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # 槽位已经给到了，但调用方在拿到之前被取消了，得还回去
+                self._release(lane)
+            else:
+                # 放行还在路上的话，_settle 看到 future 已经取消会自己把槽位还回去
+                with self._lock:
+                    self._cancelled_count[priority] += 1
+            raise
+
+        waited = time.monotonic() - waiter.enqueued_at
+        with self._lock:
+            self._wait_samples[priority].append(waited)
+        if waited > 1.0:
+            logger.debug(f"[{provider}] {priority.name} 请求排队 {waited:.2f} 秒后放行。")
+        try:
+            yield waited
+        finally:
+            self._release(lane)
+
+    def cancel_group(self, group: str) -> int:
+        """取消某个分组（通常是某个会话）里所有还在排队的请求，返回取消的数量。"""
+        cancelled = 0
+        with self._lock:
+            for lane in self._lanes.values():
+                lane_cancelled = 0
+                for waiter in lane.heap:
+                    if waiter.group == group and waiter.pending:
+                        waiter.settled = True
+                        error = LLMRequestCancelledError(f"分组 '{group}' 已结束，排队中的请求被取消。")
+                        _call_in_loop(waiter.loop, self._settle, lane, waiter, error)
+                        lane_cancelled += 1
+                if lane_cancelled and not lane.refill_pending():
+                    self._pump(lane)
+                cancelled += lane_cancelled
+        if cancelled:
+            logger.info(f"LLM调度器已取消分组 '{group}' 中 {cancelled} 个排队请求。")
+        return cancelled
+
+    def get_metrics(self) -> dict[str, Any]:
+        """返回排队耗时统计（按优先级）和各提供商通道的当前状态。"""
+        with self._lock:
+            return self._collect_metrics()
+
+    def _collect_metrics(self) -> dict[str, Any]:
+        wait_stats: dict[str, dict[str, float]] = {}
+        for priority, samples in self._wait_samples.items():
+            if not samples:
+                wait_stats[priority.name] = {"count": 0, "cancelled": self._cancelled_count[priority]}
+                continue
+            ordered = sorted(samples)
+            wait_stats[priority.name] = {
+                "count": len(ordered),
+                "cancelled": self._cancelled_count[priority],
+                "avg_ms": sum(ordered) / len(ordered) * 1000,
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        lanes = {
+            name: {
+                "in_flight": lane.in_flight,
+                "queued": sum(1 for w in lane.heap if w.pending),
+                "tokens": round(lane.tokens, 2) if lane.requests_per_minute > 0 else None,
+            }
+            for name, lane in self._lanes.items()
+        }
+        return {"queue_wait": wait_stats, "providers": lanes}
+
+
+# 全局唯一的调度器实例
+llm_request_scheduler = LLMRequestScheduler()
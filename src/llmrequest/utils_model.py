@@ -8,19 +8,25 @@ import io
 import json
 import mimetypes
 import os
-import random
 import re
 import time
+from collections.abc import AsyncIterator, Awaitable, Callable
 from typing import Any, TypedDict, Unpack
 
 import aiohttp
 from PIL import Image
 
+from src.common.custom_logging.hot_path_logger import HotPathLogger
 from src.common.custom_logging.logging_config import get_logger
-from src.config import config
+
+from .key_pool import APIKeyPool, get_shared_key_pool
 
 # --- 日志配置 ---
 logger = get_logger(__name__)
+# 每个请求都会走的日志用这个：默认级别下是 DEBUG 就直接跳过，连 System Prompt 切片都不做
+hot_path_logger = HotPathLogger(logger)
+# 流式响应里逐行/逐段都可能触发的日志，同一处每隔这么多秒最多记一条
+STREAM_LOG_INTERVAL_SECONDS = 5.0
 
 
 # --- 定义 TypedDict 用于 default_generation_config ---
@@ -137,10 +143,12 @@ class RateLimitError(NetworkError):
         status_code: int | None = 429,
         response_text: str | None = None,
         key_identifier: str | None = None,
+        retry_after_seconds: float | None = None,
     ) -> None:
         super().__init__(message, status_code=status_code, original_exception=None)
         self.response_text = response_text
         self.key_identifier = key_identifier
+        self.retry_after_seconds = retry_after_seconds
 
 
 class PermissionDeniedError(NetworkError):
@@ -183,6 +191,22 @@ DEFAULT_IMAGE_COMPRESSION_QUALITY_JPEG: int = 85
 DEFAULT_IMAGE_COMPRESSION_SCALE_MIN: float = 0.2
 DEFAULT_RATE_LIMIT_DISABLE_SECONDS: int = 30 * 60
 INITIAL_RETRY_PASS_DELAY_SECONDS: float = 10.0
+MAX_COOLDOWN_WAIT_SECONDS: float = 60.0
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """解析 Retry-After 响应头（只认秒数形式）。"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _preview(text: str, limit: int = 50) -> str:
+    """日志里只看个开头，超长就加省略号。"""
+    return f"{text[:limit]}{'...' if len(text) > limit else ''}"
 
 
 class LLMClient:
@@ -216,7 +240,6 @@ class LLMClient:
         self.pri_in = model.get("pri_in", 0)
         self.pri_out = model.get("pri_out", 0)
         self.rate_limit_disable_duration_seconds = rate_limit_disable_duration_seconds
-        self._temporarily_disabled_keys_429: dict[str, float] = {}
 
         api_keys_env_var_name = f"{self.env_provider_prefix}_API_KEYS"
         api_keys_env_var_name_singular = f"{self.env_provider_prefix}_KEY"
@@ -285,6 +308,8 @@ class LLMClient:
                     f"({self.env_provider_prefix}_BASE_URL) 加载Base URL。"
                 )
         self.base_url = self.base_url.rstrip("/")
+        # 同一个提供商（同一个 Base URL）的所有客户端共享一个密钥池和里面的健康档案
+        self.key_pool: APIKeyPool = get_shared_key_pool(f"{self.provider}|{self.base_url}")
 
         if self.provider == "GEMINI" or ("googleapis.com" in self.base_url.lower()):
             self.api_endpoint_style = "google"
@@ -309,7 +334,6 @@ class LLMClient:
 
         _abandoned_keys_list = abandoned_keys_config if abandoned_keys_config is not None else []
         self.abandoned_keys_config = {str(k) for k in _abandoned_keys_list if str(k)}
-        self._abandoned_keys_runtime: set[str] = set()
 
         _proxy_host = proxy_host if proxy_host is not None else os.getenv("PROXY_HOST", DEFAULT_PROXY_HOST)
         _proxy_port_str = os.getenv("PROXY_PORT")
@@ -336,6 +360,10 @@ class LLMClient:
         self.enable_image_compression = enable_image_compression
         self.image_compression_target_bytes = image_compression_target_bytes
 
+        # 同一个事件循环里的请求共用一个 HTTP 会话，别每次都重新握手
+        self._session: aiohttp.ClientSession | None = None
+        self._session_loop: asyncio.AbstractEventLoop | None = None
+
         logger.info(
             f"LLMClient 为提供商 '{self.provider}' 初始化完成。"
             f"模型: {self.model_name}, API密钥数: {len(self.api_keys_config)}, "
@@ -351,6 +379,33 @@ class LLMClient:
             f"目标大小: {self.image_compression_target_bytes / (1024 * 1024):.2f} MB"
         )
 
+    @contextlib.asynccontextmanager
+    async def _acquire_session(self) -> AsyncIterator[aiohttp.ClientSession]:
+        """
+        拿一个可用的 aiohttp 会话。
+        和创建它的事件循环是同一个，就复用共享会话；否则（比如在别的线程的循环里）临时开一个，用完即关。
+        """
+        current_loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+            self._session_loop = current_loop
+            logger.debug(f"LLMClient ({self.model_name}) 创建了新的共享 HTTP 会话。")
+
+        if self._session_loop is current_loop:
+            yield self._session
+            return
+
+        async with aiohttp.ClientSession() as temp_session:
+            yield temp_session
+
+    async def _close_session_if_any(self) -> None:
+        """关闭共享的 HTTP 会话（如果有的话），关机时调用。"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+            logger.info(f"LLMClient ({self.model_name}) 的共享 HTTP 会话已关闭。")
+        self._session = None
+        self._session_loop = None
+
     async def _compress_base64_image(self, base64_data: str, original_mime_type: str) -> tuple[str, str]:
         # 小色猫的终极调教：这次一定要把GIF操到服！
         if not self.enable_image_compression:
@@ -684,8 +739,8 @@ class LLMClient:
 
                 # 2. 如果有system_prompt，就把它放在名为"system_instruction"的顶级王座上！
                 if system_prompt:
-                    logger.debug(
-                        f"为 Google API 添加顶级的 system_instruction: {system_prompt[:50]}{'...' if len(system_prompt) > 50 else ''}"
+                    hot_path_logger.debug(
+                        "为 Google API 添加顶级的 system_instruction: {}", lambda: _preview(system_prompt)
                     )
                     payload["system_instruction"] = {"parts": [{"text": system_prompt}]}
 
@@ -777,15 +832,20 @@ class LLMClient:
         response: aiohttp.ClientResponse,
         request_type: str,
         interruption_event: asyncio.Event | None = None,
+        chunk_listener: Callable[[str], Awaitable[None]] | None = None,
     ) -> dict[str, Any]:
+        # chunk_listener 不为空时，每收到一段文本就交给它（比如专注聊天的增量解析器），终端就不再逐字打印了
         full_streamed_text = ""
         chunk_count = 0
         tool_calls_aggregated = []
         interrupted_by_event = False
         finish_reason_override = None
 
-        logger.info(
-            f"Beginning to receive '{self.api_endpoint_style}' stream data for request type '{request_type}'..."
+        hot_path_logger.debug(
+            "Beginning to receive '{}' stream data for request type '{}'...",
+            self.api_endpoint_style,
+            request_type,
+            per_seconds=STREAM_LOG_INTERVAL_SECONDS,
         )
         try:
             async for line_bytes in response.content:
@@ -861,22 +921,36 @@ class LLMClient:
                                                 + tc_delta["function"]["arguments"]
                                             )
                     except json.JSONDecodeError:
-                        logger.warning(f"Unable to parse stream JSON: {data_json_str}")
+                        hot_path_logger.warning(
+                            "Unable to parse stream JSON: {}",
+                            data_json_str,
+                            per_seconds=STREAM_LOG_INTERVAL_SECONDS,
+                        )
 
                 elif line and self.api_endpoint_style == "google":
-                    logger.debug(f"Non-data Google stream event: {line}")
+                    hot_path_logger.debug(
+                        "Non-data Google stream event: {}", line, per_seconds=STREAM_LOG_INTERVAL_SECONDS
+                    )
 
                 if current_chunk_text is not None:
                     if self.stream_chunk_delay_seconds > 0:
                         await asyncio.sleep(self.stream_chunk_delay_seconds)
-                    print(current_chunk_text, end="", flush=True)  # Changed from logger.info to print for stream
                     full_streamed_text += current_chunk_text
+                    if chunk_listener is not None and current_chunk_text:
+                        await chunk_listener(current_chunk_text)
 
+            # 以前没有监听者时会逐字 print 到终端，忙起来全是 stdout I/O；现在整段流结束后再按需记一条 DEBUG
+            if chunk_listener is None:
+                hot_path_logger.debug("流式输出全文: {}", lambda: full_streamed_text)
             if not interrupted_by_event:
-                print()  # Newline after stream finishes
-                logger.info(f"'{self.api_endpoint_style}' streaming complete ({chunk_count} data chunks).")
+                hot_path_logger.debug(
+                    "'{}' streaming complete ({} data chunks).",
+                    self.api_endpoint_style,
+                    chunk_count,
+                    per_seconds=STREAM_LOG_INTERVAL_SECONDS,
+                )
             else:
-                print(" [STREAM INTERRUPTED]")
+                logger.info(f"'{self.api_endpoint_style}' stream interrupted after {chunk_count} data chunks.")
 
             result = {
                 "streamed_text_summary": (
@@ -981,6 +1055,7 @@ class LLMClient:
         is_streaming: bool,
         request_type: str,
         interruption_event: asyncio.Event | None = None,
+        chunk_listener: Callable[[str], Awaitable[None]] | None = None,
     ) -> dict[str, Any]:
         full_request_url = f"{self.base_url}{url_path}"
         request_params = {}
@@ -1035,6 +1110,7 @@ class LLMClient:
 
             status_code = http_response.status
             logger.debug(f"Request sent. Actual URL: {http_response.url}. Status: {status_code}")
+            self.key_pool.observe_headers(api_key, http_response.headers)
 
             if 200 <= status_code < 300:
                 if is_streaming:
@@ -1042,6 +1118,7 @@ class LLMClient:
                         http_response,
                         request_type,
                         interruption_event,
+                        chunk_listener,
                     )
                 else:
                     response_json = await http_response.json()
@@ -1067,7 +1144,11 @@ class LLMClient:
                     )
                 if status_code == 429:
                     raise RateLimitError(
-                        f"速率限制超出 (429) - Key {key_info}", status_code, response_text, key_identifier=api_key
+                        f"速率限制超出 (429) - Key {key_info}",
+                        status_code,
+                        response_text,
+                        key_identifier=api_key,
+                        retry_after_seconds=_parse_retry_after(http_response.headers.get("Retry-After")),
                     )
                 raise APIResponseError(f"API错误 {status_code} - Key {key_info}", status_code, response_text)
 
@@ -1116,8 +1197,9 @@ class LLMClient:
         max_retries: int = 3,
         interruption_event: asyncio.Event | None = None,
         enable_google_search: bool = False,
+        chunk_listener: Callable[[str], Awaitable[None]] | None = None,
     ) -> dict[str, Any]:
-        async with aiohttp.ClientSession() as session:
+        async with self._acquire_session() as session:
             all_initial_keys = self.api_keys_config[:]
             last_exception: Exception | None = None
 
@@ -1140,8 +1222,16 @@ class LLMClient:
                 current_generation_config.update(generation_params_override)
 
             images_have_been_compression_attempted_this_call = False
-            allowed_temp_disable_resets = max(0, max_retries - 1)
-            num_temp_disable_resets_done = 0
+
+            # 流式文本一旦交给了下游，中途出错就不能再换密钥重试了，否则下游会收到两份开头
+            chunks_delivered = False
+            forward_chunk: Callable[[str], Awaitable[None]] | None = None
+            if chunk_listener is not None:
+
+                async def forward_chunk(text: str) -> None:
+                    nonlocal chunks_delivered
+                    chunks_delivered = True
+                    await chunk_listener(text)
 
             for attempt_pass in range(max_retries + 1):
                 if interruption_event and interruption_event.is_set():
@@ -1155,56 +1245,46 @@ class LLMClient:
                         "message": "Task was interrupted before an API call could be made in this attempt.",
                     }
 
-                current_time = time.time()
-                keys_to_reactivate = [
-                    k for k, expiry_ts in self._temporarily_disabled_keys_429.items() if expiry_ts <= current_time
-                ]
-                for k_active in keys_to_reactivate:
-                    del self._temporarily_disabled_keys_429[k_active]
-                    logger.info(f"密钥 ...{k_active[-4:]} 的429临时禁用已到期并解除。")
-
-                all_abandoned_permanently = self.abandoned_keys_config.union(self._abandoned_keys_runtime)
-
-                available_keys_this_pass = [
-                    key
-                    for key in all_initial_keys
-                    if key not in all_abandoned_permanently and key not in self._temporarily_disabled_keys_429
-                ]
+                available_keys_this_pass = self.key_pool.available_keys(
+                    all_initial_keys, excluded=self.abandoned_keys_config
+                )
 
                 if not available_keys_this_pass:
-                    if (
-                        self._temporarily_disabled_keys_429
-                        and num_temp_disable_resets_done < allowed_temp_disable_resets
-                    ):
-                        logger.warning(
-                            f"在第 {attempt_pass + 1} 次尝试轮中，所有可用密钥当前均处于429临时禁用状态。 "
-                            "将清除临时禁用列表并重试 "
-                            f"(已执行重置: {num_temp_disable_resets_done}/{allowed_temp_disable_resets})。"
-                        )
-                        self._temporarily_disabled_keys_429.clear()
-                        num_temp_disable_resets_done += 1
-                        available_keys_this_pass = [
-                            key for key in all_initial_keys if key not in all_abandoned_permanently
-                        ]
-                        if not available_keys_this_pass:
-                            logger.error("清除临时禁用列表后，仍无任何可用API密钥。")
-                            break
-                    else:
-                        logger.error(
-                            f"在第 {attempt_pass + 1} 次尝试轮中，已无任何可用API密钥"
-                            f"（包括永久禁用和无法再重置的临时禁用）。"
-                        )
+                    wait_seconds = self.key_pool.seconds_until_next_available(
+                        all_initial_keys, excluded=self.abandoned_keys_config
+                    )
+                    if wait_seconds is None:
+                        logger.error(f"在第 {attempt_pass + 1} 次尝试轮中，已无任何可用API密钥（全部被永久弃用）。")
+                        break
+                    if attempt_pass >= max_retries:
+                        logger.error(f"在第 {attempt_pass + 1} 次尝试轮中，所有密钥仍在冷却期，且已无剩余尝试轮。")
                         break
+                    wait_seconds = min(wait_seconds, MAX_COOLDOWN_WAIT_SECONDS)
+                    logger.warning(
+                        f"在第 {attempt_pass + 1} 次尝试轮中，所有可用密钥当前均处于冷却期。"
+                        f"等待 {wait_seconds:.1f} 秒后进入下一轮。"
+                    )
+                    await asyncio.sleep(wait_seconds)
+                    continue
 
-                random.shuffle(available_keys_this_pass)
-                logger.info(
-                    f"开始第 {attempt_pass + 1}/{max_retries + 1} 次请求尝试轮。 "
-                    f"本轮可用密钥数 (排除永久和临时禁用): {len(available_keys_this_pass)}"
+                hot_path_logger.debug(
+                    "开始第 {}/{} 次请求尝试轮。 本轮可用密钥数 (排除弃用和冷却中的): {}",
+                    attempt_pass + 1,
+                    max_retries + 1,
+                    len(available_keys_this_pass),
                 )
 
                 current_pass_last_exception: Exception | None = None
+                tried_keys_this_pass: set[str] = set()
+                key_idx = -1
 
-                for key_idx, current_key in enumerate(available_keys_this_pass):
+                # 每次都从密钥池里挑当下分数最好的（最闲、最快、最健康），而不是随机洗牌
+                while current_key := self.key_pool.pick(
+                    k for k in available_keys_this_pass if k not in tried_keys_this_pass
+                ):
+                    key_idx += 1
+                    tried_keys_this_pass.add(current_key)
+                    attempt_started_at = time.monotonic()
                     key_display = f"...{current_key[-4:]}" if current_key and len(current_key) > 4 else "INVALID_KEY"
                     try:
                         url_path, headers, payload = self._prepare_request_data_for_style(
@@ -1219,14 +1299,20 @@ class LLMClient:
                             text_to_embed=text_to_embed,
                             enable_google_search=enable_google_search,
                         )
-                        logger.info(
-                            f"尝试轮 {attempt_pass + 1}/{max_retries + 1}, "
-                            f"密钥 {key_idx + 1}/{len(available_keys_this_pass)} (ID: {key_display}): "
-                            f"类型: {request_type}, {'流式' if is_streaming else '非流式'}, 模型: {self.model_name}"
+                        hot_path_logger.debug(
+                            "尝试轮 {}/{}, 密钥 {}/{} (ID: {}): 类型: {}, {}, 模型: {}",
+                            attempt_pass + 1,
+                            max_retries + 1,
+                            key_idx + 1,
+                            len(available_keys_this_pass),
+                            key_display,
+                            request_type,
+                            "流式" if is_streaming else "非流式",
+                            self.model_name,
                         )
                         if system_prompt and request_type != "embedding":
-                            logger.info(
-                                f"  使用 System Prompt (前50字符): {system_prompt[:50]}{'...' if len(system_prompt) > 50 else ''}"
+                            hot_path_logger.debug(
+                                "  使用 System Prompt (前50字符): {}", lambda: _preview(system_prompt)
                             )
 
                         result = await self._make_api_call_attempt(
@@ -1238,9 +1324,18 @@ class LLMClient:
                             is_streaming,
                             request_type,
                             interruption_event,
+                            forward_chunk,
                         )
+                        # 先看结果再记账：返回了 error 的不算成功，被打断的不算数（那次的耗时也没意义）
+                        if result.get("error"):
+                            self.key_pool.record_failure(current_key)
+                        elif not result.get("interrupted"):
+                            self.key_pool.record_success(current_key, time.monotonic() - attempt_started_at)
 
                         # --- START: 小猫咪的淫纹植入处！ ---
+                        # 配置在这里才读，导入这个模块（比如调度器）不会触发配置文件的生成和检查
+                        from src.config import config
+
                         if config.test_function.fallback_model_name != "":
                             is_successful_call = not result.get("error") and not result.get("interrupted")
                             is_non_streaming_text_request = not is_streaming and request_type != "embedding"
@@ -1309,23 +1404,23 @@ class LLMClient:
                             f"密钥 {key_display} 遇到权限拒绝 ({e_perm.status_code}): "
                             f"{e_perm!s}. 将被永久标记为已弃用。"
                         )
-                        if e_perm.key_identifier:
-                            self._abandoned_keys_runtime.add(e_perm.key_identifier)
-                            if e_perm.key_identifier in self._temporarily_disabled_keys_429:
-                                del self._temporarily_disabled_keys_429[e_perm.key_identifier]
+                        self.key_pool.abandon(e_perm.key_identifier or current_key)
                         current_pass_last_exception = e_perm
 
                     except RateLimitError as e_rate:
+                        cooldown_seconds = self.key_pool.record_rate_limited(
+                            e_rate.key_identifier or current_key,
+                            max_cooldown_seconds=self.rate_limit_disable_duration_seconds,
+                            retry_after_seconds=e_rate.retry_after_seconds,
+                        )
                         logger.warning(
                             f"密钥 {key_display} 达到速率限制 ({e_rate.status_code}). "
-                            f"将被临时禁用 {self.rate_limit_disable_duration_seconds // 60} 分钟。"
-                        )
-                        if e_rate.key_identifier and self.rate_limit_disable_duration_seconds > 0:
-                            disable_until_ts = time.time() + self.rate_limit_disable_duration_seconds
-                            self._temporarily_disabled_keys_429[e_rate.key_identifier] = disable_until_ts
-                            logger.info(
-                                f"密钥 {key_display} 已被临时禁用直到 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(disable_until_ts))}."
+                            + (
+                                f"将冷却 {cooldown_seconds:.0f} 秒。"
+                                if cooldown_seconds > 0
+                                else "冷却已关闭，不禁用。"
                             )
+                        )
                         current_pass_last_exception = e_rate
 
                     except PayloadTooLargeError as e_payload:
@@ -1359,11 +1454,15 @@ class LLMClient:
                             logger.warning("遇到PayloadTooLargeError，但无法或不再尝试图像压缩。")
 
                     except (NetworkError, APIResponseError, LLMClientError) as e_general:
+                        self.key_pool.record_failure(current_key)
                         logger.warning(
                             f"尝试轮 {attempt_pass + 1} (密钥 {key_display}) 失败，"
                             f"错误类型 {type(e_general).__name__}: {e_general!s}"
                         )
                         current_pass_last_exception = e_general
+                        if chunks_delivered:
+                            logger.error("流式响应在已向下游输出部分文本后中断，不再重试。")
+                            raise
 
                     except Exception as e_unexpected:
                         logger.error(
@@ -1372,6 +1471,9 @@ class LLMClient:
                         )
                         current_pass_last_exception = e_unexpected
 
+                    finally:
+                        self.key_pool.release(current_key)
+
                     if key_idx < len(available_keys_this_pass) - 1:
                         logger.warning(f"密钥 {key_display} 尝试失败。将尝试本轮中的下一个可用密钥。")
                     else:
@@ -1425,6 +1527,7 @@ class LLMClient:
         max_retries: int = 3,
         interruption_event: asyncio.Event | None = None,
         use_google_search: bool = False,
+        chunk_listener: Callable[[str], Awaitable[None]] | None = None,
         **kwargs: Unpack[GenerationParams],
     ) -> dict[str, Any]:
         request_type = "chat"
@@ -1455,6 +1558,7 @@ class LLMClient:
             max_retries=max_retries,
             interruption_event=interruption_event,
             enable_google_search=use_google_search,
+            chunk_listener=chunk_listener,
         )
 
     async def generate_text_completion(
@@ -1468,10 +1572,10 @@ class LLMClient:
         interruption_event: asyncio.Event | None = None,
         **kwargs: Unpack[GenerationParams],
     ) -> dict[str, Any]:
-        logger.info(f"generate_text_completion: {'流式' if is_stream else '非流式'}")
+        hot_path_logger.debug("generate_text_completion: {}", "流式" if is_stream else "非流式")
         if system_prompt:
-            logger.info(
-                f"  generate_text_completion 收到 System Prompt (前50字符): {system_prompt[:50]}{'...' if len(system_prompt) > 50 else ''}"
+            hot_path_logger.debug(
+                "  generate_text_completion 收到 System Prompt (前50字符): {}", lambda: _preview(system_prompt)
             )
         gen_params = kwargs.copy()
         return await self.make_request(
@@ -1499,10 +1603,12 @@ class LLMClient:
         interruption_event: asyncio.Event | None = None,
         **kwargs: Unpack[GenerationParams],
     ) -> dict[str, Any]:
-        logger.info(f"generate_vision_completion: {'流式' if is_stream else '非流式'}, 图像数量: {len(image_inputs)}")
+        hot_path_logger.debug(
+            "generate_vision_completion: {}, 图像数量: {}", "流式" if is_stream else "非流式", len(image_inputs)
+        )
         if system_prompt:
-            logger.info(
-                f"  generate_vision_completion 收到 System Prompt (前50字符): {system_prompt[:50]}{'...' if len(system_prompt) > 50 else ''}"
+            hot_path_logger.debug(
+                "  generate_vision_completion 收到 System Prompt (前50字符): {}", lambda: _preview(system_prompt)
             )
 
         if not image_inputs:
@@ -1537,10 +1643,10 @@ class LLMClient:
         interruption_event: asyncio.Event | None = None,
         **kwargs: Unpack[GenerationParams],
     ) -> dict[str, Any]:
-        logger.info(f"generate_with_tools: {'流式' if is_stream else '非流式'}, 工具数量: {len(tools)}")
+        hot_path_logger.debug("generate_with_tools: {}, 工具数量: {}", "流式" if is_stream else "非流式", len(tools))
         if system_prompt:
-            logger.info(
-                f"  generate_with_tools 收到 System Prompt (前50字符): {system_prompt[:50]}{'...' if len(system_prompt) > 50 else ''}"
+            hot_path_logger.debug(
+                "  generate_with_tools 收到 System Prompt (前50字符): {}", lambda: _preview(system_prompt)
             )
 
         if not tools:
@@ -1568,7 +1674,7 @@ class LLMClient:
         generation_params_override: GenerationParams | None = None,
         max_retries: int = 3,
     ) -> dict[str, Any]:
-        logger.info(f"嵌入请求: 文本长度 {len(text_to_embed)}")
+        hot_path_logger.debug("嵌入请求: 文本长度 {}", len(text_to_embed))
         if not text_to_embed:
             raise ValueError("用于嵌入的文本不能为空。")
         return await self._execute_request_with_retries(
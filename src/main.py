@@ -3,6 +3,7 @@ import asyncio
 import json
 import os
 import threading
+from pathlib import Path
 
 from src import platform_builders  # 确保能导入这个包
 from src.action.action_handler import ActionHandler
@@ -11,9 +12,12 @@ from src.common.custom_logging.logging_config import get_logger
 from src.common.intelligent_interrupt_system.iis_main import IISBuilder
 from src.common.intelligent_interrupt_system.intelligent_interrupter import IntelligentInterrupter
 from src.common.intelligent_interrupt_system.models import SemanticModel
+from src.common.semantic_memory.semantic_memory_service import SemanticMemoryService
 from src.common.summarization_observation.summarization_service import SummarizationService
+from src.common.tracing.tracer import tracer
 from src.common.unread_info_service.unread_info_service import UnreadInfoService
 from src.config import config
+from src.config.config_paths import PROJECT_ROOT
 from src.core_communication.action_sender import ActionSender
 from src.core_communication.core_ws_server import CoreWebsocketServer
 from src.core_communication.event_receiver import EventReceiver
@@ -31,23 +35,34 @@ from src.database import (
     ArangoDBConnectionManager,
     ConversationStorageService,
     CoreDBCollections,
+    InMemoryActionLogStorageService,
+    InMemoryConversationStorageService,
+    InMemoryEventStorageService,
+    InMemoryPersonStorageService,
+    InMemoryStore,
+    InMemorySummaryStorageService,
+    InMemoryThoughtStorageService,
     PersonStorageService,  # 把新老鸨请进来！
     ThoughtStorageService,
+    query_registry,
 )
+from src.database.services.event_archive import EventArchive
 from src.database.services.event_storage_service import EventStorageService
 from src.database.services.summary_storage_service import SummaryStorageService
 from src.focus_chat_mode.chat_session_manager import ChatSessionManager
 from src.llmrequest.llm_processor import Client as ProcessorClient
+from src.llmrequest.request_scheduler import PURPOSE_PRIORITIES, LLMPriority
 from src.llmrequest.utils_model import GenerationParams
 from src.message_processing.default_message_processor import DefaultMessageProcessor
 from src.platform_builders.registry import platform_builder_registry
+from src.tools.search.search_service import search_service_instance
 
 logger = get_logger(__name__)
 
 
 class CoreSystemInitializer:
     def __init__(self) -> None:
-        self.conn_manager: ArangoDBConnectionManager | None = None
+        self.conn_manager: ArangoDBConnectionManager | InMemoryStore | None = None
         self.event_storage_service: EventStorageService | None = None
         self.conversation_storage_service: ConversationStorageService | None = None
         self.thought_storage_service: ThoughtStorageService | None = None
@@ -75,6 +90,7 @@ class CoreSystemInitializer:
         self.iis_builder_instance: IISBuilder | None = None
         self.interrupt_model_instance: IntelligentInterrupter | None = None
         self.semantic_model_instance: SemanticModel | None = None  # 语义模型也作为单例
+        self.semantic_memory_service: SemanticMemoryService | None = None
         self.context_builder_instance: ContextBuilder | None = None
         self.thought_generator_instance: ThoughtGenerator | None = None
         self.thought_persistor_instance: ThoughtPersistor | None = None
@@ -114,6 +130,7 @@ class CoreSystemInitializer:
                 }
                 if resolved_abandoned_keys:
                     args["abandoned_keys_config"] = resolved_abandoned_keys
+                args["default_priority"] = PURPOSE_PRIORITIES.get(purpose, LLMPriority.MAIN_THOUGHT)
                 client = ProcessorClient(**{k: v for k, v in args.items() if v is not None})
                 logger.info(f"为用途 '{purpose}' 创建 ProcessorClient 成功 (模型: {client.llm_client.model_name})。")
                 return client
@@ -140,20 +157,40 @@ class CoreSystemInitializer:
         logger.info("LLM客户端初始化完毕。")
 
     async def _initialize_database_and_services(self) -> None:
-        self.conn_manager = await ArangoDBConnectionManager.create_from_config(
-            config.database, core_collection_configs=CoreDBCollections.get_all_core_collection_configs()
+        query_registry.configure(
+            slow_query_threshold_ms=config.tracing.slow_query_threshold_ms,
+            profile_slow_queries=config.tracing.profile_slow_queries,
+            track_bytes=config.tracing.track_query_bytes,
         )
-        if not self.conn_manager or not self.conn_manager.db:
-            raise RuntimeError("数据库连接管理器初始化失败。")
-        logger.debug(f"数据库连接管理器已为数据库 '{self.conn_manager.db.name}' 初始化。")
-
-        services_to_init = {
-            "event_storage_service": EventStorageService,
-            "conversation_storage_service": ConversationStorageService,
-            "thought_storage_service": ThoughtStorageService,
-            "action_log_service": ActionLogStorageService,
-            "person_storage_service": PersonStorageService,  # 把新老鸨也加进来初始化
-        }
+        use_memory_backend = config.database.backend == "memory"
+        if use_memory_backend:
+            # 不连数据库，所有服务换成内存版（接口一样，上层无感）
+            self.conn_manager = await InMemoryStore.create_from_config(config.database)
+            services_to_init = {
+                "event_storage_service": InMemoryEventStorageService,
+                "conversation_storage_service": InMemoryConversationStorageService,
+                "thought_storage_service": InMemoryThoughtStorageService,
+                "action_log_service": InMemoryActionLogStorageService,
+                "person_storage_service": InMemoryPersonStorageService,
+            }
+            summary_service_class = InMemorySummaryStorageService
+        else:
+            self.conn_manager = await ArangoDBConnectionManager.create_from_config(
+                config.database, core_collection_configs=CoreDBCollections.get_all_core_collection_configs()
+            )
+            if not self.conn_manager or not self.conn_manager.db:
+                raise RuntimeError("数据库连接管理器初始化失败。")
+            logger.debug(f"数据库连接管理器已为数据库 '{self.conn_manager.db.name}' 初始化。")
+
+            services_to_init = {
+                "event_storage_service": EventStorageService,
+                "conversation_storage_service": ConversationStorageService,
+                "thought_storage_service": ThoughtStorageService,
+                "action_log_service": ActionLogStorageService,
+                "person_storage_service": PersonStorageService,  # 把新老鸨也加进来初始化
+            }
+            summary_service_class = SummaryStorageService
+
         for attr_name, service_class in services_to_init.items():
             instance = service_class(conn_manager=self.conn_manager)
             if hasattr(instance, "initialize_infrastructure"):
@@ -162,11 +199,25 @@ class CoreSystemInitializer:
             logger.info(f"{service_class.__name__} 已初始化。")
 
         # 单独处理 SummaryStorageService
-        self.summary_storage_service = SummaryStorageService(db_manager=self.conn_manager)
+        self.summary_storage_service = summary_service_class(db_manager=self.conn_manager)
         if hasattr(self.summary_storage_service, "initialize_infrastructure"):
             await self.summary_storage_service.initialize_infrastructure()
-        logger.info(f"{SummaryStorageService.__name__} 已初始化。")
-        logger.info("所有核心数据存储服务均已初始化。")
+        logger.info(f"{summary_service_class.__name__} 已初始化。")
+        logger.info(f"所有核心数据存储服务均已初始化（存储后端: {config.database.backend}）。")
+
+        retention = config.event_retention
+        if retention.enabled and self.event_storage_service:
+            # 老的、已总结过的事件搬进冷归档，热集合的大小不再跟着运行年限一起涨
+            archive_dir = Path(retention.archive_directory)
+            if not archive_dir.is_absolute():
+                archive_dir = PROJECT_ROOT / archive_dir
+            await self.event_storage_service.enable_retention(
+                EventArchive(archive_dir),
+                hot_retention_days=retention.hot_retention_days,
+                check_interval_seconds=retention.check_interval_minutes * 60,
+                batch_size=retention.batch_size,
+            )
+            logger.info(f"事件冷归档已启用：保留最近 {retention.hot_retention_days} 天，归档目录 {archive_dir}。")
 
     async def _initialize_interrupt_model(self) -> None:
         """初始化我们的中断判断模型和其依赖（最终完美对接版）"""
@@ -257,6 +308,16 @@ class CoreSystemInitializer:
             self.summarization_service = SummarizationService(llm_client=summary_llm)
             logger.info("SummarizationService 初始化成功。")
 
+            # 语义记忆要先于专注聊天初始化，会话的 prompt 和总结都要用到它
+            if config.semantic_memory.enabled and self.event_storage_service:
+                self.semantic_memory_service = SemanticMemoryService(
+                    event_storage=self.event_storage_service,
+                    semantic_model=self.semantic_model_instance,
+                    summary_storage=self.summary_storage_service,
+                )
+                await self.semantic_memory_service.initialize()
+                logger.info("SemanticMemoryService 初始化成功。")
+
             if config.focus_chat_mode.enabled:
                 if (
                     self.focused_chat_llm_client
@@ -278,6 +339,7 @@ class CoreSystemInitializer:
                         summary_storage_service=self.summary_storage_service,
                         intelligent_interrupter=self.interrupt_model_instance,
                         core_logic=None,
+                        semantic_memory=self.semantic_memory_service,
                     )
                     logger.info("ChatSessionManager 初始化完成，并已成功注入智能打断系统。")
                 else:
@@ -293,6 +355,7 @@ class CoreSystemInitializer:
                 person_service=self.person_storage_service,  # 把新老鸨介绍给消息处理器
                 semantic_model=self.semantic_model_instance,
                 qq_chat_session_manager=self.qq_chat_session_manager,
+                semantic_memory=self.semantic_memory_service,
             )
             self.message_processor.core_initializer_ref = self
             logger.info("DefaultMessageProcessor 初始化成功。")
@@ -342,7 +405,10 @@ class CoreSystemInitializer:
                 event_storage=self.event_storage_service,
                 core_comm=self.core_comm_layer,
                 state_manager=self.state_manager_instance,
+                conversation_storage=self.conversation_storage_service,
             )
+            # 主意识一轮思考里，未读摘要直接用这一轮的上下文快照
+            self.unread_info_service.snapshot_source = self.context_builder_instance.current_snapshot
             logger.info("ContextBuilder 初始化成功。")
             if self.context_builder_instance:
                 self.context_builder_instance.core_comm = self.core_comm_layer
@@ -351,9 +417,18 @@ class CoreSystemInitializer:
             if config.intrusive_thoughts_module_settings.enabled:
                 if self.intrusive_thoughts_llm_client:
                     # 用我们全新的、干净的构造方法来创建它！
+                    # 内存后端没法在独立线程里另开连接，只能共用主循环里的那一份
+                    use_main_loop = (
+                        config.intrusive_thoughts_module_settings.run_in_main_loop
+                        or config.database.backend == "memory"
+                    )
                     self.intrusive_generator_instance = IntrusiveThoughtsGenerator(
                         llm_client=self.intrusive_thoughts_llm_client,
                         stop_event=self.stop_event,
+                        thought_service=self.thought_storage_service if use_main_loop else None,
+                        is_focus_chat_busy=(
+                            self.qq_chat_session_manager.is_any_session_active if self.qq_chat_session_manager else None
+                        ),
                     )
                     logger.info("IntrusiveThoughtsGenerator 已使用新的独立配方初始化成功。")
                 else:
@@ -418,7 +493,12 @@ class CoreSystemInitializer:
 
         all_tasks: list[asyncio.Task] = []
         try:
-            if self.intrusive_generator_instance and config.intrusive_thoughts_module_settings.enabled:
+            # 侵入性思维优先跑在主循环里共用连接；拿不到共享服务时才退回独立线程
+            if (
+                self.intrusive_generator_instance
+                and config.intrusive_thoughts_module_settings.enabled
+                and not self.intrusive_generator_instance.start_as_task()
+            ):
                 self.intrusive_thread = self.intrusive_generator_instance.start_background_generation()
                 if self.intrusive_thread:
                     logger.info("侵入性思维后台线程已启动。")
@@ -479,7 +559,9 @@ class CoreSystemInitializer:
         if self.core_logic_instance:
             await self.core_logic_instance.stop()
 
-        # 2. 停止侵入性思维线程
+        # 2. 停止侵入性思维（主循环任务或独立线程）
+        if self.intrusive_generator_instance:
+            await self.intrusive_generator_instance.stop_task()
         if self.intrusive_thread and self.intrusive_thread.is_alive():
             self.intrusive_thread.join(timeout=10.0)
             if self.intrusive_thread.is_alive():
@@ -509,7 +591,29 @@ class CoreSystemInitializer:
                 except Exception as e:
                     logger.warning(f"关闭LLM客户端会话时出错: {e}")
 
-        # 6. 最后，当所有可能使用数据库的操作都结束后，再关闭数据库连接
+        # 6. 关闭搜索引擎的连接池，把搜索缓存、链路计时和查询统计落盘
+        try:
+            await search_service_instance.close()
+        except Exception as e:
+            logger.warning(f"关闭搜索服务时出错: {e}")
+        if tracer.enabled:
+            tracer.export_stats()
+            await tracer.flush()
+            # 查询统计和链路计时放在同一个导出目录，相对路径按项目根目录算（和冷归档目录一样）
+            query_registry.export_stats(PROJECT_ROOT / config.tracing.export_directory)
+
+        # 7. 不会再有新消息入库了，把语义索引的活动段落盘
+        if self.semantic_memory_service:
+            try:
+                await self.semantic_memory_service.shutdown()
+            except Exception as e:
+                logger.warning(f"语义记忆索引落盘时出错: {e}")
+
+        # 8. 停掉事件存储的后台维护，把还没落盘的会话计数器写回去
+        if self.event_storage_service:
+            await self.event_storage_service.shutdown()
+
+        # 9. 最后，当所有可能使用数据库的操作都结束后，再关闭数据库连接（内存后端在这里写快照）
         if self.conn_manager:
             await self.conn_manager.close_client()
 
@@ -2,15 +2,18 @@
 import asyncio
 import time
 import uuid
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Optional
 
 # 导入我们全新的、不带platform字段的协议对象！
 from aicarus_protocols import Event as ProtocolEvent
 from aicarus_protocols import Seg, SegBuilder
 from websockets.server import WebSocketServerProtocol
 
+from src.common.custom_logging.hot_path_logger import HotPathLogger
 from src.common.custom_logging.logging_config import get_logger
 from src.common.intelligent_interrupt_system.models import SemanticModel
+from src.common.semantic_memory.embedding_codec import encode_embedding
+from src.common.tracing.tracer import tracer
 from src.config import config
 from src.database import (
     ConversationStorageService,
@@ -23,9 +26,11 @@ from src.focus_chat_mode.chat_session_manager import ChatSessionManager
 
 if TYPE_CHECKING:
     from src.action.action_handler import ActionHandler  # 确保导入 ActionHandler
+    from src.common.semantic_memory.semantic_memory_service import SemanticMemoryService
     from src.core_communication.core_ws_server import CoreWebsocketServer
     from src.main import CoreSystemInitializer
 logger = get_logger(__name__)
+hot_path_logger = HotPathLogger(logger)
 
 
 class DefaultMessageProcessor:
@@ -41,6 +46,7 @@ class DefaultMessageProcessor:
         semantic_model: "SemanticModel",
         core_websocket_server: Optional["CoreWebsocketServer"] = None,
         qq_chat_session_manager: Optional["ChatSessionManager"] = None,
+        semantic_memory: Optional["SemanticMemoryService"] = None,
     ) -> None:
         self.event_service: EventStorageService = event_service
         self.conversation_service: ConversationStorageService = conversation_service
@@ -48,6 +54,7 @@ class DefaultMessageProcessor:
         self.semantic_model: SemanticModel = semantic_model
         self.core_comm_layer: CoreWebsocketServer | None = core_websocket_server
         self.qq_chat_session_manager = qq_chat_session_manager
+        self.semantic_memory = semantic_memory
         self.core_initializer_ref: CoreSystemInitializer | None = None
         logger.info("DefaultMessageProcessor 初始化完成，已配备PersonStorageService服务。")
         if self.core_comm_layer:
@@ -94,17 +101,18 @@ class DefaultMessageProcessor:
             # --- 核心改造点：关联Person ---
             person_id, account_uid = None, None
             if proto_event.user_info and proto_event.user_info.user_id:
-                person_id, account_uid = await self.person_service.find_or_create_person_and_account(
-                    proto_event.user_info, platform_id
-                )
-                if person_id and account_uid and proto_event.conversation_info:
-                    # 更新一下这个账号在这个群里的成员信息（边属性）
-                    await self.person_service.update_membership(
-                        account_uid=account_uid,
-                        conversation_id=proto_event.conversation_info.conversation_id,
-                        user_info=proto_event.user_info,
-                        conversation_name=proto_event.conversation_info.name,
+                with tracer.span("person_lookup"):
+                    person_id, account_uid = await self.person_service.find_or_create_person_and_account(
+                        proto_event.user_info, platform_id
                     )
+                    if person_id and account_uid and proto_event.conversation_info:
+                        # 更新一下这个账号在这个群里的成员信息（边属性）
+                        await self.person_service.update_membership(
+                            account_uid=account_uid,
+                            conversation_id=proto_event.conversation_info.conversation_id,
+                            user_info=proto_event.user_info,
+                            conversation_name=proto_event.conversation_info.name,
+                        )
 
             if needs_persistence:
                 # DBEventDocument 的 from_protocol 方法需要被改造，以适应新的 Event 结构
@@ -121,13 +129,20 @@ class DefaultMessageProcessor:
                     # 使用语义模型将文本编码为向量
                     # encode 方法需要一个列表，因此将文本包装在列表中
                     # 结果也是一个列表，我们取第一个元素
-                    embedding_vector = self.semantic_model.encode([text_content])[0]
-                    # 将向量（NumPy数组）转换为普通列表，以便存储到数据库中
-                    db_event_document.embedding = embedding_vector.tolist()
+                    with tracer.span("embedding"):
+                        embedding_vector = self.semantic_model.encode([text_content])[0]
+                    # 量化成紧凑格式再存，比直接 tolist() 成一长串浮点数小一个数量级
+                    db_event_document.embedding = encode_embedding(
+                        embedding_vector, config.semantic_memory.embedding_storage_format
+                    )
                     logger.debug(f"为事件 '{proto_event.event_id}' 生成并添加了句子向量。")
 
                 event_doc_to_save = db_event_document.to_dict()
-                await self.event_service.save_event_document(event_doc_to_save)
+                with tracer.span("event_save"):
+                    event_saved = await self.event_service.save_event_document(event_doc_to_save)
+                if event_saved and self.semantic_memory:
+                    # 存好了就顺手放进语义索引，以后才能按意思把它找回来
+                    self.semantic_memory.index_event_document(event_doc_to_save)
                 logger.debug(f"事件文档 '{proto_event.event_id}' 已保存，status='{event_status}'")
 
             if proto_event.conversation_info and proto_event.conversation_info.conversation_id:
@@ -138,7 +153,10 @@ class DefaultMessageProcessor:
                     event_bot_id=proto_event.bot_id,
                 )
                 conversation_doc_to_upsert = enriched_conv_info.to_db_document()
-                upsert_result = await self.conversation_service.upsert_conversation_document(conversation_doc_to_upsert)
+                with tracer.span("conversation_upsert"):
+                    upsert_result = await self.conversation_service.upsert_conversation_document(
+                        conversation_doc_to_upsert
+                    )
                 # 从返回的字典中安全地获取 '_key' 或 '_id'
                 upsert_result_key = None
                 if upsert_result:  # 增加健壮性检查，防止 upsert_result 为 None
@@ -218,32 +236,18 @@ class DefaultMessageProcessor:
                 # 这样下次会话被激活时，它就能从数据库读到最新的信息
                 logger.info(f"会话 '{conversation_id}' 不活跃，仅更新其在数据库中的机器人档案。")
 
-                # 先从数据库读出旧的档案，但我们只关心它的 card
-                conv_doc = await self.conversation_service.get_conversation_document_by_id(conversation_id)
-
-                # 创建新的档案对象以避免直接修改原始数据
-                profile_to_update = {}
-
-                # 如果旧档案里有卡片信息，就先继承过来
-                if (
-                    conv_doc
-                    and conv_doc.get("bot_profile_in_this_conversation")
-                    and isinstance(conv_doc["bot_profile_in_this_conversation"], dict)
-                ):
-                    profile_to_update = conv_doc["bot_profile_in_this_conversation"]
-
-                # 在干净的档案基础上更新
+                # 只把变了的字段当补丁发过去，服务端 UPDATE 会把它合并进旧档案，不用先读出来再整份写回
+                profile_patch: dict[str, Any] = {}
                 if update_type == "card_change":
-                    profile_to_update["card"] = new_value
+                    profile_patch["card"] = new_value
                 # 可以在这里添加对其他更新类型的处理，比如头衔 'title'
                 # elif update_type == "title_change":
-                #     profile_to_update["title"] = new_value
+                #     profile_patch["title"] = new_value
 
-                profile_to_update["updated_at"] = int(time.time() * 1000)
+                profile_patch["updated_at"] = int(time.time() * 1000)
 
-                # 将更新后的档案写回数据库
                 await self.conversation_service.update_conversation_field(
-                    conversation_id, "bot_profile_in_this_conversation", profile_to_update
+                    conversation_id, "bot_profile_in_this_conversation", profile_patch
                 )
 
         except Exception as e:
@@ -253,7 +257,7 @@ class DefaultMessageProcessor:
         try:
             # 测试入口点
             text_content = proto_event.get_text_content()
-            print(f"收到的文本内容: {text_content}")
+            hot_path_logger.debug("收到的文本内容: {}", text_content)
             if text_content.strip() == "完整测试":
                 logger.info(
                     f'收到来自会话 {proto_event.conversation_info.conversation_id} 的"完整测试"指令！进入测试模式！'
@@ -1,8 +1,10 @@
 # src/platform_builders/base_builder.py (小色猫·V6.0重塑版)
 from abc import ABC, abstractmethod
-from typing import Any
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
 
-from aicarus_protocols import Event
+if TYPE_CHECKING:
+    from aicarus_protocols import Event
 
 
 class BasePlatformBuilder(ABC):
@@ -21,7 +23,7 @@ class BasePlatformBuilder(ABC):
         pass
 
     @abstractmethod
-    def build_action_event(self, action_name: str, params: dict[str, Any]) -> Event | None:
+    def build_action_event(self, action_name: str, params: dict[str, Any]) -> "Event | None":
         """
         【全新职责】把一个平台内唯一的“动作别名”和参数，翻译成一个带有完整命名空间的标准Event。
         这是最重要的活儿，干不好就滚蛋！
@@ -44,3 +46,10 @@ class BasePlatformBuilder(ABC):
         这是给ActionHandler用来动态构建给LLM的超级工具的，写不好LLM就看不懂你！
         """
         pass
+
+    def get_action_builders(self) -> dict[str, Callable[[dict[str, Any]], "Event | None"]]:
+        """
+        【可选】返回 动作别名 -> 翻译方法 的分发表，供中介所编进扁平分发表，省得每次都绕一圈 build_action_event。
+        不提供的话，中介所会退回去调用 build_action_event。
+        """
+        return {}
@@ -1,6 +1,7 @@
 # src/platform_builders/qq_builder.py (小色猫·最终高潮·一步到胃版)
 import time
 import uuid
+from collections.abc import Callable
 from typing import Any
 
 from aicarus_protocols import ConversationInfo, Event, Seg
@@ -24,12 +25,9 @@ class QQBuilder(BasePlatformBuilder):
         # 注意：这里要和Adapter的core_platform_id完全一致！
         return "napcat_qq"
 
-    def build_action_event(self, action_name: str, params: dict[str, Any]) -> Event | None:
-        """
-        把平台内唯一的“动作别名”(action_name)和参数，翻译成一个带有完整命名空间的标准Event。
-        """
-        # 我的“服务菜单”，key是动作别名，value是具体的翻译方法
-        action_builders = {
+    def __init__(self) -> None:
+        # 我的“服务菜单”，key是动作别名，value是具体的翻译方法。只在上岗时编一次，别每个动作都重新编！
+        self._action_builders: dict[str, Callable[[dict[str, Any]], Event | None]] = {
             "send_message": self._build_send_message,
             "send_forward_message": self._build_send_forward_message,
             "recall_message": self._build_recall_message,
@@ -51,7 +49,14 @@ class QQBuilder(BasePlatformBuilder):
             "get_list": self._build_get_list,
         }
 
-        if builder_func := action_builders.get(action_name):
+    def get_action_builders(self) -> dict[str, Callable[[dict[str, Any]], Event | None]]:
+        return dict(self._action_builders)
+
+    def build_action_event(self, action_name: str, params: dict[str, Any]) -> Event | None:
+        """
+        把平台内唯一的“动作别名”(action_name)和参数，翻译成一个带有完整命名空间的标准Event。
+        """
+        if builder_func := self._action_builders.get(action_name):
             # 找到对应的翻译方法，让它干活
             return builder_func(params)
 
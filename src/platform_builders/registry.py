@@ -2,17 +2,51 @@
 import importlib
 import inspect
 import pkgutil
-from typing import Any
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from functools import partial
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
 
 from src.common.custom_logging.logging_config import get_logger
 from src.platform_builders.base_builder import BasePlatformBuilder
 
+if TYPE_CHECKING:
+    from aicarus_protocols import Event
+
 logger = get_logger(__name__)
 
 
+def _freeze(value: Any) -> Any:  # noqa: ANN401
+    """把字典和列表一层层换成 MappingProxyType 和元组，目录里的东西谁也改不动，也碰不到翻译官自己的那几个字典。"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list | tuple):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@dataclass(frozen=True)
+class ActionCatalogue:
+    """
+    所有平台动作的只读目录，注册翻译官时一次性编好，之后每次挑工具、每次执行动作都直接拿来用。
+    只有新翻译官登记、或者适配器重新上报能力时才会作废重编。哼，别想改它，它是冻住的。
+    """
+
+    version: int
+    definitions: Mapping[str, Mapping[str, Any]]
+    """平台ID -> 该平台所有动作的超级工具定义，整棵都是冻住的（MappingProxyType + 元组）。"""
+    tools: tuple[Mapping[str, Any], ...]
+    """OpenAI tool-call 格式的工具列表，工具名是 'platform.<平台ID>.<动作名>'，行动决策挑工具时用。"""
+    dispatch: Mapping[tuple[str, str], Callable[[dict[str, Any]], "Event | None"]]
+    """(平台ID, 动作名) -> 翻译方法的扁平分发表。"""
+
+
 class PlatformBuilderRegistry:
     def __init__(self) -> None:
         self._builders: dict[str, BasePlatformBuilder] = {}
+        self._catalogue: ActionCatalogue | None = None
+        self._catalogue_version: int = 0
 
     def discover_and_register_builders(self, package: any) -> None:  # 使用 any 兼容旧的调用
         """
@@ -25,18 +59,26 @@ class PlatformBuilderRegistry:
                 for item_name, item in inspect.getmembers(module, inspect.isclass):
                     if issubclass(item, BasePlatformBuilder) and item is not BasePlatformBuilder:
                         try:
-                            instance = item()
-                            platform_id = instance.platform_id
-                            if platform_id in self._builders:
-                                logger.warning(
-                                    f"发现重复的翻译官！平台'{platform_id}'的翻译官被'{item.__name__}'覆盖了！"
-                                )
-                            self._builders[platform_id] = instance
-                            logger.info(f"翻译官'{item.__name__}'已登记，负责平台：'{platform_id}'")
+                            self.register_builder(item())
                         except Exception as e:
                             logger.error(f"实例化或注册翻译官'{item_name}'失败: {e}", exc_info=True)
         logger.info(f"中介所登记完毕，目前共有 {len(self._builders)} 位翻译官在岗。")
 
+    def register_builder(self, builder: BasePlatformBuilder) -> None:
+        """登记一位翻译官，动作目录随之作废。"""
+        platform_id = builder.platform_id
+        if platform_id in self._builders:
+            logger.warning(f"发现重复的翻译官！平台'{platform_id}'的翻译官被'{type(builder).__name__}'覆盖了！")
+        self._builders[platform_id] = builder
+        self.invalidate_action_catalogue(f"翻译官'{type(builder).__name__}'登记")
+        logger.info(f"翻译官'{type(builder).__name__}'已登记，负责平台：'{platform_id}'")
+
+    def invalidate_action_catalogue(self, reason: str = "") -> None:
+        """让动作目录作废，下次取用时重编。翻译官登记或适配器重新上报能力时调用。"""
+        if self._catalogue is not None:
+            logger.debug(f"动作目录 v{self._catalogue.version} 已作废（{reason or '未说明原因'}）。")
+        self._catalogue = None
+
     def get_builder(self, platform_id: str) -> BasePlatformBuilder | None:
         """根据平台ID，找一个翻译官出来干活。"""
         return self._builders.get(platform_id)
@@ -45,21 +87,60 @@ class PlatformBuilderRegistry:
         """返回所有已注册的翻译官实例。"""
         return self._builders.copy()
 
-    # --- ❤❤❤ 全新的方法！用来收集所有平台的“服务价目表”！❤❤❤ ---
-    def get_all_action_definitions(self) -> dict[str, Any]:
-        """
-        把所有在岗翻译官的“服务价目表”都收上来，打包成一个大的字典。
-        这是给 ActionHandler 用来构建给LLM的超级工具的。
-        """
-        all_definitions = {}
+    def get_action_catalogue(self) -> ActionCatalogue:
+        """取当前的动作目录，作废了就现场重编一份。"""
+        if self._catalogue is None:
+            self._catalogue = self._compile_action_catalogue()
+        return self._catalogue
+
+    def build_action_event(self, platform_id: str, action_name: str, params: dict[str, Any]) -> "Event | None":
+        """直接查扁平分发表翻译动作，找不到对应翻译方法时返回 None。"""
+        builder_func = self.get_action_catalogue().dispatch.get((platform_id, action_name))
+        if builder_func is None:
+            logger.warning(f"动作目录里没有 '{platform_id}.{action_name}' 的翻译方法。")
+            return None
+        return builder_func(params)
+
+    def _compile_action_catalogue(self) -> ActionCatalogue:
+        self._catalogue_version += 1
+        definitions: dict[str, Any] = {}
+        tools: list[dict[str, Any]] = []
+        dispatch: dict[tuple[str, str], Callable[[dict[str, Any]], Event | None]] = {}
+
         for platform_id, builder in self._builders.items():
+            action_definitions = builder.get_action_definitions()
             # 我们把每个平台的动作定义，都放在以平台ID为key的子字典里
-            all_definitions[platform_id] = {
+            definitions[platform_id] = {
                 "type": "object",
                 "description": f"针对 {platform_id} 平台的所有动作。",
-                "properties": builder.get_action_definitions(),
+                "properties": action_definitions,
             }
-        return all_definitions
+            action_builders = builder.get_action_builders()
+            for action_name, schema in action_definitions.items():
+                description = schema.get("description", "")
+                tools.append(
+                    {
+                        "type": "function",
+                        "function": {
+                            "name": f"platform.{platform_id}.{action_name}",
+                            "description": description,
+                            "parameters": {k: v for k, v in schema.items() if k != "description"},
+                        },
+                    }
+                )
+            for action_name in action_definitions.keys() | action_builders.keys():
+                dispatch[(platform_id, action_name)] = action_builders.get(action_name) or partial(
+                    builder.build_action_event, action_name
+                )
+
+        catalogue = ActionCatalogue(
+            version=self._catalogue_version,
+            definitions=_freeze(definitions),
+            tools=_freeze(tools),
+            dispatch=MappingProxyType(dispatch),
+        )
+        logger.info(f"动作目录 v{catalogue.version} 编好了：{len(self._builders)} 个平台，{len(dispatch)} 个动作。")
+        return catalogue
 
 
 # 创建一个全局的单例
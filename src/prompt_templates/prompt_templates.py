@@ -200,6 +200,11 @@ GROUP_USER_PROMPT = """
 [FILE]: 文件分享
 </Event_Types>
 
+<related_memory>
+# 根据眼下的聊天内容想起来的更早的消息和以前的对话总结，只是回忆，仅供参考
+{related_memory_block}
+</related_memory>
+
 <chat_history>
 {chat_history_log_block}
 </chat_history>
@@ -407,6 +412,11 @@ PRIVATE_USER_PROMPT = """
 [FILE]: 文件分享
 </Event_Types>
 
+<related_memory>
+# 根据眼下的聊天内容想起来的更早的消息和以前的对话总结，只是回忆，仅供参考
+{related_memory_block}
+</related_memory>
+
 <chat_history>
 {chat_history_log_block}
 </chat_history>
@@ -14,3 +14,6 @@ class SearchEngineBase(ABC):
         这个 search 方法就是每个引擎的小穴，我们都要从这里“进入”。
         """
         pass
+
+    async def close(self) -> None:  # noqa: B027
+        """释放引擎持有的连接池之类的资源，没有就什么都不做。"""
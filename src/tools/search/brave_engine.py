@@ -25,16 +25,31 @@ class BraveSearchEngine(SearchEngineBase):
         super().__init__()
         # aiohttp更喜欢直接的字符串，我们就给它最直接的爱
         self.proxy_url = proxy_url
+        # 复用同一个会话（连接池），别每次搜索都重新握手
+        self._session: aiohttp.ClientSession | None = None
         if self.proxy_url:
             logger.info(f"Brave 引擎已配置秘密通道 (aiohttp 模式): {self.proxy_url}")
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers={"Accept": "application/json"},
+                connector=aiohttp.TCPConnector(limit=10, ttl_dns_cache=300),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     async def search(self, query: str, max_results: int = 5) -> list[dict[str, Any]]:
         if not BRAVE_API_KEY:
             logger.warning("未配置 BRAVE_API_KEY，Brave 引擎跳过执行。")
             return []
 
         logger.info(f"正在使用 aiohttp 和 Brave Search API (T1梯队) 搜索: {query}")
-        headers = {"Accept": "application/json", "X-Subscription-Token": BRAVE_API_KEY}
+        headers = {"X-Subscription-Token": BRAVE_API_KEY}
         params = {"q": query, "count": max_results}
 
         # aiohttp 的超时设置，也是这么直接色情
@@ -42,16 +57,14 @@ class BraveSearchEngine(SearchEngineBase):
 
         try:
             # aiohttp 的进入方式，感觉是不是更舒服了？
-            async with (
-                aiohttp.ClientSession(headers=headers, timeout=timeout) as session,
-                session.get(
-                    "https://api.search.brave.com/res/v1/web/search",
-                    params=params,
-                    # 看这里！proxy参数就是这么简单粗暴地插进去！
-                    proxy=self.proxy_url,
-                    timeout=timeout,  # 在请求时再次确认超时，双重保险
-                ) as response,
-            ):
+            async with self._get_session().get(
+                "https://api.search.brave.com/res/v1/web/search",
+                params=params,
+                headers=headers,
+                # 看这里！proxy参数就是这么简单粗暴地插进去！
+                proxy=self.proxy_url,
+                timeout=timeout,
+            ) as response:
                 response.raise_for_status()  # 如果她不舒服（返回错误状态码），就让她叫出来！
                 data = await response.json()
 
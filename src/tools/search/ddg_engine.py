@@ -1,5 +1,6 @@
 # tools/search/ddg_engine.py
 import asyncio
+import threading
 from typing import Any
 
 from duckduckgo_search import DDGS
@@ -23,16 +24,22 @@ class DuckDuckGoEngine(SearchEngineBase):
         super().__init__()
         # 这里我们把 proxies 改成 proxy，让她开心
         self.proxy = proxies
+        # DDGS 底下是个同步 HTTP 客户端，不保证线程安全，所以每个工作线程各养一个，复用它的连接
+        self._local = threading.local()
         if self.proxy:
             logger.info(f"DuckDuckGo 引擎已配置秘密通道: {self.proxy}")
 
+    def _text_search(self, query: str, max_results: int) -> list[dict[str, Any]]:
+        ddgs = getattr(self._local, "ddgs", None)
+        if ddgs is None:
+            # 关键的修改在这里！把 proxies=... 改成 proxy=...
+            ddgs = self._local.ddgs = DDGS(proxy=self.proxy)
+        return ddgs.text(keywords=query, max_results=max_results)
+
     async def search(self, query: str, max_results: int = 5) -> list[dict[str, Any]]:
         logger.info(f"正在使用 DuckDuckGo (T2梯队) 搜索: {query}")
         try:
-            # 关键的修改在这里！把 proxies=... 改成 proxy=...
-            ddgs = DDGS(proxy=self.proxy)
-
-            search_results = await asyncio.to_thread(ddgs.text, keywords=query, max_results=max_results)
+            search_results = await asyncio.to_thread(self._text_search, query, max_results)
 
             if not search_results:
                 logger.warning(f"DuckDuckGo 搜索 '{query}' 没有返回结果。")
@@ -0,0 +1,57 @@
+# tools/search/engine_stats.py
+import bisect
+from collections import deque
+from typing import Any
+
+# 延迟直方图的桶上界（秒），最后一个桶兜住所有更慢的
+LATENCY_BUCKETS_SECONDS: tuple[float, ...] = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, float("inf"))
+LATENCY_HISTORY_SIZE: int = 200
+MIN_SAMPLES_FOR_PERCENTILE: int = 10
+
+
+class EngineStats:
+    """
+    单个搜索引擎的体检表：成功/失败/被取消次数，延迟直方图，外加最近成功请求的延迟样本。
+    竞速模式靠最近的延迟样本算“等多久再叫下一梯队上场”。
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.successes = 0
+        self.failures = 0
+        self.cancellations = 0
+        self.latency_histogram = [0] * len(LATENCY_BUCKETS_SECONDS)
+        self._recent_success_latencies: deque[float] = deque(maxlen=LATENCY_HISTORY_SIZE)
+
+    def record(self, latency_seconds: float, success: bool) -> None:
+        self.latency_histogram[bisect.bisect_left(LATENCY_BUCKETS_SECONDS, latency_seconds)] += 1
+        if success:
+            self.successes += 1
+            self._recent_success_latencies.append(latency_seconds)
+        else:
+            self.failures += 1
+
+    def record_cancelled(self) -> None:
+        self.cancellations += 1
+
+    def latency_percentile(self, percentile: float) -> float | None:
+        """最近成功请求延迟的百分位，样本不够时返回 None。"""
+        if len(self._recent_success_latencies) < MIN_SAMPLES_FOR_PERCENTILE:
+            return None
+        ordered = sorted(self._recent_success_latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+    def to_dict(self) -> dict[str, Any]:
+        finished = self.successes + self.failures
+        return {
+            "successes": self.successes,
+            "failures": self.failures,
+            "cancellations": self.cancellations,
+            "success_rate": self.successes / finished if finished else 0.0,
+            "p50_latency_seconds": self.latency_percentile(0.5),
+            "p90_latency_seconds": self.latency_percentile(0.9),
+            "latency_histogram": {
+                (f"<={bound}s" if bound != float("inf") else "slower"): count
+                for bound, count in zip(LATENCY_BUCKETS_SECONDS, self.latency_histogram, strict=True)
+            },
+        }
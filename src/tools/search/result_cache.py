@@ -0,0 +1,120 @@
+# tools/search/result_cache.py
+import copy
+import json
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from src.common.custom_logging.logging_config import get_logger
+
+logger = get_logger("AIcarusCore.tools.search_result_cache")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# 动态TTL：按关键词给查询分个类，时效性越强的缓存得越短（见 websearch.md 3.3 节）
+NEWS_KEYWORDS = ("新闻", "天气", "股价", "汇率", "比分", "今天", "今日", "最新", "实时", "news", "weather", "price")
+KNOWLEDGE_KEYWORDS = ("什么是", "是什么", "历史", "定义", "原理", "含义", "意思", "what is", "definition", "history")
+NEWS_TTL_SECONDS = 300.0
+KNOWLEDGE_TTL_SECONDS = 86400.0
+
+
+def normalize_query(query: str) -> str:
+    """缓存键标准化：转小写、去首尾空白、连续空白合成一个空格。"""
+    return _WHITESPACE_RE.sub(" ", query.strip().lower())
+
+
+class SearchResultCache:
+    """
+    搜索结果的 LRU + TTL 缓存，键是标准化后的查询。
+    一条缓存记住它当初是按多少条结果搜的，只要够用，少要几条的请求也能直接吃缓存。
+    可选持久化到一个 JSON 文件，重启之后还没过期的结果接着用，哼，白花的 API 额度能省则省。
+    """
+
+    def __init__(
+        self, max_entries: int = 256, default_ttl_seconds: float = 1800.0, persist_path: Path | None = None
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.default_ttl_seconds = default_ttl_seconds
+        self.persist_path = persist_path
+        # key -> {"expires_at", "cached_at", "max_results", "results"}；过期时间用墙上时钟，才能跨重启
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def ttl_for(self, normalized_query: str) -> float:
+        if any(keyword in normalized_query for keyword in NEWS_KEYWORDS):
+            return NEWS_TTL_SECONDS
+        if any(keyword in normalized_query for keyword in KNOWLEDGE_KEYWORDS):
+            return KNOWLEDGE_TTL_SECONDS
+        return self.default_ttl_seconds
+
+    def get(self, query: str, max_results: int) -> list[dict[str, Any]] | None:
+        key = normalize_query(query)
+        entry = self._entries.get(key)
+        if entry is None or entry["expires_at"] <= time.time() or entry["max_results"] < max_results:
+            if entry is not None and entry["expires_at"] <= time.time():
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # 深拷贝一份再给出去，调用方怎么改都碰不到缓存里的那份
+        return [{**copy.deepcopy(result), "is_cached": True} for result in entry["results"][:max_results]]
+
+    def put(self, query: str, max_results: int, results: list[dict[str, Any]]) -> None:
+        """空结果不缓存，免得一次失败把这个查询坑上半小时。"""
+        if not results:
+            return
+        key = normalize_query(query)
+        now = time.time()
+        self._entries[key] = {
+            "expires_at": now + self.ttl_for(key),
+            "cached_at": now,
+            "max_results": max_results,
+            "results": copy.deepcopy(results),
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def load(self) -> None:
+        """从持久化文件里读回还没过期的条目（阻塞的文件 IO，异步代码里请丢进 asyncio.to_thread）。"""
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            data = json.loads(self.persist_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"搜索缓存文件 '{self.persist_path}' 读取失败，忽略: {e}")
+            return
+        now = time.time()
+        for key, entry in data.items():
+            if isinstance(entry, dict) and entry.get("expires_at", 0) > now and entry.get("results"):
+                self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        logger.info(f"已从磁盘恢复 {len(self._entries)} 条搜索缓存。")
+
+    def save(self) -> None:
+        """把还没过期的条目写回持久化文件（先写临时文件再替换；同样是阻塞 IO）。"""
+        if not self.persist_path:
+            return
+        now = time.time()
+        alive = {key: entry for key, entry in self._entries.items() if entry["expires_at"] > now}
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.persist_path.with_suffix(self.persist_path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps(alive, ensure_ascii=False), encoding="utf-8")
+            tmp_path.replace(self.persist_path)
+        except OSError as e:
+            logger.warning(f"搜索缓存写入 '{self.persist_path}' 失败: {e}")
+
+    def get_stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
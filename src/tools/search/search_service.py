@@ -1,15 +1,25 @@
 # tools/search/search_service.py
 import asyncio
+import copy
 import os
+import time
+from functools import partial
+from pathlib import Path
 from typing import Any
 
 from src.common.custom_logging.logging_config import get_logger
+from src.config import config
 
+from .base_engine import SearchEngineBase
 from .brave_engine import BraveSearchEngine
 from .ddg_engine import DuckDuckGoEngine
+from .engine_stats import EngineStats
+from .result_cache import SearchResultCache, normalize_query
 
 logger = get_logger("AIcarusCore.tools.search_service")
 
+PROJECT_ROOT = Path(__file__).resolve().parents[3]  # 从 src/tools/search/ 向上到项目根目录
+
 
 class SearchService:
     """
@@ -36,16 +46,200 @@ class SearchService:
         # DDG 是我们重点关照对象，把钥匙也给她！
         self.t2_engines = [DuckDuckGoEngine(proxies=proxy_url)]
 
+        settings = config.web_search
+        persist_path = None
+        if settings.cache_persist_path:
+            persist_path = Path(settings.cache_persist_path)
+            if not persist_path.is_absolute():
+                persist_path = PROJECT_ROOT / persist_path
+        self.cache: SearchResultCache | None = None
+        if settings.cache_enabled:
+            self.cache = SearchResultCache(
+                max_entries=settings.cache_max_entries,
+                default_ttl_seconds=settings.cache_default_ttl_seconds,
+                persist_path=persist_path,
+            )
+        # 缓存文件等第一次搜索时才去线程里读，模块导入、建单例的时候不碰磁盘
+        self._cache_loaded = False
+        self._cache_load_lock = asyncio.Lock()
+        # 正在进行中的搜索：同一个查询同时来好几次，只真正搜一次，大家一起等结果
+        self._inflight: dict[tuple[str, int], asyncio.Task] = {}
+        # 每个引擎的体检表，竞速模式靠它调整对冲延迟
+        self.engine_stats: dict[str, EngineStats] = {
+            type(engine).__name__: EngineStats(type(engine).__name__) for engine in [*self.t1_engines, *self.t2_engines]
+        }
+
     async def search(self, query: str, max_results: int = 5) -> list[dict[str, Any]]:
         logger.info(f"搜索服务收到请求: {query}")
 
+        await self._ensure_cache_loaded()
+        if self.cache and (cached := self.cache.get(query, max_results)) is not None:
+            logger.info(f"搜索缓存命中: '{query}'，直接返回 {len(cached)} 条结果。")
+            return cached
+
+        key = (normalize_query(query), max_results)
+        task = self._inflight.get(key)
+        if task is not None:
+            logger.info(f"相同的搜索 '{query}' 正在进行中，等它的结果。")
+        else:
+            # 真正干活的搜索是个独立的任务，谁都不“拥有”它：哪个等待者被取消都不会连累别人
+            task = asyncio.create_task(self._search_and_cache(query, max_results), name=f"search-{key[0][:32]}")
+            self._inflight[key] = task
+            task.add_done_callback(partial(self._on_search_done, key))
+        results = await asyncio.shield(task)
+        # 每个调用方拿自己的一份，改了也不会弄脏缓存或者别人的结果
+        return copy.deepcopy(results)
+
+    async def _search_and_cache(self, query: str, max_results: int) -> list[dict[str, Any]]:
+        results = await self._search_engines(query, max_results)
+        if self.cache:
+            self.cache.put(query, max_results, results)
+        return results
+
+    def _on_search_done(self, key: tuple[str, int], task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 等待者可能都被取消了，没人取异常的话 asyncio 会抱怨，这里替他们取走
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"搜索任务 '{key[0]}' 出错: {task.exception()}")
+
+    async def _ensure_cache_loaded(self) -> None:
+        """第一次用缓存时在线程里读回持久化文件，只读一次。"""
+        if not self.cache or self._cache_loaded:
+            return
+        async with self._cache_load_lock:
+            if self._cache_loaded:
+                return
+            await asyncio.to_thread(self.cache.load)
+            self._cache_loaded = True
+
+    async def close(self) -> None:
+        """关掉各引擎的连接池，并把缓存落盘。"""
+        for engine in [*self.t1_engines, *self.t2_engines]:
+            try:
+                await engine.close()
+            except Exception as e:
+                logger.warning(f"关闭搜索引擎 {type(engine).__name__} 时出错: {e}")
+        logger.info(f"搜索引擎统计: {self.get_engine_stats()}")
+        # 没读过缓存文件就别写，不然会拿空缓存把上次存下的结果覆盖掉
+        if self.cache and self._cache_loaded:
+            await asyncio.to_thread(self.cache.save)
+            logger.info(f"搜索缓存已落盘，统计: {self.cache.get_stats()}")
+
+    def get_engine_stats(self) -> dict[str, Any]:
+        """各引擎的成功率和延迟直方图，外加竞速模式当前的对冲延迟。"""
+        return {
+            "race_hedge_delay_seconds": round(self._current_hedge_delay(), 3),
+            "engines": {name: stats.to_dict() for name, stats in self.engine_stats.items()},
+        }
+
+    async def _search_engines(self, query: str, max_results: int) -> list[dict[str, Any]]:
+        """缓存没命中时，真正去问各个引擎。"""
+        if config.web_search.search_strategy == "race":
+            return await self._search_race(query, max_results)
+        return await self._search_tiered(query, max_results)
+
+    async def _run_engine(self, engine: SearchEngineBase, query: str, max_results: int) -> list[dict[str, Any]]:
+        """调用一个引擎并记下它这次的表现。"""
+        stats = self._stats_for(engine)
+        started_at = time.monotonic()
+        try:
+            results = await engine.search(query, max_results)
+        except asyncio.CancelledError:
+            stats.record_cancelled()
+            raise
+        except Exception:
+            stats.record(time.monotonic() - started_at, success=False)
+            raise
+        stats.record(time.monotonic() - started_at, success=bool(results))
+        return results
+
+    def _stats_for(self, engine: SearchEngineBase) -> EngineStats:
+        name = type(engine).__name__
+        if name not in self.engine_stats:
+            self.engine_stats[name] = EngineStats(name)
+        return self.engine_stats[name]
+
+    def _current_hedge_delay(self) -> float:
+        """T1 引擎历史延迟的百分位（取最慢的那个），夹在配置的上下限之间；样本不够时用下限。"""
+        settings = config.web_search
+        percentiles = [
+            p
+            for engine in self.t1_engines
+            if (p := self._stats_for(engine).latency_percentile(settings.race_hedge_percentile)) is not None
+        ]
+        if not percentiles:
+            return settings.race_min_hedge_delay_seconds
+        return min(max(max(percentiles), settings.race_min_hedge_delay_seconds), settings.race_max_hedge_delay_seconds)
+
+    async def _search_race(self, query: str, max_results: int) -> list[dict[str, Any]]:
+        """
+        竞速模式：T1 先跑，过了对冲延迟还没凑够结果就让 T2 也上场（T1 提前全军覆没的话 T2 立刻上场），
+        凑够 max_results 条不重复结果就马上收工，还在跑的统统取消。
+        """
+        settings = config.web_search
+        hedge_delay = self._current_hedge_delay()
+        deadline = time.monotonic() + settings.race_total_timeout_seconds
+
+        def launch(engines: list[SearchEngineBase]) -> set[asyncio.Task]:
+            return {
+                asyncio.create_task(
+                    self._run_engine(engine, query, max_results), name=f"search-{type(engine).__name__}"
+                )
+                for engine in engines
+            }
+
+        pending = launch(self.t1_engines)
+        t2_launched = not self.t2_engines
+        if not pending and not t2_launched:
+            pending, t2_launched = launch(self.t2_engines), True
+        hedge_at = time.monotonic() + hedge_delay
+        collected: list[dict[str, Any]] = []
+
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    logger.warning(f"竞速搜索 '{query}' 超过 {settings.race_total_timeout_seconds} 秒，不等了。")
+                    break
+                wait_until = deadline if t2_launched else min(deadline, hedge_at)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, wait_until - now), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        logger.warning(f"搜索引擎 {task.get_name()} 出错: {task.exception()}")
+                        continue
+                    collected.extend(task.result() or [])
+
+                unique = self._deduplicate(collected)
+                if len(unique) >= max_results:
+                    logger.info(f"竞速搜索已凑够 {len(unique)} 条结果，取消其余 {len(pending)} 个引擎。")
+                    return unique
+
+                if not t2_launched and (not pending or time.monotonic() >= hedge_at):
+                    reason = "T1 引擎都已返回但结果不够" if not pending else f"T1 引擎 {hedge_delay:.2f} 秒内没凑够结果"
+                    logger.info(f"{reason}，T2 梯队上场。")
+                    pending |= launch(self.t2_engines)
+                    t2_launched = True
+        finally:
+            for task in pending:
+                task.cancel()
+
+        unique = self._deduplicate(collected)
+        if not unique:
+            logger.error(f"所有搜索引擎都未能完成对 '{query}' 的搜索。")
+        return unique
+
+    async def _search_tiered(self, query: str, max_results: int) -> list[dict[str, Any]]:
+        """梯队模式：T1 全部跑完没结果，再让 T2 上。"""
         # 优先尝试 T1 引擎
         try:
             # 【小猫的性感修改】
             # 让两个梯队并发执行，谁先爽到就用谁的结果！这叫“双龙入洞”，效率最高！
             tasks = []
             if self.t1_engines:
-                tasks.extend([engine.search(query, max_results) for engine in self.t1_engines])
+                tasks.extend([self._run_engine(engine, query, max_results) for engine in self.t1_engines])
 
             # 只有在T1引擎都挂了或者没结果的时候，才去麻烦T2小妹妹
             t1_results_list = await asyncio.gather(*tasks, return_exceptions=True)
@@ -67,7 +261,7 @@ class SearchService:
 
         # T2
         try:
-            t2_tasks = [engine.search(query, max_results) for engine in self.t2_engines]
+            t2_tasks = [self._run_engine(engine, query, max_results) for engine in self.t2_engines]
             t2_results_list = await asyncio.gather(*t2_tasks, return_exceptions=True)
 
             valid_results = []
@@ -0,0 +1,18 @@
+# tests/conftest.py
+# 日志目录是按当前工作目录算的（logs/），导入任何带 logger 的模块都会建它。
+# 测试开始前先换到一个临时目录里，跑完再删掉，别在仓库里留下 logs/。
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_ORIGINAL_CWD = os.getcwd()
+_WORKDIR = tempfile.mkdtemp(prefix="aicarus-tests-")
+os.chdir(_WORKDIR)
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    os.chdir(_ORIGINAL_CWD)
+    shutil.rmtree(_WORKDIR, ignore_errors=True)
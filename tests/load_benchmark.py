@@ -0,0 +1,450 @@
+# tests/load_benchmark.py
+# 端到端压测脚本：模拟 N 个适配器、M 个群，按设定的速率和内容配比往 Core 灌消息，
+# 同时起一个假的 OpenAI 兼容 LLM 服务（延迟可控），适配器收到 action.* 就回 action_response.*。
+# 跑完输出一份 JSON 结果（回复延迟百分位、打断延迟、发送积压、Core 进程的内存/CPU 曲线、Core 自己导出的链路计时），
+# 方便上线前和上一次的结果对比，看看有没有变慢。
+#
+# 用法（先启动压测脚本里的假 LLM，再把 Core 指过来）：
+#   python tests/load_benchmark.py --llm-only --llm-port 18080
+#   OPENAI_BASE_URL=http://127.0.0.1:18080/v1 OPENAI_API_KEY=bench python -m src.main   # 另一个终端，模型提供商配成 OPENAI
+#   python tests/load_benchmark.py --adapters 1 --groups 20 --rate 0.5 --duration 120 --core-pid <pid> --output bench.json
+#
+# 注意：Core 目前只有 napcat_qq 一个平台翻译官，所以第一个适配器用 napcat_qq，其余的适配器（napcat_qq_2 ...）
+# 的消息会入库、走完接收链路，但不会收到回复。
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import websockets
+from aiohttp import web
+
+CORE_WS_URL = "ws://localhost:8077"
+BASE_ADAPTER_ID = "napcat_qq"
+BOT_ID = "10000"
+HEARTBEAT_INTERVAL_SECONDS = 20.0
+
+SAMPLE_TEXTS = [
+    "今天的天气好像不错",
+    "有人在吗？",
+    "刚刚那个视频笑死我了",
+    "晚上一起打游戏吗",
+    "这个问题我也不太懂",
+    "哈哈哈哈",
+    "有没有人知道这个怎么弄",
+    "我先去吃饭了",
+]
+SAMPLE_IMAGE_URL = "https://example.invalid/bench.png"
+
+# 假 LLM 回复：同时满足专注聊天的回复格式和其他地方的宽松JSON解析
+SCRIPTED_REPLY = {
+    "mood": "平静",
+    "think": "压测中，随便回一句。",
+    "reply_willing": True,
+    "motivation": "压测",
+    "reply_text": ["收到"],
+    "at_someone": None,
+    "quote_reply": None,
+    "poke": None,
+    "end_focused_chat": False,
+}
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 2)
+
+
+def summarize(values: list[float]) -> dict[str, Any]:
+    return {
+        "count": len(values),
+        "avg_ms": round(statistics.fmean(values), 2) if values else None,
+        "p50_ms": percentile(values, 0.5),
+        "p90_ms": percentile(values, 0.9),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": round(max(values), 2) if values else None,
+    }
+
+
+# --- 假 LLM ---
+
+
+class ScriptedLLM:
+    """OpenAI 兼容的 /chat/completions 和 /embeddings，延迟 = latency ± jitter，流式时按 chunk 间隔吐字。"""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, chunk_interval_ms: float, embedding_dim: int) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chunk_interval_ms = chunk_interval_ms
+        self.embedding_dim = embedding_dim
+        self.requests = 0
+
+    def _delay(self) -> float:
+        return max(0.0, (self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        text = json.dumps(SCRIPTED_REPLY, ensure_ascii=False)
+        await asyncio.sleep(self._delay())
+        if not body.get("stream"):
+            return web.json_response(
+                {
+                    "id": f"bench-{uuid.uuid4().hex[:8]}",
+                    "object": "chat.completion",
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+                    ],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i in range(0, len(text), 8):
+            chunk = {"choices": [{"index": 0, "delta": {"content": text[i : i + 8]}, "finish_reason": None}]}
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+            await asyncio.sleep(self.chunk_interval_ms / 1000)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def embeddings(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        body = await request.json()
+        inputs = body.get("input") or [""]
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        data = [
+            {"object": "embedding", "index": i, "embedding": [random.random() for _ in range(self.embedding_dim)]}
+            for i in range(len(inputs))
+        ]
+        return web.json_response({"object": "list", "data": data})
+
+    async def start(self, port: int) -> web.AppRunner:
+        app = web.Application()
+        for prefix in ("", "/v1"):
+            app.router.add_post(f"{prefix}/chat/completions", self.chat_completions)
+            app.router.add_post(f"{prefix}/embeddings", self.embeddings)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        print(f"假 LLM 已启动: http://127.0.0.1:{port}/v1 (延迟 {self.latency_ms}±{self.jitter_ms} ms)")
+        return runner
+
+
+# --- 模拟适配器 ---
+
+
+@dataclass
+class BenchMetrics:
+    reply_latencies_ms: list[float] = field(default_factory=list)
+    interrupt_latencies_ms: list[float] = field(default_factory=list)
+    send_lag_ms: list[float] = field(default_factory=list)
+    messages_sent: int = 0
+    actions_received: int = 0
+    actions_by_type: dict[str, int] = field(default_factory=dict)
+    resource_samples: list[dict[str, Any]] = field(default_factory=list)
+
+
+class SimulatedAdapter:
+    """一个假适配器：注册、发心跳、按群发消息，收到 action.* 就回成功的 action_response.*。"""
+
+    def __init__(self, adapter_id: str, groups: list[str], args: argparse.Namespace, metrics: BenchMetrics) -> None:
+        self.adapter_id = adapter_id
+        self.groups = groups
+        self.args = args
+        self.metrics = metrics
+        # 每个群还没等到回复的第一条消息的发送时间，以及还没等到回复的打断探针
+        self._unanswered_since: dict[str, float] = {}
+        self._interrupt_probe_since: dict[str, float] = {}
+        self._ws: websockets.WebSocketClientProtocol | None = None
+
+    def _event(self, event_type: str, content: list[dict[str, Any]], **extra: object) -> dict[str, Any]:
+        return {
+            "event_id": f"bench_{uuid.uuid4().hex}",
+            "event_type": event_type,
+            "time": int(time.time() * 1000),
+            "bot_id": BOT_ID,
+            "content": content,
+            **extra,
+        }
+
+    async def _send(self, event: dict[str, Any]) -> None:
+        started_at = time.monotonic()
+        await self._ws.send(json.dumps(event, ensure_ascii=False))
+        self.metrics.send_lag_ms.append((time.monotonic() - started_at) * 1000)
+
+    def _build_message(self, group_id: str, interrupt_probe: bool) -> dict[str, Any]:
+        user_index = random.randint(1, self.args.users_per_group)
+        segments: list[dict[str, Any]] = [{"type": "message_metadata", "data": {"message_id": uuid.uuid4().hex[:12]}}]
+        if interrupt_probe:
+            segments.append({"type": "text", "data": {"text": f"{self.args.interrupt_keyword}！快看这里"}})
+        else:
+            kind = random.choices(["text", "image", "at"], weights=self.args.mix)[0]
+            if kind == "image":
+                segments.append({"type": "image", "data": {"url": SAMPLE_IMAGE_URL, "file": "bench.png"}})
+            elif kind == "at":
+                segments.append({"type": "at", "data": {"user_id": BOT_ID, "display_name": "bench_bot"}})
+            segments.append({"type": "text", "data": {"text": random.choice(SAMPLE_TEXTS)}})
+        return self._event(
+            f"message.{self.adapter_id}.group.normal",
+            segments,
+            conversation_info={"conversation_id": group_id, "type": "group", "name": f"压测群{group_id}"},
+            user_info={"user_id": f"bench_user_{user_index}", "user_nickname": f"压测用户{user_index}"},
+        )
+
+    async def _group_traffic(self, group_id: str, deadline: float) -> None:
+        """泊松到达：消息间隔服从指数分布，平均每秒 rate 条。"""
+        while time.monotonic() < deadline:
+            await asyncio.sleep(random.expovariate(self.args.rate))
+            interrupt_probe = group_id in self._unanswered_since and random.random() < self.args.interrupt_probe_ratio
+            await self._send(self._build_message(group_id, interrupt_probe))
+            # 发出去之后再取时间，别把上面随机等的那段到达间隔也算进回复/打断延迟里
+            now = time.monotonic()
+            self.metrics.messages_sent += 1
+            self._unanswered_since.setdefault(group_id, now)
+            if interrupt_probe:
+                self._interrupt_probe_since.setdefault(group_id, now)
+
+    def _action_response(self, action: dict[str, Any]) -> dict[str, Any]:
+        event_type = action.get("event_type", "")
+        action_name = event_type.split(".")[-1]
+        details: dict[str, Any] = {}
+        if action_name == "send_message":
+            details = {"message_id": uuid.uuid4().hex[:12]}
+        elif action_name == "get_bot_profile":
+            details = {"platform": self.adapter_id, "user_id": BOT_ID, "nickname": "bench_bot", "groups": {}}
+        return self._event(
+            f"action_response.{self.adapter_id}.{action_name}",
+            [
+                {
+                    "type": "action_response.success",
+                    "data": {"original_event_id": action.get("event_id"), "data": details},
+                }
+            ],
+        )
+
+    async def _receive_loop(self) -> None:
+        async for raw in self._ws:
+            try:
+                action = json.loads(raw)
+            except json.JSONDecodeError:
+                continue
+            event_type = action.get("event_type", "")
+            if not event_type.startswith("action."):
+                continue
+            now = time.monotonic()
+            self.metrics.actions_received += 1
+            action_name = event_type.split(".")[-1]
+            self.metrics.actions_by_type[action_name] = self.metrics.actions_by_type.get(action_name, 0) + 1
+            group_id = (action.get("conversation_info") or {}).get("conversation_id")
+            if action_name == "send_message" and group_id:
+                if (since := self._unanswered_since.pop(group_id, None)) is not None:
+                    self.metrics.reply_latencies_ms.append((now - since) * 1000)
+                if (since := self._interrupt_probe_since.pop(group_id, None)) is not None:
+                    self.metrics.interrupt_latencies_ms.append((now - since) * 1000)
+            if self.args.action_response_delay_ms:
+                await asyncio.sleep(self.args.action_response_delay_ms / 1000)
+            await self._send(self._action_response(action))
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+            await self._send(self._event(f"meta.{self.adapter_id}.heartbeat", []))
+
+    async def run(self, deadline: float) -> None:
+        async with websockets.connect(self.args.core_url, max_size=None) as ws:
+            self._ws = ws
+            await self._send(
+                self._event(
+                    f"meta.{self.adapter_id}.lifecycle.connect",
+                    [
+                        {
+                            "type": "meta.lifecycle",
+                            "data": {
+                                "lifecycle_type": "connect",
+                                "details": {"adapter_id": self.adapter_id, "display_name": f"压测-{self.adapter_id}"},
+                            },
+                        }
+                    ],
+                )
+            )
+            receiver = asyncio.create_task(self._receive_loop())
+            heartbeat = asyncio.create_task(self._heartbeat_loop())
+            try:
+                await asyncio.gather(*(self._group_traffic(group_id, deadline) for group_id in self.groups))
+                # 发完了再等一会儿，让最后的回复回来
+                await asyncio.sleep(self.args.drain_seconds)
+            finally:
+                receiver.cancel()
+                heartbeat.cancel()
+
+
+# --- Core 进程资源采样（Linux /proc） ---
+
+
+def _read_proc_sample(pid: int, clock_ticks: int, page_size: int) -> tuple[float, int] | None:
+    try:
+        stat_fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+        cpu_seconds = (int(stat_fields[11]) + int(stat_fields[12])) / clock_ticks
+        rss_bytes = int(Path(f"/proc/{pid}/statm").read_text().split()[1]) * page_size
+        return cpu_seconds, rss_bytes
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+async def sample_resources(pid: int, metrics: BenchMetrics, deadline: float) -> None:
+    if not Path(f"/proc/{pid}").exists():
+        print(f"找不到 /proc/{pid}，跳过资源采样（只支持 Linux）。")
+        return
+    clock_ticks = os.sysconf("SC_CLK_TCK")
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    started_at = time.monotonic()
+    previous = _read_proc_sample(pid, clock_ticks, page_size)
+    previous_at = started_at
+    while time.monotonic() < deadline:
+        await asyncio.sleep(1.0)
+        sample = _read_proc_sample(pid, clock_ticks, page_size)
+        now = time.monotonic()
+        if sample is None or previous is None:
+            break
+        metrics.resource_samples.append(
+            {
+                "t": round(now - started_at, 1),
+                "cpu_percent": round((sample[0] - previous[0]) / (now - previous_at) * 100, 1),
+                "rss_mb": round(sample[1] / 1024 / 1024, 1),
+            }
+        )
+        previous, previous_at = sample, now
+
+
+# --- 主流程 ---
+
+
+def build_report(args: argparse.Namespace, metrics: BenchMetrics, elapsed: float, llm: ScriptedLLM) -> dict[str, Any]:
+    report: dict[str, Any] = {
+        "label": args.label,
+        "started_at": int(time.time() - elapsed),
+        "elapsed_seconds": round(elapsed, 1),
+        "config": {
+            "adapters": args.adapters,
+            "groups": args.groups,
+            "rate_per_group": args.rate,
+            "mix_text_image_at": args.mix,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_jitter_ms": args.llm_jitter_ms,
+        },
+        "messages_sent": metrics.messages_sent,
+        "ingest_rate_per_second": round(metrics.messages_sent / elapsed, 2) if elapsed else None,
+        "actions_received": metrics.actions_received,
+        "actions_by_type": metrics.actions_by_type,
+        "llm_requests": llm.requests,
+        "reply_latency": summarize(metrics.reply_latencies_ms),
+        "interrupt_latency": summarize(metrics.interrupt_latencies_ms),
+        "send_lag": summarize(metrics.send_lag_ms),
+        "resources": {
+            "peak_rss_mb": max((s["rss_mb"] for s in metrics.resource_samples), default=None),
+            "avg_cpu_percent": (
+                round(statistics.fmean(s["cpu_percent"] for s in metrics.resource_samples), 1)
+                if metrics.resource_samples
+                else None
+            ),
+            "samples": metrics.resource_samples,
+        },
+    }
+    # Core 开了 [tracing] 的话，把它导出的各阶段直方图也带上（入库链路的耗时就在里面）
+    if args.trace_stats and Path(args.trace_stats).exists():
+        try:
+            report["core_trace_stats"] = json.loads(Path(args.trace_stats).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            report["core_trace_stats"] = {"error": str(e)}
+    return report
+
+
+async def run_benchmark(args: argparse.Namespace) -> None:
+    llm = ScriptedLLM(args.llm_latency_ms, args.llm_jitter_ms, args.llm_chunk_interval_ms, args.embedding_dim)
+    runner = await llm.start(args.llm_port)
+    try:
+        if args.llm_only:
+            print("只启动假 LLM，按 Ctrl+C 结束。")
+            await asyncio.Event().wait()
+            return
+
+        metrics = BenchMetrics()
+        group_ids = [f"bench_group_{i}" for i in range(args.groups)]
+        adapters = [
+            SimulatedAdapter(
+                BASE_ADAPTER_ID if i == 0 else f"{BASE_ADAPTER_ID}_{i + 1}",
+                group_ids[i :: args.adapters],
+                args,
+                metrics,
+            )
+            for i in range(args.adapters)
+        ]
+        started_at = time.monotonic()
+        deadline = started_at + args.duration
+        tasks = [asyncio.create_task(adapter.run(deadline)) for adapter in adapters]
+        if args.core_pid:
+            tasks.append(asyncio.create_task(sample_resources(args.core_pid, metrics, deadline + args.drain_seconds)))
+        print(
+            f"压测开始：{args.adapters} 个适配器，{args.groups} 个群，每群每秒 {args.rate} 条，持续 {args.duration} 秒。"
+        )
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started_at
+
+        report = build_report(args, metrics, elapsed, llm)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if args.output:
+            Path(args.output).write_text(output, encoding="utf-8")
+            print(f"结果已写入 {args.output}")
+        summary = {k: report[k] for k in ("messages_sent", "actions_received", "reply_latency", "interrupt_latency")}
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    finally:
+        await runner.cleanup()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="AIcarusCore 端到端压测")
+    parser.add_argument("--core-url", default=CORE_WS_URL)
+    parser.add_argument("--adapters", type=int, default=1, help="模拟的适配器数量")
+    parser.add_argument("--groups", type=int, default=10, help="模拟的群数量（平均分给各适配器）")
+    parser.add_argument("--users-per-group", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=0.2, help="每个群平均每秒的消息数")
+    parser.add_argument(
+        "--mix", type=float, nargs=3, default=[0.8, 0.1, 0.1], metavar=("TEXT", "IMAGE", "AT"), help="消息类型配比"
+    )
+    parser.add_argument("--duration", type=float, default=60.0, help="发消息的持续时间（秒）")
+    parser.add_argument("--drain-seconds", type=float, default=15.0, help="发完后继续等回复的时间（秒）")
+    parser.add_argument(
+        "--interrupt-keyword", default="紧急停止", help="打断探针消息里带的关键词（要在 Core 的打断关键词里）"
+    )
+    parser.add_argument("--interrupt-probe-ratio", type=float, default=0.1, help="群里有消息未回复时，发打断探针的概率")
+    parser.add_argument("--action-response-delay-ms", type=float, default=0.0, help="适配器回 action_response 前的延迟")
+    parser.add_argument("--llm-port", type=int, default=18080)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=200.0)
+    parser.add_argument("--llm-chunk-interval-ms", type=float, default=20.0, help="流式回复时每个块的间隔")
+    parser.add_argument("--embedding-dim", type=int, default=384)
+    parser.add_argument("--llm-only", action="store_true", help="只启动假 LLM 服务")
+    parser.add_argument("--core-pid", type=int, default=None, help="Core 进程号，用于采样内存/CPU（Linux）")
+    parser.add_argument("--trace-stats", default="logs/traces/trace_stats.json", help="Core 导出的链路计时统计文件")
+    parser.add_argument("--label", default="", help="这次压测的备注（比如存储后端、分支名）")
+    parser.add_argument("--output", default="", help="结果 JSON 的输出路径")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_benchmark(parse_args()))
+    except KeyboardInterrupt:
+        print("\n压测被中断了。")
@@ -0,0 +1,144 @@
+# tests/test_conversation_directory.py
+"""会话名录：加载、补丁合并、机器人档案副本和几个过滤视图。"""
+
+from collections.abc import Iterator
+
+import pytest
+
+from src.database.services.conversation_directory import (
+    BOT_PROFILE_FIELD,
+    ConversationDirectory,
+)
+from src.database.services.event_counters import COUNTERS_FIELD, conversation_event_counters
+
+
+@pytest.fixture(autouse=True)
+def _clean_counters() -> Iterator[None]:
+    # as_document 会去全局计数器账本里取未读数，别让别的用例串进来
+    conversation_event_counters.reset()
+    yield
+    conversation_event_counters.reset()
+
+
+def _conversation_doc(key: str, **fields: object) -> dict:
+    doc = {
+        "_key": key,
+        "name": f"群{key}",
+        "type": "group",
+        "platform": "qq",
+        "parent_id": None,
+        "last_processed_timestamp": 100,
+        "attention_profile": {"is_suspended_by_ai": False},
+        BOT_PROFILE_FIELD: {"user_id": "bot", "card": "小懒猫"},
+        "updated_at": 10,
+    }
+    doc.update(fields)
+    return doc
+
+
+def test_load_marks_ready_and_replaces_previous_entries() -> None:
+    directory = ConversationDirectory()
+    assert not directory.ready
+    directory.upsert(_conversation_doc("old"))
+
+    directory.load([_conversation_doc("c1"), _conversation_doc("c2"), {"name": "没有 id 的文档"}])
+    assert directory.ready
+    assert {entry.conversation_id for entry in directory.all()} == {"c1", "c2"}
+    assert directory.get("old") is None
+
+
+def test_upsert_accepts_projection_rows() -> None:
+    directory = ConversationDirectory()
+    # directory_projection_aql 投影出来的行，is_suspended_by_ai 是拍平的
+    directory.upsert(
+        {"conversation_id": "c1", "name": "投影", "is_suspended_by_ai": True, "last_processed_timestamp": 5}
+    )
+    entry = directory.get("c1")
+    assert entry is not None
+    assert entry.name == "投影"
+    assert entry.is_suspended_by_ai
+    assert entry.last_processed_timestamp == 5
+
+
+def test_patch_merges_without_clobbering_missing_fields() -> None:
+    directory = ConversationDirectory()
+    directory.load([_conversation_doc("c1")])
+
+    directory.patch("c1", {"last_processed_timestamp": 300, BOT_PROFILE_FIELD: {"card": "大懒猫"}})
+    entry = directory.get("c1")
+    assert entry is not None
+    assert entry.name == "群c1"
+    assert entry.last_processed_timestamp == 300
+    assert entry.bot_profile == {"user_id": "bot", "card": "大懒猫"}
+
+    directory.patch("c1", {"attention_profile": {"is_suspended_by_ai": True}})
+    assert directory.get("c1").is_suspended_by_ai
+
+
+def test_nested_bot_profile_patch_merges_recursively() -> None:
+    directory = ConversationDirectory()
+    profile = {"user_id": "bot", "card": "小懒猫", "permissions": {"role": "member", "can_ban": False}}
+    directory.load([_conversation_doc("c1", **{BOT_PROFILE_FIELD: profile})])
+
+    # 和 UPDATE 的 mergeObjects 一样，嵌套的 permissions 只改补丁里带的那一项
+    patch = {BOT_PROFILE_FIELD: {"permissions": {"role": "admin"}}}
+    directory.patch("c1", patch)
+
+    assert directory.get("c1").bot_profile == {
+        "user_id": "bot",
+        "card": "小懒猫",
+        "permissions": {"role": "admin", "can_ban": False},
+    }
+    # 名录里存的是副本，调用方回头改补丁或原文档都影响不到它
+    patch[BOT_PROFILE_FIELD]["permissions"]["role"] = "owner"
+    profile["permissions"]["can_ban"] = True
+    assert directory.get("c1").bot_profile["permissions"] == {"role": "admin", "can_ban": False}
+
+
+def test_bot_profile_is_a_copy() -> None:
+    directory = ConversationDirectory()
+    directory.load([_conversation_doc("c1"), _conversation_doc("c2", **{BOT_PROFILE_FIELD: None})])
+
+    profile = directory.bot_profile("c1")
+    profile["card"] = "被改了"
+    assert directory.bot_profile("c1")["card"] == "小懒猫"
+    assert directory.bot_profile("c2") is None
+    assert directory.bot_profile("unknown") is None
+
+
+def test_filtered_views() -> None:
+    directory = ConversationDirectory()
+    directory.load(
+        [
+            _conversation_doc("c1"),
+            _conversation_doc("c2", attention_profile={"is_suspended_by_ai": True}),
+            _conversation_doc("c3", platform="wechat"),
+        ]
+    )
+    assert [entry.conversation_id for entry in directory.active()] == ["c1", "c3"]
+    assert [entry.conversation_id for entry in directory.suspended()] == ["c2"]
+    assert [entry.conversation_id for entry in directory.by_platform("wechat")] == ["c3"]
+
+
+def test_as_document_uses_counter_ledger_and_copies_profile() -> None:
+    directory = ConversationDirectory()
+    directory.load([_conversation_doc("c1")])
+    conversation_event_counters.record_new_event(
+        {"conversation_id_extracted": "c1", "event_category": "message", "status": "unread", "timestamp": 200}
+    )
+
+    doc = directory.get("c1").as_document()
+    assert doc["conversation_id"] == "c1"
+    assert doc["attention_profile"] == {"is_suspended_by_ai": False}
+    assert doc[COUNTERS_FIELD]["unread_messages"] == 1
+
+    doc[BOT_PROFILE_FIELD]["card"] = "被改了"
+    assert directory.get("c1").bot_profile["card"] == "小懒猫"
+
+
+def test_reset_clears_entries_and_ready() -> None:
+    directory = ConversationDirectory()
+    directory.load([_conversation_doc("c1")])
+    directory.reset()
+    assert not directory.ready
+    assert directory.all() == []
@@ -0,0 +1,93 @@
+# tests/test_embedding_codec.py
+"""句向量紧凑编码：int8/float16 往返精度、老格式兼容、坏数据兜底。"""
+
+import base64
+
+import numpy as np
+import pytest
+
+from src.common.semantic_memory.embedding_codec import (
+    EMBEDDING_FORMAT_FLOAT16,
+    EMBEDDING_FORMAT_INT8,
+    decode_embedding,
+    encode_embedding,
+)
+
+
+def _unit_vector(dim: int = 384, seed: int = 0) -> np.ndarray:
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def test_int8_round_trip_keeps_cosine_similarity() -> None:
+    vec = _unit_vector()
+    stored = encode_embedding(vec)
+    assert stored["format"] == EMBEDDING_FORMAT_INT8
+    assert stored["dim"] == 384
+    assert stored["scale"] > 0
+
+    decoded = decode_embedding(stored)
+    assert decoded is not None
+    assert decoded.dtype == np.float32
+    assert decoded.shape == (384,)
+    cosine = float(np.dot(vec, decoded) / (np.linalg.norm(vec) * np.linalg.norm(decoded)))
+    assert cosine > 0.999
+    assert np.max(np.abs(decoded - vec)) <= stored["scale"] / 2 + 1e-6
+
+
+def test_int8_payload_is_much_smaller_than_a_float_list() -> None:
+    vec = _unit_vector()
+    stored = encode_embedding(vec)
+    assert len(stored["data"]) < len(str(vec.astype(np.float64).tolist())) / 5
+
+
+def test_float16_round_trip() -> None:
+    vec = _unit_vector(seed=1)
+    stored = encode_embedding(vec.tolist(), EMBEDDING_FORMAT_FLOAT16)
+    assert stored["format"] == EMBEDDING_FORMAT_FLOAT16
+    assert "scale" not in stored
+    decoded = decode_embedding(stored)
+    assert decoded is not None
+    np.testing.assert_allclose(decoded, vec, atol=1e-3)
+
+
+def test_unknown_format_falls_back_to_int8() -> None:
+    assert encode_embedding([0.1, 0.2], "bfloat16")["format"] == EMBEDDING_FORMAT_INT8
+
+
+def test_zero_vector_round_trips_to_zeros() -> None:
+    stored = encode_embedding(np.zeros(8))
+    assert stored["scale"] == 0.0
+    decoded = decode_embedding(stored)
+    assert decoded is not None
+    assert not decoded.any()
+
+
+def test_legacy_float_list_is_still_decoded() -> None:
+    decoded = decode_embedding([0.5, -0.25, 1.0])
+    assert decoded is not None
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, np.array([0.5, -0.25, 1.0], dtype=np.float32))
+
+
+@pytest.mark.parametrize(
+    "stored",
+    [
+        None,
+        [],
+        "not a dict",
+        {},
+        {"format": EMBEDDING_FORMAT_INT8, "dim": 2, "scale": 0.1, "data": ""},
+        {"format": "bfloat16", "dim": 2, "data": base64.b64encode(b"\x01\x02").decode()},
+        {"format": EMBEDDING_FORMAT_INT8, "dim": 2, "scale": 0.1, "data": "!!! 不是 base64 !!!"},
+        {"format": EMBEDDING_FORMAT_FLOAT16, "dim": 2, "data": base64.b64encode(b"\x01\x02\x03").decode()},
+    ],
+)
+def test_broken_data_decodes_to_none(stored: object) -> None:
+    assert decode_embedding(stored) is None
+
+
+def test_dim_mismatch_decodes_to_none() -> None:
+    stored = encode_embedding([0.1, 0.2, 0.3])
+    stored["dim"] = 4
+    assert decode_embedding(stored) is None
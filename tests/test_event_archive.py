@@ -0,0 +1,153 @@
+# tests/test_event_archive.py
+"""事件冷归档：按 会话×月份 分段写入、manifest 重载、按时间查询、精确找回和小段合并。"""
+
+import gzip
+import json
+from pathlib import Path
+
+from src.database.services.event_archive import (
+    MANIFEST_FILENAME,
+    NO_CONVERSATION_ID,
+    EventArchive,
+    archive_month_of,
+)
+
+# 2024-01-15 和 2024-02-15 的 UTC 零点（毫秒）
+JAN = 1705276800000
+FEB = 1707955200000
+DAY = 86400000
+FEB_FIRST = 1706745600000  # 2024-02-01 00:00 UTC
+
+
+def _event(key: str, timestamp: int, cid: str | None = "c1", category: str = "message") -> dict:
+    return {"_key": key, "conversation_id_extracted": cid, "timestamp": timestamp, "event_category": category}
+
+
+def _keys(docs: list[dict]) -> list[str]:
+    return [doc["_key"] for doc in docs]
+
+
+def test_archive_month_is_utc() -> None:
+    assert archive_month_of(JAN) == "2024-01"
+    assert archive_month_of(FEB_FIRST - 1) == "2024-01"
+    assert archive_month_of(FEB_FIRST) == "2024-02"
+    assert archive_month_of(FEB + 20 * DAY) == "2024-03"
+
+
+def test_append_partitions_by_conversation_and_month(tmp_path: Path) -> None:
+    archive = EventArchive(tmp_path)
+    written = archive.append(
+        [
+            _event("e2", JAN + 2 * DAY),
+            _event("e1", JAN),
+            _event("e3", FEB),
+            _event("e4", JAN, cid="c2"),
+            _event("e5", JAN, cid=None),
+        ]
+    )
+    assert written == 5
+    assert archive.segment_count() == 4
+    assert archive.event_count() == 5
+    assert archive.append([]) == 0
+
+    assert _keys(archive.query("c1")) == ["e1", "e2", "e3"]
+    assert _keys(archive.query(NO_CONVERSATION_ID)) == ["e5"]
+    assert (tmp_path / "c1" / "2024-01").is_dir()
+    assert not list(tmp_path.rglob("*.part"))
+
+
+def test_unsafe_conversation_ids_stay_inside_root(tmp_path: Path) -> None:
+    archive = EventArchive(tmp_path)
+    archive.append([_event("e1", JAN, cid="../../逃出去")])
+    segment_files = list(tmp_path.rglob("*.jsonl.gz"))
+    assert len(segment_files) == 1
+    assert tmp_path in segment_files[0].parents
+    assert _keys(archive.query("../../逃出去")) == ["e1"]
+
+
+def test_manifest_survives_reload_and_drops_missing_segments(tmp_path: Path) -> None:
+    archive = EventArchive(tmp_path)
+    archive.append([_event("e1", JAN), _event("e2", FEB), _event("e3", JAN, cid="c2")])
+
+    reloaded = EventArchive(tmp_path)
+    reloaded.load()
+    assert reloaded.segment_count() == 3
+    assert _keys(reloaded.query("c1")) == ["e1", "e2"]
+
+    next((tmp_path / "c2").rglob("*.jsonl.gz")).unlink()
+    reloaded.load()
+    assert reloaded.segment_count() == 2
+    assert reloaded.query("c2") == []
+
+
+def test_load_without_manifest_or_with_broken_manifest_is_empty(tmp_path: Path) -> None:
+    archive = EventArchive(tmp_path)
+    archive.load()
+    assert archive.segment_count() == 0
+
+    (tmp_path / MANIFEST_FILENAME).write_text("{坏掉的 json", encoding="utf-8")
+    archive.load()
+    assert archive.segment_count() == 0
+
+
+def test_query_filters_range_category_limit_and_dedupes(tmp_path: Path) -> None:
+    archive = EventArchive(tmp_path)
+    archive.append([_event("e1", JAN), _event("e2", JAN + DAY, category="notice"), _event("e3", JAN + 2 * DAY)])
+    # 搬到一半挂了重搬，同一个事件在归档里有两份
+    archive.append([_event("e3", JAN + 2 * DAY), _event("e4", FEB)])
+
+    assert _keys(archive.query("c1")) == ["e1", "e2", "e3", "e4"]
+    assert _keys(archive.query("c1", start_timestamp=JAN + DAY, end_timestamp=JAN + 2 * DAY)) == ["e2", "e3"]
+    assert _keys(archive.query("c1", event_category="message")) == ["e1", "e3", "e4"]
+    assert _keys(archive.query("c1", limit=2)) == ["e1", "e2"]
+    assert archive.query("unknown") == []
+
+
+def test_lookup_finds_events_by_reference(tmp_path: Path) -> None:
+    archive = EventArchive(tmp_path)
+    archive.append([_event("e1", JAN), _event("e2", FEB), _event("e3", JAN, cid=None)])
+
+    found = archive.lookup([("c1", JAN, "e1"), ("c1", FEB, "e2"), ("", JAN, "e3"), ("c1", JAN, "missing")])
+    assert set(found) == {"e1", "e2", "e3"}
+    assert found["e2"]["timestamp"] == FEB
+    assert archive.lookup([]) == {}
+
+
+def test_compact_merges_small_segments_per_partition(tmp_path: Path) -> None:
+    archive = EventArchive(tmp_path)
+    for i in range(3):
+        archive.append([_event(f"e{i}", JAN + i * DAY)])
+    archive.append([_event("e0", JAN)])  # 重复的
+    archive.append([_event("f1", FEB)])  # 另一个分区只有一段，不动
+    assert archive.segment_count() == 5
+
+    assert archive.compact(min_segments=3) == 4
+    assert archive.segment_count() == 2
+    assert archive.event_count() == 4
+    assert _keys(archive.query("c1")) == ["e0", "e1", "e2", "f1"]
+    assert len(list((tmp_path / "c1" / "2024-01").glob("*.jsonl.gz"))) == 1
+
+    reloaded = EventArchive(tmp_path)
+    reloaded.load()
+    assert reloaded.segment_count() == 2
+
+    assert archive.compact(min_segments=3) == 0
+
+
+def test_compact_skips_partition_with_unreadable_segment(tmp_path: Path) -> None:
+    archive = EventArchive(tmp_path)
+    for i in range(2):
+        archive.append([_event(f"e{i}", JAN + i * DAY)])
+    broken = sorted((tmp_path / "c1" / "2024-01").glob("*.jsonl.gz"))[0]
+    broken.write_bytes(b"not gzip")
+
+    assert archive.compact(min_segments=2) == 0
+    assert archive.segment_count() == 2
+
+
+def test_segments_are_gzipped_json_lines(tmp_path: Path) -> None:
+    archive = EventArchive(tmp_path)
+    archive.append([_event("e1", JAN), _event("e2", JAN + 1)])
+    segment = next(tmp_path.rglob("*.jsonl.gz"))
+    with gzip.open(segment, "rt", encoding="utf-8") as f:
+        assert [json.loads(line)["_key"] for line in f] == ["e1", "e2"]
@@ -0,0 +1,184 @@
+# tests/test_event_counters.py
+"""会话计数器账本的记账规则：入库、改状态、处理进度前移、对账覆盖、加载和落盘。"""
+
+from src.database.services.event_counters import (
+    COUNTERS_FIELD,
+    ConversationCounters,
+    ConversationEventCounters,
+    StatusChange,
+)
+
+
+def _event(cid: str, status: str, timestamp: int, category: str = "message") -> dict:
+    return {
+        "conversation_id_extracted": cid,
+        "event_category": category,
+        "status": status,
+        "timestamp": timestamp,
+    }
+
+
+def test_new_events_update_unread_summarizable_and_last_message() -> None:
+    counters = ConversationEventCounters()
+    counters.record_new_event(_event("c1", "unread", 100))
+    counters.record_new_event(_event("c1", "unread", 300))
+    counters.record_new_event(_event("c1", "read", 200))
+    counters.record_new_event(_event("c1", "unread", 400, category="notice"))
+
+    snapshot = counters.get("c1")
+    assert snapshot.unread_messages == 2  # notice 不算未读消息
+    assert snapshot.summarizable_events == 1
+    assert snapshot.last_message_timestamp == 300  # 也只看 message
+
+
+def test_new_event_without_conversation_is_ignored() -> None:
+    counters = ConversationEventCounters()
+    counters.record_new_event({"event_category": "message", "status": "unread", "timestamp": 1})
+    assert counters.pop_dirty() == {}
+
+
+def test_unread_before_processed_timestamp_is_not_counted() -> None:
+    counters = ConversationEventCounters()
+    counters.replace("c1", ConversationCounters(last_processed_timestamp=500))
+    counters.record_new_event(_event("c1", "unread", 400))
+    counters.record_new_event(_event("c1", "unread", 600))
+    assert counters.get("c1").unread_messages == 1
+
+
+def test_status_changes_move_counts_between_buckets() -> None:
+    counters = ConversationEventCounters()
+    for ts in (100, 200):
+        counters.record_new_event(_event("c1", "unread", ts))
+
+    changes = [StatusChange("c1", "message", "unread", ts) for ts in (100, 200)]
+    counters.record_status_changes(changes, "read")
+    snapshot = counters.get("c1")
+    assert (snapshot.unread_messages, snapshot.summarizable_events) == (0, 2)
+
+    counters.record_status_changes([StatusChange("c1", "message", "read", 100)], "summarized")
+    snapshot = counters.get("c1")
+    assert (snapshot.unread_messages, snapshot.summarizable_events) == (0, 1)
+
+
+def test_status_change_to_same_status_or_without_conversation_is_noop() -> None:
+    counters = ConversationEventCounters()
+    counters.record_new_event(_event("c1", "read", 100))
+    version = counters.version("c1")
+    counters.record_status_changes(
+        [StatusChange("c1", "message", "read", 100), StatusChange(None, "message", "unread", 100)], "read"
+    )
+    assert counters.version("c1") == version
+    assert counters.get("c1").summarizable_events == 1
+
+
+def test_counts_never_go_negative() -> None:
+    counters = ConversationEventCounters()
+    counters.record_status_changes([StatusChange("c1", "message", "unread", 100)], "read")
+    counters.record_status_changes([StatusChange("c1", "message", "read", 100)], "summarized")
+    snapshot = counters.get("c1")
+    assert snapshot.unread_messages == 0
+    assert snapshot.summarizable_events == 0
+
+
+def test_processed_timestamp_moving_forward_marks_stale() -> None:
+    counters = ConversationEventCounters()
+    counters.ready = True
+    counters.replace("c1", ConversationCounters(last_processed_timestamp=100))
+    assert counters.is_trusted("c1")
+
+    counters.record_processed_timestamp("c1", 50)  # 往回挪不算
+    assert counters.is_trusted("c1")
+
+    counters.record_processed_timestamp("c1", 200)
+    assert not counters.is_trusted("c1")
+    assert counters.get("c1").last_processed_timestamp == 200
+
+
+def test_is_trusted_requires_ready_and_known_conversation() -> None:
+    counters = ConversationEventCounters()
+    counters.replace("c1", ConversationCounters())
+    assert not counters.is_trusted("c1")
+    counters.ready = True
+    assert counters.is_trusted("c1")
+    assert not counters.is_trusted("unknown")
+
+
+def test_replace_with_stale_version_is_rejected_and_marks_stale() -> None:
+    counters = ConversationEventCounters()
+    counters.ready = True
+    counters.record_new_event(_event("c1", "unread", 100))
+    version = counters.version("c1")
+
+    # 对账查询跑到一半又进来一条
+    counters.record_new_event(_event("c1", "unread", 200))
+    assert not counters.replace("c1", ConversationCounters(unread_messages=1), expected_version=version)
+    assert counters.get("c1").unread_messages == 2
+    assert not counters.is_trusted("c1")
+
+    version = counters.version("c1")
+    assert counters.replace("c1", ConversationCounters(unread_messages=2), expected_version=version)
+    assert counters.is_trusted("c1")
+
+
+def test_mark_stale_keeps_counts() -> None:
+    counters = ConversationEventCounters()
+    counters.ready = True
+    counters.record_new_event(_event("c1", "unread", 100))
+    counters.mark_stale("c1")
+    assert not counters.is_trusted("c1")
+    assert counters.get("c1").unread_messages == 1
+
+
+def test_get_returns_a_copy() -> None:
+    counters = ConversationEventCounters()
+    counters.record_new_event(_event("c1", "unread", 100))
+    counters.get("c1").unread_messages = 99
+    assert counters.get("c1").unread_messages == 1
+
+
+def test_load_restores_counts_without_marking_dirty() -> None:
+    counters = ConversationEventCounters()
+    counters.load(
+        [
+            {
+                "conversation_id": "c1",
+                COUNTERS_FIELD: {"unread_messages": 3, "summarizable_events": "5", "last_message_timestamp": 900},
+                "last_processed_timestamp": 800,
+            },
+            {"_key": "c2"},
+            {"name": "没有 id 的文档"},
+        ]
+    )
+    assert counters.get("c1") == ConversationCounters(3, 5, 900, 800)
+    assert counters.get("c2") == ConversationCounters()
+    assert counters.pop_dirty() == {}
+
+
+def test_pop_dirty_returns_persisted_counts_once_and_mark_dirty_requeues() -> None:
+    counters = ConversationEventCounters()
+    counters.record_new_event(_event("c1", "unread", 100))
+
+    dirty = counters.pop_dirty()
+    assert dirty == {"c1": {"unread_messages": 1, "summarizable_events": 0, "last_message_timestamp": 100}}
+    assert counters.pop_dirty() == {}
+
+    counters.mark_dirty(["c1", "unknown"])
+    assert set(counters.pop_dirty()) == {"c1"}
+
+
+def test_reset_clears_everything() -> None:
+    counters = ConversationEventCounters()
+    counters.ready = True
+    counters.record_new_event(_event("c1", "unread", 100))
+    counters.reset()
+    assert not counters.ready
+    assert counters.get("c1") == ConversationCounters()
+    assert counters.pop_dirty() == {}
+
+
+def test_counters_dict_round_trip() -> None:
+    original = ConversationCounters(1, 2, 3, 4)
+    assert ConversationCounters.from_dict(original.to_dict()) == original
+    assert ConversationCounters.from_dict(None) == ConversationCounters()
+    assert "last_processed_timestamp" not in original.persisted()
+    assert original.same_counts(ConversationCounters(1, 2, 3, 99))
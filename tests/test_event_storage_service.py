@@ -0,0 +1,60 @@
+# tests/test_event_storage_service.py
+"""事件存储服务的关闭流程：计数器维护和冷归档两个后台任务要停干净，没落盘的计数器要写回去。用内存后端跑。"""
+
+import asyncio
+from collections.abc import Iterator
+
+import pytest
+
+from src.database.core.connection_manager import CoreDBCollections
+from src.database.core.memory_store import InMemoryStore
+from src.database.services.event_counters import COUNTERS_FIELD, conversation_event_counters
+from src.database.services.memory_storage_services import InMemoryEventStorageService
+
+
+@pytest.fixture(autouse=True)
+def _clean_counters() -> Iterator[None]:
+    conversation_event_counters.reset()
+    yield
+    conversation_event_counters.reset()
+
+
+def test_shutdown_stops_maintenance_and_flushes_counters() -> None:
+    async def run() -> None:
+        store = InMemoryStore()
+        conversations = store.get_collection(CoreDBCollections.CONVERSATIONS)
+        await conversations.insert({"_key": "c1", "name": "群c1"})
+        service = InMemoryEventStorageService(store)
+        maintenance = asyncio.create_task(asyncio.sleep(3600))
+        retention = asyncio.create_task(asyncio.sleep(3600))
+        service._maintenance_task = maintenance
+        service._retention_task = retention
+
+        service.counters.record_new_event(
+            {"conversation_id_extracted": "c1", "event_category": "message", "status": "unread", "timestamp": 100}
+        )
+        await service.shutdown()
+
+        assert maintenance.cancelled()
+        assert retention.cancelled()
+        stored = await conversations.get("c1")
+        assert stored[COUNTERS_FIELD]["unread_messages"] == 1
+        assert service.counters.pop_dirty() == {}
+
+    asyncio.run(run())
+
+
+def test_shutdown_keeps_counters_dirty_when_flush_fails() -> None:
+    class FailingService(InMemoryEventStorageService):
+        async def _persist_event_counters(self, dirty: dict[str, dict[str, int]]) -> None:
+            raise RuntimeError("连接已经断了")
+
+    async def run() -> None:
+        service = FailingService(InMemoryStore())
+        service.counters.record_new_event(
+            {"conversation_id_extracted": "c1", "event_category": "message", "status": "unread", "timestamp": 100}
+        )
+        await service.shutdown()  # 不抛出去，关闭流程还得接着走
+        assert set(service.counters.pop_dirty()) == {"c1"}
+
+    asyncio.run(run())
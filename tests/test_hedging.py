@@ -0,0 +1,68 @@
+# tests/test_hedging.py
+"""对冲请求：主请求不管赢没赢都要进延迟历史，被对冲请求抢先时按它被取消前跑了多久记。"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import pytest
+
+from src.llmrequest.hedging import RequestHedger
+
+HEDGE_DELAY = 0.05
+
+
+def _factory(*attempts: tuple[float, dict[str, Any]]) -> Callable[[], Awaitable[dict[str, Any]]]:
+    """每调用一次按顺序发起下一次“请求”：睡一会儿再返回给定结果。"""
+    queue = list(attempts)
+
+    def factory() -> Awaitable[dict[str, Any]]:
+        delay, result = queue.pop(0)
+
+        async def attempt() -> dict[str, Any]:
+            await asyncio.sleep(delay)
+            return result
+
+        return attempt()
+
+    return factory
+
+
+@pytest.fixture
+def hedger() -> RequestHedger:
+    return RequestHedger("test", min_delay_seconds=HEDGE_DELAY, max_delay_seconds=HEDGE_DELAY)
+
+
+def test_fast_primary_is_recorded_without_hedging(hedger: RequestHedger) -> None:
+    result = asyncio.run(hedger.run(_factory((0.0, {"text": "primary"}))))
+
+    assert result == {"text": "primary"}
+    assert hedger.hedges_launched == 0
+    assert len(hedger._latencies) == 1
+    assert hedger._latencies[0] < HEDGE_DELAY
+
+
+def test_cancelled_primary_is_recorded_with_its_elapsed_time(hedger: RequestHedger) -> None:
+    result = asyncio.run(hedger.run(_factory((5.0, {"text": "primary"}), (0.05, {"text": "hedge"}))))
+
+    assert result == {"text": "hedge"}
+    assert (hedger.hedges_launched, hedger.hedge_wins) == (1, 1)
+    # 记的是主请求被取消时已经跑了多久（对冲延迟 + 对冲请求的耗时），而不是只记赢家
+    (elapsed,) = hedger._latencies
+    assert HEDGE_DELAY + 0.05 <= elapsed < 5.0
+
+
+def test_slow_primary_that_still_wins_is_recorded(hedger: RequestHedger) -> None:
+    result = asyncio.run(hedger.run(_factory((0.1, {"text": "primary"}), (5.0, {"text": "hedge"}))))
+
+    assert result == {"text": "primary"}
+    assert (hedger.hedges_launched, hedger.hedge_wins) == (1, 0)
+    (elapsed,) = hedger._latencies
+    assert 0.1 <= elapsed < 5.0
+
+
+def test_failed_primary_is_not_recorded(hedger: RequestHedger) -> None:
+    result = asyncio.run(hedger.run(_factory((0.06, {"error": True}), (0.1, {"text": "hedge"}))))
+
+    assert result == {"text": "hedge"}
+    assert list(hedger._latencies) == []
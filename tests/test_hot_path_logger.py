@@ -0,0 +1,91 @@
+# tests/test_hot_path_logger.py
+"""热路径日志门面：创建时算好的级别门槛、惰性求值，以及采样和限流。"""
+
+from collections.abc import Iterator
+from types import SimpleNamespace
+
+import pytest
+from loguru import logger
+
+from src.common.custom_logging import hot_path_logger
+from src.common.custom_logging.hot_path_logger import HotPathLogger
+
+
+@pytest.fixture
+def records() -> Iterator[list[str]]:
+    captured: list[str] = []
+    sink_id = logger.add(
+        lambda message: captured.append(message.record["message"]),
+        level="TRACE",
+        filter=lambda record: record["extra"].get("hot_path_test") is True,
+    )
+    yield captured
+    logger.remove(sink_id)
+
+
+def _make(min_level_no: int | None = None) -> HotPathLogger:
+    return HotPathLogger(logger.bind(hot_path_test=True), min_level_no=min_level_no)
+
+
+def test_threshold_combines_hot_path_level_and_sink_levels(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(hot_path_logger, "CONSOLE_LOG_LEVEL", "WARNING")
+    monkeypatch.setattr(hot_path_logger, "FILE_LOG_LEVEL", "INFO")
+
+    monkeypatch.setenv("HOT_PATH_LOG_LEVEL", "DEBUG")
+    # 热路径放开了 DEBUG，但最宽的处理器也只收 INFO
+    opened = _make()
+    assert not opened.is_enabled("DEBUG")
+    assert opened.is_enabled("INFO")
+
+    monkeypatch.setenv("HOT_PATH_LOG_LEVEL", "ERROR")
+    strict = _make()
+    assert not strict.is_enabled("WARNING")
+    assert strict.is_enabled("ERROR")
+
+
+def test_disabled_levels_never_touch_lazy_arguments(records: list[str]) -> None:
+    log = _make(min_level_no=20)
+    calls: list[str] = []
+
+    def expensive() -> str:
+        calls.append("called")
+        return "贵"
+
+    log.debug("没开: {}", expensive)
+    log.debug(lambda: expensive())
+    assert calls == []
+    assert records == []
+
+    log.info("开了: {}", expensive)
+    log.info(lambda: f"消息本身也是 {expensive()}")
+    assert calls == ["called", "called"]
+    assert records == ["开了: 贵", "消息本身也是 贵"]
+
+
+def test_every_n_samples_the_same_call_site(records: list[str]) -> None:
+    log = _make(min_level_no=0)
+    for i in range(7):
+        log.info("第 {} 条", i, every_n=3)
+
+    assert records == ["第 0 条", "第 3 条", "第 6 条"]
+
+
+def test_per_seconds_throttles_and_reports_suppressed_count(
+    records: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    now = [100.0]
+    monkeypatch.setattr(hot_path_logger, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    log = _make(min_level_no=0)
+
+    for _ in range(4):
+        log.info("刷屏", per_seconds=5.0)
+    now[0] += 5.0
+    log.info("刷屏", per_seconds=5.0)
+
+    assert records == ["刷屏", "刷屏 (期间另有 3 条同类日志被省略)"]
+
+
+def test_messages_without_args_keep_braces(records: list[str]) -> None:
+    _make(min_level_no=0).info('{"event_type": "message"}')
+
+    assert records == ['{"event_type": "message"}']
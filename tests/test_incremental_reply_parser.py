@@ -0,0 +1,79 @@
+# tests/test_incremental_reply_parser.py
+"""流式回复的增量解析：不管文本从哪里被切开（键名中间、转义序列中间、表情和汉字旁边），交出来的句子都要和完整解析一致。"""
+
+import json
+
+import pytest
+
+from src.common.json_parser.incremental_reply_parser import IncrementalReplyParser
+from src.common.json_parser.json_parser import parse_llm_json_response
+
+_REPLY = {
+    "mood": "得意 😼",
+    "reply_willing": True,
+    "reply_text": [
+        "哼，才不是“特意”等你的呢",
+        'ta 说 "别闹" \\ 然后换行\n第二行',
+        "表情 😀🐱 和 é 都要完整",
+        "方括号 [不是数组] {也不是对象}，逗号, 冒号: 都别当真",
+    ],
+    "motivation": {"inner": ["嵌套的字符串不该交出去"]},
+    "at_someone": None,
+    "quote_reply": 12.5,
+    'key with "quote"': "键名里也有转义",
+}
+
+# ensure_ascii 版本把汉字和表情都写成 \\uXXXX（表情是一对代理项），切在转义序列中间的情况就都有了
+_TEXTS = [
+    "```json\n" + json.dumps(_REPLY, ensure_ascii=False, indent=2) + "\n```",
+    json.dumps(_REPLY, ensure_ascii=True),
+]
+
+
+def _expected(text: str) -> tuple[list[str], dict]:
+    full = parse_llm_json_response(text)
+    assert full is not None
+    scalars = {key: value for key, value in full.items() if not isinstance(value, list | dict)}
+    return full["reply_text"], scalars
+
+
+def _feed_all(parser: IncrementalReplyParser, chunks: list[str]) -> list[str]:
+    emitted: list[str] = []
+    for chunk in chunks:
+        emitted.extend(parser.feed(chunk))
+    return emitted
+
+
+@pytest.mark.parametrize("text", _TEXTS)
+def test_every_two_way_split_matches_the_full_parse(text: str) -> None:
+    expected_segments, expected_fields = _expected(text)
+    for cut in range(len(text) + 1):
+        parser = IncrementalReplyParser("reply_text")
+        emitted = _feed_all(parser, [text[:cut], text[cut:]])
+        assert emitted == expected_segments, f"切在第 {cut} 个字符: {text[max(cut - 10, 0) : cut + 10]!r}"
+        assert parser.fields == expected_fields
+        assert parser.finished
+        assert parser.emitted_count == len(expected_segments)
+
+
+@pytest.mark.parametrize("text", _TEXTS)
+def test_char_by_char_feed_matches_the_full_parse(text: str) -> None:
+    expected_segments, expected_fields = _expected(text)
+    parser = IncrementalReplyParser("reply_text")
+
+    emitted = _feed_all(parser, list(text))
+
+    assert emitted == expected_segments
+    assert parser.fields == expected_fields
+
+
+def test_segments_are_emitted_as_soon_as_they_close() -> None:
+    parser = IncrementalReplyParser("reply_text")
+
+    assert parser.feed('{"reply_text": ["第一句", "第二') == ["第一句"]
+    assert parser.feed('句\\"带引号\\""') == ['第二句"带引号"']
+    assert not parser.finished
+    assert parser.feed("]}") == []
+    assert parser.finished
+    # 顶层对象闭合之后的废话不再理会
+    assert parser.feed(' ["多出来的"]') == []
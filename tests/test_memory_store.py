@@ -0,0 +1,185 @@
+# tests/test_memory_store.py
+"""内存存储后端：集合读写和 UPDATE 合并语义、有序/分组索引扫描、merge_update 和快照往返。"""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src.database.core.connection_manager import CoreDBCollections
+from src.database.core.memory_store import (
+    InMemoryStore,
+    MemoryCollection,
+    MemoryIndexSpec,
+    get_path,
+    merge_patch,
+)
+
+EVENTS_SPEC = MemoryIndexSpec("timestamp", ("conversation_id_extracted", "meta.kind"))
+
+
+def _events_collection() -> MemoryCollection:
+    collection = MemoryCollection("events", EVENTS_SPEC)
+
+    async def fill() -> None:
+        for key, cid, ts in [("e3", "c1", 300), ("e1", "c1", 100), ("e2", "c2", 200), ("e4", "c1", 300)]:
+            await collection.insert(
+                {"_key": key, "conversation_id_extracted": cid, "timestamp": ts, "meta": {"kind": "msg"}}
+            )
+
+    asyncio.run(fill())
+    return collection
+
+
+def _keys(docs: object) -> list[str]:
+    return [doc["_key"] for doc in docs]
+
+
+def test_get_path_and_merge_patch() -> None:
+    doc = {"a": {"b": {"c": 1}}, "x": 2}
+    assert get_path(doc, "a.b.c") == 1
+    assert get_path(doc, "a.missing.c") is None
+    assert get_path(doc, "x.y") is None
+
+    merged = merge_patch({"a": {"b": 1, "c": 2}, "d": [1]}, {"a": {"c": 3}, "d": [2], "e": None})
+    assert merged == {"a": {"b": 1, "c": 3}, "d": [2], "e": None}
+
+
+def test_insert_get_update_remove() -> None:
+    async def run() -> None:
+        collection = MemoryCollection("things", MemoryIndexSpec())
+        meta = await collection.insert({"_key": "k1", "profile": {"name": "a", "age": 1}})
+        assert meta is not None
+        assert meta["_id"] == "things/k1"
+        assert await collection.insert({"_key": "k1"}) is None  # 不覆盖就不让插
+        assert await collection.has("k1")
+
+        fetched = await collection.get("k1")
+        fetched["profile"] = "被改了"
+        assert (await collection.get("k1"))["profile"] == {"name": "a", "age": 1}
+
+        updated = await collection.update("k1", {"_key": "hijack", "profile": {"age": 2}})
+        assert updated["_key"] == "k1"
+        assert updated["profile"] == {"name": "a", "age": 2}
+        assert updated["_rev"] != meta["_rev"]
+        assert await collection.update("missing", {"a": 1}) is None
+
+        assert (await collection.upsert("k2", {"v": 1}))["v"] == 1
+        upserted = await collection.upsert("k2", {"w": 2})
+        assert (upserted["v"], upserted["w"]) == (1, 2)
+
+        generated = await collection.insert({"v": 3})
+        assert generated["_key"]
+        assert len(collection) == 3
+
+        assert await collection.remove("k1")
+        assert not await collection.remove("k1")
+        assert await collection.get("k1") is None
+
+    asyncio.run(run())
+
+
+def test_scan_orders_by_sort_field_and_groups() -> None:
+    collection = _events_collection()
+    assert _keys(collection.scan()) == ["e1", "e2", "e3", "e4"]
+    assert _keys(collection.scan(reverse=True)) == ["e4", "e3", "e2", "e1"]
+    assert _keys(collection.scan("conversation_id_extracted", "c1")) == ["e1", "e3", "e4"]
+    assert _keys(collection.scan("meta.kind", "msg")) == ["e1", "e2", "e3", "e4"]
+    assert list(collection.scan("conversation_id_extracted", "unknown")) == []
+    assert sorted(collection.group_values("conversation_id_extracted")) == ["c1", "c2"]
+    assert collection.group_keys("conversation_id_extracted", "c2") == ["e2"]
+
+
+def test_scan_after_cursor() -> None:
+    collection = _events_collection()
+    # 只给排序值：同一时间戳的全都跳过
+    assert _keys(collection.scan(after=200)) == ["e3", "e4"]
+    assert _keys(collection.scan(after=300)) == []
+    # (排序值, _key) 游标：同一时间戳里接着上次的 key 往后扫
+    assert _keys(collection.scan(after=(300, "e3"))) == ["e4"]
+    assert _keys(collection.scan("conversation_id_extracted", "c1", after=100, reverse=True)) == ["e4", "e3"]
+
+
+def test_update_and_remove_keep_indexes_in_sync() -> None:
+    collection = _events_collection()
+
+    async def run() -> None:
+        await collection.update("e1", {"timestamp": 400, "conversation_id_extracted": "c2"})
+        await collection.update("e3", {"content": "不碰索引字段"})
+        await collection.remove("e4")
+
+    asyncio.run(run())
+    assert _keys(collection.scan()) == ["e2", "e3", "e1"]
+    assert _keys(collection.scan("conversation_id_extracted", "c1")) == ["e3"]
+    assert _keys(collection.scan("conversation_id_extracted", "c2")) == ["e2", "e1"]
+
+
+def test_documents_without_sort_value_are_only_in_full_scans() -> None:
+    collection = MemoryCollection("events", EVENTS_SPEC)
+    asyncio.run(collection.insert({"_key": "no_ts", "conversation_id_extracted": "c1"}))
+    assert list(collection.scan()) == []
+    assert list(collection.scan("conversation_id_extracted", "c1")) == []
+    assert _keys(collection.all_documents()) == ["no_ts"]
+
+
+def test_merge_update_by_key_and_by_match() -> None:
+    async def run() -> None:
+        store = InMemoryStore()
+        events = store.get_collection(CoreDBCollections.EVENTS)
+        await events.insert({"_key": "e1", "conversation_id_extracted": "c1", "timestamp": 1, "status": "unread"})
+        await events.insert({"_key": "e2", "conversation_id_extracted": "c2", "timestamp": 2, "status": "unread"})
+
+        assert await store.merge_update(CoreDBCollections.EVENTS, {"status": "read"}, key="e1") == {"_key": "e1"}
+        updated = await store.merge_update(
+            CoreDBCollections.EVENTS, {"status": "read"}, match={"conversation_id_extracted": "c2"}, return_new=True
+        )
+        assert updated["_key"] == "e2"
+        assert updated["status"] == "read"
+        assert await store.merge_update(CoreDBCollections.EVENTS, {"x": 1}, match={"status": "gone"}) is None
+        assert await store.merge_update(CoreDBCollections.EVENTS, {"x": 1}, key="missing") is None
+        with pytest.raises(ValueError):
+            await store.merge_update(CoreDBCollections.EVENTS, {"x": 1})
+
+    asyncio.run(run())
+
+
+def test_store_has_every_core_collection() -> None:
+    store = InMemoryStore()
+    for name in CoreDBCollections.get_all_collection_names():
+        assert name in store.collections
+    for name in CoreDBCollections.get_edge_collection_names():
+        assert store.collections[name].is_edge
+
+
+def test_snapshot_round_trip(tmp_path: Path) -> None:
+    snapshot = tmp_path / "nested" / "snapshot.json"
+
+    async def run() -> None:
+        store = InMemoryStore(snapshot)
+        events = store.get_collection(CoreDBCollections.EVENTS)
+        await events.insert({"_key": "e2", "conversation_id_extracted": "c1", "timestamp": 2})
+        await events.insert({"_key": "e1", "conversation_id_extracted": "c1", "timestamp": 1})
+        await store.close_client()
+
+    asyncio.run(run())
+    assert snapshot.exists()
+    assert not snapshot.with_suffix(".json.tmp").exists()
+
+    restored = InMemoryStore(snapshot)
+    restored.load_snapshot()
+    events = restored.get_collection(CoreDBCollections.EVENTS)
+    assert _keys(events.scan("conversation_id_extracted", "c1")) == ["e1", "e2"]
+
+
+def test_broken_snapshot_starts_empty(tmp_path: Path) -> None:
+    snapshot = tmp_path / "snapshot.json"
+    snapshot.write_text("{坏掉的 json", encoding="utf-8")
+    store = InMemoryStore(snapshot)
+    store.load_snapshot()
+    assert all(len(collection) == 0 for collection in store.collections.values())
+
+
+def test_store_without_snapshot_path_does_not_write(tmp_path: Path) -> None:
+    store = InMemoryStore()
+    store.save_snapshot()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,114 @@
+# tests/test_platform_registry.py
+"""翻译官中介所的动作目录：缓存命中、登记新翻译官后作废重编、目录整棵冻住，以及扁平分发表的翻译。"""
+
+from typing import Any
+
+import pytest
+
+from src.platform_builders.base_builder import BasePlatformBuilder
+from src.platform_builders.registry import PlatformBuilderRegistry
+
+
+class _FakeBuilder(BasePlatformBuilder):
+    """假翻译官：翻译结果就是一个元组，顺便数一数目录被要了几次。"""
+
+    def __init__(self, platform_id: str = "fake_qq") -> None:
+        self._platform_id = platform_id
+        self.definition_calls = 0
+        self.definitions: dict[str, Any] = {
+            "send_message": {
+                "type": "object",
+                "description": "发一条消息",
+                "properties": {"text": {"type": "string"}},
+                "required": ["text"],
+            },
+            "poke": {"type": "object", "description": "戳一戳", "properties": {"user_id": {"type": "string"}}},
+        }
+
+    @property
+    def platform_id(self) -> str:
+        return self._platform_id
+
+    def build_action_event(self, action_name: str, params: dict[str, Any]) -> Any:  # noqa: ANN401
+        return ("generic", action_name, params)
+
+    def get_action_definitions(self) -> dict[str, Any]:
+        self.definition_calls += 1
+        return self.definitions
+
+    def get_action_builders(self) -> dict[str, Any]:
+        return {"send_message": lambda params: ("send_message", params)}
+
+
+@pytest.fixture
+def registry() -> PlatformBuilderRegistry:
+    return PlatformBuilderRegistry()
+
+
+def test_catalogue_is_cached_until_invalidated(registry: PlatformBuilderRegistry) -> None:
+    builder = _FakeBuilder()
+    registry.register_builder(builder)
+
+    first = registry.get_action_catalogue()
+    assert registry.get_action_catalogue() is first
+    assert builder.definition_calls == 1
+
+    registry.invalidate_action_catalogue("测试")
+    assert registry.get_action_catalogue() is not first
+    assert builder.definition_calls == 2
+
+
+def test_register_builder_invalidates_and_bumps_version(registry: PlatformBuilderRegistry) -> None:
+    registry.register_builder(_FakeBuilder("fake_qq"))
+    first = registry.get_action_catalogue()
+
+    registry.register_builder(_FakeBuilder("fake_tg"))
+    second = registry.get_action_catalogue()
+
+    assert second is not first
+    assert second.version == first.version + 1
+    assert set(second.definitions) == {"fake_qq", "fake_tg"}
+    assert len(second.tools) == 4
+
+
+def test_catalogue_is_deeply_frozen(registry: PlatformBuilderRegistry) -> None:
+    builder = _FakeBuilder()
+    registry.register_builder(builder)
+    catalogue = registry.get_action_catalogue()
+
+    send_schema = catalogue.definitions["fake_qq"]["properties"]["send_message"]
+    with pytest.raises(TypeError):
+        send_schema["description"] = "被改了"
+    with pytest.raises(TypeError):
+        send_schema["properties"]["text"]["type"] = "integer"
+    assert isinstance(send_schema["required"], tuple)
+
+    tool = catalogue.tools[0]
+    with pytest.raises(TypeError):
+        tool["function"]["name"] = "platform.evil.rm"
+    with pytest.raises(TypeError):
+        tool["function"]["parameters"]["properties"]["text"] = {}
+
+    # 翻译官自己的字典没有被目录拿去共用，改它也不影响已经编好的目录
+    builder.definitions["send_message"]["description"] = "改了自己的"
+    assert send_schema["description"] == "发一条消息"
+
+
+def test_tools_use_namespaced_names_without_description_in_parameters(registry: PlatformBuilderRegistry) -> None:
+    registry.register_builder(_FakeBuilder())
+    tools = {tool["function"]["name"]: tool for tool in registry.get_action_catalogue().tools}
+
+    assert set(tools) == {"platform.fake_qq.send_message", "platform.fake_qq.poke"}
+    send = tools["platform.fake_qq.send_message"]["function"]
+    assert send["description"] == "发一条消息"
+    assert "description" not in send["parameters"]
+
+
+def test_build_action_event_dispatches_through_catalogue(registry: PlatformBuilderRegistry) -> None:
+    registry.register_builder(_FakeBuilder())
+
+    # 有专门翻译方法的走分发表，没有的退回 build_action_event
+    assert registry.build_action_event("fake_qq", "send_message", {"text": "哼"}) == ("send_message", {"text": "哼"})
+    assert registry.build_action_event("fake_qq", "poke", {"user_id": "1"}) == ("generic", "poke", {"user_id": "1"})
+    assert registry.build_action_event("fake_qq", "fly", {}) is None
+    assert registry.build_action_event("nobody", "send_message", {}) is None
@@ -0,0 +1,260 @@
+# tests/test_query_registry.py
+"""具名查询登记处：绑定参数检查、重复登记、动态查询缓存、统计和慢查询 profile，外加各存储服务登记的 AQL 自检。"""
+
+import asyncio
+import importlib
+import re
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from src.database.core.connection_manager import ArangoDBConnectionManager
+from src.database.core.query_options import QueryOptions, QueryResult
+from src.database.core.query_registry import (
+    NULLABLE_STR,
+    NUMBER,
+    QueryRegistry,
+    RegisteredQuery,
+    query_registry,
+)
+
+# 登记了查询的存储服务模块，import 一下全局登记处里就有它们的查询了
+_STORAGE_SERVICE_MODULES = (
+    "src.database.services.action_log_storage_service",
+    "src.database.services.conversation_storage_service",
+    "src.database.services.event_storage_service",
+    "src.database.services.person_storage_service",
+    "src.database.services.summary_storage_service",
+    "src.database.services.thought_storage_service",
+)
+# AQL 里的 @name / @@collection（前面不能紧挨着字母数字或另一个 @）
+_BIND_VAR_PATTERN = re.compile(r"(?<![@\w])@(@?[A-Za-z_]\w*)")
+
+
+def _query() -> RegisteredQuery:
+    return RegisteredQuery(
+        name="test.events_since",
+        aql="FOR doc IN @@collection FILTER doc.timestamp > @since AND doc.cid == @cid RETURN doc",
+        params={"@collection": str, "since": NUMBER, "cid": NULLABLE_STR},
+    )
+
+
+def test_check_bind_vars_accepts_matching_params() -> None:
+    query = _query()
+    query.check_bind_vars({"@collection": "events", "since": 1, "cid": None})
+    query.check_bind_vars({"@collection": "events", "since": 1.5, "cid": "c1"})
+
+
+@pytest.mark.parametrize(
+    ("bind_vars", "fragment"),
+    [
+        ({"@collection": "events", "since": 1}, "缺少 ['cid']"),
+        ({"@collection": "events", "since": 1, "cid": None, "limit": 10}, "多余 ['limit']"),
+        ({"@collection": "events", "since": "1", "cid": None}, "类型不对 ['since=str']"),
+        ({"@collection": "events", "since": 1, "cid": 42}, "类型不对 ['cid=int']"),
+    ],
+)
+def test_check_bind_vars_rejects_bad_params(bind_vars: dict, fragment: str) -> None:
+    with pytest.raises(ValueError, match=re.escape(fragment)):
+        _query().check_bind_vars(bind_vars)
+
+
+def test_register_is_idempotent_but_rejects_conflicting_aql() -> None:
+    registry = QueryRegistry()
+    first = registry.register("q", "RETURN @x", {"x": int})
+    assert registry.register("q", "RETURN @x", {"x": int}) is first
+    with pytest.raises(ValueError):
+        registry.register("q", "RETURN @y", {"y": int})
+    assert registry.get("q") is first
+    assert registry.all() == [first]
+
+
+def test_prepared_builds_each_shape_once() -> None:
+    registry = QueryRegistry()
+    calls = []
+
+    def build() -> tuple[str, dict]:
+        calls.append(1)
+        return "RETURN @x", {"x": int}
+
+    first = registry.prepared("q.with_x", build)
+    assert registry.prepared("q.with_x", build) is first
+    assert len(calls) == 1
+
+
+def test_record_accumulates_stats_sorted_by_total_time() -> None:
+    registry = QueryRegistry()
+    fast = registry.register("fast", "RETURN 1", {})
+    slow = registry.register("slow", "RETURN 2", {})
+    registry.record(fast, 1.0, QueryResult(rows=[1, 2]))
+    registry.record(slow, 30.0, QueryResult(rows=[1]))
+    registry.record(slow, 20.0, QueryResult(error="boom"))
+
+    stats = registry.get_stats()
+    assert list(stats) == ["slow", "fast"]
+    assert stats["slow"]["calls"] == 2
+    assert stats["slow"]["errors"] == 1
+    assert stats["slow"]["rows"] == 1
+    assert stats["fast"]["max_rows"] == 2
+    assert stats["fast"]["bytes"] == 0  # 默认不算字节数
+
+    registry.reset_stats()
+    assert registry.get_stats() == {}
+
+
+def test_track_bytes_counts_serialized_rows() -> None:
+    registry = QueryRegistry()
+    registry.configure(track_bytes=True)
+    query = registry.register("q", "RETURN 1", {})
+    registry.record(query, 1.0, QueryResult(rows=[{"a": 1}]))
+    assert registry.get_stats()["q"]["bytes"] == len(b'[{"a": 1}]')
+
+
+def test_slow_query_gets_profiled_on_next_run_only() -> None:
+    registry = QueryRegistry()
+    registry.configure(slow_query_threshold_ms=10)
+    query = registry.register("q", "RETURN 1", {}, options=QueryOptions(batch_size=5))
+    assert registry.options_for(query, None) == QueryOptions(batch_size=5)
+
+    registry.record(query, 50.0, QueryResult())
+    assert registry.get_stats()["q"]["slow_calls"] == 1
+    profiled = registry.options_for(query, None)
+    assert profiled.profile == 2
+    assert profiled.batch_size == 5
+
+    # 带着 profile 跑完一次就不再带了
+    registry.record(query, 50.0, QueryResult(profile={"executing": 0.05}))
+    assert not registry.options_for(query, None).profile
+
+
+def test_slow_query_profiling_can_be_disabled() -> None:
+    registry = QueryRegistry()
+    registry.configure(slow_query_threshold_ms=10, profile_slow_queries=False)
+    query = registry.register("q", "RETURN 1", {})
+    registry.record(query, 50.0, QueryResult())
+    assert not registry.options_for(query, None).profile
+
+
+def test_export_stats_writes_json(tmp_path: Path) -> None:
+    registry = QueryRegistry()
+    registry.export_stats(tmp_path)
+    assert not (tmp_path / "query_stats.json").exists()  # 没统计就不写
+
+    registry.record(registry.register("q", "RETURN 1", {}), 1.0, QueryResult())
+    registry.export_stats(tmp_path)
+    assert '"q"' in (tmp_path / "query_stats.json").read_text(encoding="utf-8")
+
+
+def test_registered_queries_declare_exactly_the_bind_vars_they_use() -> None:
+    for module in _STORAGE_SERVICE_MODULES:
+        importlib.import_module(module)
+
+    queries = query_registry.all()
+    assert queries
+    mismatched = {}
+    for query in queries:
+        used = set(_BIND_VAR_PATTERN.findall(query.aql))
+        if used != set(query.params):
+            mismatched[query.name] = sorted(used ^ set(query.params))
+    assert mismatched == {}
+
+
+class _FakeCursor:
+    def __init__(self, rows: list) -> None:
+        self._rows = rows
+        self.has_more = False
+        self.statistics = None
+        self.profile = None
+
+    def __aiter__(self) -> "_FakeCursor":
+        self._iter = iter(self._rows)
+        return self
+
+    async def __anext__(self) -> object:
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+class _FakeDatabase:
+    """只认 aql.execute，把收到的 AQL 和绑定参数记下来，按 rows 返回结果。"""
+
+    name = "fake"
+
+    def __init__(self, rows: list) -> None:
+        self.rows = rows
+        self.executed: list[tuple[str, dict]] = []
+        self.aql = SimpleNamespace(execute=self._execute)
+
+    async def _execute(self, query: str, bind_vars: dict | None = None, **kwargs: object) -> _FakeCursor:
+        self.executed.append((query, dict(bind_vars or {})))
+        return _FakeCursor(list(self.rows))
+
+
+def _manager(rows: list) -> tuple[ArangoDBConnectionManager, _FakeDatabase]:
+    db = _FakeDatabase(rows)
+    return ArangoDBConnectionManager(client=None, db=db, core_collection_configs={}), db
+
+
+def test_merge_update_runs_one_registered_query_per_shape() -> None:
+    manager, db = _manager([{"_key": "t1"}])
+    query_registry.reset_stats()
+
+    async def run() -> None:
+        for action_id in ("a1", "a2"):
+            result = await manager.merge_update(
+                "thoughts",
+                {"action_attempted": {"status": "done"}},
+                key="t1",
+                match={"action_attempted.action_id": action_id},
+            )
+            assert result == {"_key": "t1"}
+        await manager.merge_update("thoughts", {"seen": True}, match={"action_attempted.action_id": "a3"})
+
+    asyncio.run(run())
+
+    keyed = query_registry.get("merge_update.key.match_2.key_only")
+    unkeyed = query_registry.get("merge_update.nokey.match_2.key_only")
+    assert keyed is not None
+    assert unkeyed is not None
+    # 同一个形状的两次调用拼出来的是同一条 AQL，字段路径和值都走绑定参数
+    assert db.executed[0][0] == db.executed[1][0] == keyed.aql
+    assert db.executed[0][1]["m0_0"] == "action_attempted"
+    assert db.executed[1][1]["m0"] == "a2"
+    stats = query_registry.get_stats()
+    assert stats[keyed.name]["calls"] == 2
+    assert stats[unkeyed.name]["calls"] == 1
+
+
+def test_merge_update_requires_key_or_match() -> None:
+    manager, _db = _manager([])
+    with pytest.raises(ValueError):
+        asyncio.run(manager.merge_update("thoughts", {"x": 1}))
+
+
+def test_iterate_query_checks_bind_vars_and_records_stats() -> None:
+    manager, db = _manager([{"n": i} for i in range(5)])
+    query = query_registry.register("test.iterate_numbers", "FOR doc IN @@collection RETURN doc", {"@collection": str})
+    query_registry.reset_stats()
+
+    async def collect() -> list[list]:
+        return [
+            batch
+            async for batch in manager.iterate_query(query, {"@collection": "numbers"}, QueryOptions(batch_size=2))
+        ]
+
+    batches = asyncio.run(collect())
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert db.executed == [(query.aql, {"@collection": "numbers"})]
+    stats = query_registry.get_stats()[query.name]
+    assert stats["calls"] == 1
+    assert stats["rows"] == 5
+
+    async def bad_bind_vars() -> None:
+        async for _batch in manager.iterate_query(query, {"@collection": "numbers", "extra": 1}):
+            pass
+
+    with pytest.raises(ValueError):
+        asyncio.run(bad_bind_vars())
@@ -0,0 +1,228 @@
+# tests/test_request_scheduler.py
+"""LLM 请求调度器：优先级放行、交互预留槽位、令牌桶限速、分组取消、排队中被取消和跨线程事件循环。"""
+
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+from types import SimpleNamespace
+
+import pytest
+
+from src.llmrequest import request_scheduler
+from src.llmrequest.request_scheduler import (
+    PURPOSE_PRIORITIES,
+    LLMPriority,
+    LLMRequestCancelledError,
+    LLMRequestScheduler,
+)
+
+
+def _settings(**overrides: object) -> SimpleNamespace:
+    settings = {
+        "enabled": True,
+        "max_concurrent_requests_per_provider": 1,
+        "reserved_interactive_slots": 0,
+        "requests_per_minute_per_provider": 0,
+        "burst_size": 5,
+    }
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+
+@pytest.fixture
+def use_settings(monkeypatch: pytest.MonkeyPatch) -> Callable[..., None]:
+    def apply(**overrides: object) -> None:
+        settings = _settings(**overrides)
+        monkeypatch.setattr(request_scheduler, "_scheduler_settings", lambda: settings)
+
+    apply()
+    return apply
+
+
+async def _hold(scheduler: LLMRequestScheduler, priority: LLMPriority, release: asyncio.Event, order: list) -> None:
+    async with scheduler.slot("p", priority):
+        order.append(priority)
+        await release.wait()
+
+
+def test_disabled_scheduler_does_not_queue(use_settings: Callable[..., None]) -> None:
+    use_settings(enabled=False)
+    scheduler = LLMRequestScheduler()
+
+    async def run() -> list[float]:
+        waits = []
+        for _ in range(3):
+            async with scheduler.slot("p", LLMPriority.INTRUSIVE) as waited:
+                waits.append(waited)
+        return waits
+
+    assert asyncio.run(run()) == [0.0, 0.0, 0.0]
+    assert scheduler.get_metrics()["providers"] == {}
+
+
+def test_queued_requests_are_released_by_priority(use_settings: Callable[..., None]) -> None:
+    scheduler = LLMRequestScheduler()
+
+    async def run() -> list[LLMPriority]:
+        order: list[LLMPriority] = []
+        release = asyncio.Event()
+        blocker_release = asyncio.Event()
+        blocker = asyncio.create_task(_hold(scheduler, LLMPriority.MAIN_THOUGHT, blocker_release, order))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(_hold(scheduler, priority, release, order))
+            for priority in (LLMPriority.INTRUSIVE, LLMPriority.SUMMARY, LLMPriority.FOCUS_REPLY)
+        ]
+        await asyncio.sleep(0.01)
+        assert scheduler.get_metrics()["providers"]["p"] == {"in_flight": 1, "queued": 3, "tokens": None}
+        release.set()
+        blocker_release.set()
+        await asyncio.gather(blocker, *waiters)
+        return order
+
+    assert asyncio.run(run()) == [
+        LLMPriority.MAIN_THOUGHT,
+        LLMPriority.FOCUS_REPLY,
+        LLMPriority.SUMMARY,
+        LLMPriority.INTRUSIVE,
+    ]
+    metrics = scheduler.get_metrics()
+    assert metrics["providers"]["p"]["in_flight"] == 0
+    assert metrics["queue_wait"]["FOCUS_REPLY"]["count"] == 1
+
+
+def test_background_requests_leave_reserved_slots_to_interactive(use_settings: Callable[..., None]) -> None:
+    use_settings(max_concurrent_requests_per_provider=2, reserved_interactive_slots=1)
+    scheduler = LLMRequestScheduler()
+
+    async def run() -> None:
+        order: list[LLMPriority] = []
+        release = asyncio.Event()
+        summary = asyncio.create_task(_hold(scheduler, LLMPriority.SUMMARY, release, order))
+        await asyncio.sleep(0)
+        intrusive = asyncio.create_task(_hold(scheduler, LLMPriority.INTRUSIVE, release, order))
+        await asyncio.sleep(0.01)
+        # 后台请求只能用 2 - 1 = 1 个槽位，第二个得等
+        assert order == [LLMPriority.SUMMARY]
+
+        focus = asyncio.create_task(_hold(scheduler, LLMPriority.FOCUS_REPLY, release, order))
+        await asyncio.sleep(0.01)
+        assert order == [LLMPriority.SUMMARY, LLMPriority.FOCUS_REPLY]
+
+        release.set()
+        await asyncio.gather(summary, intrusive, focus)
+        assert order[-1] == LLMPriority.INTRUSIVE
+
+    asyncio.run(run())
+
+
+def test_token_bucket_limits_request_rate(use_settings: Callable[..., None]) -> None:
+    use_settings(max_concurrent_requests_per_provider=10, requests_per_minute_per_provider=600, burst_size=1)
+    scheduler = LLMRequestScheduler()
+
+    async def run() -> float:
+        started = time.monotonic()
+        for _ in range(3):
+            async with scheduler.slot("p", LLMPriority.FOCUS_REPLY):
+                pass
+        return time.monotonic() - started
+
+    # 每 0.1 秒补一个令牌，桶里只有 1 个，三次请求至少要等两次补令牌
+    assert asyncio.run(run()) >= 0.18
+
+
+def test_cancel_group_fails_queued_requests_of_that_group(use_settings: Callable[..., None]) -> None:
+    scheduler = LLMRequestScheduler()
+
+    async def run() -> None:
+        order: list[LLMPriority] = []
+        release = asyncio.Event()
+        blocker = asyncio.create_task(_hold(scheduler, LLMPriority.FOCUS_REPLY, release, order))
+        await asyncio.sleep(0)
+
+        async def grouped() -> None:
+            async with scheduler.slot("p", LLMPriority.TOOL_DECISION, group="conv-1"):
+                pytest.fail("被取消的请求不应该拿到槽位")
+
+        doomed = asyncio.create_task(grouped())
+        survivor = asyncio.create_task(_hold(scheduler, LLMPriority.SUMMARY, release, order))
+        await asyncio.sleep(0.01)
+
+        assert scheduler.cancel_group("conv-1") == 1
+        assert scheduler.cancel_group("conv-1") == 0
+        with pytest.raises(LLMRequestCancelledError):
+            await doomed
+
+        release.set()
+        await asyncio.gather(blocker, survivor)
+        assert order == [LLMPriority.FOCUS_REPLY, LLMPriority.SUMMARY]
+
+    asyncio.run(run())
+    metrics = scheduler.get_metrics()
+    assert metrics["queue_wait"]["TOOL_DECISION"]["cancelled"] == 1
+    assert metrics["providers"]["p"]["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot(use_settings: Callable[..., None]) -> None:
+    scheduler = LLMRequestScheduler()
+
+    async def run() -> None:
+        order: list[LLMPriority] = []
+        release = asyncio.Event()
+        blocker = asyncio.create_task(_hold(scheduler, LLMPriority.FOCUS_REPLY, release, order))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(_hold(scheduler, LLMPriority.MAIN_THOUGHT, release, order))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        release.set()
+        await blocker
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        # 槽位还回来了，下一个请求马上能拿到
+        async with scheduler.slot("p", LLMPriority.INTRUSIVE) as waited:
+            assert waited < 0.5
+
+    asyncio.run(run())
+    assert scheduler.get_metrics()["providers"]["p"]["in_flight"] == 0
+
+
+def test_requests_from_another_thread_share_the_lane(use_settings: Callable[..., None]) -> None:
+    use_settings(max_concurrent_requests_per_provider=2)
+    scheduler = LLMRequestScheduler()
+    active = 0
+    peak = 0
+    done: list[str] = []
+    counter_lock = threading.Lock()
+
+    async def use(name: str, priority: LLMPriority) -> None:
+        nonlocal active, peak
+        async with scheduler.slot("p", priority):
+            with counter_lock:
+                active += 1
+                peak = max(peak, active)
+            await asyncio.sleep(0.005)
+            with counter_lock:
+                active -= 1
+                done.append(name)
+
+    async def many(prefix: str, priority: LLMPriority) -> None:
+        await asyncio.gather(*(use(f"{prefix}{i}", priority) for i in range(10)))
+
+    # 侵入性思维那样跑在自己线程的事件循环里
+    thread = threading.Thread(target=lambda: asyncio.run(many("t", LLMPriority.INTRUSIVE)))
+    thread.start()
+    asyncio.run(many("m", LLMPriority.FOCUS_REPLY))
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert len(done) == 20
+    assert peak <= 2
+    assert scheduler.get_metrics()["providers"]["p"]["in_flight"] == 0
+
+
+def test_embedding_requests_are_not_treated_as_background() -> None:
+    priority = PURPOSE_PRIORITIES["embedding"]
+    assert priority < request_scheduler.BACKGROUND_PRIORITY_THRESHOLD
+    assert PURPOSE_PRIORITIES["focused_chat"] < priority
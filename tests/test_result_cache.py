@@ -0,0 +1,150 @@
+# tests/test_result_cache.py
+"""搜索结果缓存：键标准化、动态 TTL、LRU 淘汰、按条数复用、深拷贝隔离和磁盘持久化。"""
+
+from pathlib import Path
+
+import pytest
+
+from src.tools.search import result_cache
+from src.tools.search.result_cache import (
+    KNOWLEDGE_TTL_SECONDS,
+    NEWS_TTL_SECONDS,
+    SearchResultCache,
+    normalize_query,
+)
+
+
+class _Clock:
+    def __init__(self, now: float = 1_000_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> _Clock:
+    fake = _Clock()
+    monkeypatch.setattr(result_cache.time, "time", fake)
+    return fake
+
+
+def _results(n: int) -> list[dict]:
+    return [{"title": f"结果{i}", "url": f"https://example.com/{i}", "tags": ["a"]} for i in range(n)]
+
+
+def test_normalize_query() -> None:
+    assert normalize_query("  Python   GIL\t是什么 \n") == "python gil 是什么"
+
+
+def test_ttl_depends_on_query_kind() -> None:
+    cache = SearchResultCache(default_ttl_seconds=1800.0)
+    assert cache.ttl_for("今天 天气") == NEWS_TTL_SECONDS
+    assert cache.ttl_for("什么是 gil") == KNOWLEDGE_TTL_SECONDS
+    assert cache.ttl_for("python gil") == 1800.0
+
+
+def test_hit_marks_cached_and_normalizes_key(clock: _Clock) -> None:
+    cache = SearchResultCache()
+    cache.put("Python GIL", 5, _results(5))
+    cached = cache.get("  python   gil ", 3)
+    assert cached is not None
+    assert len(cached) == 3
+    assert all(result["is_cached"] for result in cached)
+    assert cache.get_stats() == {"entries": 1, "hits": 1, "misses": 0, "hit_rate": 1.0}
+
+
+def test_entry_searched_with_fewer_results_misses(clock: _Clock) -> None:
+    cache = SearchResultCache()
+    cache.put("python gil", 3, _results(3))
+    assert cache.get("python gil", 5) is None
+    assert cache.get("python gil", 3) is not None
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_empty_results_are_not_cached(clock: _Clock) -> None:
+    cache = SearchResultCache()
+    cache.put("python gil", 5, [])
+    assert cache.get("python gil", 5) is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_entries_expire_by_query_ttl(clock: _Clock) -> None:
+    cache = SearchResultCache(default_ttl_seconds=1800.0)
+    cache.put("今天 天气", 5, _results(1))
+    cache.put("python gil", 5, _results(1))
+
+    clock.now += NEWS_TTL_SECONDS
+    assert cache.get("今天 天气", 5) is None
+    assert cache.get("python gil", 5) is not None
+    assert cache.get_stats()["entries"] == 1  # 过期的顺手删掉了
+
+    clock.now += 1800.0
+    assert cache.get("python gil", 5) is None
+
+
+def test_lru_eviction_keeps_recently_used(clock: _Clock) -> None:
+    cache = SearchResultCache(max_entries=2)
+    cache.put("a", 1, _results(1))
+    cache.put("b", 1, _results(1))
+    assert cache.get("a", 1) is not None  # a 变成最近用过的
+    cache.put("c", 1, _results(1))
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is not None
+    assert cache.get("c", 1) is not None
+
+
+def test_callers_cannot_mutate_cached_results(clock: _Clock) -> None:
+    cache = SearchResultCache()
+    original = _results(1)
+    cache.put("python gil", 1, original)
+    original[0]["tags"].append("put 之后改的")
+
+    first = cache.get("python gil", 1)
+    first[0]["tags"].append("get 之后改的")
+    first[0]["title"] = "被改了"
+
+    second = cache.get("python gil", 1)
+    assert second[0]["title"] == "结果0"
+    assert second[0]["tags"] == ["a"]
+
+
+def test_persistence_round_trip_drops_expired(tmp_path: Path, clock: _Clock) -> None:
+    path = tmp_path / "cache" / "search.json"
+    cache = SearchResultCache(persist_path=path)
+    cache.put("今天 天气", 5, _results(1))
+    cache.put("python gil", 5, _results(2))
+    cache.save()
+    assert path.exists()
+
+    clock.now += NEWS_TTL_SECONDS + 1
+    restored = SearchResultCache(persist_path=path)
+    restored.load()
+    assert restored.get_stats()["entries"] == 1
+    assert restored.get("python gil", 2) is not None
+    assert restored.get("今天 天气", 1) is None
+
+
+def test_load_respects_max_entries(tmp_path: Path, clock: _Clock) -> None:
+    path = tmp_path / "search.json"
+    cache = SearchResultCache(persist_path=path)
+    for query in ("a", "b", "c"):
+        cache.put(query, 1, _results(1))
+    cache.save()
+
+    restored = SearchResultCache(max_entries=2, persist_path=path)
+    restored.load()
+    assert restored.get("a", 1) is None
+    assert restored.get("c", 1) is not None
+
+
+def test_missing_or_broken_file_is_ignored(tmp_path: Path) -> None:
+    path = tmp_path / "search.json"
+    cache = SearchResultCache(persist_path=path)
+    cache.load()
+    path.write_text("{坏掉的 json", encoding="utf-8")
+    cache.load()
+    assert cache.get_stats()["entries"] == 0
+
+    SearchResultCache().save()  # 没配路径就什么都不写
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,128 @@
+# tests/test_tool_selector.py
+"""行动决策的工具筛选：按意图挑 top-k、固定带上的工具、没有语义模型时的字面兜底，以及预渲染 schema 的复用。"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.action.components import tool_selector
+from src.action.components.tool_selector import ToolSelector
+
+# 假的语义模型：每个关键词一个维度，文本里出现了就记 1
+_VOCABULARY = ("消息", "禁言", "文件", "戳", "头像", "失败")
+
+
+def _fake_encode(texts: list[str]) -> list[list[float]]:
+    return [[1.0 if word in text else 0.0 for word in _VOCABULARY] for text in texts]
+
+
+def _tool(name: str, description: str) -> dict:
+    return {
+        "type": "function",
+        "function": {"name": name, "description": description, "parameters": {"type": "object", "properties": {}}},
+    }
+
+
+TOOLS = [
+    _tool("platform.qq.send_message", "往群里或私聊发一条消息"),
+    _tool("platform.qq.ban_user", "把群成员禁言一段时间"),
+    _tool("platform.qq.upload_file", "上传群文件"),
+    _tool("platform.qq.poke", "戳一戳某个人"),
+    _tool("platform.qq.set_avatar", "修改机器人的头像"),
+    _tool("internal.report_action_failure", "报告动作执行失败"),
+]
+
+
+def _names(schemas: list[dict]) -> list[str]:
+    return [schema["function"]["name"] for schema in schemas]
+
+
+class _CountingEncode:
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        self.batches.append(list(texts))
+        return _fake_encode(texts)
+
+
+def test_select_returns_most_relevant_top_k_in_original_order() -> None:
+    selector = ToolSelector(encode=_fake_encode)
+    selected = selector.select(TOOLS, query_text="他刷屏了，禁言他，再发条消息警告一下", top_k=2)
+    assert _names(selected) == ["platform.qq.send_message", "platform.qq.ban_user"]
+
+
+def test_pinned_tools_are_always_included_on_top_of_k() -> None:
+    selector = ToolSelector(encode=_fake_encode, always_include=("report_action_failure",))
+    selected = selector.select(TOOLS, query_text="换个头像", top_k=1)
+    assert _names(selected) == ["platform.qq.set_avatar", "internal.report_action_failure"]
+
+
+def test_top_k_zero_or_larger_than_list_returns_everything() -> None:
+    selector = ToolSelector(encode=_fake_encode)
+    assert _names(selector.select(TOOLS, "随便", top_k=0)) == _names(TOOLS)
+    assert _names(selector.select(TOOLS, "随便", top_k=len(TOOLS))) == _names(TOOLS)
+
+
+def test_falls_back_to_bigram_overlap_without_a_model() -> None:
+    selector = ToolSelector()
+    selected = selector.select(TOOLS, query_text="上传群文件", top_k=1)
+    assert _names(selected) == ["platform.qq.upload_file"]
+
+
+def test_falls_back_to_bigram_overlap_when_encoding_fails() -> None:
+    def broken_encode(texts: list[str]) -> list[list[float]]:
+        raise RuntimeError("模型没加载")
+
+    selector = ToolSelector(encode=broken_encode)
+    selected = selector.select(TOOLS, query_text="戳一戳他", top_k=1)
+    assert _names(selected) == ["platform.qq.poke"]
+
+
+def test_tool_descriptions_are_encoded_once() -> None:
+    encode = _CountingEncode()
+    selector = ToolSelector(encode=encode)
+    selector.register_tools(TOOLS)
+    selector.select(TOOLS, "发消息", top_k=2)
+    selector.select(TOOLS, "禁言", top_k=2)
+
+    description_batches = [batch for batch in encode.batches if len(batch) > 1]
+    assert len(description_batches) == 1
+    assert len(description_batches[0]) == len(TOOLS)
+    # 剩下的都是意图文本，一次一条
+    assert [batch for batch in encode.batches if len(batch) == 1] == [["发消息"], ["禁言"]]
+
+
+def test_changed_schema_is_re_rendered_and_re_encoded() -> None:
+    encode = _CountingEncode()
+    selector = ToolSelector(encode=encode)
+    selector.register_tools(TOOLS)
+    changed = _tool("platform.qq.poke", "戳一戳，或者双击头像")
+    selector.register_tools([*TOOLS[:3], changed, *TOOLS[4:]])
+    assert encode.batches[-1] == ["platform.qq.poke: 戳一戳，或者双击头像"]
+    assert "双击头像" in selector.render([changed])
+
+
+def test_render_reuses_cached_strings(monkeypatch: pytest.MonkeyPatch) -> None:
+    selector = ToolSelector(encode=_fake_encode)
+    first = selector.render(TOOLS)
+    assert first == "[" + ",".join(json.dumps(t, ensure_ascii=False, separators=(",", ":")) for t in TOOLS) + "]"
+    tail = selector.render(TOOLS[4:])
+
+    def no_more_dumps(*args: object, **kwargs: object) -> str:
+        raise AssertionError("schema 没变，不该再序列化一次")
+
+    monkeypatch.setattr(tool_selector, "json", SimpleNamespace(dumps=no_more_dumps))
+    selector.select(TOOLS, "发消息", top_k=2)
+    assert selector.render(TOOLS) == first
+    assert selector.render(TOOLS[4:]) == tail
+
+
+def test_equal_but_new_schema_object_reuses_rendered_string() -> None:
+    encode = _CountingEncode()
+    selector = ToolSelector(encode=encode)
+    selector.register_tools(TOOLS)
+    copies = [dict(schema) for schema in TOOLS]
+    assert selector.render(copies) == selector.render(TOOLS)
+    assert len(encode.batches) == 1
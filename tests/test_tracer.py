@@ -0,0 +1,134 @@
+# tests/test_tracer.py
+"""全链路计时：span 嵌套、关掉时的空操作、慢 trace 阈值，以及事件循环里的文件写入交给后台线程。"""
+
+import asyncio
+import json
+import time
+from collections.abc import Callable
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from src.common.tracing import tracer as tracer_module
+from src.common.tracing.tracer import SLOW_TRACES_FILENAME, STATS_FILENAME, TOTAL_STAGE, PipelineTracer
+
+
+@pytest.fixture
+def use_settings(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Callable[..., None]:
+    def apply(**overrides: object) -> None:
+        settings = {
+            "enabled": True,
+            "slow_trace_threshold_ms": 60_000.0,
+            "export_directory": str(tmp_path),
+            "export_every_n_traces": 0,
+            "max_open_traces": 10,
+        }
+        settings.update(overrides)
+        tracing = SimpleNamespace(**settings)
+        monkeypatch.setattr(tracer_module, "_tracing_settings", lambda: tracing)
+
+    apply()
+    return apply
+
+
+def _read_slow_traces(directory: Path) -> list[dict]:
+    path = directory / SLOW_TRACES_FILENAME
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_nested_spans_are_recorded_inside_their_parent(use_settings: Callable[..., None]) -> None:
+    tracer = PipelineTracer()
+    token = tracer.start("evt-1")
+    trace = tracer.current()
+    with tracer.span("outer"):
+        time.sleep(0.002)
+        with tracer.span("inner"):
+            time.sleep(0.002)
+    tracer.finish_scope(token)
+
+    # 里层先结束，所以先记；外层从更早开始、持续更久，把里层整个包住
+    (inner_stage, inner_offset, inner_ms), (outer_stage, outer_offset, outer_ms) = trace.spans
+    assert (inner_stage, outer_stage) == ("inner", "outer")
+    assert outer_offset <= inner_offset
+    assert inner_offset + inner_ms <= outer_offset + outer_ms
+    assert outer_ms > inner_ms
+
+    stats = tracer.get_stats()
+    assert stats["finished_traces"] == 1
+    assert set(stats["stages"]) == {"inner", "outer", TOTAL_STAGE}
+    assert tracer.current() is None
+
+
+def test_disabled_tracer_is_a_noop(use_settings: Callable[..., None]) -> None:
+    use_settings(enabled=False)
+    tracer = PipelineTracer()
+
+    assert tracer.start("evt-1") is None
+    with tracer.span("outer"):
+        pass
+    tracer.finish("evt-1")
+    assert tracer.get_stats()["finished_traces"] == 0
+
+
+def test_only_traces_over_the_threshold_are_written(use_settings: Callable[..., None], tmp_path: Path) -> None:
+    tracer = PipelineTracer()
+    tracer.finish_scope(tracer.start("fast"))
+    assert _read_slow_traces(tmp_path) == []
+
+    use_settings(slow_trace_threshold_ms=0.0)
+    token = tracer.start("slow")
+    with tracer.span("llm"):
+        pass
+    tracer.finish_scope(token)
+
+    (written,) = _read_slow_traces(tmp_path)
+    assert written["trace_id"] == "slow"
+    assert [span["stage"] for span in written["spans"]] == ["llm"]
+
+
+def test_writes_inside_the_loop_run_in_the_background(use_settings: Callable[..., None], tmp_path: Path) -> None:
+    use_settings(slow_trace_threshold_ms=0.0, export_every_n_traces=1)
+    tracer = PipelineTracer()
+
+    async def run() -> None:
+        tracer.finish_scope(tracer.start("evt-1"))
+        # 事件循环里只是排了个写文件的任务，等 flush 之后才落盘
+        assert tracer._pending_writes
+        await tracer.flush()
+        assert not tracer._pending_writes
+
+    asyncio.run(run())
+
+    assert [trace["trace_id"] for trace in _read_slow_traces(tmp_path)] == ["evt-1"]
+    stats = json.loads((tmp_path / STATS_FILENAME).read_text(encoding="utf-8"))
+    assert stats["finished_traces"] == 1
+
+
+def test_trace_follows_create_task_and_can_be_handed_off(use_settings: Callable[..., None]) -> None:
+    tracer = PipelineTracer()
+
+    async def focus_loop(trace_id: str) -> None:
+        token = tracer.activate(trace_id)
+        with tracer.span("reply"):
+            pass
+        tracer.finish(trace_id)
+        tracer.deactivate(token)
+
+    async def run() -> None:
+        token = tracer.start("evt-1")
+        tracer.hand_off()
+        task = asyncio.create_task(focus_loop("evt-1"))
+        # 接收端收尾时 trace 已经交出去了，不会替专注循环提前结束它
+        tracer.finish_scope(token)
+        assert tracer.get_stats()["open_traces"] == 1
+        await task
+
+    asyncio.run(run())
+
+    stats = tracer.get_stats()
+    assert stats["finished_traces"] == 1
+    assert stats["open_traces"] == 0
+    assert "reply" in stats["stages"]
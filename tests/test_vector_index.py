@@ -0,0 +1,96 @@
+# tests/test_vector_index.py
+"""语义向量索引：写入和检索的过滤、封存段落盘后在事件循环这边换块，以及 flush / load 的往返。"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.common.semantic_memory.vector_index import SemanticVectorIndex
+
+
+def _vec(*components: float) -> list[float]:
+    return list(components)
+
+
+@pytest.fixture
+def index(tmp_path: Path) -> SemanticVectorIndex:
+    index = SemanticVectorIndex(tmp_path / "index", dimension=3, segment_size=2)
+    index.add("a", "conv-1", _vec(1, 0, 0), timestamp=100)
+    index.add("b", "conv-1", _vec(0, 1, 0), timestamp=200)
+    index.add("c", "conv-2", _vec(0.9, 0.1, 0), kind="summary", timestamp=300)
+    return index
+
+
+def test_add_rejects_duplicates_wrong_dimension_and_zero_vectors(index: SemanticVectorIndex) -> None:
+    assert not index.add("a", "conv-1", _vec(0, 0, 1))
+    assert not index.add("d", "conv-1", [1.0, 0.0])
+    assert not index.add("e", "conv-1", _vec(0, 0, 0))
+    assert len(index) == 3
+    assert "a" in index and "d" not in index
+    # 只有消息事件算进补录的水位线，摘要不算
+    assert (index.max_timestamp, index.max_timestamp_item_id) == (200, "b")
+
+
+def test_search_ranks_and_filters(index: SemanticVectorIndex) -> None:
+    assert [hit.item_id for hit in index.search(_vec(1, 0, 0), k=3)] == ["a", "c", "b"]
+    assert [hit.item_id for hit in index.search(_vec(1, 0, 0), k=3, conversation_id="conv-2")] == ["c"]
+    assert [hit.item_id for hit in index.search(_vec(1, 0, 0), k=3, kinds={"event"})] == ["a", "b"]
+    assert [hit.item_id for hit in index.search(_vec(1, 0, 0), k=1, exclude_ids={"a"})] == ["c"]
+    assert [hit.item_id for hit in index.search(_vec(1, 0, 0), k=3, min_score=0.5)] == ["a", "c"]
+    assert index.search(_vec(1, 0), k=3) == []
+
+    hit = index.search(_vec(2, 0, 0), k=1)[0]
+    assert hit.score == pytest.approx(1.0)
+    assert (hit.conversation_id, hit.kind, hit.timestamp) == ("conv-1", "event", 100)
+
+
+def test_written_segments_are_swapped_in_by_the_caller(index: SemanticVectorIndex) -> None:
+    # segment_size=2：前两条已经封存成段，第三条还在活动缓冲区
+    assert index.has_unwritten_segments
+    sealed = index._segments[0]
+
+    written = index.write_pending_segments()
+
+    # 写盘线程不碰索引本身
+    assert len(written) == 1
+    assert index._segments[0] is sealed
+    assert index.has_unwritten_segments
+
+    index.install_written_segments(written)
+
+    assert not index.has_unwritten_segments
+    assert isinstance(index._segments[0].vectors, np.memmap)
+    assert [hit.item_id for hit in index.search(_vec(0, 1, 0), k=1)] == ["b"]
+    assert index.write_pending_segments() == []
+
+
+def test_segments_sealed_during_a_write_stay_queued(index: SemanticVectorIndex) -> None:
+    written = index.write_pending_segments()
+    # 写盘期间又满了一个段
+    index.add("d", "conv-2", _vec(0, 0, 1), timestamp=400)
+
+    index.install_written_segments(written)
+
+    assert index.has_unwritten_segments
+    assert len(index._segments) == 2
+    index.install_written_segments(index.write_pending_segments())
+    assert not index.has_unwritten_segments
+    assert all(isinstance(segment.vectors, np.memmap) for segment in index._segments)
+
+
+def test_flush_and_load_round_trip(index: SemanticVectorIndex, tmp_path: Path) -> None:
+    query = _vec(0.5, 0.5, 0.1)
+    before = [(hit.item_id, round(hit.score, 5)) for hit in index.search(query, k=3)]
+    index.install_written_segments(index.flush())
+
+    reloaded = SemanticVectorIndex(tmp_path / "index", dimension=3, segment_size=2)
+    reloaded.load()
+
+    assert len(reloaded) == 3
+    assert [(hit.item_id, round(hit.score, 5)) for hit in reloaded.search(query, k=3)] == before
+    assert (reloaded.max_timestamp, reloaded.max_timestamp_item_id) == (200, "b")
+    # 没写满的尾段回到活动缓冲区，接着写满了会覆盖同一个段号，不会留下碎段
+    assert reloaded.add("d", "conv-2", _vec(0, 0, 1), timestamp=400)
+    reloaded.install_written_segments(reloaded.flush())
+    assert sorted(p.name for p in (tmp_path / "index").iterdir()) == ["segment_000000", "segment_000001"]